@@ -0,0 +1,67 @@
+"""
+Compares a Backtester parameter sweep against running MovingAverageMonitor once per (window, threshold) combination.
+
+A deterministic synthetic feed of one data point per second for every pair of the given number of currencies
+is swept over 3 windows and 3 thresholds. Both must report the same alert counts.
+
+Usage:
+    python benchmarks/bench_backtest.py [currencies] [seconds] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.service.backtester import Backtester
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed, write_feed
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+
+WINDOWS = [30, 60, 300]
+THRESHOLDS = [0.005, 0.01, 0.02]
+
+
+def run_monitor(path: str) -> list:
+    counts = []
+    for window in WINDOWS:
+        for threshold in THRESHOLDS:
+            with patch.object(config, "MOVING_AVERAGE_WINDOW", window), patch.object(config, "PCT_CHANGE_THRESHOLD", threshold):
+                monitor = MovingAverageMonitor(singleton=False)
+                count = 0
+                for batch in SpotRateReader.columnar_reader(path, config.BATCH_SIZE, symbols=monitor.symbols):
+                    count += monitor.update_batch(batch.timestamps, batch.pair_ids, batch.rates).size
+                counts.append(count)
+    return counts
+
+
+if __name__ == "__main__":
+    currencies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "feed.jsonl")
+        data_points = write_feed(path, synthetic_feed(currencies, seconds, volatility=0.005))
+        print(f"{data_points} data points, {len(WINDOWS) * len(THRESHOLDS)} combinations")
+
+        start_time = time.perf_counter()
+        monitor_counts = run_monitor(path)
+        monitor_time = time.perf_counter() - start_time
+        print(f"monitor per combination: {monitor_time:.3f} s")
+
+        start_time = time.perf_counter()
+        backtest_counts = [result.alert_count for result in Backtester(WINDOWS, THRESHOLDS, workers).run(path)]
+        backtest_time = time.perf_counter() - start_time
+        print(f"backtester ({workers} workers): {backtest_time:.3f} s")
+
+        print(f"speedup: {monitor_time / backtest_time:.1f}x, same alert counts: {monitor_counts == backtest_counts}")
@@ -0,0 +1,106 @@
+"""
+Measures the cost of keeping the top movers index up to date, and the latency of querying it.
+
+A deterministic synthetic feed of one data point per second for every pair of the given number of currencies
+is applied to the windows of MovingAverageMonitor data point by data point (as process_new_rate does, without
+parsing and writing) and with update_batch (one batch per second), with and without MOVERS_INDEX, keeping the best
+of 3 runs, to measure the overhead per data point. The top `k` movers are then queried from the index, and by
+scanning the averages of all the pairs, as a dashboard would without it.
+
+Usage:
+    python benchmarks/bench_movers_index.py [currencies] [seconds] [k]
+"""
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed
+
+
+def new_monitor(currency_pairs, movers_index: bool):
+    with patch("conversion_rate_analyzer.config.MOVERS_INDEX", movers_index):
+        monitor = MovingAverageMonitor(singleton=False)
+    return monitor, monitor.symbols.intern_many(currency_pairs)
+
+
+def run_per_tick(timestamps, currency_pairs, rates, movers_index: bool):
+    monitor, pair_ids = new_monitor(currency_pairs, movers_index)
+    update = monitor._update_count_window
+    data = [Point(timestamp, rate) for timestamp, rate in zip(timestamps.tolist(), rates.tolist())]
+    pair_id_list = pair_ids.tolist()
+    start_time = time.perf_counter()
+    for point, pair_id in zip(data, pair_id_list):
+        update(point, pair_id)
+    return time.perf_counter() - start_time, monitor
+
+
+def run_batch(timestamps, currency_pairs, rates, batch_size: int, movers_index: bool) -> float:
+    monitor, pair_ids = new_monitor(currency_pairs, movers_index)
+    start_time = time.perf_counter()
+    for i in range(0, len(rates), batch_size):
+        monitor.update_batch(timestamps[i:i + batch_size], pair_ids[i:i + batch_size], rates[i:i + batch_size])
+    return time.perf_counter() - start_time
+
+
+class Point:
+    """Minimal data point with the attributes read by the monitor, to leave parsing out of the measurement."""
+    __slots__ = ("timestamp", "rate")
+
+    def __init__(self, timestamp: float, rate: float):
+        self.timestamp = timestamp
+        self.rate = rate
+
+
+def scan_top(monitor: MovingAverageMonitor, k: int):
+    """Top movers without the index: the deviation of the latest rate of every pair from its average."""
+    movers = []
+    for pair_id in monitor._active_pair_ids():
+        window = monitor.windows[pair_id]
+        average_rate = (monitor.totals[pair_id] + monitor.compensations[pair_id]) / monitor.counts[pair_id]
+        movers.append((abs(window.rates[window.tail - 1] / average_rate - 1), pair_id))
+    return sorted(movers, reverse=True)[:k]
+
+
+def best_of(function, repeat: int = 20) -> float:
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    currencies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    logger.remove()
+
+    timestamps, currency_pairs, rates = map(list, zip(*synthetic_feed(currencies, seconds)))
+    pairs_per_second = currencies * (currencies - 1)
+    timestamps, rates = np.array(timestamps), np.array(rates)
+    print(f"{len(rates)} data points, {pairs_per_second} pairs per second")
+
+    baseline = min(run_per_tick(timestamps, currency_pairs, rates, False)[0] for _ in range(3))
+    indexed, monitor = min((run_per_tick(timestamps, currency_pairs, rates, True) for _ in range(3)), key=lambda run: run[0])
+    overhead = (indexed - baseline) / len(rates) * 1e6
+    print(f"per data point        : {baseline / len(rates) * 1e6:.2f} µs, with index {indexed / len(rates) * 1e6:.2f} µs "
+          f"({overhead:+.2f} µs per data point)")
+
+    baseline = min(run_batch(timestamps, currency_pairs, rates, pairs_per_second, False) for _ in range(3))
+    indexed = min(run_batch(timestamps, currency_pairs, rates, pairs_per_second, True) for _ in range(3))
+    print(f"per batch of a second : {baseline / seconds * 1e3:.2f} ms, with index {indexed / seconds * 1e3:.2f} ms "
+          f"({(indexed - baseline) / len(rates) * 1e6:+.2f} µs per data point)")
+
+    print(f"top {k} from the index : {best_of(lambda: monitor.top_movers(k)) * 1e6:.1f} µs")
+    print(f"top {k} by a full scan : {best_of(lambda: scan_top(monitor, k)) * 1e6:.1f} µs "
+          f"over {len(monitor._active_pair_ids())} pairs")
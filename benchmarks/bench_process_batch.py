@@ -0,0 +1,85 @@
+"""
+Compares MovingAverageMonitor.process_new_rate against MovingAverageMonitor.process_batch.
+
+The 1 second snapshot of all currency pairs in `input/1second_all.jsonl` is scaled up to the given number
+of seconds by shifting timestamps and applying a deterministic random walk to the rates.
+Both paths must produce identical output files.
+
+Usage:
+    python benchmarks/bench_process_batch.py [seconds]
+"""
+import filecmp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import jsonlines
+import numpy as np
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+
+
+def scaled_feed(seconds: int):
+    with jsonlines.open(os.path.join(PROJECT_ROOT_DIR, "input/1second_all.jsonl")) as reader:
+        snapshot = list(reader)
+
+    pairs = np.array([obj["currencyPair"] for obj in snapshot])
+    rates = np.array([obj["rate"] for obj in snapshot])
+    start = snapshot[0]["timestamp"]
+    rng = np.random.default_rng(0)
+
+    for second in range(seconds):
+        rates = rates * (1 + rng.normal(0, 0.03, len(rates)))
+        yield np.full(len(pairs), start + second), pairs, rates
+
+
+def run_per_tick(feed, path: str) -> float:
+    monitor = MovingAverageMonitor()
+    monitor.initialize_writer(path)
+    start_time = time.perf_counter()
+    for timestamps, pairs, rates in feed:
+        for timestamp, currency_pair, rate in zip(timestamps.tolist(), pairs.tolist(), rates.tolist()):
+            obj = {"timestamp": timestamp, "currencyPair": currency_pair, "rate": rate}
+            monitor.process_new_rate(CurrencyConversionRate.parse_obj(obj))
+    elapsed = time.perf_counter() - start_time
+    monitor.terminate_writer()
+    return elapsed
+
+
+def run_batch(feed, path: str) -> float:
+    monitor = MovingAverageMonitor()
+    monitor.initialize_writer(path)
+    start_time = time.perf_counter()
+    for timestamps, pairs, rates in feed:
+        monitor.process_batch(timestamps, pairs, rates)
+    elapsed = time.perf_counter() - start_time
+    monitor.terminate_writer()
+    return elapsed
+
+
+if __name__ == "__main__":
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    logger.remove()
+
+    feed = list(scaled_feed(seconds))
+    data_points = sum(len(timestamps) for timestamps, _, _ in feed)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        per_tick_path = os.path.join(tmp_dir, "per_tick.jsonl")
+        batch_path = os.path.join(tmp_dir, "batch.jsonl")
+        per_tick_time = run_per_tick(feed, per_tick_path)
+        batch_time = run_batch(feed, batch_path)
+        identical = filecmp.cmp(per_tick_path, batch_path, shallow=False)
+
+    print(f"{data_points} data points over {seconds} seconds of all currency pairs")
+    print(f"process_new_rate: {per_tick_time:.3f}s ({data_points / per_tick_time:,.0f} data points/s)")
+    print(f"process_batch   : {batch_time:.3f}s ({data_points / batch_time:,.0f} data points/s)")
+    print(f"speedup         : {per_tick_time / batch_time:.1f}x, identical output: {identical}")
@@ -0,0 +1,61 @@
+"""
+Compares reading a jsonlines feed sequentially, with the parallel chunked reader, and gzip compressed.
+
+A deterministic synthetic feed of one data point per second for every pair of the given number of currencies
+is read into columnar batches of interned pair IDs by SpotRateReader.columnar_reader.
+Every reader must yield the same data points.
+
+Usage:
+    python benchmarks/bench_reader.py [currencies] [seconds] [workers]
+"""
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed, write_feed
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+
+
+def read(path: str, workers: int = 1):
+    start_time = time.perf_counter()
+    timestamps, pair_ids = [], []
+    for batch in SpotRateReader.columnar_reader(path, config.BATCH_SIZE, symbols=SymbolTable(), workers=workers):
+        timestamps.append(np.asarray(batch.timestamps))
+        pair_ids.append(np.asarray(batch.pair_ids))
+    return time.perf_counter() - start_time, np.concatenate(timestamps), np.concatenate(pair_ids)
+
+
+if __name__ == "__main__":
+    currencies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "feed.jsonl")
+        data_points = write_feed(path, synthetic_feed(currencies, seconds))
+        with open(path, "rb") as f, gzip.open(path + ".gz", "wb", compresslevel=6) as compressed:
+            shutil.copyfileobj(f, compressed)
+        print(f"{data_points} data points, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+        baseline_time, *baseline = read(path)
+        for name, (elapsed, *result) in (
+                ("sequential", (baseline_time, *baseline)),
+                (f"parallel ({workers} workers)", read(path, workers)),
+                ("gzip", read(path + ".gz")),
+        ):
+            same = all(np.array_equal(a, b) for a, b in zip(result, baseline))
+            print(f"{name:22}: {elapsed:.3f} s ({data_points / elapsed:,.0f} data points/s), same data points: {same}")
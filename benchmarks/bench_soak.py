@@ -0,0 +1,95 @@
+"""
+Soak test of the running sums of MovingAverageMonitor over a long stream of a single currency pair.
+
+A deterministic random walk with occasional jumps of several orders of magnitude is fed one data point at a time.
+After every report interval, the moving average of the monitor is compared with the exact (math.fsum) average of
+its window, for the plain running sum (`total - expired + rate`, as before compensated summation),
+for compensated summation alone, and for compensated summation with periodic re-anchoring.
+The plain running sum is timed in a bare loop over a RateWindow, the other two through process_new_rate.
+
+Usage:
+    python benchmarks/bench_soak.py [data points] [report interval]
+"""
+import math
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.tick import Tick
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.rate_window import RateWindow
+
+
+def soak_feed(data_points: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    rates = np.exp(np.cumsum(rng.normal(0, 0.001, data_points)))
+    jumps = rng.random(data_points) < 0.001
+    rates[jumps] *= rng.choice([1e-6, 1e6], int(jumps.sum()))
+    return rates
+
+
+def run_plain(rates: np.ndarray, report_interval: int):
+    """The running sum as it was updated before compensated summation."""
+    window = RateWindow(config.MOVING_AVERAGE_WINDOW)
+    total, count = 0.0, 0
+    errors = []
+    start_time = time.perf_counter()
+    for i, rate in enumerate(rates.tolist()):
+        if window.full():
+            total = total - window.get()[1] + rate
+        else:
+            total, count = total + rate, count + 1
+        window.put((i, rate))
+        if (i + 1) % report_interval == 0:
+            errors.append(relative_error(total / count, window))
+    return time.perf_counter() - start_time, errors
+
+
+def run_monitor(rates: np.ndarray, report_interval: int, reanchor_interval: int):
+    errors = []
+    with patch.object(config, "REANCHOR_INTERVAL", reanchor_interval), patch.object(config, "VERBOSE", False):
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.jsonline_writer = _NullWriter()
+        start_time = time.perf_counter()
+        for i, rate in enumerate(rates.tolist()):
+            monitor.process_new_rate(Tick(i, "AUDUSD", rate))
+            if (i + 1) % report_interval == 0:
+                errors.append(relative_error(monitor.get_current_average_rate("AUDUSD"), monitor.get_window("AUDUSD")))
+        return time.perf_counter() - start_time, errors
+
+
+def relative_error(average: float, window: RateWindow) -> float:
+    exact = sum(window.exact_sum()) / len(window)
+    return abs(average - exact) / abs(exact)
+
+
+class _NullWriter:
+    def write(self, *args):
+        pass
+
+
+if __name__ == "__main__":
+    data_points = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    report_interval = int(sys.argv[2]) if len(sys.argv) > 2 else data_points // 10
+    logger.remove()
+
+    rates = soak_feed(data_points)
+    print(f"{data_points} data points, window of {config.MOVING_AVERAGE_WINDOW}, relative error of the average")
+
+    for name, run in [
+        ("plain sum", lambda: run_plain(rates, report_interval)),
+        ("compensated", lambda: run_monitor(rates, report_interval, 0)),
+        (f"compensated + re-anchor every {config.REANCHOR_INTERVAL}", lambda: run_monitor(rates, report_interval, config.REANCHOR_INTERVAL)),
+    ]:
+        elapsed, errors = run()
+        print(f"{name}: {elapsed:.3f}s ({data_points / elapsed:,.0f} data points/s)")
+        print(f"\tmax error: {max(errors):.3e}, at each report: " + " ".join(f"{error:.1e}" for error in errors))
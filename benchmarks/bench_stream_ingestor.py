@@ -0,0 +1,73 @@
+"""
+Measures the throughput and latency of StreamIngestor over TCP.
+
+The sample input is sent over a local TCP connection, and timed until all its data points have been processed
+by the monitor, then a single data point is sent and timed until it has been processed, which is bounded by the
+micro-batch delay rather than the batch size.
+
+Usage:
+    python benchmarks/bench_stream_ingestor.py [input file]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.stream_ingestor import StreamIngestor
+
+
+async def wait_for_processed(ingestor: StreamIngestor, count: int):
+    while ingestor.data_points_processed < count:
+        await asyncio.sleep(0.001)
+
+
+async def run(lines: bytes, max_delay: float):
+    monitor = MovingAverageMonitor(singleton=False)
+    output_dir = tempfile.mkdtemp()
+    monitor.initialize_writer(os.path.join(output_dir, "output.jsonl"))
+    data_points = lines.count(b"\n")
+    ingestor = StreamIngestor(monitor, max_delay=max_delay)
+    server = await ingestor.serve_tcp("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    consumer = asyncio.ensure_future(ingestor.run())
+
+    _, writer = await asyncio.open_connection("127.0.0.1", port)
+    start_time = time.perf_counter()
+    writer.write(lines)
+    await writer.drain()
+    await wait_for_processed(ingestor, data_points)
+    throughput = data_points / (time.perf_counter() - start_time)
+
+    start_time = time.perf_counter()
+    writer.write(b'{"timestamp": 1626614332.69, "currencyPair": "GIPPEN", "rate": 2.0}\n')
+    await writer.drain()
+    await wait_for_processed(ingestor, data_points + 1)
+    latency = time.perf_counter() - start_time
+
+    writer.close()
+    ingestor.stop()
+    await consumer
+    monitor.terminate_writer()
+    return data_points, throughput, latency
+
+
+if __name__ == "__main__":
+    input_file = sys.argv[1] if len(sys.argv) > 1 else str(Path(PROJECT_ROOT_DIR) / "input" / "1second_all.jsonl")
+    logger.remove()
+
+    with open(input_file, "rb") as f:
+        lines = f.read()
+
+    for max_delay in (0.01, 0.05):
+        data_points, throughput, latency = asyncio.run(run(lines, max_delay))
+        print(f"max delay {max_delay * 1000:.0f} ms: {data_points} data points at {throughput:,.0f} per second, "
+              f"single data point latency {latency * 1000:.1f} ms")
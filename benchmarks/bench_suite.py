@@ -0,0 +1,62 @@
+"""
+Benchmarks the reading, parsing, monitor update and writing stages, separately and end to end.
+
+The input is either a jsonlines file, or a deterministic synthetic feed of one data point per second for every
+pair of the given number of currencies. The results (throughput, p50/p99 per-tick latency and peak RSS of
+each stage) are printed as JSON, or appended as one JSON line to the --output file to track regressions.
+With --feed-only, the synthetic feed is written to the given path instead of being benchmarked.
+
+Usage:
+    python benchmarks/bench_suite.py [--input input.jsonl]
+                                     [--currencies 20] [--seconds 60] [--out-of-order 0.01] [--volatility 0.001]
+                                     [--seed 0] [--batch-size 10000] [--output results.jsonl] [--feed-only feed.jsonl]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer.utils.benchmark import run_benchmark, run_synthetic_benchmark
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed, write_feed
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", help="benchmark this jsonlines file instead of a synthetic feed")
+    parser.add_argument("--currencies", type=int, default=20, help="currencies of the synthetic feed")
+    parser.add_argument("--seconds", type=int, default=60, help="duration of the synthetic feed in seconds")
+    parser.add_argument("--out-of-order", type=float, default=0.0, help="fraction of delayed data points")
+    parser.add_argument("--volatility", type=float, default=0.001, help="per second volatility of the currencies")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--output", help="append the results as a JSON line to this file")
+    parser.add_argument("--feed-only", metavar="PATH", help="write the synthetic feed to PATH and exit")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logger.remove()
+
+    if args.feed_only:
+        feed = synthetic_feed(args.currencies, args.seconds, args.out_of_order, args.volatility, args.seed)
+        print(f"{write_feed(args.feed_only, feed)} data points written to {args.feed_only}")
+        sys.exit(0)
+
+    if args.input:
+        results = run_benchmark(args.input, args.batch_size)
+    else:
+        results = run_synthetic_benchmark(
+            args.currencies, args.seconds, args.out_of_order, args.volatility, args.seed, args.batch_size
+        )
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps(results) + "\n")
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,78 @@
+"""
+Compares replaying a jsonlines feed against replaying the same feed converted to a binary tick file.
+
+A deterministic synthetic feed of one data point per second for every pair of the given number of currencies
+(100 currencies is the full 9,900 pairs) is written as jsonlines and converted with tick_file.convert_jsonl.
+Each input is then read alone, and read and processed with MovingAverageMonitor.process_batch.
+Both replays must produce identical output files.
+
+Usage:
+    python benchmarks/bench_tick_file.py [currencies] [seconds]
+"""
+import filecmp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed, write_feed
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.utils.tick_file import convert_jsonl
+
+
+def readers(jsonl_path: str, tick_path: str, monitor: MovingAverageMonitor) -> dict:
+    return {
+        "jsonl": SpotRateReader.columnar_reader(jsonl_path, config.BATCH_SIZE, symbols=monitor.symbols),
+        "ticks": SpotRateReader.tick_file_reader(tick_path, config.TICK_FILE_BATCH_SIZE, symbols=monitor.symbols),
+    }
+
+
+def run(name: str, jsonl_path: str, tick_path: str, output_path: str = None) -> float:
+    monitor = MovingAverageMonitor(singleton=False)
+    if output_path:
+        monitor.initialize_writer(output_path)
+    start_time = time.perf_counter()
+    for batch in readers(jsonl_path, tick_path, monitor)[name]:
+        if output_path:
+            monitor.process_batch(batch.timestamps, batch.pair_ids, batch.rates)
+    elapsed = time.perf_counter() - start_time
+    if output_path:
+        monitor.terminate_writer()
+    return elapsed
+
+
+if __name__ == "__main__":
+    currencies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        jsonl_path = os.path.join(tmp_dir, "feed.jsonl")
+        tick_path = os.path.join(tmp_dir, "feed.ticks")
+        data_points = write_feed(jsonl_path, synthetic_feed(currencies, seconds))
+
+        start_time = time.perf_counter()
+        convert_jsonl(jsonl_path, tick_path)
+        print(f"{data_points} data points, converted in {time.perf_counter() - start_time:.2f} s")
+        print(f"file size: jsonl {os.path.getsize(jsonl_path) / 1e6:.1f} MB, ticks {os.path.getsize(tick_path) / 1e6:.1f} MB")
+
+        outputs = {}
+        for name in ("jsonl", "ticks"):
+            read_time = run(name, jsonl_path, tick_path)
+            outputs[name] = os.path.join(tmp_dir, f"{name}_output.jsonl")
+            total_time = run(name, jsonl_path, tick_path, outputs[name])
+            print(
+                f"{name:5}: read {read_time:.3f} s ({data_points / read_time:,.0f} data points/s), "
+                f"read + process {total_time:.3f} s ({data_points / total_time:,.0f} data points/s)"
+            )
+
+        print(f"identical output: {filecmp.cmp(outputs['jsonl'], outputs['ticks'], shallow=False)}")
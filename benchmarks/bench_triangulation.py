@@ -0,0 +1,69 @@
+"""
+Measures the cost of checking every data point against the cross rates of the other pairs.
+
+A deterministic synthetic feed of one data point per second for every pair of the given number of currencies
+is checked by TriangulationEngine data point by data point, then run through MovingAverageMonitor.process_batch
+with and without TRIANGULATION_TOLERANCE. One in `bad_every` rates is corrupted by 5%, and all of them must be
+flagged. To keep up with the feed, each second of data points must be checked in well under a second.
+
+Usage:
+    python benchmarks/bench_triangulation.py [currencies] [seconds] [bad_every]
+"""
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.service.triangulation import TriangulationEngine
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed
+
+
+def run_monitor(timestamps, currency_pairs, rates, batch_size: int) -> float:
+    monitor = MovingAverageMonitor(singleton=False)
+    pair_ids = monitor.symbols.intern_many(currency_pairs)
+    start_time = time.perf_counter()
+    for i in range(0, len(rates), batch_size):
+        monitor.update_batch(timestamps[i:i + batch_size], pair_ids[i:i + batch_size], rates[i:i + batch_size])
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    currencies = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    bad_every = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    logger.remove()
+
+    timestamps, currency_pairs, rates = map(list, zip(*synthetic_feed(currencies, seconds)))
+    pairs_per_second = currencies * (currencies - 1)
+    bad_rows = list(range(2 * pairs_per_second, len(rates), bad_every))
+    for row in bad_rows:
+        rates[row] *= 1.05
+    symbols = SymbolTable()
+    timestamps, pair_ids, rates = np.array(timestamps), symbols.intern_many(currency_pairs), np.array(rates)
+    print(f"{len(rates)} data points, {pairs_per_second} pairs per second")
+
+    engine = TriangulationEngine(symbols, tolerance=0.01)
+    check = engine.check
+    start_time = time.perf_counter()
+    flagged = [row for row, (pair_id, rate) in enumerate(zip(pair_ids.tolist(), rates.tolist())) if check(pair_id, rate)]
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"engine.check          : {elapsed:.3f} s ({len(rates) / elapsed:,.0f} data points/s, "
+        f"{elapsed / seconds:.3f} s per second of feed), flagged {len(flagged)}/{len(bad_rows)} "
+        f"bad rates, {len(set(flagged) - set(bad_rows))} good rates"
+    )
+
+    baseline = run_monitor(timestamps, currency_pairs, rates, pairs_per_second)
+    with patch("conversion_rate_analyzer.config.TRIANGULATION_TOLERANCE", 0.01):
+        checked = run_monitor(timestamps, currency_pairs, rates, pairs_per_second)
+    print(f"process_batch         : {baseline:.3f} s ({len(rates) / baseline:,.0f} data points/s)")
+    print(f"process_batch, checked: {checked:.3f} s ({len(rates) / checked:,.0f} data points/s)")
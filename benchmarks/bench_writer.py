@@ -0,0 +1,70 @@
+"""
+Compares SpotRateWriter (flush after every alert) against BufferedSpotRateWriter.
+
+A burst of alerts is written both one at a time with `write` and as AlertBlocks with `write_block`,
+as MovingAverageMonitor does when thousands of pairs breach the threshold at once.
+Both writers must produce identical output files.
+
+Usage:
+    python benchmarks/bench_writer.py [alerts]
+"""
+import filecmp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+
+PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+if PROJECT_ROOT_DIR not in sys.path:
+    sys.path.append(PROJECT_ROOT_DIR)
+
+from conversion_rate_analyzer.models.alert_block import AlertBlock
+from conversion_rate_analyzer.models.tick import Tick
+from conversion_rate_analyzer.utils.writer import BufferedSpotRateWriter, SpotRateWriter
+
+
+def alert_blocks(alerts: int, block_size: int = 9900):
+    rng = np.random.default_rng(0)
+    for start in range(0, alerts, block_size):
+        size = min(block_size, alerts - start)
+        yield AlertBlock(
+            timestamps=np.full(size, 1626614331.0 + start // block_size),
+            currency_pairs=np.array([f"C{i % 100:02d}C{i // 100:02d}" for i in range(size)], dtype=object),
+            rates=rng.random(size),
+            average_rates=rng.random(size),
+            pct_changes=rng.random(size),
+            indices=np.arange(size),
+        )
+
+
+def run(writer, blocks) -> float:
+    start_time = time.perf_counter()
+    for block in blocks:
+        for tick in zip(block.timestamps.tolist(), block.currency_pairs.tolist(), block.rates.tolist()):
+            writer.write(Tick(*tick))
+        writer.write_block(block)
+    writer.close()
+    return time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    alerts = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    logger.remove()
+    blocks = list(alert_blocks(alerts))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        per_line_path = os.path.join(tmp_dir, "per_line.jsonl")
+        buffered_path = os.path.join(tmp_dir, "buffered.jsonl")
+        per_line_time = run(SpotRateWriter(per_line_path), blocks)
+        buffered_time = run(BufferedSpotRateWriter(buffered_path), blocks)
+        identical = filecmp.cmp(per_line_path, buffered_path, shallow=False)
+
+    written = 2 * alerts
+    print(f"{written} alerts written")
+    print(f"SpotRateWriter        : {per_line_time:.3f}s ({written / per_line_time:,.0f} alerts/s)")
+    print(f"BufferedSpotRateWriter: {buffered_time:.3f}s ({written / buffered_time:,.0f} alerts/s)")
+    print(f"speedup               : {per_line_time / buffered_time:.1f}x, identical output: {identical}")
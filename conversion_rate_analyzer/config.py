@@ -1,29 +1,255 @@
+"""
+Default settings of the analyzer. Each setting can be overridden per run by a config file, environment variables
+or command line flags (see RuntimeConfig), which set the attributes of this module; the components read them
+when they are used. Importing this module has no side effects: the log file sink is added by configure_logging,
+and the output directory is created when the output file is opened.
+"""
 import os
-from datetime import datetime
-from pathlib import Path
-
-from loguru import logger
 
 # configure log output directory
-PROJECT_ROOT_DIR = Path(__file__).parent.parent
+PROJECT_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOG_DIR = os.path.join(PROJECT_ROOT_DIR, "logs")
-logger.add(os.path.join(LOG_DIR, "file_{time}.log"))
+
+"""
+If LOG_ENQUEUE is set to True, the log file is written from a background thread, so log I/O does not block
+the processing loop. main.py waits for the queued records before exiting. Other callers of configure_logging
+should call logger.complete() before exiting, or the last records may be lost.
+If LOG_SERIALIZE is set to True, each record is written to the log file as a JSON line,
+including the fields of the alerts.
+"""
+LOG_ENQUEUE = False
+LOG_SERIALIZE = False
 
 # moving average window
 MOVING_AVERAGE_WINDOW = 60 * 5
 
 PCT_CHANGE_THRESHOLD = 0.1
 
-OUTPUT_DIR = os.path.join(PROJECT_ROOT_DIR, "output")
+"""
+Direction of the spot change alerts: "up" alerts when the rate rises PCT_CHANGE_THRESHOLD above the moving average,
+"down" when it falls PCT_CHANGE_THRESHOLD below it, and "both" on either.
+"""
+PCT_CHANGE_DIRECTION = "up"
+
+"""
+Additional detectors run on every data point, sharing the window of each currency pair. Each entry is a dict
+with the registered "type" of the detector and its parameters, for example:
+    {"type": "ema", "threshold": 0.05, "alpha": 0.1, "direction": "both"}
+    {"type": "zscore", "threshold": 3.0, "direction": "both"}
+    {"type": "range", "threshold": 0.0, "direction": "both"}
+"""
+DETECTORS = []
+
+"""
+if WINDOW_SECONDS is set, the moving average covers the data points of the last WINDOW_SECONDS seconds of event time
+instead of the last MOVING_AVERAGE_WINDOW data points. Data points arriving more than ALLOWED_LATENESS seconds behind
+the latest event time are dropped.
+"""
+WINDOW_SECONDS = None
+ALLOWED_LATENESS = 10.0
+
+"""
+The running sum of each currency pair is kept with compensated summation, and every REANCHOR_INTERVAL data points
+of a pair it is recomputed exactly from the contents of its window, so that it does not drift over a long run.
+The recomputations of different pairs are staggered. Set to 0 to disable re-anchoring.
+"""
+REANCHOR_INTERVAL = 1000
+
+"""
+For a churning universe of currency pairs, the memory held by the monitor can be bounded: every GOVERNOR_INTERVAL
+seconds of event time, the pairs without a data point for PAIR_TTL seconds are evicted, then the least recently
+updated pairs while the estimated state of the monitor exceeds MEMORY_BUDGET_MB. Evicted pairs start over with an
+empty window, unless SPILL_DIR is set, in which case their state is spilled to a scratch file in SPILL_DIR and reloaded
+when they tick again. Until then, evicted pairs are unknown to the getters of the monitor and to the query API.
+The budget bounds the windows: a small fixed state is kept for every pair ever seen.
+"""
+PAIR_TTL = None
+MEMORY_BUDGET_MB = None
+SPILL_DIR = None
+GOVERNOR_INTERVAL = 60.0
+
+"""
+if DEDUPLICATE is True, a data point with the same currency pair and timestamp as one of the last DEDUP_CAPACITY
+data points of the pair is dropped as a duplicate. If MAX_TICK_DELAY is set, a data point more than MAX_TICK_DELAY
+seconds behind the latest data point of its pair is dropped as late, and appended to LATE_OUTPUT_FILE if set,
+as jsonlines in the input format. Neither reaches the moving average, and both are counted.
+With WORKERS > 1, each worker appends to LATE_OUTPUT_FILE suffixed with its shard number (.0, .1...).
+"""
+DEDUPLICATE = False
+DEDUP_CAPACITY = 1024
+MAX_TICK_DELAY = None
+LATE_OUTPUT_FILE = None
+
+"""
+if TRIANGULATION_TOLERANCE is set, the latest rate of every pair of currency codes is kept in a currency matrix,
+and a data point of A→C that deviates by more than TRIANGULATION_TOLERANCE (as a fraction) from A→B·B→C for most
+intermediate currencies B, with at least TRIANGULATION_MIN_PATHS of them known, raises a crossRateMismatch alert
+instead of updating the moving average, so that a bad quote does not raise spot change alerts.
+The cross rates span all the currency pairs, so WORKERS is ignored (the input is processed by a single process).
+"""
+TRIANGULATION_TOLERANCE = None
+TRIANGULATION_MIN_PATHS = 3
+
+"""
+Spot change alerts are debounced per currency pair if any of the following is set: once a pair raises an alert,
+it raises no other alert until its percent change is back within ALERT_CLEAR_THRESHOLD (PCT_CHANGE_THRESHOLD by default)
+of the average, and then only after ALERT_MIN_TICKS consecutive data points over PCT_CHANGE_THRESHOLD and at least
+ALERT_COOLDOWN seconds of event time after its previous alert. Each alert reports how many breaches were suppressed.
+"""
+ALERT_CLEAR_THRESHOLD = None
+ALERT_COOLDOWN = 0.0
+ALERT_MIN_TICKS = 1
 
-if not os.path.exists(OUTPUT_DIR):
-    os.mkdir(OUTPUT_DIR)
+"""
+if MOVERS_INDEX is set to True, the monitor ranks the currency pairs by the deviation of their latest data point from
+their moving average (the pct change checked against PCT_CHANGE_THRESHOLD), in an index updated in O(log n) per
+data point, so that MovingAverageMonitor.top_movers and the /movers endpoint of the query API are served instantly.
+"""
+MOVERS_INDEX = False
+
+"""
+Alerts are written to OUTPUT_FILE, which defaults to OUTPUT_DIR/<date>.jsonl for the date on which it is first used.
+"""
+OUTPUT_DIR = os.path.join(PROJECT_ROOT_DIR, "output")
 
-current_date = datetime.now().strftime("%Y-%m-%d")
-OUTPUT_FILE = os.path.join(OUTPUT_DIR, f"{current_date}.jsonl")
+"""
+Alerts are logged as a multi-line "verbose" message, a single line "compact" message, or not at all (None).
+if ALERT_LOG_RATE is set, the log lines of each currency pair are limited to ALERT_LOG_RATE per second,
+with bursts of up to ALERT_LOG_BURST. Alerts are always written to the output file regardless.
+"""
+ALERT_LOG_FORMAT = "verbose"
+ALERT_LOG_RATE = None
+ALERT_LOG_BURST = 5
 
 """
 if VERBOSE is set to True, new conversation rate, last moving average, and 
 percentage change will also be included in the output jsonlines file.
 """
 VERBOSE = False
+
+"""
+if STRICT_VALIDATION is set to True, each line is validated with the pydantic model and processed one at a time.
+Otherwise lines are decoded on the fast path into columnar batches of BATCH_SIZE data points,
+which are processed with MovingAverageMonitor.process_batch.
+"""
+STRICT_VALIDATION = False
+BATCH_SIZE = 10000
+
+"""
+Binary tick files (see utils/tick_file.py) are memory-mapped and processed in slices of TICK_FILE_BATCH_SIZE
+data points, whatever STRICT_VALIDATION and WORKERS are, since their data points were validated when converted.
+"""
+TICK_FILE_BATCH_SIZE = 100000
+
+"""
+if READER_WORKERS is greater than 1, uncompressed jsonlines inputs are split into chunks of READER_CHUNK_SIZE bytes
+at line boundaries, which are decoded by READER_WORKERS processes and merged back in file order.
+gzip (.gz) and zstd (.zst) compressed inputs are decompressed as they are read, by a single process;
+zstd requires the zstandard package.
+"""
+READER_WORKERS = 1
+READER_CHUNK_SIZE = 1 << 23
+
+"""
+if WORKERS is greater than 1, the currency pairs are partitioned over WORKERS processes by ShardedPipeline.
+The sharded mode uses the fast decoding path, and is not used when STRICT_VALIDATION is set to True
+or TRIANGULATION_TOLERANCE is set.
+"""
+WORKERS = 1
+
+"""
+if FOLLOW_INPUT is set to True, the input file is tailed for new lines instead of stopping at the end of the file.
+Input paths of the form tcp://host:port or unix:///path/to.sock are always streamed.
+"""
+FOLLOW_INPUT = False
+
+"""
+By default (WRITER_FLUSH_RECORDS = 1) the output file is flushed after each alert.
+Otherwise alerts are buffered in memory and flushed when WRITER_FLUSH_RECORDS alerts or WRITER_FLUSH_BYTES bytes
+are buffered, or WRITER_FLUSH_INTERVAL_MS milliseconds have passed since the last flush.
+If WRITER_BACKGROUND_FLUSH is set to True, a background thread also flushes the buffer on that interval.
+See BufferedSpotRateWriter for the durability guarantees of each policy.
+"""
+WRITER_FLUSH_RECORDS = 1
+WRITER_FLUSH_BYTES = 1 << 20
+WRITER_FLUSH_INTERVAL_MS = 100.0
+WRITER_BACKGROUND_FLUSH = False
+
+"""
+if OUTPUT_SINKS is set, alerts are fanned out to each of the listed sinks instead of being written to OUTPUT_FILE alone.
+Each entry is a dict with the "type" of the sink and its parameters, for example:
+    {"type": "stdout"}
+    {"type": "file", "path": "output/%Y-%m-%d.jsonl", "max_bytes": 104857600, "backups": 5}
+    {"type": "unix", "path": "/tmp/alerts.sock"}
+    {"type": "queue", "name": "alerts"}
+File paths are formatted with strftime, so the file above rolls over at midnight, and a file sink without a path
+writes to OUTPUT_FILE. Each sink buffers up to SINK_BUFFER_SIZE lines (or its own "buffer_size") and writes them
+from a thread of its own. When its buffer is full, SINK_POLICY (or its own "policy") drops the newest lines
+("drop_newest"), drops the oldest ones ("drop_oldest"), or blocks the monitor until the sink catches up ("block").
+"""
+OUTPUT_SINKS = None
+SINK_BUFFER_SIZE = 10000
+SINK_POLICY = "drop_newest"
+
+"""
+if CHECKPOINT_FILE is set, the state of the monitor is restored from that snapshot on startup, and the input
+is resumed from the offset recorded in it. A new snapshot is written in the background every CHECKPOINT_INTERVAL
+seconds, and at the end of the input. Checkpoints are only taken in the default (columnar, single process) mode.
+Snapshots include the windows, the detector and debouncer states, the recent timestamps of the tick filter
+and the movers index, so a restarted process drops the same duplicates and does not fire debounced alerts again.
+"""
+CHECKPOINT_FILE = None
+CHECKPOINT_INTERVAL = 60.0
+
+"""
+if METRICS_ENABLED is set to True, counters and latency histograms of each stage are collected and exported
+in the Prometheus text format, at http://127.0.0.1:METRICS_PORT/metrics if METRICS_PORT is set, and to METRICS_FILE
+every METRICS_INTERVAL seconds if METRICS_FILE is set. Metrics are not collected in the workers of ShardedPipeline.
+"""
+METRICS_ENABLED = False
+METRICS_PORT = None
+METRICS_FILE = None
+METRICS_INTERVAL = 10.0
+
+"""
+if QUERY_PORT is set, the state of the monitor is served as JSON at http://QUERY_HOST:QUERY_PORT, with the
+averages, latest rates and pct changes of all the pairs (/pairs), the window of one pair (/pairs/<pair>),
+the top movers (/movers?k=20) and the status (/status). Requests are served from a snapshot of the state
+published by the monitor every QUERY_INTERVAL seconds. Not available with WORKERS > 1.
+"""
+QUERY_PORT = None
+QUERY_HOST = "127.0.0.1"
+QUERY_INTERVAL = 1.0
+
+"""
+if BACKTEST_WINDOWS or BACKTEST_THRESHOLDS is set to a list, main.py runs a backtest instead of monitoring the input:
+the spot change alerts of every combination of the windows (MOVING_AVERAGE_WINDOW by default) and the thresholds
+(PCT_CHANGE_THRESHOLD by default) are evaluated by Backtester over WORKERS processes, and written to OUTPUT_FILE
+as one JSON line per combination, with the alert count and alert timestamps of each currency pair.
+"""
+BACKTEST_WINDOWS = None
+BACKTEST_THRESHOLDS = None
+
+_log_handler_id = None
+
+
+def __getattr__(name: str):
+    # OUTPUT_FILE is resolved on first use rather than on import, and then kept for the rest of the run
+    if name == "OUTPUT_FILE":
+        from datetime import datetime
+
+        global OUTPUT_FILE
+        OUTPUT_FILE = os.path.join(OUTPUT_DIR, f"{datetime.now().strftime('%Y-%m-%d')}.jsonl")
+        return OUTPUT_FILE
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def configure_logging():
+    """Adds the log file sink in LOG_DIR, once. Called when the pipeline starts."""
+    global _log_handler_id
+    if _log_handler_id is not None:
+        return
+
+    from loguru import logger
+
+    _log_handler_id = logger.add(os.path.join(LOG_DIR, "file_{time}.log"), enqueue=LOG_ENQUEUE, serialize=LOG_SERIALIZE)
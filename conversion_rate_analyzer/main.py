@@ -1,20 +1,14 @@
+import os
+import signal
 import sys
 import time
-from pathlib import Path
 
-from jsonlines import InvalidLineError
-from loguru import logger
-from pydantic.error_wrappers import ValidationError
-
-PROJECT_ROOT_DIR = str(Path(__file__).parent.parent)
+PROJECT_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT_DIR not in sys.path:  # pragma: no cover
     sys.path.append(PROJECT_ROOT_DIR)
 
 from conversion_rate_analyzer import config
-from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
-from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
-from conversion_rate_analyzer.utils.exceptions import SpotRateWriterError
-from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.runtime_config import RuntimeConfig
 
 data_points_processed = 0
 
@@ -22,21 +16,41 @@ data_points_processed = 0
 The program:
 - reads from input jsonline file passed via command line argument,
 - convert each line into a CurrencyConversionRate object after validating data,
+  or in fast mode (default), decode and validate lines straight into columnar batches,
+  or, for a binary tick file (see utils/tick_file.py), memory-map it and process it in slices,
 - and uses the MovingAverageMonitor singleton object to record conversion rates for each currency pair
   while retaining a specific number of latest n records for continuously updating moving averages
 - when the percentage difference between a new conversion rate and the current moving average exceed
   the acceptance threshold, the program will print to the console and log that alert to the output file
 - all logs are captured and stored in `logs` directory as well
+
+With BACKTEST_WINDOWS or BACKTEST_THRESHOLDS set, the input is backtested over a grid of windows and thresholds
+instead (see Backtester), and the alerts of each combination are written to the output file.
+
+Settings can be overridden per run with command line flags, RATE_ANALYZER_* environment variables
+or a JSON config file (see RuntimeConfig), and reloaded on SIGHUP. The modules of each mode are only imported
+when that mode runs, so that starting the program (or importing it) stays cheap.
 """
 
 
 def main():
+    from loguru import logger
+
     if len(sys.argv) < 2:
         e = IndexError("Supply the input file path as an argument: python main.py input.jsonl")
         logger.error(e)
         raise e
 
-    input_file = sys.argv[1]
+    input_file, runtime_config = RuntimeConfig.from_args(sys.argv[1:])
+    runtime_config.apply()
+    config.configure_logging()
+
+    from jsonlines import InvalidLineError
+
+    from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+    from conversion_rate_analyzer.utils.exceptions import SpotRateWriterError, TickFileError
+    from conversion_rate_analyzer.utils.reader import SpotRateReader
+
     logger.info(
         (
             "Program starting with parameters:"
@@ -44,22 +58,93 @@ def main():
             f"\n\tOutput File: {config.OUTPUT_FILE}"
             f"\n\tMoving Average Window Size: {config.MOVING_AVERAGE_WINDOW} ({config.MOVING_AVERAGE_WINDOW / 60:.2f} minutes)"
             f"\n\tPercent Change Threshold: {config.PCT_CHANGE_THRESHOLD}"
+            f"\n\tStrict Validation: {config.STRICT_VALIDATION}"
+            f"\n\tWorkers: {config.WORKERS}"
+            f"\n\tCheckpoint File: {config.CHECKPOINT_FILE}"
+            f"\n\tMetrics: {config.METRICS_ENABLED}"
         )
     )
 
     global data_points_processed
+    if config.BACKTEST_WINDOWS or config.BACKTEST_THRESHOLDS:
+        try:
+            data_points_processed += backtest(input_file)
+        except (FileNotFoundError, InvalidLineError, TickFileError) as e:
+            logger.error(e)
+            raise e
+        return
+
     monitor = MovingAverageMonitor()
+    exporters = start_metrics(monitor) if config.METRICS_ENABLED else []
+    if monitor.publisher is not None:
+        exporters.append(start_query_server(monitor))
+    previous_handler = watch_reload(runtime_config)
 
     try:
         monitor.initialize_writer(config.OUTPUT_FILE)
-        reader = SpotRateReader().jsonlines_reader(input_file)
-        for obj in reader:
+        from conversion_rate_analyzer.utils.tick_file import is_tick_file
+
+        tick_file_input = is_tick_file(input_file)
+        if config.FOLLOW_INPUT or input_file.startswith(("tcp://", "unix://")):
+            import asyncio
+
+            from conversion_rate_analyzer.service.stream_ingestor import StreamIngestor, stream
+
+            ingestor = StreamIngestor(monitor)
             try:
-                data = CurrencyConversionRate.parse_obj(obj)
-                monitor.process_new_rate(data)
-                data_points_processed += 1
-            except ValidationError as e:
-                logger.warning(e)
+                asyncio.run(stream(input_file, monitor, ingestor))
+            except KeyboardInterrupt:  # pragma: no cover
+                logger.info("Stream interrupted.")
+            data_points_processed += ingestor.data_points_processed
+        elif config.STRICT_VALIDATION and not tick_file_input:
+            from pydantic.error_wrappers import ValidationError
+
+            from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+            from conversion_rate_analyzer.utils.metrics import metrics
+
+            reader = SpotRateReader().jsonlines_reader(input_file)
+            for obj in reader:
+                try:
+                    if metrics.enabled:
+                        start_time = time.perf_counter_ns()
+                        data = CurrencyConversionRate.parse_obj(obj)
+                        metrics.parse_seconds.record(time.perf_counter_ns() - start_time)
+                    else:
+                        data = CurrencyConversionRate.parse_obj(obj)
+                    monitor.process_new_rate(data)
+                    data_points_processed += 1
+                except ValidationError as e:
+                    logger.warning(e)
+                    if metrics.enabled:
+                        metrics.strict_validation_errors.inc()
+        elif config.WORKERS > 1 and not tick_file_input and config.TRIANGULATION_TOLERANCE is None:
+            from conversion_rate_analyzer.service.sharded_pipeline import ShardedPipeline
+
+            pipeline = ShardedPipeline(config.WORKERS)
+            data_points_processed += pipeline.run(input_file, monitor.jsonline_writer)
+        else:
+            offset, checkpointer = 0, None
+            if config.CHECKPOINT_FILE:
+                from conversion_rate_analyzer.utils.checkpoint import Checkpointer
+
+                checkpointer = Checkpointer(monitor, config.CHECKPOINT_FILE, config.CHECKPOINT_INTERVAL)
+                offset = checkpointer.restore()
+
+            if tick_file_input:
+                reader = SpotRateReader().tick_file_reader(input_file, config.TICK_FILE_BATCH_SIZE, offset, monitor.symbols)
+            else:
+                reader = SpotRateReader().columnar_reader(
+                    input_file, config.BATCH_SIZE, offset, monitor.symbols, config.READER_WORKERS
+                )
+            for batch in reader:
+                monitor.process_batch(batch.timestamps, batch.pair_ids, batch.rates)
+                data_points_processed += batch.size
+                offset = batch.offset
+                if checkpointer:
+                    checkpointer.maybe_checkpoint(offset)
+
+            if checkpointer:
+                checkpointer.close(offset)
 
         monitor.terminate_writer()
     except FileNotFoundError as e:
@@ -68,13 +153,91 @@ def main():
     except InvalidLineError as e:
         logger.error(e)
         raise e
+    except TickFileError as e:
+        logger.error(e)
+        raise e
     except SpotRateWriterError as e:  # pragma: no cover
         logger.error(e)
         raise e
+    finally:
+        for exporter in exporters:
+            exporter.stop()
+        if previous_handler is not None:
+            signal.signal(signal.SIGHUP, previous_handler)
+
+
+def backtest(input_file: str) -> int:
+    """Runs the backtest of BACKTEST_WINDOWS and BACKTEST_THRESHOLDS, writing the results to OUTPUT_FILE.
+
+    Returns the number of data points processed.
+    """
+    import json
+
+    from loguru import logger
+
+    from conversion_rate_analyzer.service.backtester import Backtester
+
+    backtester = Backtester(
+        config.BACKTEST_WINDOWS or [config.MOVING_AVERAGE_WINDOW],
+        config.BACKTEST_THRESHOLDS or [config.PCT_CHANGE_THRESHOLD],
+        config.WORKERS,
+    )
+    symbols, timestamps, pair_ids, rates = backtester.load(input_file)
+    results = backtester.run_arrays(symbols, timestamps, pair_ids, rates)
+
+    os.makedirs(os.path.dirname(os.path.abspath(config.OUTPUT_FILE)), exist_ok=True)
+    with open(config.OUTPUT_FILE, "w") as f:
+        for result in results:
+            f.write(json.dumps(result.to_dict()) + "\n")
+            logger.info(f"Backtest window {result.window}, threshold {result.threshold}: {result.alert_count} alerts")
+    return len(timestamps)
+
+
+def start_metrics(monitor) -> list:
+    """Enables the metrics, and starts exporting them over HTTP and/or to a file as configured."""
+    from conversion_rate_analyzer.utils.metrics import MetricsDumper, MetricsServer, metrics
+
+    metrics.enabled = True
+    metrics.track_monitor(monitor)
+
+    exporters = []
+    if config.METRICS_PORT is not None:
+        exporters.append(MetricsServer(config.METRICS_PORT))
+    if config.METRICS_FILE:
+        exporters.append(MetricsDumper(config.METRICS_FILE, config.METRICS_INTERVAL))
+    for exporter in exporters:
+        exporter.start()
+    return exporters
+
+
+def start_query_server(monitor):
+    """Starts serving the snapshots of the state of the monitor at QUERY_HOST:QUERY_PORT."""
+    from conversion_rate_analyzer.service.query_api import QueryServer
+
+    server = QueryServer(monitor.publisher, config.QUERY_PORT, config.QUERY_HOST)
+    server.start()
+    return server
+
+
+def watch_reload(runtime_config: RuntimeConfig):
+    """Reloads the runtime configuration on SIGHUP, where supported. Returns the previous handler, if replaced."""
+    import threading
+
+    # signal handlers can only be installed from the main thread
+    if not hasattr(signal, "SIGHUP") or threading.current_thread() is not threading.main_thread():
+        return None
+
+    return signal.signal(signal.SIGHUP, lambda signum, frame: runtime_config.reload())
 
 
 if __name__ == "__main__":
+    from loguru import logger
+
     start_time = time.time()
-    main()
-    end_time = time.time()
-    logger.info(f"{data_points_processed} data points processed in {end_time - start_time:.4f} seconds")
+    try:
+        main()
+        end_time = time.time()
+        logger.info(f"{data_points_processed} data points processed in {end_time - start_time:.4f} seconds")
+    finally:
+        # with LOG_ENQUEUE, the log file is written from a background thread, which must drain before exiting
+        logger.complete()
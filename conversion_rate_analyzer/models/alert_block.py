@@ -0,0 +1,56 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+SPOT_CHANGE = "spotChange"
+
+
+class AlertBlock(NamedTuple):
+    """Columnar block of alerts produced by MovingAverageMonitor.process_batch.
+
+    Each attribute is a NumPy array, and row i across all the arrays describes a single alert.
+    Rows are ordered by their position in the input batch, which is recorded in `indices`.
+    `alert_types` holds SPOT_CHANGE or the alert of the detector that raised it. For detector alerts,
+    `average_rates` holds the reference rate of the detector and `pct_changes` its score.
+    With alert debouncing, `suppressed` holds the number of threshold breaches of the pair that were suppressed
+    since its previous alert, and is None otherwise.
+    """
+    timestamps: np.ndarray
+    currency_pairs: np.ndarray
+    rates: np.ndarray
+    average_rates: np.ndarray
+    pct_changes: np.ndarray
+    indices: np.ndarray
+    alert_types: np.ndarray
+    suppressed: Optional[np.ndarray] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def empty(cls) -> "AlertBlock":
+        return cls(
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=object),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=object),
+        )
+
+    @classmethod
+    def merge(cls, *blocks: "AlertBlock") -> "AlertBlock":
+        """Merges blocks of alerts of the same input batch, in input order."""
+        blocks = [block for block in blocks if block.size]
+        if len(blocks) < 2:
+            return blocks[0] if blocks else cls.empty()
+        if any(block.suppressed is not None for block in blocks):
+            blocks = [
+                block if block.suppressed is not None else block._replace(suppressed=np.zeros(block.size, dtype=np.int64))
+                for block in blocks
+            ]
+        merged = cls(*(np.concatenate(columns) if columns[0] is not None else None for columns in zip(*blocks)))
+        order = np.argsort(merged.indices, kind="stable")
+        return cls(*(column[order] if column is not None else None for column in merged))
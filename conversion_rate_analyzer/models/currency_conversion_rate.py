@@ -4,6 +4,10 @@ from pydantic import BaseModel, validator
 
 UnixTimestamp = float
 
+# range of timestamps representable as a datetime (0001-01-01 to 9999-12-31T23:59:59)
+MIN_UNIX_TIMESTAMP = -62135596800.0
+MAX_UNIX_TIMESTAMP = 253402300799.0
+
 
 class CurrencyConversionRate(BaseModel):
     """Class for representing a single currency conversion rate data point.
@@ -24,12 +28,13 @@ class CurrencyConversionRate(BaseModel):
 
     @validator("timestamp")
     def check_timestamp(cls, v: float):
-        """Validate timestamp before instantiating this object"""
-        try:
-            datetime.utcfromtimestamp(v)
+        """Validate timestamp before instantiating this object.
+
+        A plain range check is used instead of building a datetime that would be thrown away.
+        """
+        if MIN_UNIX_TIMESTAMP <= v <= MAX_UNIX_TIMESTAMP:
             return v
-        except Exception as e:
-            raise ValueError("timestamp must be Unix Timestamp") from e
+        raise ValueError("timestamp must be Unix Timestamp")
 
     def get_datetime(self) -> datetime:
         """Returns the datetime object of the timestamp."""
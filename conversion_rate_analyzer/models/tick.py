@@ -0,0 +1,79 @@
+from array import array
+from typing import List, NamedTuple, Optional
+
+from conversion_rate_analyzer.models.currency_conversion_rate import MAX_UNIX_TIMESTAMP, MIN_UNIX_TIMESTAMP
+from conversion_rate_analyzer.utils.exceptions import TickValidationError
+
+
+class Tick(NamedTuple):
+    """Compact representation of a single currency conversion rate data point.
+
+    This is the lightweight counterpart of CurrencyConversionRate used on the fast decoding path.
+    Validation applies the same rules with plain type and range checks instead of a pydantic model.
+
+    Example:
+        obj = { "timestamp": 1554933784.023, "currencyPair": "CNYAUD", "rate": 0.39281 }
+        tick = Tick.parse_obj(obj)
+
+    Throws:
+        TickValidationError: the data is incomplete (missing attributes), or the timestamp is invalid.
+    """
+    timestamp: float
+    currencyPair: str
+    rate: float
+
+    @classmethod
+    def parse_obj(cls, obj) -> "Tick":
+        if type(obj) is not dict:
+            raise TickValidationError([("__root__", "value is not a valid dict", "type_error.dict")])
+
+        errors = []
+        timestamp = _parse_float(obj, "timestamp", errors)
+        if timestamp is not None and not MIN_UNIX_TIMESTAMP <= timestamp <= MAX_UNIX_TIMESTAMP:
+            errors.append(("timestamp", "timestamp must be Unix Timestamp", "value_error"))
+
+        currency_pair = obj.get("currencyPair")
+        if currency_pair is None:
+            errors.append(("currencyPair", "field required", "value_error.missing"))
+        elif type(currency_pair) is not str:
+            errors.append(("currencyPair", "str type expected", "type_error.str"))
+
+        rate = _parse_float(obj, "rate", errors)
+
+        if errors:
+            raise TickValidationError(errors)
+
+        return cls(timestamp, currency_pair, rate)
+
+
+class TickBatch(NamedTuple):
+    """Columnar block of data points, ready to be passed to MovingAverageMonitor.process_batch.
+
+    `offset` is the byte offset in the input file just past the last line of the batch, if read from a file.
+    When read with a symbol table, the currency pairs are held as IDs in `pair_ids`, and `currency_pairs` is None.
+    When read from a binary tick file, the columns are NumPy views of the memory-mapped file instead of arrays,
+    and when read by the workers of the parallel reader, NumPy arrays.
+    """
+    timestamps: array
+    currency_pairs: Optional[List[str]]
+    rates: array
+    offset: int = 0
+    pair_ids: Optional[array] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.timestamps)
+
+
+def _parse_float(obj: dict, field: str, errors: list):
+    value = obj.get(field)
+    if type(value) is float:
+        return value
+    if value is None:
+        errors.append((field, "field required", "value_error.missing"))
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        errors.append((field, "value is not a valid float", "type_error.float"))
+        return None
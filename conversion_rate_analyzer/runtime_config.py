@@ -0,0 +1,261 @@
+import json
+import os
+from typing import Dict, List, Mapping, Tuple
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.utils.exceptions import ConfigError
+
+ENV_PREFIX = "RATE_ANALYZER_"
+
+"""
+Settings that are read on every use, so that reload() changes them in a running pipeline.
+The other settings size the windows, open files or start workers when the pipeline starts, and need a restart.
+"""
+RELOADABLE_SETTINGS = frozenset({
+    "PCT_CHANGE_THRESHOLD",
+    "PCT_CHANGE_DIRECTION",
+    "ALLOWED_LATENESS",
+    "REANCHOR_INTERVAL",
+    "VERBOSE",
+    "ALERT_LOG_FORMAT",
+    "ALERT_LOG_RATE",
+    "ALERT_LOG_BURST",
+})
+
+# command line flags for the most common settings, besides the generic --set NAME=VALUE
+FLAGS = {
+    "--window": ("MOVING_AVERAGE_WINDOW", "moving average window in data points"),
+    "--window-seconds": ("WINDOW_SECONDS", "moving average window in seconds of event time"),
+    "--threshold": ("PCT_CHANGE_THRESHOLD", "percent change threshold of the spot change alerts"),
+    "--output": ("OUTPUT_FILE", "path of the output jsonlines file"),
+    "--workers": ("WORKERS", "number of worker processes"),
+    "--backtest-windows": ("BACKTEST_WINDOWS", "backtest these windows, as a JSON list such as [60,300,600]"),
+    "--backtest-thresholds": ("BACKTEST_THRESHOLDS", "backtest these thresholds, as a JSON list such as [0.05,0.1]"),
+}
+
+
+def setting_names() -> List[str]:
+    """Returns the names of the settings defined in config.py."""
+    names = [name for name, value in vars(config).items() if name.isupper() and not callable(value)]
+    if "OUTPUT_FILE" not in names:
+        names.append("OUTPUT_FILE")
+    return names
+
+
+def parse_value(name: str, text: str, source: str = None):
+    """Parses the text of a setting from the environment or the command line, by the type of its default value.
+
+    Booleans accept true/false, yes/no, on/off and 1/0, and other settings accept none or null for None.
+    Settings without a default (None), lists and dicts are parsed as JSON when possible, such as WINDOW_SECONDS=120
+    or DETECTORS=[{"type": "ema", "threshold": 0.05}], and are kept as text otherwise, such as CHECKPOINT_FILE=state.npz.
+
+    Throws:
+        ConfigError: The setting does not exist, or the text is not a valid value for it.
+    """
+    name = name.upper()
+    if name not in setting_names():
+        raise ConfigError(f"Unknown setting: {name}.", source)
+
+    default = getattr(config, name) if name != "OUTPUT_FILE" else ""
+    if not isinstance(default, bool) and text.strip().lower() in ("none", "null"):
+        return None
+
+    try:
+        if isinstance(default, bool):
+            lowered = text.strip().lower()
+            if lowered in ("1", "true", "yes", "on"):
+                return True
+            if lowered in ("0", "false", "no", "off"):
+                return False
+            raise ValueError(text)
+        if isinstance(default, int):
+            return int(text)
+        if isinstance(default, float):
+            return float(text)
+        if isinstance(default, str):
+            return text
+    except ValueError:
+        raise ConfigError(f"Invalid value for {name}: {text!r}.", source)
+
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def check_value(name: str, value, source: str = None):
+    """Checks a setting read from a JSON config file against the type of its default value, as parse_value does.
+    Returns the value, with integers widened for float settings. Strings are parsed with parse_value,
+    so "5" is accepted for WORKERS as it is in the environment.
+
+    Throws:
+        ConfigError: The setting does not exist, or the value is not valid for it.
+    """
+    name = name.upper()
+    if name not in setting_names():
+        raise ConfigError(f"Unknown setting: {name}.", source)
+
+    default = getattr(config, name) if name != "OUTPUT_FILE" else ""
+    if isinstance(value, str) and not isinstance(default, str):
+        return parse_value(name, value, source)
+    if value is None and not isinstance(default, bool):
+        return None
+
+    if isinstance(default, bool):
+        valid = isinstance(value, bool)
+    elif isinstance(default, int):
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    elif isinstance(default, float):
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+        value = float(value) if valid else value
+    elif isinstance(default, str):
+        valid = isinstance(value, str)
+    else:
+        valid = True
+    if not valid:
+        raise ConfigError(f"Invalid value for {name}: {value!r}.", source)
+    return value
+
+
+class RuntimeConfig:
+    """Settings of a run, layered over the defaults in config.py.
+
+    In increasing priority, the settings come from:
+    - the defaults in config.py,
+    - a JSON config file, such as {"MOVING_AVERAGE_WINDOW": 600, "PCT_CHANGE_THRESHOLD": 0.05},
+      whose values are checked against the type of the defaults (see check_value),
+    - environment variables prefixed with RATE_ANALYZER_, such as RATE_ANALYZER_PCT_CHANGE_THRESHOLD=0.05,
+    - command line flags, such as --threshold 0.05 or --set PCT_CHANGE_THRESHOLD=0.05.
+
+    `apply` sets the overridden settings on the config module, which the components read when they are used.
+    `reload` reads the config file and the environment again, and applies the changes of the RELOADABLE_SETTINGS
+    to the running pipeline. main.py calls it on SIGHUP.
+
+    Example:
+        input_file, runtime_config = RuntimeConfig.from_args(["input.jsonl", "--window", "600", "--verbose"])
+        runtime_config.apply()
+
+    Throws:
+        ConfigError: A setting is unknown or has an invalid value, or the config file cannot be read.
+    """
+
+    def __init__(self, config_file: str = None, cli_settings: Dict[str, str] = None, environ: Mapping[str, str] = None):
+        self.config_file = config_file
+        self.cli_settings = dict(cli_settings or {})
+        self.environ = os.environ if environ is None else environ
+        # defaults to revert to when an override is removed, without resolving the OUTPUT_FILE default
+        self.defaults = {name: value for name, value in vars(config).items() if name in setting_names()}
+        self.applied: Dict[str, object] = {}
+
+    @classmethod
+    def from_args(cls, argv: List[str], environ: Mapping[str, str] = None) -> Tuple[str, "RuntimeConfig"]:
+        """Parses the command line arguments. Returns the input file and the runtime configuration."""
+        import argparse
+
+        parser = argparse.ArgumentParser(prog="main.py", description="Alerts on spot rates deviating from their moving average.")
+        parser.add_argument("input_file", help="input jsonlines file, or tcp://host:port or unix:///path/to.sock")
+        parser.add_argument("--config", metavar="PATH", help="JSON config file of settings")
+        for flag, (name, help) in FLAGS.items():
+            parser.add_argument(flag, dest=name, metavar=name, help=help)
+        parser.add_argument("--verbose", dest="VERBOSE", action="store_const", const="true", help="verbose output")
+        parser.add_argument(
+            "--set", dest="settings", metavar="NAME=VALUE", action="append", default=[], help="any setting of config.py"
+        )
+        args = parser.parse_args(argv)
+
+        cli_settings = {name: getattr(args, name) for name, _ in FLAGS.values() if getattr(args, name) is not None}
+        if args.VERBOSE:
+            cli_settings["VERBOSE"] = args.VERBOSE
+        for setting in args.settings:
+            name, separator, value = setting.partition("=")
+            if not separator:
+                raise ConfigError(f"Expected NAME=VALUE, got {setting!r}.", "command line")
+            cli_settings[name.strip().upper()] = value
+
+        return args.input_file, cls(args.config, cli_settings, environ)
+
+    def resolve(self) -> Dict[str, object]:
+        """Returns the settings overridden by the config file, the environment and the command line."""
+        settings = {}
+        if self.config_file:
+            settings.update(self._read_config_file())
+
+        for key, text in self.environ.items():
+            if key.startswith(ENV_PREFIX):
+                name = key[len(ENV_PREFIX):]
+                settings[name.upper()] = parse_value(name, text, key)
+
+        for name, text in self.cli_settings.items():
+            settings[name.upper()] = parse_value(name, text, "command line")
+
+        return settings
+
+    def apply(self) -> Dict[str, object]:
+        """Sets the overridden settings on the config module. Returns them."""
+        settings = self.resolve()
+        for name, value in settings.items():
+            setattr(config, name, value)
+        self.applied = settings
+        return settings
+
+    def reload(self) -> Dict[str, object]:
+        """Resolves the settings again, and applies the ones that changed among RELOADABLE_SETTINGS. Returns them.
+
+        Settings that are no longer overridden revert to their default. Changes to the other settings are logged
+        and ignored until the next restart. On an invalid config, the current settings are kept.
+        """
+        from loguru import logger
+
+        try:
+            settings = self.resolve()
+        except ConfigError as e:
+            logger.error(f"Configuration not reloaded: {e}")
+            return {}
+
+        changes, ignored = {}, []
+        for name in set(settings) | set(self.applied):
+            value = settings[name] if name in settings else self.defaults.get(name)
+            if getattr(config, name, None) == value:
+                continue
+            if name in RELOADABLE_SETTINGS:
+                changes[name] = value
+            else:
+                ignored.append(name)
+
+        for name, value in changes.items():
+            setattr(config, name, value)
+            if name in settings:
+                self.applied[name] = value
+            else:
+                self.applied.pop(name, None)
+
+        if changes:
+            logger.info(f"Configuration reloaded: {changes}")
+        if ignored:
+            logger.warning(f"Settings {sorted(ignored)} cannot be changed without a restart, and were not reloaded.")
+        return changes
+
+    def restore(self):
+        """Reverts the settings set by apply and reload to their defaults."""
+        for name in self.applied:
+            if name in self.defaults:
+                setattr(config, name, self.defaults[name])
+            elif name in vars(config):
+                delattr(config, name)
+        self.applied = {}
+
+    def _read_config_file(self) -> Dict[str, object]:
+        try:
+            with open(self.config_file) as f:
+                settings = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f"Config file could not be read: {e}.", self.config_file) from e
+
+        if not isinstance(settings, dict):
+            raise ConfigError("Config file must hold a JSON object of settings.", self.config_file)
+
+        names = setting_names()
+        unknown = [name for name in settings if name.upper() not in names]
+        if unknown:
+            raise ConfigError(f"Unknown settings: {unknown}.", self.config_file)
+        return {name.upper(): check_value(name, value, self.config_file) for name, value in settings.items()}
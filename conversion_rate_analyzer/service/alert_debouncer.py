@@ -0,0 +1,163 @@
+import math
+from array import array
+from typing import Optional, Tuple
+
+import numpy as np
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.service.detectors import DIRECTIONS, exceeds_threshold
+from conversion_rate_analyzer.utils.metrics import metrics
+
+
+class AlertDebouncer:
+    """State machine with hysteresis that turns the threshold breaches of each pair into distinct alerts.
+
+    Without it, a sustained move raises a spot change alert on every data point until the moving average
+    catches up. With it, each pair is either idle or firing:
+    - an idle pair fires an alert once it breaches the trigger threshold on `min_ticks` consecutive data points,
+      and at least `cooldown` seconds of event time after its previous alert,
+    - a firing pair raises no alert, and goes back to idle once its score is back within `clear_threshold`
+      of the average (in the alert direction). Scores between the two thresholds keep the current state.
+
+    Breaches that do not raise an alert are suppressed, and each alert reports how many breaches of the pair
+    were suppressed since its previous alert. The state lives in flat arrays indexed by pair ID, so each update
+    is O(1), and `update_round` applies the same transitions to many pairs at once with vectorized operations.
+    The trigger threshold is passed by the caller with each breach, so it can be reloaded.
+
+    Throws:
+        ValueError: The clear threshold is negative, the cooldown is negative, the minimum number of consecutive
+            breaches is not positive, or the direction is not one of "up", "down", or "both".
+    """
+
+    def __init__(self, clear_threshold: float, cooldown: float = 0.0, min_ticks: int = 1, direction: str = "up"):
+        if clear_threshold < 0 or cooldown < 0 or min_ticks < 1 or direction not in DIRECTIONS:
+            raise ValueError(
+                f"Invalid debouncing settings: clear threshold {clear_threshold}, cooldown {cooldown}, "
+                f"minimum ticks {min_ticks}, direction {direction}"
+            )
+
+        self.clear_threshold = clear_threshold
+        self.cooldown = cooldown
+        self.min_ticks = min_ticks
+        self.direction = direction
+
+        # per pair ID: whether an alert is firing, consecutive breaches while idle,
+        # event time of the latest alert, and breaches suppressed since then
+        self.firing = bytearray()
+        self.streaks = array("q")
+        self.last_alerts = array("d")
+        self.suppressed = array("q")
+
+        self.suppressed_total = 0
+
+    @classmethod
+    def from_config(cls) -> Optional["AlertDebouncer"]:
+        """Returns the debouncer configured by ALERT_CLEAR_THRESHOLD, ALERT_COOLDOWN and ALERT_MIN_TICKS,
+        or None if none of them is set. The clear threshold defaults to PCT_CHANGE_THRESHOLD (no hysteresis)."""
+        if config.ALERT_CLEAR_THRESHOLD is None and not config.ALERT_COOLDOWN and config.ALERT_MIN_TICKS <= 1:
+            return None
+        clear_threshold = config.ALERT_CLEAR_THRESHOLD
+        if clear_threshold is None:
+            clear_threshold = config.PCT_CHANGE_THRESHOLD
+        return cls(clear_threshold, config.ALERT_COOLDOWN, config.ALERT_MIN_TICKS, config.PCT_CHANGE_DIRECTION)
+
+    def update(self, pair_id: int, timestamp: float, score: float, breach: bool) -> Optional[int]:
+        """Applies the score of a data point of the pair, and whether it breached the trigger threshold.
+        Returns the number of suppressed breaches if the data point raises an alert, else None."""
+        if pair_id >= len(self.firing):
+            self._allocate(pair_id)
+
+        if self.firing[pair_id]:
+            if breach:
+                self._suppress(pair_id)
+            elif not exceeds_threshold(score, self.clear_threshold, self.direction):
+                self.firing[pair_id] = 0
+            return None
+
+        if not breach:
+            self.streaks[pair_id] = 0
+            return None
+
+        streak = self.streaks[pair_id] + 1
+        if streak < self.min_ticks or timestamp < self.last_alerts[pair_id] + self.cooldown:
+            self.streaks[pair_id] = streak
+            self._suppress(pair_id)
+            return None
+
+        self.firing[pair_id] = 1
+        self.streaks[pair_id] = 0
+        self.last_alerts[pair_id] = timestamp
+        suppressed, self.suppressed[pair_id] = self.suppressed[pair_id], 0
+        return suppressed
+
+    def update_round(
+            self, pair_ids: np.ndarray, timestamps: np.ndarray, scores: np.ndarray, breaches: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Same as `update` on one data point of each of the distinct `pair_ids`.
+        Returns the mask of the data points raising an alert, and the suppressed breaches of each of them."""
+        if len(pair_ids) and int(pair_ids.max()) >= len(self.firing):
+            self._allocate(int(pair_ids.max()))
+
+        firing_view = np.frombuffer(self.firing, dtype=np.uint8)
+        streaks_view = np.frombuffer(self.streaks, dtype=np.int64)
+        last_alerts_view = np.frombuffer(self.last_alerts, dtype=np.float64)
+        suppressed_view = np.frombuffer(self.suppressed, dtype=np.int64)
+
+        firing = firing_view[pair_ids].astype(bool)
+        streaks = np.where(breaches & ~firing, streaks_view[pair_ids] + 1, 0)
+        last_alerts = last_alerts_view[pair_ids]
+        alert = ~firing & breaches & (streaks >= self.min_ticks) & (timestamps >= last_alerts + self.cooldown)
+        cleared = firing & ~breaches & ~exceeds_threshold(scores, self.clear_threshold, self.direction)
+
+        suppressed = suppressed_view[pair_ids] + (breaches & ~alert)
+        alert_suppressed = suppressed[alert]
+        firing_view[pair_ids] = (firing & ~cleared) | alert
+        streaks_view[pair_ids] = np.where(alert, 0, streaks)
+        last_alerts_view[pair_ids] = np.where(alert, timestamps, last_alerts)
+        suppressed_view[pair_ids] = np.where(alert, 0, suppressed)
+        del firing_view, streaks_view, last_alerts_view, suppressed_view
+
+        newly_suppressed = int(np.count_nonzero(breaches & ~alert))
+        if newly_suppressed:
+            self.suppressed_total += newly_suppressed
+            if metrics.enabled:
+                metrics.breaches_suppressed.inc(newly_suppressed)
+        return alert, alert_suppressed
+
+    def export_pair(self, pair_id: int) -> list:
+        """Returns the [firing, streak, latest alert time, suppressed breaches] of the pair."""
+        if pair_id >= len(self.firing):
+            return [0, 0, -math.inf, 0]
+        return [self.firing[pair_id], self.streaks[pair_id], self.last_alerts[pair_id], self.suppressed[pair_id]]
+
+    def import_pair(self, pair_id: int, state: Optional[list]):
+        """Sets the state of the pair from a state returned by `export_pair`."""
+        if state is None:
+            self.reset(pair_id)
+            return
+        if pair_id >= len(self.firing):
+            self._allocate(pair_id)
+        firing, streak, last_alert, suppressed = state
+        self.firing[pair_id], self.streaks[pair_id], self.suppressed[pair_id] = int(firing), int(streak), int(suppressed)
+        self.last_alerts[pair_id] = last_alert
+
+    def reset(self, pair_id: int):
+        """Forgets the state of the pair, as if it had never breached the threshold."""
+        if pair_id < len(self.firing):
+            self.firing[pair_id] = 0
+            self.streaks[pair_id] = 0
+            self.last_alerts[pair_id] = -math.inf
+            self.suppressed[pair_id] = 0
+
+    def _suppress(self, pair_id: int):
+        self.suppressed[pair_id] += 1
+        self.suppressed_total += 1
+        if metrics.enabled:
+            metrics.breaches_suppressed.inc()
+
+    def _allocate(self, pair_id: int):
+        new_pairs = pair_id + 1 - len(self.firing)
+        self.firing.extend(bytes(new_pairs))
+        self.streaks.extend(array("q", bytes(8 * new_pairs)))
+        self.last_alerts.extend(array("d", [-math.inf]) * new_pairs)
+        self.suppressed.extend(array("q", bytes(8 * new_pairs)))
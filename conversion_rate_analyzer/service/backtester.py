@@ -0,0 +1,186 @@
+import multiprocessing as mp
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.service.detectors import exceeds_threshold
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.utils.tick_file import TickFile, is_tick_file
+
+
+class BacktestResult(NamedTuple):
+    """Spot change alerts of one (window, threshold) combination, with the alert timestamps of each pair."""
+    window: int
+    threshold: float
+    alert_count: int
+    alerts: Dict[str, np.ndarray]
+
+    def to_dict(self) -> dict:
+        return {
+            "window": self.window,
+            "threshold": self.threshold,
+            "alerts": self.alert_count,
+            "pairs": {
+                currency_pair: {"alerts": len(timestamps), "timestamps": timestamps.tolist()}
+                for currency_pair, timestamps in self.alerts.items()
+            },
+        }
+
+
+class Backtester:
+    """Evaluates the spot change alerts of a grid of (window, threshold) combinations over one input.
+
+    The input is read and parsed once. The data points are grouped by currency pair (in input order within
+    each pair), and the prefix sums of the rates of every pair are computed once, so that the moving average
+    of every window length is the difference of two cumulative sums. The percentage changes of a window are
+    then checked against every threshold. The pairs are split into chunks of about equal size, which are
+    evaluated by a pool of `workers` processes.
+
+    The alerts are those MovingAverageMonitor would raise with MOVING_AVERAGE_WINDOW = window and
+    PCT_CHANGE_THRESHOLD = threshold, for the count based window and without DETECTORS, as long as the data points
+    of each pair arrive in timestamp order. The window here always holds the last `window` data points to arrive,
+    while the window of the monitor evicts the earliest timestamp first, so late data points may change a few alerts.
+    The averages differ from the running sums of the monitor by rounding only, so data points within rounding
+    of a threshold may also differ.
+    The whole input is held in memory (20 bytes per data point), and memory-mapped for binary tick files.
+
+    Example:
+        backtester = Backtester(windows=[60, 300, 600], thresholds=[0.05, 0.1], workers=4)
+        for result in backtester.run("input.jsonl"):
+            print(result.window, result.threshold, result.alert_count)
+
+    Throws:
+        ValueError: A window is not a positive integer, a threshold is not positive, or workers is not positive.
+    """
+
+    def __init__(self, windows: Sequence[int], thresholds: Sequence[float], workers: int = 1, direction: str = None):
+        if not windows or any(int(window) != window or window < 1 for window in windows):
+            raise ValueError(f"Windows must be positive integers: {windows}")
+        if not thresholds or any(threshold <= 0 for threshold in thresholds):
+            raise ValueError(f"Thresholds must be positive: {thresholds}")
+        if workers < 1:
+            raise ValueError(f"Number of workers must be a positive integer: {workers}")
+
+        self.windows = [int(window) for window in windows]
+        self.thresholds = [float(threshold) for threshold in thresholds]
+        self.workers = workers
+        self.direction = direction or config.PCT_CHANGE_DIRECTION
+
+    def run(self, input_file: str) -> List[BacktestResult]:
+        """Reads the input file, a jsonlines or binary tick file, and evaluates every combination."""
+        symbols, timestamps, pair_ids, rates = self.load(input_file)
+        return self.run_arrays(symbols, timestamps, pair_ids, rates)
+
+    @staticmethod
+    def load(input_file: str) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the symbols, and the timestamps, pair IDs and rates of the data points of the input file."""
+        if is_tick_file(input_file):
+            tick_file = TickFile(input_file)
+            return tick_file.symbols, tick_file.timestamps, tick_file.pair_ids, tick_file.rates
+
+        symbols = SymbolTable()
+        timestamps, pair_ids, rates = array("d"), array("q"), array("d")
+        for batch in SpotRateReader.columnar_reader(input_file, config.BATCH_SIZE, symbols=symbols, workers=config.READER_WORKERS):
+            timestamps.extend(batch.timestamps)
+            pair_ids.extend(batch.pair_ids)
+            rates.extend(batch.rates)
+        return (
+            symbols.symbols,
+            np.frombuffer(timestamps, dtype=np.float64),
+            np.frombuffer(pair_ids, dtype=np.int64),
+            np.frombuffer(rates, dtype=np.float64),
+        )
+
+    def run_arrays(
+            self, symbols: List[str], timestamps: np.ndarray, pair_ids: np.ndarray, rates: np.ndarray
+    ) -> List[BacktestResult]:
+        """Evaluates every combination over columnar data points. Returns the results in grid order."""
+        order = np.argsort(pair_ids, kind="stable")
+        pair_ids = np.asarray(pair_ids, dtype=np.int64)[order]
+        group_ids, group_starts = np.unique(pair_ids, return_index=True)
+        group_ends = np.append(group_starts[1:], len(pair_ids))
+        tasks = self._tasks(np.asarray(timestamps)[order], np.asarray(rates)[order], group_ids, group_starts, group_ends)
+
+        # alert (pair ID, timestamp) arrays of each combination, from every chunk
+        combinations = [(window, threshold) for window in self.windows for threshold in self.thresholds]
+        collected = {combination: ([np.empty(0, dtype=np.int64)], [np.empty(0)]) for combination in combinations}
+        if self.workers == 1:
+            chunk_results = map(_backtest_chunk, tasks)
+        else:
+            pool = mp.get_context().Pool(self.workers)
+            chunk_results = pool.imap(_backtest_chunk, tasks)
+
+        try:
+            for chunk_result in chunk_results:
+                for combination, (alert_pair_ids, alert_timestamps) in chunk_result.items():
+                    collected[combination][0].append(alert_pair_ids)
+                    collected[combination][1].append(alert_timestamps)
+        finally:
+            if self.workers > 1:
+                pool.close()
+                pool.join()
+
+        results = []
+        for window, threshold in combinations:
+            alert_pair_ids, alert_timestamps = (np.concatenate(columns) for columns in collected[(window, threshold)])
+            # the chunks hold whole pairs in ascending pair ID order, so the alerts of each pair are contiguous
+            pair_starts = np.flatnonzero(np.diff(alert_pair_ids, prepend=-1))
+            alerts = {
+                symbols[pair_id]: timestamps
+                for pair_id, timestamps in zip(alert_pair_ids[pair_starts].tolist(), np.split(alert_timestamps, pair_starts[1:]))
+            }
+            results.append(BacktestResult(window, threshold, len(alert_timestamps), alerts))
+        return results
+
+    def _tasks(
+            self, timestamps: np.ndarray, rates: np.ndarray, group_ids: np.ndarray, group_starts: np.ndarray, group_ends: np.ndarray
+    ) -> Iterator[tuple]:
+        """Splits the pairs into chunks of about equal numbers of data points, a few per worker."""
+        chunk_count = min(len(group_ids), self.workers * 4) or 1
+        chunk_size = -(-len(timestamps) // chunk_count) or 1
+        first = 0
+        while first < len(group_ids):
+            last = int(np.searchsorted(group_ends, group_starts[first] + chunk_size, side="left"))
+            last = min(max(last, first) + 1, len(group_ids))
+            begin, end = group_starts[first], group_ends[last - 1]
+            yield (
+                timestamps[begin:end],
+                rates[begin:end],
+                group_ids[first:last],
+                group_starts[first:last] - begin,
+                self.windows,
+                self.thresholds,
+                self.direction,
+            )
+            first = last
+
+
+def _backtest_chunk(task: tuple) -> Dict[Tuple[int, float], Tuple[np.ndarray, np.ndarray]]:
+    """Evaluates every combination over a chunk of whole pairs. Entry point of the worker processes.
+
+    The rates of each pair are centered on the first rate of the pair before the prefix sums are taken,
+    which keeps the cumulative sums small and the differences of the sums accurate.
+    """
+    timestamps, rates, group_ids, group_starts, windows, thresholds, direction = task
+    group_sizes = np.diff(np.append(group_starts, len(rates)))
+    group_of_point = np.repeat(np.arange(len(group_ids)), group_sizes)
+    # rank of each data point within its pair, which is the number of previous data points of the pair
+    rank = np.arange(len(rates)) - group_starts[group_of_point]
+    anchor = rates[group_starts][group_of_point]
+    prefix = np.concatenate(([0.0], np.cumsum(rates - anchor)))
+    known = rank > 0
+
+    results = {}
+    for window in windows:
+        count = np.minimum(rank, window)
+        positions = np.arange(len(rates))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg = anchor + (prefix[positions] - prefix[positions - count]) / count
+            pct_change = (rates - avg) / avg
+        for threshold in thresholds:
+            alert = known & exceeds_threshold(pct_change, threshold, direction)
+            results[(window, threshold)] = (group_ids[group_of_point[alert]], timestamps[alert])
+    return results
@@ -0,0 +1,34 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def compensated_add(total: float, compensation: float, value: float) -> Tuple[float, float]:
+    """Adds a value to a running sum with Neumaier's variant of Kahan summation.
+
+    The low-order bits lost by `total + value` are accumulated in `compensation`, and the sum is
+    `total + compensation`. Unlike a plain running sum, the rounding error does not grow with the
+    number of additions and subtractions, so a moving sum that is updated on every data point does not
+    drift over a long run.
+
+    Returns:
+        The new (total, compensation).
+    """
+    new_total = total + value
+    if abs(total) >= abs(value):
+        compensation += (total - new_total) + value
+    else:
+        compensation += (value - new_total) + total
+    return new_total, compensation
+
+
+def compensated_add_array(totals: np.ndarray, compensations: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Element-wise compensated_add over arrays, with the same float operations on every element."""
+    new_totals = totals + values
+    with np.errstate(invalid="ignore"):
+        compensations = compensations + np.where(
+            np.abs(totals) >= np.abs(values),
+            (totals - new_totals) + values,
+            (values - new_totals) + totals,
+        )
+    return new_totals, compensations
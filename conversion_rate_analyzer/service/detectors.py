@@ -0,0 +1,251 @@
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple, Type
+
+from conversion_rate_analyzer.service.rate_window import RateWindow
+
+DIRECTIONS = ("up", "down", "both")
+
+
+def exceeds_threshold(score, threshold: float, direction: str):
+    """Threshold check of a score, or an array of scores, in the given direction.
+
+    "up" alerts on score >= threshold, "down" on score <= -threshold, and "both" on either.
+    NaN scores never exceed the threshold.
+    """
+    if direction == "up":
+        return score >= threshold
+    if direction == "down":
+        return score <= -threshold
+    return abs(score) >= threshold
+
+
+class Detector(ABC):
+    """Base class of the incremental detectors that MovingAverageMonitor runs on every data point.
+
+    A detector holds no per-pair data itself. The monitor creates one state per currency pair with `new_state`,
+    and passes it back on every call, together with the window of the pair that is shared by all the detectors.
+    On each data point, the monitor updates the window once, calls `evict` with the data points that left it,
+    and then `update` with the new data point, which is already in the window.
+    `update` checks the new data point against the statistics of the previous data points, and then adds it.
+    Every call is O(1) (amortized), so the cost of a data point grows with the number of detectors,
+    not with the window size.
+
+    When the monitor re-anchors the running sum of a pair, `rebuild` recomputes the state from the window,
+    so that detectors with floating point accumulators do not drift either.
+    Detectors with `scalar_state` keep their state as a flat list of numbers, which is saved in snapshots
+    of the monitor as is. Other states are rebuilt from the window when a snapshot is restored.
+
+    Subclasses are registered under a name with `register_detector`, and configured with DETECTORS in the config file.
+
+    Throws:
+        ValueError: The direction is not one of "up", "down", or "both".
+    """
+
+    alert = None
+    scalar_state = False
+
+    def __init__(self, threshold: float, direction: str = "up"):
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Direction must be one of {DIRECTIONS}: {direction}")
+
+        self.threshold = threshold
+        self.direction = direction
+
+    @abstractmethod
+    def new_state(self) -> list:
+        pass
+
+    def evict(self, state: list, timestamp: float, rate: float):
+        pass
+
+    @abstractmethod
+    def update(self, state: list, timestamp: float, rate: float, window: RateWindow) -> Optional[Tuple[float, float]]:
+        """Returns (reference rate, score) if the new data point is an alert."""
+
+    def rebuild(self, state: list, window: RateWindow):
+        pass
+
+
+DETECTORS: Dict[str, Type[Detector]] = {}
+
+
+def register_detector(name: str):
+    """Class decorator registering a Detector under the name used by DETECTORS in the config file."""
+    def register(cls: Type[Detector]) -> Type[Detector]:
+        DETECTORS[name] = cls
+        return cls
+
+    return register
+
+
+def create_detectors(specs: Sequence[dict]) -> List[Detector]:
+    """Creates detectors from specs such as {"type": "zscore", "threshold": 3.0, "direction": "both"}.
+
+    Throws:
+        ValueError: Unknown detector type.
+    """
+    detectors = []
+    for spec in specs:
+        spec = dict(spec)
+        name = spec.pop("type")
+        if name not in DETECTORS:
+            raise ValueError(f"Unknown detector type: {name}. Available types: {sorted(DETECTORS)}")
+        detectors.append(DETECTORS[name](**spec))
+    return detectors
+
+
+@register_detector("ema")
+class EmaDetector(Detector):
+    """Percentage change of the new rate from the exponential moving average of the previous rates.
+
+    The EMA weighs every data point of the pair with a decay of `alpha`, regardless of the window.
+    """
+
+    alert = "emaChange"
+    scalar_state = True
+
+    def __init__(self, threshold: float, alpha: float = 0.1, direction: str = "up"):
+        super().__init__(threshold, direction)
+        if not 0 < alpha <= 1:
+            raise ValueError(f"Alpha must be in (0, 1]: {alpha}")
+        self.alpha = alpha
+
+    def new_state(self) -> list:
+        return [math.nan]
+
+    def update(self, state: list, timestamp: float, rate: float, window: RateWindow) -> Optional[Tuple[float, float]]:
+        ema = state[0]
+        if ema != ema:
+            state[0] = rate
+            return None
+
+        state[0] = ema + self.alpha * (rate - ema)
+        pct_change = (rate - ema) / ema
+        if exceeds_threshold(pct_change, self.threshold, self.direction):
+            return ema, pct_change
+        return None
+
+    def rebuild(self, state: list, window: RateWindow):
+        # the EMA is not derived from the window, but a restored state is seeded with the window average
+        if state[0] != state[0] and len(window):
+            state[0] = sum(window.exact_sum()) / len(window)
+
+
+@register_detector("zscore")
+class ZScoreDetector(Detector):
+    """Z-score of the new rate against the mean and sample standard deviation of the window.
+
+    The mean and the sum of squared deviations are kept with Welford's updates, which also support removing
+    the data points that leave the window. No score is computed while the window holds fewer than two data points,
+    or when all the rates in the window are equal.
+    """
+
+    alert = "zScore"
+    scalar_state = True
+
+    def new_state(self) -> list:
+        # count, mean, sum of squared deviations from the mean
+        return [0, 0.0, 0.0]
+
+    def evict(self, state: list, timestamp: float, rate: float):
+        count, mean, m2 = state
+        if count <= 1:
+            state[:] = [0, 0.0, 0.0]
+            return
+
+        count -= 1
+        delta = rate - mean
+        mean -= delta / count
+        state[:] = [count, mean, max(m2 - delta * (rate - mean), 0.0)]
+
+    def update(self, state: list, timestamp: float, rate: float, window: RateWindow) -> Optional[Tuple[float, float]]:
+        count, mean, m2 = state
+        alert = None
+        if count >= 2 and m2 > 0:
+            z_score = (rate - mean) / math.sqrt(m2 / (count - 1))
+            if exceeds_threshold(z_score, self.threshold, self.direction):
+                alert = (mean, z_score)
+
+        count += 1
+        delta = rate - mean
+        mean += delta / count
+        state[:] = [count, mean, m2 + delta * (rate - mean)]
+        return alert
+
+    def rebuild(self, state: list, window: RateWindow):
+        rates = [rate for _, rate in window]
+        if not rates:
+            state[:] = [0, 0.0, 0.0]
+            return
+
+        mean = math.fsum(rates) / len(rates)
+        state[:] = [len(rates), mean, math.fsum((rate - mean) ** 2 for rate in rates)]
+
+
+@register_detector("range")
+class RangeDetector(Detector):
+    """Breakout of the new rate above the rolling maximum, or below the rolling minimum, of the window.
+
+    The score is the percentage change from the maximum for upward breakouts, and from the minimum
+    for downward breakouts. The minimum and maximum are kept in monotonic deques, which is amortized O(1)
+    while data points arrive in timestamp order. A late data point rebuilds the deques from the window.
+    """
+
+    alert = "rangeBreakout"
+
+    def __init__(self, threshold: float = 0.0, direction: str = "both"):
+        super().__init__(threshold, direction)
+
+    def new_state(self) -> list:
+        # deque of candidate maximums, deque of candidate minimums, newest (timestamp, rate) seen
+        return [deque(), deque(), None]
+
+    def evict(self, state: list, timestamp: float, rate: float):
+        maximums, minimums, _ = state
+        if maximums and maximums[0] == (timestamp, rate):
+            maximums.popleft()
+        if minimums and minimums[0] == (timestamp, rate):
+            minimums.popleft()
+
+    def update(self, state: list, timestamp: float, rate: float, window: RateWindow) -> Optional[Tuple[float, float]]:
+        maximums, minimums, newest = state
+        alert = None
+        if maximums:
+            maximum, minimum = maximums[0][1], minimums[0][1]
+            if rate > maximum:
+                alert = (maximum, (rate - maximum) / maximum)
+            elif rate < minimum:
+                alert = (minimum, (rate - minimum) / minimum)
+            if alert and not exceeds_threshold(alert[1], self.threshold, self.direction):
+                alert = None
+
+        item = (timestamp, rate)
+        if newest is None or item >= newest:
+            state[2] = item
+            # equal rates are all kept, so that evicting one of two identical data points leaves the other
+            while maximums and maximums[-1][1] < rate:
+                maximums.pop()
+            maximums.append(item)
+            while minimums and minimums[-1][1] > rate:
+                minimums.pop()
+            minimums.append(item)
+        else:
+            self.rebuild(state, window)
+
+        return alert
+
+    def rebuild(self, state: list, window: RateWindow):
+        maximums, minimums = deque(), deque()
+        for item in window:
+            while maximums and maximums[-1][1] < item[1]:
+                maximums.pop()
+            maximums.append(item)
+            while minimums and minimums[-1][1] > item[1]:
+                minimums.pop()
+            minimums.append(item)
+
+        state[0], state[1] = maximums, minimums
+        if maximums and (state[2] is None or state[2] < maximums[-1]):
+            state[2] = maximums[-1]
@@ -0,0 +1,60 @@
+import heapq
+import math
+from typing import Dict, Hashable, List
+
+
+class ExpirationIndex:
+    """Index of pending expirations, bucketed by time.
+
+    Each key (currency pair) is scheduled at the time its oldest data point leaves the window.
+    Keys are kept in buckets of `resolution` seconds, and a heap holds one entry per bucket, not per key,
+    so scheduling is amortized O(1) and `pop_expired` only touches buckets that have fully elapsed.
+    This lets the monitor evict expired data points of idle pairs without scanning every pair.
+
+    A key is scheduled at most once at a time. Rescheduling to an earlier bucket leaves a stale entry behind,
+    which is skipped when its bucket is popped.
+    """
+
+    def __init__(self, resolution: float = 1.0):
+        if resolution <= 0:
+            raise ValueError(f"Resolution must be positive: {resolution}")
+
+        self.resolution = resolution
+        self.buckets: Dict[int, List[Hashable]] = {}
+        self.heap: List[int] = []
+        self.scheduled: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.scheduled)
+
+    def schedule(self, key: Hashable, expires_at: float):
+        """Schedule the key, unless it is already scheduled in the same or an earlier bucket."""
+        bucket = math.floor(expires_at / self.resolution)
+        current = self.scheduled.get(key)
+        if current is not None and current <= bucket:
+            return
+
+        self.scheduled[key] = bucket
+        keys = self.buckets.get(bucket)
+        if keys is None:
+            self.buckets[bucket] = [key]
+            heapq.heappush(self.heap, bucket)
+        else:
+            keys.append(key)
+
+    def pop_expired(self, now: float) -> List[Hashable]:
+        """Remove and return the keys of every bucket that ended at or before `now`."""
+        limit = math.floor(now / self.resolution)
+        expired = []
+
+        while self.heap and self.heap[0] < limit:
+            bucket = heapq.heappop(self.heap)
+            for key in self.buckets.pop(bucket):
+                if self.scheduled.get(key) == bucket:
+                    del self.scheduled[key]
+                    expired.append(key)
+
+        return expired
+
+    def discard(self, key: Hashable):
+        self.scheduled.pop(key, None)
@@ -0,0 +1,240 @@
+import json
+import math
+import struct
+import tempfile
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.utils.metrics import metrics
+
+# total, compensation, count, re-anchoring countdown, data points in the window, length of the JSON states
+RECORD_HEADER = struct.Struct("<ddqqII")
+
+# estimated bytes of the flat per-pair state of the monitor besides the window: the slots of the state arrays
+# and lists, the detector states, the symbol and its table entries, which are kept when a pair is evicted
+PAIR_OVERHEAD_BYTES = 200
+
+
+class SpillStore:
+    """Compact on-disk store of the state of evicted currency pairs, keyed by pair ID.
+
+    Each state is appended to an anonymous scratch file in `directory` as a fixed header, the raw timestamp
+    and rate columns of the window, and the scalar detector states and the debouncing state as JSON. An in-memory index maps each
+    pair ID to its record. Records are removed from the index when reloaded, and the file is compacted
+    once most of it is garbage. The file is deleted when the store is closed or garbage collected,
+    so the store only lives as long as the run; snapshots of the monitor include the spilled pairs.
+    """
+
+    def __init__(self, directory: str = None):
+        self.file = tempfile.TemporaryFile(prefix="spill-", dir=directory)
+        self.index: Dict[int, Tuple[int, int]] = {}
+        self.size = 0
+        self.live_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, pair_id: int) -> bool:
+        return pair_id in self.index
+
+    def put(self, pair_id: int, record: dict):
+        data = self._encode(record)
+        self.file.seek(self.size)
+        self.file.write(data)
+        self.index[pair_id] = (self.size, len(data))
+        self.size += len(data)
+        self.live_bytes += len(data)
+
+    def pop(self, pair_id: int) -> Optional[dict]:
+        """Removes and returns the state of the pair, or None if it was not spilled."""
+        location = self.index.pop(pair_id, None)
+        if location is None:
+            return None
+        record = self._read(*location)
+        self.live_bytes -= location[1]
+        if self.size > 1 << 20 and self.live_bytes < self.size // 4:
+            self._compact()
+        return record
+
+    def items(self) -> Iterator[Tuple[int, dict]]:
+        """Yields the (pair ID, state) of every spilled pair, without removing them."""
+        for pair_id, location in list(self.index.items()):
+            yield pair_id, self._read(*location)
+
+    def close(self):
+        self.file.close()
+        self.index.clear()
+
+    def _read(self, offset: int, length: int) -> dict:
+        self.file.seek(offset)
+        return self._decode(self.file.read(length))
+
+    def _compact(self):
+        records = list(self.items())
+        self.file.seek(0)
+        self.file.truncate()
+        self.index.clear()
+        self.size = self.live_bytes = 0
+        for pair_id, record in records:
+            self.put(pair_id, record)
+
+    @staticmethod
+    def _encode(record: dict) -> bytes:
+        states = json.dumps([record["detector_states"], record.get("debouncer")]).encode()
+        header = RECORD_HEADER.pack(
+            record["total"], record["compensation"], record["count"], record["countdown"],
+            len(record["timestamps"]), len(states),
+        )
+        return b"".join((header, record["timestamps"].tobytes(), record["rates"].tobytes(), states))
+
+    @staticmethod
+    def _decode(data: bytes) -> dict:
+        total, compensation, count, countdown, size, states_length = RECORD_HEADER.unpack_from(data)
+        position = RECORD_HEADER.size
+        timestamps, rates = array("d"), array("d")
+        timestamps.frombytes(data[position:position + 8 * size])
+        rates.frombytes(data[position + 8 * size:position + 16 * size])
+        detector_states, debouncer = json.loads(data[position + 16 * size:position + 16 * size + states_length])
+        return {
+            "timestamps": timestamps,
+            "rates": rates,
+            "total": total,
+            "compensation": compensation,
+            "count": count,
+            "countdown": countdown,
+            "detector_states": detector_states,
+            "debouncer": debouncer,
+        }
+
+
+class MemoryGovernor:
+    """Bounds the memory held by MovingAverageMonitor for a churning universe of currency pairs.
+
+    The monitor reports the event time of the data points of each pair, and every `interval` seconds of
+    event time, the governor:
+    - evicts the pairs that have not received a data point for `ttl` seconds of event time, then
+    - while the estimated memory of the monitor exceeds `budget_bytes`, evicts the least recently updated pairs.
+
+    Without a spill directory, the state of an evicted pair is dropped, and the pair starts over with an empty
+    window if it ticks again. With a spill directory, the state is written to a SpillStore and reloaded
+    when the pair ticks again, so the alerts are the same as if it had never been evicted. Until then,
+    the monitor answers for the pair as if it had never been seen (see MovingAverageMonitor).
+
+    The budget bounds the windows, which hold most of the memory of the monitor. The flat per-pair state
+    (symbol table entry, slots of the per-pair arrays, `last_seen`) is kept for every pair ever seen,
+    and is only estimated as PAIR_OVERHEAD_BYTES per pair, so the total memory still grows with the number of pairs.
+
+    The monitor creates its governor from the config file (see `from_config`), and calls `touch` or
+    `touch_batch` after updating pairs and `maybe_maintain` after each data point or batch.
+
+    Throws:
+        ValueError: The TTL, budget or interval is not positive.
+    """
+
+    def __init__(self, monitor, ttl: float = None, budget_bytes: int = None, spill_dir: str = None, interval: float = 60.0):
+        if (ttl is not None and ttl <= 0) or (budget_bytes is not None and budget_bytes <= 0) or interval <= 0:
+            raise ValueError(f"TTL, memory budget and interval must be positive: {ttl}, {budget_bytes}, {interval}")
+
+        self.monitor = monitor
+        self.ttl = ttl
+        self.budget_bytes = budget_bytes
+        self.interval = interval
+        self.store = SpillStore(spill_dir) if spill_dir is not None else None
+
+        # latest event time of each pair ID, and of the monitor
+        self.last_seen = array("d")
+        self.now = -math.inf
+        self.next_check = -math.inf
+
+        self.evicted = {"ttl": 0, "budget": 0}
+        self.reloaded = 0
+
+    @classmethod
+    def from_config(cls, monitor) -> Optional["MemoryGovernor"]:
+        """Returns the governor configured by PAIR_TTL, MEMORY_BUDGET_MB and SPILL_DIR, or None if neither limit is set."""
+        if config.PAIR_TTL is None and config.MEMORY_BUDGET_MB is None:
+            return None
+        budget_bytes = int(config.MEMORY_BUDGET_MB * (1 << 20)) if config.MEMORY_BUDGET_MB is not None else None
+        return cls(monitor, config.PAIR_TTL, budget_bytes, config.SPILL_DIR, config.GOVERNOR_INTERVAL)
+
+    def touch(self, pair_id: int, timestamp: float):
+        if pair_id >= len(self.last_seen):
+            self.last_seen.extend(array("d", [-math.inf]) * (pair_id + 1 - len(self.last_seen)))
+        if timestamp > self.last_seen[pair_id]:
+            self.last_seen[pair_id] = timestamp
+            if timestamp > self.now:
+                self.now = timestamp
+
+    def touch_batch(self, pair_ids: np.ndarray, timestamps: np.ndarray):
+        if not len(pair_ids):
+            return
+        self.touch(int(pair_ids.max()), -math.inf)
+        last_seen = np.frombuffer(self.last_seen, dtype=np.float64)
+        np.maximum.at(last_seen, pair_ids, timestamps)
+        self.now = max(self.now, float(timestamps.max()))
+        del last_seen
+
+    def maybe_maintain(self):
+        if self.now >= self.next_check:
+            self.maintain()
+
+    def maintain(self):
+        """Evicts the idle pairs, then the least recently updated pairs while over the memory budget."""
+        self.next_check = self.now + self.interval
+        resident = self.monitor._active_pair_ids()
+
+        # pairs restored from a snapshot have not been touched yet, and count as seen now
+        if resident and resident[-1] >= len(self.last_seen):
+            self.touch(resident[-1], -math.inf)
+        for pair_id in resident:
+            if self.last_seen[pair_id] == -math.inf:
+                self.last_seen[pair_id] = self.now
+
+        if self.ttl is not None:
+            cutoff = self.now - self.ttl
+            idle = [pair_id for pair_id in resident if self.last_seen[pair_id] < cutoff]
+            for pair_id in idle:
+                self.evict(pair_id, "ttl")
+            if idle:
+                resident = self.monitor._active_pair_ids()
+
+        if self.budget_bytes is not None:
+            memory = self.monitor.memory_bytes()
+            if memory > self.budget_bytes:
+                for pair_id in sorted(resident, key=self.last_seen.__getitem__):
+                    memory -= self.monitor.pair_memory_bytes(pair_id)
+                    self.evict(pair_id, "budget")
+                    if memory <= self.budget_bytes:
+                        break
+
+    def evict(self, pair_id: int, reason: str):
+        """Drops the state of the pair from the monitor, spilling it first if there is a spill store."""
+        if self.store is not None:
+            self.store.put(pair_id, self.monitor.export_pair(pair_id))
+        self.monitor.drop_pair(pair_id, spilled=self.store is not None)
+        self.evicted[reason] += 1
+        if metrics.enabled:
+            (metrics.pairs_evicted_ttl if reason == "ttl" else metrics.pairs_evicted_budget).inc()
+        logger.debug(f"Evicted {self.monitor.symbols.symbol(pair_id)} ({reason}{', spilled' if self.store else ''})")
+
+    def reload(self, pair_id: int) -> Optional[dict]:
+        """Returns the spilled state of the pair, removing it from the spill store, or None."""
+        if self.store is None:
+            return None
+        record = self.store.pop(pair_id)
+        if record is not None:
+            self.reloaded += 1
+            if metrics.enabled:
+                metrics.pairs_reloaded.inc()
+        return record
+
+    def spilled_bytes(self) -> int:
+        return self.store.live_bytes if self.store is not None else 0
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
@@ -0,0 +1,123 @@
+import heapq
+import math
+from array import array
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from conversion_rate_analyzer import config
+
+
+class MoversIndex:
+    """Tournament tree over pair IDs ranking the pairs by the absolute deviation of their latest data point
+    from their moving average, so the top movers are known without scanning every pair.
+
+    The leaves of the tree are the absolute deviations, at `capacity + pair_id`, and each internal node holds
+    the largest of its two children, so the root holds the largest deviation of all. The tree lives in a flat
+    `array('d')`, with -inf for pairs without a deviation, and the capacity doubles when a larger pair ID arrives.
+
+    `update` sets the deviation of a pair and walks up to the root in O(log n), stopping as soon as a node
+    is unchanged, which is the case for most pairs, as they are not the largest of their subtree.
+    `update_many` applies a round of distinct pairs with one vectorized pass per level of the tree.
+    `top` returns the k largest with a best-first descent from the root, in O(k log n).
+
+    Example:
+        index = MoversIndex()
+        index.update(pair_id, pct_change)
+        index.top(20)  # [(pair_id, pct_change), ...], largest absolute deviation first
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = 1 << max(capacity - 1, 1).bit_length()
+        # signed deviation of each pair ID, and the tree of absolute deviations
+        self.deviations = array("d", [math.nan]) * self.capacity
+        self.tree = array("d", [-math.inf]) * (2 * self.capacity)
+
+    @classmethod
+    def from_config(cls) -> Optional["MoversIndex"]:
+        """Returns an index if MOVERS_INDEX is set in the config file, else None."""
+        return cls() if config.MOVERS_INDEX else None
+
+    def update(self, pair_id: int, deviation: float):
+        if pair_id >= self.capacity:
+            self._grow(pair_id)
+        self.deviations[pair_id] = deviation
+
+        key = abs(deviation)
+        if key != key:
+            key = -math.inf
+        tree = self.tree
+        node = pair_id + self.capacity
+        tree[node] = key
+        while node > 1:
+            sibling = tree[node ^ 1]
+            if sibling > key:
+                key = sibling
+            node >>= 1
+            if tree[node] == key:
+                break
+            tree[node] = key
+
+    def update_many(self, pair_ids: np.ndarray, deviations: np.ndarray):
+        """Same as `update` on each of the distinct `pair_ids`."""
+        if not len(pair_ids):
+            return
+        if int(pair_ids.max()) >= self.capacity:
+            self._grow(int(pair_ids.max()))
+
+        deviations_view = np.frombuffer(self.deviations, dtype=np.float64)
+        tree_view = np.frombuffer(self.tree, dtype=np.float64)
+        deviations_view[pair_ids] = deviations
+        keys = np.abs(deviations)
+        keys[np.isnan(keys)] = -math.inf
+        nodes = np.sort(pair_ids + self.capacity)
+        tree_view[pair_ids + self.capacity] = keys
+        while nodes[0] > 1:
+            nodes >>= 1
+            nodes = nodes[np.concatenate(([True], nodes[1:] != nodes[:-1]))]
+            tree_view[nodes] = np.maximum(tree_view[2 * nodes], tree_view[2 * nodes + 1])
+        del deviations_view, tree_view
+
+    def remove(self, pair_id: int):
+        """Removes the pair from the ranking, until its next update."""
+        if pair_id < self.capacity:
+            self.update(pair_id, math.nan)
+
+    def top(self, k: int) -> List[Tuple[int, float]]:
+        """Returns the (pair ID, deviation) of the k pairs with the largest absolute deviation, largest first.
+        Ties are ordered by pair ID."""
+        tree, capacity = self.tree, self.capacity
+        movers = []
+        candidates = [(-tree[1], 1)]
+        while candidates and len(movers) < k:
+            key, node = heapq.heappop(candidates)
+            if key == math.inf:
+                break
+            if node >= capacity:
+                movers.append((node - capacity, self.deviations[node - capacity]))
+            else:
+                heapq.heappush(candidates, (-tree[2 * node], 2 * node))
+                heapq.heappush(candidates, (-tree[2 * node + 1], 2 * node + 1))
+        return movers
+
+    def get_many(self, pair_ids: np.ndarray) -> np.ndarray:
+        """Returns the deviations of the pairs, NaN for those without one."""
+        deviations = np.full(len(pair_ids), math.nan)
+        known = pair_ids < self.capacity
+        deviations[known] = np.frombuffer(self.deviations, dtype=np.float64)[pair_ids[known]]
+        return deviations
+
+    def _grow(self, pair_id: int):
+        capacity = 1 << pair_id.bit_length()
+        deviations = np.full(capacity, math.nan)
+        deviations[:self.capacity] = np.frombuffer(self.deviations, dtype=np.float64)
+        tree = np.full(2 * capacity, -math.inf)
+        tree[capacity:capacity + self.capacity] = np.frombuffer(self.tree, dtype=np.float64)[self.capacity:]
+        level = capacity
+        while level > 1:
+            level >>= 1
+            tree[level:2 * level] = np.maximum(tree[2 * level:4 * level:2], tree[2 * level + 1:4 * level:2])
+
+        self.capacity = capacity
+        self.deviations = array("d", deviations.tobytes())
+        self.tree = array("d", tree.tobytes())
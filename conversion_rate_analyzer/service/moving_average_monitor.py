@@ -1,11 +1,30 @@
-from queue import PriorityQueue
+import math
+import time
+import zlib
+from array import array
+from typing import List, Optional, Sequence, Tuple
 
+import numpy as np
 from loguru import logger
 
 from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.alert_block import SPOT_CHANGE, AlertBlock
 from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
-from conversion_rate_analyzer.utils.exceptions import SpotRateWriterError
-from conversion_rate_analyzer.utils.writer import SpotRateWriter
+from conversion_rate_analyzer.service.alert_debouncer import AlertDebouncer
+from conversion_rate_analyzer.service.compensated_sum import compensated_add, compensated_add_array
+from conversion_rate_analyzer.service.detectors import create_detectors, exceeds_threshold
+from conversion_rate_analyzer.service.expiration_index import ExpirationIndex
+from conversion_rate_analyzer.service.memory_governor import PAIR_OVERHEAD_BYTES, MemoryGovernor
+from conversion_rate_analyzer.service.movers_index import MoversIndex
+from conversion_rate_analyzer.service.query_api import StatePublisher
+from conversion_rate_analyzer.service.rate_window import RateWindow
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.service.tick_filter import TickFilter
+from conversion_rate_analyzer.service.triangulation import TriangulationEngine
+from conversion_rate_analyzer.utils.alert_logger import alert_logger
+from conversion_rate_analyzer.utils.exceptions import SnapshotError, SpotRateWriterError
+from conversion_rate_analyzer.utils.metrics import metrics
+from conversion_rate_analyzer.utils.writer import create_writer
 
 
 class MovingAverageMonitor:
@@ -14,15 +33,58 @@ class MovingAverageMonitor:
     This is a singleton object for storing the latest n conversion rates for
     all the currency pairs, where n is MOVING_AVERAGE_WINDOW as specified in the config file.
     If multiple instantiation is attempted, reference to the existing instance will be returned.
+    Independent instances, such as the shards of ShardedPipeline, are created with `singleton=False`.
 
-    For each currency pair, this object creates a queue with finite capacity
+    For each currency pair, this object creates a RateWindow with finite capacity
     to hold the latest n conversion rates (specified by MOVING_AVERAGE_WINDOW in the config file).
+    Each window stores timestamps and rates in preallocated array columns rather than a heap of tuples.
 
-    By using a PriorityQueue, even if conversion rates are received out-of-order,
+    Since the window is kept ordered by timestamp, even if conversion rates are received out-of-order,
     the accuracy of moving average will not be lost as items will be dequeued by timestamp priority.
 
+    If WINDOW_SECONDS is set in the config file, the windows are time-based instead: each window holds the
+    data points within (now - WINDOW_SECONDS, now], where now is the latest event time seen by the monitor.
+    Data points more than ALLOWED_LATENESS seconds behind are dropped and counted in `late_data_points`.
+    Pending expirations are kept in an ExpirationIndex, so the windows of idle pairs are also evicted
+    without scanning every pair.
+
+    The running sum of each window is updated in O(1) per data point with compensated (Neumaier) summation,
+    and is re-anchored to the exact sum of the window every REANCHOR_INTERVAL data points of the pair,
+    so the moving average does not drift however long the monitor runs.
+
+    Currency pairs are interned in a SymbolTable, and the state of each pair lives at its integer ID
+    in flat arrays, so the hot path does a single dict lookup per data point, and none at all for batches
+    read with the symbol table of the monitor. A symbol table already shared with a reader can be passed
+    as `symbols`.
+
+    If PAIR_TTL or MEMORY_BUDGET_MB is set in the config file, a MemoryGovernor evicts the state of idle
+    and least recently updated pairs, dropping it or spilling it to disk (SPILL_DIR) until the pair ticks again.
+    The windows of pairs without state are None, and are created on the next data point of the pair.
+    Evicted pairs, spilled or not, are unknown to the getters (`currency_pair_exists`, `get_known_currency_pairs`,
+    `get_current_average_rate`...), to the top movers and to the published snapshots until they tick again;
+    only `snapshot_state` reads the spilled pairs back.
+
+    If DEDUPLICATE or MAX_TICK_DELAY is set in the config file, a TickFilter drops duplicate and late data points
+    of each pair before they reach its window, routing the late ones to LATE_OUTPUT_FILE.
+    If TRIANGULATION_TOLERANCE is set, a TriangulationEngine then checks each data point against the cross rates
+    of the other pairs, and inconsistent data points raise an alert instead of reaching the window.
+
+    If ALERT_CLEAR_THRESHOLD, ALERT_COOLDOWN or ALERT_MIN_TICKS is set, the spot change threshold breaches of each pair
+    go through an AlertDebouncer, so that a sustained move raises a single alert rather than one per data point.
+
+    If MOVERS_INDEX is set, a MoversIndex ranks the pairs by the deviation of their latest data point from their
+    moving average, updated in O(log n) per data point, so `top_movers` does not scan every pair.
+
+    If QUERY_PORT is set, a StatePublisher publishes a snapshot of the state every QUERY_INTERVAL seconds,
+    which QueryServer serves to dashboards without touching the state itself.
+
+    Besides the spot change check against the moving average (in the PCT_CHANGE_DIRECTION direction),
+    the detectors configured by DETECTORS in the config file, such as EMA, z-score and rolling min/max breakouts,
+    are updated in the same pass over each data point, and share the window of the pair.
+
     Throws:
         KeyError: Currency pair does not exist.
+        ValueError: Top movers requested without MOVERS_INDEX.
         SpotRateWriterError:
             Attempt made to write without initializing the jsonline writer,
             or the output file has been removed before closing.
@@ -30,21 +92,64 @@ class MovingAverageMonitor:
 
     instance = None
 
-    def __new__(cls):
+    def __new__(cls, singleton: bool = True, symbols: SymbolTable = None):
         """Called implicitly before __init__(self)."""
 
+        if not singleton:
+            return super().__new__(cls)
+
         if cls.instance is None:
             cls.instance = super().__new__(cls)
         return cls.instance
 
-    def __init__(self):
-        self.known_currency_pairs = set()
+    def __init__(self, singleton: bool = True, symbols: SymbolTable = None):
+        # interned currency pairs, whose dense IDs index the per-pair state below
+        self.symbols = symbols if symbols is not None else SymbolTable()
+
+        # window of conversion rates over the specified moving average window, for each pair ID (None until
+        # the pair receives a data point, or once evicted), and whether the pair holds state, as readers may
+        # intern pairs ahead of the monitor
+        self.windows: List[Optional[RateWindow]] = []
+        self.active = bytearray()
+
+        # sum of the conversion rates contained in each window, its compensation, and the current window size
+        self.totals = array("d")
+        self.compensations = array("d")
+        self.counts = array("q")
+
+        # number of data points of each pair until its running sum is re-anchored
+        self.reanchor_countdowns = array("q")
+
+        # additional detectors configured by DETECTORS, and their state for each pair ID
+        self.detectors = create_detectors(config.DETECTORS)
+        self.detector_states: List[list] = []
+
+        # latest event time and pending expirations of time-based windows
+        self.watermark = -math.inf
+        self.expirations = ExpirationIndex()
+        self.late_data_points = 0
 
-        # queue of conversion rates over the specified moving average window
-        self.conversion_rates_queue = {}
+        # evicts the state of idle pairs, if configured
+        if getattr(self, "governor", None) is not None:
+            self.governor.close()
+        self.governor = MemoryGovernor.from_config(self)
 
-        # sum of the conversion rates contained in `self.conversion_rates` and the current queue size
-        self.conversion_rates_sum_count = {}
+        # drops duplicate and late data points, if configured
+        if getattr(self, "tick_filter", None) is not None:
+            self.tick_filter.close()
+        self.tick_filter = TickFilter.from_config(self.symbols)
+
+        # checks the data points against the cross rates, if configured
+        self.triangulation = TriangulationEngine.from_config(self.symbols)
+
+        # turns the spot change threshold breaches of each pair into distinct alerts, if configured
+        self.debouncer = AlertDebouncer.from_config()
+
+        # ranks the pairs by the deviation of their latest data point from their average, if configured
+        self.movers = MoversIndex.from_config()
+
+        # publishes snapshots of the state for the query API, if configured
+        self.publisher = StatePublisher.from_config(self)
 
         self.jsonline_writer = None
 
@@ -53,10 +158,12 @@ class MovingAverageMonitor:
             self.jsonline_writer.close()
 
         logger.info(f"Initializing jsonline writer with output path: {path}.")
-        self.jsonline_writer = SpotRateWriter(path)
+        self.jsonline_writer = create_writer(path)
 
     def terminate_writer(self):
         logger.info(f"Terminating jsonline writer...")
+        if self.tick_filter is not None:
+            self.tick_filter.close()
         try:
             self.jsonline_writer.close()
         except SpotRateWriterError as e:
@@ -70,58 +177,631 @@ class MovingAverageMonitor:
             logger.error(e)
             raise e
 
-        if data.currencyPair not in self.known_currency_pairs:
-            self.known_currency_pairs.add(data.currencyPair)
-            self.conversion_rates_queue[data.currencyPair] = PriorityQueue(maxsize=config.MOVING_AVERAGE_WINDOW)
-            self.conversion_rates_queue[data.currencyPair].put((data.timestamp, data.rate))
-            self.conversion_rates_sum_count[data.currencyPair] = (data.rate, 1)
+        if metrics.enabled:
+            start_time = time.perf_counter_ns()
+            self._process_new_rate(data)
+            metrics.update_seconds.record(time.perf_counter_ns() - start_time)
+            metrics.data_points.inc()
+        else:
+            self._process_new_rate(data)
+
+        if self.publisher is not None:
+            self.publisher.maybe_publish()
+
+    def _process_new_rate(self, data: CurrencyConversionRate):
+        pair_id = self.symbols.intern(data.currencyPair)
+        if self.tick_filter is not None and not self.tick_filter.admit(pair_id, data.timestamp, data.rate):
+            return
+
+        if self.triangulation is not None:
+            inconsistency = self.triangulation.check(pair_id, data.rate)
+            if inconsistency is not None:
+                self._write_alert(data, *inconsistency, self.triangulation.alert)
+                return
+
+        if config.WINDOW_SECONDS:
+            for alert, reference_rate, score, suppressed in self._update_time_window(data.timestamp, pair_id, data.rate):
+                self._write_alert(data, reference_rate, score, alert, suppressed)
+        else:
+            self._update_count_window(data, pair_id)
+
+        if self.governor is not None:
+            self.governor.touch(pair_id, data.timestamp)
+            self.governor.maybe_maintain()
+
+    def _update_count_window(self, data: CurrencyConversionRate, pair_id: int):
+        if pair_id >= len(self.windows):
+            self._allocate(pair_id)
+
+        window = self.windows[pair_id]
+        if window is None:
+            window = self._revive(pair_id)
+        count = self.counts[pair_id]
+        expired = None
+        if not count:
+            self.active[pair_id] = 1
+            window.put((data.timestamp, data.rate))
+            self.totals[pair_id] = data.rate
+            self.counts[pair_id] = 1
         else:
             # calculate percentage difference between the new conversion rate and the average rate
-            total, count = self.conversion_rates_sum_count[data.currencyPair]
-            current_avg_rate = self.get_current_average_rate(data.currencyPair)
+            total, compensation = self.totals[pair_id], self.compensations[pair_id]
+            current_avg_rate = (total + compensation) / count
             pct_change = (data.rate - current_avg_rate) / current_avg_rate
+            if self.movers is not None:
+                self.movers.update(pair_id, pct_change)
 
-            if pct_change >= config.PCT_CHANGE_THRESHOLD:
-                if config.VERBOSE:
-                    self.jsonline_writer.write(data, current_avg_rate, pct_change)
-                else:
-                    self.jsonline_writer.write(data)
-
-                logger.info(
-                    (
-                        f"Significant rate change (>= {config.PCT_CHANGE_THRESHOLD}) recorded."
-                        f"\n\tCurrency pair : {data.currencyPair}"
-                        f"\n\tAverage rate  : {current_avg_rate:.6f}"
-                        f"\n\tNew spot rate : {data.rate:.6f}"
-                        f"\n\tPercent change: {pct_change * 100:.2f}%"
-                    )
-                )
+            breach = exceeds_threshold(pct_change, config.PCT_CHANGE_THRESHOLD, config.PCT_CHANGE_DIRECTION)
+            if self.debouncer is not None:
+                suppressed = self.debouncer.update(pair_id, data.timestamp, pct_change, breach)
+                if suppressed is not None:
+                    self._write_alert(data, current_avg_rate, pct_change, SPOT_CHANGE, suppressed)
+            elif breach:
+                self._write_alert(data, current_avg_rate, pct_change)
 
-            # update queue, total, and count
-            if self.conversion_rates_queue[data.currencyPair].full():
-                _, expired_rate = self.conversion_rates_queue[data.currencyPair].get()
-                self.conversion_rates_sum_count[data.currencyPair] = (total - expired_rate + data.rate, count)
+            # update window, total, and count
+            if window.full():
+                expired = window.get()
+                total, compensation = compensated_add(total, compensation, -expired[1])
             else:
-                self.conversion_rates_sum_count[data.currencyPair] = (total + data.rate, count + 1)
+                self.counts[pair_id] = count + 1
+            self.totals[pair_id], self.compensations[pair_id] = compensated_add(total, compensation, data.rate)
 
-            self.conversion_rates_queue[data.currencyPair].put((data.timestamp, data.rate))
+            window.put((data.timestamp, data.rate))
 
-    def get_current_queue_size(self, currency_pair: str) -> int:
-        if self.currency_pair_exists(currency_pair):
-            _, count = self.conversion_rates_sum_count[currency_pair]
-            return count
+        if self.detectors:
+            for alert, reference_rate, score in self._update_detectors(pair_id, data.timestamp, data.rate, expired):
+                self._write_alert(data, reference_rate, score, alert)
+
+        self._count_down_reanchor(pair_id)
+
+    def process_batch(self, timestamps: Sequence[float], currency_pairs: Sequence, rates: Sequence[float]) -> AlertBlock:
+        """Process a columnar block of conversion rates, such as one second of all currency pairs.
+
+        `currency_pairs` holds either the currency pair of each data point, or its pair ID in `self.symbols`
+        as an integer array, such as the `pair_ids` of a batch read with `SpotRateReader.columnar_reader`.
+
+        The block is grouped by currency pair and processed in rounds, where round r holds the r-th data point
+        of every pair in the block. The averages, percentage changes, threshold check and running sums
+        of each round are computed with vectorized operations across all the pairs in the round.
+        The additional DETECTORS, if any, are updated data point by data point within each round.
+        Since the data points of each pair are still applied in input order with the same float operations,
+        the alerts are identical to calling process_new_rate on every data point.
+
+        Alerts are written to the jsonline writer in input order and returned as an AlertBlock.
+        """
+        if not self.jsonline_writer:
+            e = SpotRateWriterError("Jsonline writer not initialized")
+            logger.error(e)
+            raise e
+
+        start_time = time.perf_counter_ns() if metrics.enabled else 0
+        alerts = self.update_batch(timestamps, currency_pairs, rates)
+        if alerts.size:
+            self.jsonline_writer.write_block(alerts)
+            self.log_alert_block(alerts)
+
+        if metrics.enabled:
+            metrics.batch_seconds.record(time.perf_counter_ns() - start_time)
+            metrics.data_points.inc(len(timestamps))
+
+        if self.publisher is not None:
+            self.publisher.maybe_publish()
+        return alerts
+
+    def update_batch(self, timestamps: Sequence[float], currency_pairs: Sequence, rates: Sequence[float]) -> AlertBlock:
+        """Same as process_batch, but the alerts are only returned, without being written or logged."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        rates = np.asarray(rates, dtype=np.float64)
+        if len(timestamps) == 0:
+            return AlertBlock.empty()
+
+        pair_ids = self._pair_ids(currency_pairs)
+        admitted = None
+        if self.tick_filter is not None:
+            admitted = self.tick_filter.admit_batch(timestamps, pair_ids, rates)
+            if admitted is not None:
+                timestamps, pair_ids, rates = timestamps[admitted], pair_ids[admitted], rates[admitted]
+
+        consistent, inconsistencies = None, None
+        if self.triangulation is not None:
+            consistent, inconsistencies = self.triangulation.check_batch(timestamps, pair_ids, rates)
+            if consistent is not None:
+                timestamps, pair_ids, rates = timestamps[consistent], pair_ids[consistent], rates[consistent]
+
+        if len(timestamps) == 0:
+            alerts = AlertBlock.empty()
+        elif config.WINDOW_SECONDS:
+            alerts = self._update_time_window_batch(timestamps, pair_ids, rates)
         else:
-            raise KeyError(f"The currency pair ({currency_pair}) does not exist")
+            alerts = self._update_count_window_batch(timestamps, pair_ids, rates)
 
-    def get_current_average_rate(self, currency_pair: str) -> float:
-        if self.currency_pair_exists(currency_pair):
-            total, count = self.conversion_rates_sum_count[currency_pair]
-            return total / count
+        # indices of positions in the input batch, rather than among the data points left after each stage
+        if consistent is not None:
+            alerts = AlertBlock.merge(inconsistencies, alerts._replace(indices=np.flatnonzero(consistent)[alerts.indices]))
+        if admitted is not None and alerts.size:
+            alerts = alerts._replace(indices=np.flatnonzero(admitted)[alerts.indices])
+
+        if self.governor is not None and len(timestamps):
+            self.governor.touch_batch(pair_ids, timestamps)
+            self.governor.maybe_maintain()
+        return alerts
+
+    def _update_count_window_batch(self, timestamps: np.ndarray, pair_ids: np.ndarray, rates: np.ndarray) -> AlertBlock:
+        batch_ids, codes = np.unique(pair_ids, return_inverse=True)
+        codes = codes.ravel()
+        if batch_ids[-1] >= len(self.windows):
+            self._allocate(int(batch_ids[-1]))
+        batch_id_list = batch_ids.tolist()
+        for pair_id in batch_id_list:
+            if self.windows[pair_id] is None:
+                self._revive(pair_id)
+            self.active[pair_id] = 1
+
+        # per-pair state of this block, gathered once from the flat state arrays
+        totals_view = np.frombuffer(self.totals, dtype=np.float64)
+        compensations_view = np.frombuffer(self.compensations, dtype=np.float64)
+        counts_view = np.frombuffer(self.counts, dtype=np.int64)
+        countdowns_view = np.frombuffer(self.reanchor_countdowns, dtype=np.int64)
+        totals, compensations = totals_view[batch_ids], compensations_view[batch_ids]
+        counts, countdowns = counts_view[batch_ids], countdowns_view[batch_ids]
+        windows = [self.windows[pair_id] for pair_id in batch_id_list]
+
+        # rank of each data point within its currency pair, preserving input order
+        order = np.argsort(codes, kind="stable")
+        group_sizes = np.bincount(codes, minlength=len(batch_ids))
+        group_starts = np.concatenate(([0], np.cumsum(group_sizes)[:-1]))
+
+        alert_index, alert_avg, alert_pct, alert_suppressed = [], [], [], []
+        detector_index, detector_alerts = [], []
+        for r in range(int(group_sizes.max())):
+            idx = order[group_starts[group_sizes > r] + r]
+            round_codes = codes[idx]
+            round_rates = rates[idx]
+            total, compensation, count = totals[round_codes], compensations[round_codes], counts[round_codes]
+
+            known = count > 0
+            with np.errstate(divide="ignore", invalid="ignore"):
+                avg = (total + compensation) / count
+                pct_change = (round_rates - avg) / avg
+            alert = known & exceeds_threshold(pct_change, config.PCT_CHANGE_THRESHOLD, config.PCT_CHANGE_DIRECTION)
+            if self.movers is not None:
+                self.movers.update_many(batch_ids[round_codes[known]], pct_change[known])
+            if self.debouncer is not None and known.any():
+                alert[known], suppressed = self.debouncer.update_round(
+                    batch_ids[round_codes[known]], timestamps[idx[known]], pct_change[known], alert[known]
+                )
+                alert_suppressed.append(suppressed)
+            if alert.any():
+                alert_index.append(idx[alert])
+                alert_avg.append(avg[alert])
+                alert_pct.append(pct_change[alert])
+
+            # update windows, totals, and counts
+            expired = np.zeros(len(idx), dtype=np.float64)
+            full = np.zeros(len(idx), dtype=bool)
+            for i, (code, ts, rate) in enumerate(zip(round_codes.tolist(), timestamps[idx].tolist(), round_rates.tolist())):
+                window = windows[code]
+                expired_item = None
+                if window.full():
+                    full[i] = True
+                    expired_item = window.get()
+                    expired[i] = expired_item[1]
+                window.put((ts, rate))
+
+                if self.detectors:
+                    for detector_alert in self._update_detectors(batch_id_list[code], ts, rate, expired_item):
+                        detector_index.append(int(idx[i]))
+                        detector_alerts.append(detector_alert)
+
+            evicted_total, evicted_compensation = compensated_add_array(total, compensation, -expired)
+            total, compensation = compensated_add_array(
+                np.where(full, evicted_total, total), np.where(full, evicted_compensation, compensation), round_rates
+            )
+            totals[round_codes], compensations[round_codes] = total, compensation
+            counts[round_codes] = np.where(full, count, count + 1)
+
+            if config.REANCHOR_INTERVAL:
+                countdown = countdowns[round_codes] - 1
+                reanchor = countdown <= 0
+                for code in round_codes[reanchor].tolist():
+                    totals[code], compensations[code] = windows[code].exact_sum()
+                    self._rebuild_detectors(batch_id_list[code])
+                countdowns[round_codes] = np.where(reanchor, config.REANCHOR_INTERVAL, countdown)
+
+        totals_view[batch_ids], compensations_view[batch_ids] = totals, compensations
+        counts_view[batch_ids], countdowns_view[batch_ids] = counts, countdowns
+        del totals_view, compensations_view, counts_view, countdowns_view
+
+        if not alert_index and not detector_index:
+            return AlertBlock.empty()
+
+        # spot change alerts come before the detector alerts of the same data point, as in process_new_rate
+        alert_types = [np.full(sum(map(len, alert_index)), SPOT_CHANGE, dtype=object)]
+        if detector_index:
+            alert_index.append(np.array(detector_index, dtype=np.int64))
+            alert_types.append(np.array([alert for alert, _, _ in detector_alerts], dtype=object))
+            alert_avg.append(np.array([reference_rate for _, reference_rate, _ in detector_alerts]))
+            alert_pct.append(np.array([score for _, _, score in detector_alerts]))
+            alert_suppressed.append(np.zeros(len(detector_index), dtype=np.int64))
+
+        alert_index = np.concatenate(alert_index)
+        alert_order = np.argsort(alert_index, kind="stable")
+        alert_index = alert_index[alert_order]
+        return AlertBlock(
+            timestamps=timestamps[alert_index],
+            currency_pairs=self.symbols.symbol_array()[pair_ids[alert_index]],
+            rates=rates[alert_index],
+            average_rates=np.concatenate(alert_avg)[alert_order],
+            pct_changes=np.concatenate(alert_pct)[alert_order],
+            indices=alert_index,
+            alert_types=np.concatenate(alert_types)[alert_order],
+            suppressed=np.concatenate(alert_suppressed)[alert_order] if self.debouncer is not None else None,
+        )
+
+    def _pair_ids(self, currency_pairs: Sequence) -> np.ndarray:
+        if isinstance(currency_pairs, array) or (isinstance(currency_pairs, np.ndarray) and currency_pairs.dtype.kind in "iu"):
+            return np.asarray(currency_pairs, dtype=np.int64)
+        return self.symbols.intern_many(currency_pairs)
+
+    def _update_time_window_batch(self, timestamps: np.ndarray, pair_ids: np.ndarray, rates: np.ndarray) -> AlertBlock:
+        alert_index, alert_types, alert_avg, alert_pct, alert_suppressed = [], [], [], [], []
+        for i, (timestamp, pair_id, rate) in enumerate(zip(timestamps.tolist(), pair_ids.tolist(), rates.tolist())):
+            for alert, reference_rate, score, suppressed in self._update_time_window(timestamp, pair_id, rate):
+                alert_index.append(i)
+                alert_types.append(alert)
+                alert_avg.append(reference_rate)
+                alert_pct.append(score)
+                alert_suppressed.append(suppressed)
+
+        if not alert_index:
+            return AlertBlock.empty()
+
+        alert_index = np.array(alert_index, dtype=np.int64)
+        return AlertBlock(
+            timestamps=timestamps[alert_index],
+            currency_pairs=self.symbols.symbol_array()[pair_ids[alert_index]],
+            rates=rates[alert_index],
+            average_rates=np.array(alert_avg),
+            pct_changes=np.array(alert_pct),
+            indices=alert_index,
+            alert_types=np.array(alert_types, dtype=object),
+            suppressed=np.array(alert_suppressed, dtype=np.int64) if self.debouncer is not None else None,
+        )
+
+    def _update_time_window(self, timestamp: float, pair_id: int, rate: float) -> List[Tuple[str, float, float, int]]:
+        """Updates the time-based window of the pair.
+        Returns the (alert, reference rate, score, suppressed breaches) of each alert."""
+        window_seconds = config.WINDOW_SECONDS
+
+        if timestamp > self.watermark:
+            self.watermark = timestamp
+            for expired_pair_id in self.expirations.pop_expired(timestamp):
+                self._evict_expired(expired_pair_id)
+        elif timestamp < self.watermark - config.ALLOWED_LATENESS or timestamp <= self.watermark - window_seconds:
+            self.late_data_points += 1
+            logger.debug(
+                f"Dropped late data point of {self.symbols.symbol(pair_id)} at {timestamp} (watermark: {self.watermark})"
+            )
+            return []
+
+        if pair_id >= len(self.windows):
+            self._allocate(pair_id)
+        if self.windows[pair_id] is None:
+            self._revive(pair_id)
+        self._evict_expired(pair_id)
+        self.active[pair_id] = 1
+
+        total, compensation, count = self.totals[pair_id], self.compensations[pair_id], self.counts[pair_id]
+        alerts = []
+        if count:
+            current_avg_rate = (total + compensation) / count
+            pct_change = (rate - current_avg_rate) / current_avg_rate
+            if self.movers is not None:
+                self.movers.update(pair_id, pct_change)
+            breach = exceeds_threshold(pct_change, config.PCT_CHANGE_THRESHOLD, config.PCT_CHANGE_DIRECTION)
+            if self.debouncer is not None:
+                suppressed = self.debouncer.update(pair_id, timestamp, pct_change, breach)
+                if suppressed is not None:
+                    alerts.append((SPOT_CHANGE, current_avg_rate, pct_change, suppressed))
+            elif breach:
+                alerts.append((SPOT_CHANGE, current_avg_rate, pct_change, 0))
+
+        window = self.windows[pair_id]
+        if window.full():
+            window.grow()
+        window.put((timestamp, rate))
+        self.totals[pair_id], self.compensations[pair_id] = compensated_add(total, compensation, rate)
+        self.counts[pair_id] = count + 1
+        self.expirations.schedule(pair_id, window.peek()[0] + window_seconds)
+
+        if self.detectors:
+            alerts.extend((alert, reference_rate, score, 0) for alert, reference_rate, score in self._update_detectors(
+                pair_id, timestamp, rate, None
+            ))
+
+        self._count_down_reanchor(pair_id)
+
+        return alerts
+
+    def _evict_expired(self, pair_id: int):
+        """Evicts the data points of the pair that are no longer within the time-based window."""
+        window = self.windows[pair_id]
+        cutoff = self.watermark - config.WINDOW_SECONDS
+        total, compensation, count = self.totals[pair_id], self.compensations[pair_id], self.counts[pair_id]
+
+        while count and window.peek()[0] <= cutoff:
+            expired = window.get()
+            total, compensation = compensated_add(total, compensation, -expired[1])
+            count -= 1
+            for detector, state in zip(self.detectors, self.detector_states[pair_id]):
+                detector.evict(state, *expired)
+
+        if count:
+            self.expirations.schedule(pair_id, window.peek()[0] + config.WINDOW_SECONDS)
         else:
-            raise KeyError(f"The currency pair ({currency_pair}) does not exist")
+            total, compensation = 0.0, 0.0
+
+        self.totals[pair_id], self.compensations[pair_id], self.counts[pair_id] = total, compensation, count
+
+    def _allocate(self, pair_id: int):
+        """Allocates the state of every pair ID up to `pair_id`, which may have been interned by a reader."""
+        for new_id in range(len(self.windows), pair_id + 1):
+            self.windows.append(None)
+            self.active.append(0)
+            self.totals.append(0.0)
+            self.compensations.append(0.0)
+            self.counts.append(0)
+            self.detector_states.append([detector.new_state() for detector in self.detectors])
+            self.reanchor_countdowns.append(self._initial_countdown(new_id))
+
+    def _initial_countdown(self, pair_id: int) -> int:
+        # staggered by a hash of the pair, not by arrival order, so that the re-anchoring schedule
+        # of a pair is the same whether the data points are processed one by one or in batches
+        interval = config.REANCHOR_INTERVAL
+        return zlib.crc32(self.symbols.symbol(pair_id).encode()) % interval + 1 if interval else 0
+
+    def _revive(self, pair_id: int) -> RateWindow:
+        """Creates the window of a pair without state, reloading the state of the pair if it was spilled."""
+        record = self.governor.reload(pair_id) if self.governor is not None else None
+        if record is not None:
+            self.import_pair(pair_id, record)
+        else:
+            self.windows[pair_id] = RateWindow(config.MOVING_AVERAGE_WINDOW)
+        return self.windows[pair_id]
+
+    def export_pair(self, pair_id: int) -> dict:
+        """Returns a copy of the state of the pair, including its debouncing state. The states of detectors
+        without `scalar_state` are not included, as they are rebuilt from the window by `import_pair`."""
+        timestamps, rates = self.windows[pair_id].columns()
+        return {
+            "timestamps": timestamps,
+            "rates": rates,
+            "total": self.totals[pair_id],
+            "compensation": self.compensations[pair_id],
+            "count": self.counts[pair_id],
+            "countdown": self.reanchor_countdowns[pair_id],
+            "detector_states": [
+                list(state) if detector.scalar_state else None
+                for detector, state in zip(self.detectors, self.detector_states[pair_id])
+            ],
+            "debouncer": self.debouncer.export_pair(pair_id) if self.debouncer is not None else None,
+        }
+
+    def import_pair(self, pair_id: int, record: dict):
+        """Sets the state of the pair from a state returned by `export_pair`."""
+        window = RateWindow.from_columns(config.MOVING_AVERAGE_WINDOW, record["timestamps"], record["rates"])
+        self.windows[pair_id] = window
+        self.active[pair_id] = 1
+        self.totals[pair_id], self.counts[pair_id] = record["total"], record["count"]
+        self.compensations[pair_id] = record["compensation"]
+        self.reanchor_countdowns[pair_id] = record["countdown"]
+        self.detector_states[pair_id] = [detector.new_state() for detector in self.detectors]
+        self._rebuild_detectors(pair_id)
+        for detector_state, saved_state in zip(self.detector_states[pair_id], record["detector_states"]):
+            if saved_state is not None:
+                detector_state[:] = saved_state
+        if self.debouncer is not None:
+            self.debouncer.import_pair(pair_id, record.get("debouncer"))
+        if config.WINDOW_SECONDS and len(window):
+            self.expirations.schedule(pair_id, window.peek()[0] + config.WINDOW_SECONDS)
+
+    def drop_pair(self, pair_id: int, spilled: bool = False):
+        """Releases the state of the pair, as if it had never received a data point.
+
+        The pair leaves the top movers until its next data point. If the pair was spilled by the memory governor,
+        its debouncing state is kept, as a pair reloaded from the spill store alerts as if it had never been evicted.
+        """
+        self.windows[pair_id] = None
+        self.active[pair_id] = 0
+        self.totals[pair_id], self.compensations[pair_id], self.counts[pair_id] = 0.0, 0.0, 0
+        self.reanchor_countdowns[pair_id] = self._initial_countdown(pair_id)
+        self.detector_states[pair_id] = [detector.new_state() for detector in self.detectors]
+        self.expirations.discard(pair_id)
+        if self.debouncer is not None and not spilled:
+            self.debouncer.reset(pair_id)
+        if self.movers is not None:
+            self.movers.remove(pair_id)
+
+    def pair_memory_bytes(self, pair_id: int) -> int:
+        """Bytes released by dropping the state of the pair: its window, as the flat per-pair state is kept."""
+        window = self.windows[pair_id]
+        return window.nbytes if window is not None else 0
+
+    def memory_bytes(self) -> int:
+        """Estimated bytes held by the state of all the pairs: their windows, and their flat per-pair state.
+
+        The flat per-pair state is counted as PAIR_OVERHEAD_BYTES per pair ID, and is kept for every pair ever seen,
+        so the memory budget of the governor bounds the windows, not the total memory of the monitor.
+        """
+        return PAIR_OVERHEAD_BYTES * len(self.windows) + sum(window.nbytes for window in self.windows if window is not None)
+
+    def _count_down_reanchor(self, pair_id: int):
+        """Recomputes the running sum of the pair exactly from its window every REANCHOR_INTERVAL data points."""
+        if not config.REANCHOR_INTERVAL:
+            return
+
+        countdown = self.reanchor_countdowns[pair_id] - 1
+        if countdown <= 0:
+            self.totals[pair_id], self.compensations[pair_id] = self.windows[pair_id].exact_sum()
+            self._rebuild_detectors(pair_id)
+            countdown = config.REANCHOR_INTERVAL
+
+        self.reanchor_countdowns[pair_id] = countdown
+
+    def _update_detectors(
+            self, pair_id: int, timestamp: float, rate: float, expired: Optional[Tuple[float, float]]
+    ) -> List[Tuple[str, float, float]]:
+        """Runs every detector on the new data point, after the shared window of the pair has been updated."""
+        alerts = []
+        window = self.windows[pair_id]
+        for detector, state in zip(self.detectors, self.detector_states[pair_id]):
+            if expired is not None:
+                detector.evict(state, *expired)
+            alert = detector.update(state, timestamp, rate, window)
+            if alert:
+                alerts.append((detector.alert, *alert))
+        return alerts
+
+    def _rebuild_detectors(self, pair_id: int):
+        window = self.windows[pair_id]
+        for detector, state in zip(self.detectors, self.detector_states[pair_id]):
+            detector.rebuild(state, window)
+
+    def _write_alert(
+            self,
+            data: CurrencyConversionRate,
+            current_avg_rate: float,
+            pct_change: float,
+            alert: str = SPOT_CHANGE,
+            suppressed: int = 0,
+    ):
+        if config.VERBOSE:
+            self.jsonline_writer.write(data, current_avg_rate, pct_change, alert, suppressed)
+        else:
+            self.jsonline_writer.write(data, alert=alert, suppressed=suppressed)
+
+        alert_logger.log(data.currencyPair, current_avg_rate, data.rate, pct_change, alert, suppressed)
+
+    @staticmethod
+    def log_alert_block(alerts: AlertBlock):
+        alert_logger.log_block(alerts)
+
+    def snapshot_state(self) -> dict:
+        """Captures the state of every currency pair, including the pairs spilled by the memory governor, for Checkpointer.
+
+        The windows are copied, so the snapshot is not affected by further processing and can be serialized
+        in another thread. The states of detectors without `scalar_state` are not captured,
+        as they are rebuilt from the windows on restore. The states of the tick filter, the debouncer and the
+        movers index are captured if they are enabled, so that duplicates are still dropped, debounced pairs
+        do not fire again, and the top movers are ranked as before the restart.
+        """
+        records = [(pair_id, self.export_pair(pair_id)) for pair_id in self._active_pair_ids()]
+        if self.governor is not None and self.governor.store is not None:
+            records.extend(self.governor.store.items())
+        pct_changes = None
+        if self.movers is not None:
+            pct_changes = self.movers.get_many(np.array([pair_id for pair_id, _ in records], dtype=np.int64)).tolist()
+        return {
+            "moving_average_window": config.MOVING_AVERAGE_WINDOW,
+            "window_seconds": config.WINDOW_SECONDS or 0.0,
+            "currency_pairs": [self.symbols.symbol(pair_id) for pair_id, _ in records],
+            "windows": [(record["timestamps"], record["rates"]) for _, record in records],
+            "sum_counts": [(record["total"], record["count"]) for _, record in records],
+            "compensations": [record["compensation"] for _, record in records],
+            "reanchor_countdowns": [record["countdown"] for _, record in records],
+            "detectors": [detector.alert for detector in self.detectors],
+            "detector_states": [
+                [record["detector_states"][i] for _, record in records] if detector.scalar_state else None
+                for i, detector in enumerate(self.detectors)
+            ],
+            "debouncer_states": [record["debouncer"] for _, record in records] if self.debouncer is not None else None,
+            "pct_changes": pct_changes,
+            "tick_filter": self.tick_filter.snapshot_state() if self.tick_filter is not None else None,
+            "watermark": self.watermark,
+            "late_data_points": self.late_data_points,
+        }
+
+    def restore_state(self, state: dict):
+        """Restores a state captured by snapshot_state into a monitor that has not seen any currency pair yet.
+
+        Throws:
+            SnapshotError: The monitor already holds currency pairs, or the state was captured with other window settings.
+        """
+        if any(self.active):
+            raise SnapshotError("State can only be restored into a monitor without currency pairs.")
+        if (state["moving_average_window"], state["window_seconds"]) != (config.MOVING_AVERAGE_WINDOW, config.WINDOW_SECONDS or 0.0):
+            raise SnapshotError(
+                f"State was captured with MOVING_AVERAGE_WINDOW={state['moving_average_window']} "
+                f"and WINDOW_SECONDS={state['window_seconds'] or None}."
+            )
+
+        # detector states are only restored if the same detector is configured at the same position
+        saved_detector_states = [
+            saved_states if saved_alert == detector.alert else None
+            for detector, saved_alert, saved_states in zip(self.detectors, state["detectors"], state["detector_states"])
+        ]
+
+        debouncer_states = state["debouncer_states"]
+        pair_ids = []
+        for p, (currency_pair, (timestamps, rates), (total, count), compensation, countdown) in enumerate(zip(
+                state["currency_pairs"], state["windows"], state["sum_counts"],
+                state["compensations"], state["reanchor_countdowns"]
+        )):
+            pair_id = self.symbols.intern(currency_pair)
+            pair_ids.append(pair_id)
+            if pair_id >= len(self.windows):
+                self._allocate(pair_id)
+            self.import_pair(pair_id, {
+                "timestamps": timestamps,
+                "rates": rates,
+                "total": total,
+                "compensation": compensation,
+                "count": count,
+                "countdown": countdown,
+                "detector_states": [
+                    saved_states[p] if saved_states is not None else None for saved_states in saved_detector_states
+                ],
+                "debouncer": debouncer_states[p] if debouncer_states is not None else None,
+            })
+
+        if self.movers is not None and state["pct_changes"] is not None:
+            self.movers.update_many(np.array(pair_ids, dtype=np.int64), np.array(state["pct_changes"], dtype=np.float64))
+        if self.tick_filter is not None and state["tick_filter"] is not None:
+            self.tick_filter.restore_state(state["tick_filter"])
+        self.watermark = state["watermark"]
+        self.late_data_points = state["late_data_points"]
+
+    def get_window(self, currency_pair: str) -> RateWindow:
+        return self.windows[self._get_pair_id(currency_pair)]
+
+    def get_current_queue_size(self, currency_pair: str) -> int:
+        return self.counts[self._get_pair_id(currency_pair)]
+
+    def get_current_average_rate(self, currency_pair: str) -> float:
+        pair_id = self._get_pair_id(currency_pair)
+        count = self.counts[pair_id]
+        return (self.totals[pair_id] + self.compensations[pair_id]) / count if count else math.nan
+
+    def top_movers(self, k: int = 20) -> List[Tuple[str, float]]:
+        """Returns the (currency pair, pct change) of the k pairs whose latest data point deviated the most
+        from their moving average, largest absolute pct change first. Requires MOVERS_INDEX."""
+        if self.movers is None:
+            raise ValueError("The movers index is not enabled: set MOVERS_INDEX in the config file")
+        return [(self.symbols.symbol(pair_id), pct_change) for pair_id, pct_change in self.movers.top(k)]
 
     def get_known_currency_pairs(self) -> set:
-        return self.known_currency_pairs
+        return {self.symbols.symbol(pair_id) for pair_id in self._active_pair_ids()}
 
     def currency_pair_exists(self, currency_pair: str) -> bool:
-        return currency_pair in self.known_currency_pairs
+        pair_id = self.symbols.get(currency_pair)
+        return pair_id is not None and pair_id < len(self.active) and self.active[pair_id] == 1
+
+    def _active_pair_ids(self) -> List[int]:
+        return [pair_id for pair_id, active in enumerate(self.active) if active]
+
+    def _get_pair_id(self, currency_pair: str) -> int:
+        if self.currency_pair_exists(currency_pair):
+            return self.symbols.get(currency_pair)
+        else:
+            raise KeyError(f"The currency pair ({currency_pair}) does not exist")
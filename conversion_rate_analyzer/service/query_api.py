@@ -0,0 +1,295 @@
+import json
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from loguru import logger
+
+from conversion_rate_analyzer import config
+
+# movers ranked by the MoversIndex of the monitor, if any, in each snapshot
+PUBLISHED_MOVERS = 100
+
+
+class MonitorSnapshot:
+    """Immutable copy of the state of all the currency pairs of MovingAverageMonitor, published by StatePublisher.
+
+    Row i across the arrays describes the currency pair `currency_pairs[i]`: the average rate of its window,
+    the latest data point of its window (by event time), the deviation of that rate from the average,
+    and the number of data points in the window. `windows` holds copies of the windows of the watched pairs.
+    With a MoversIndex, `pct_changes` holds the pct change of the latest data point against the average before it,
+    as checked for alerts, and `ranked_rows` the rows of the top movers ranked by the index.
+    """
+
+    def __init__(
+            self,
+            published_at: float,
+            watermark: float,
+            currency_pairs: np.ndarray,
+            average_rates: np.ndarray,
+            timestamps: np.ndarray,
+            rates: np.ndarray,
+            counts: np.ndarray,
+            windows: Dict[str, Tuple[np.ndarray, np.ndarray]] = None,
+            pct_changes: np.ndarray = None,
+            ranked_rows: np.ndarray = None,
+    ):
+        self.published_at = published_at
+        self.watermark = watermark
+        self.currency_pairs = currency_pairs
+        self.average_rates = average_rates
+        self.timestamps = timestamps
+        self.rates = rates
+        if pct_changes is None:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                pct_changes = (rates - average_rates) / average_rates
+        self.pct_changes = pct_changes
+        self.counts = counts
+        self.windows = windows or {}
+        self.ranked_rows = ranked_rows
+        self._rows: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def empty(cls) -> "MonitorSnapshot":
+        no_rows = np.empty(0, dtype=np.float64)
+        return cls(0.0, -math.inf, np.empty(0, dtype=object), no_rows, no_rows, no_rows, np.empty(0, dtype=np.int64))
+
+    def __len__(self) -> int:
+        return len(self.currency_pairs)
+
+    def row(self, currency_pair: str) -> Optional[int]:
+        if self._rows is None:
+            # built on first use by a reader, so publishing does not pay for it
+            self._rows = {currency_pair: row for row, currency_pair in enumerate(self.currency_pairs.tolist())}
+        return self._rows.get(currency_pair)
+
+    def pair(self, currency_pair: str) -> Optional[dict]:
+        """Returns the state of the pair, with its window if it is watched, or None if the pair is unknown."""
+        row = self.row(currency_pair)
+        if row is None:
+            return None
+        state = self._pair(row)
+        if currency_pair in self.windows:
+            timestamps, rates = self.windows[currency_pair]
+            state["window"] = [[timestamp, rate] for timestamp, rate in zip(timestamps.tolist(), rates.tolist())]
+        return state
+
+    def pairs(self) -> List[dict]:
+        return [self._pair(row) for row in range(len(self))]
+
+    def movers(self, k: int) -> List[dict]:
+        """Returns the k pairs whose latest rate deviates the most from their average, largest first."""
+        if self.ranked_rows is not None and (k <= len(self.ranked_rows) or len(self.ranked_rows) < PUBLISHED_MOVERS):
+            return [self._pair(row) for row in self.ranked_rows[:k].tolist()]
+
+        deviations = np.abs(self.pct_changes)
+        deviations[np.isnan(deviations)] = -1.0
+        k = min(k, len(self))
+        rows = np.argpartition(-deviations, k - 1)[:k] if 0 < k < len(self) else np.arange(k)
+        rows = rows[np.argsort(-deviations[rows], kind="stable")]
+        return [self._pair(row) for row in rows.tolist() if deviations[row] >= 0]
+
+    def status(self) -> dict:
+        return {
+            "published_at": self.published_at,
+            "age": time.time() - self.published_at if self.published_at else None,
+            "watermark": _json_number(self.watermark),
+            "currency_pairs": len(self),
+            "data_points": int(self.counts.sum()),
+        }
+
+    def _pair(self, row: int) -> dict:
+        return {
+            "currencyPair": self.currency_pairs[row],
+            "timestamp": _json_number(self.timestamps[row]),
+            "rate": _json_number(self.rates[row]),
+            "average_rate": _json_number(self.average_rates[row]),
+            "pct_change": _json_number(self.pct_changes[row]),
+            "count": int(self.counts[row]),
+        }
+
+
+class StatePublisher:
+    """Publishes a MonitorSnapshot of the monitor every `interval` seconds, for readers in other threads.
+
+    Each snapshot is a new immutable object, and publishing it is a single reference assignment, so readers
+    such as QueryServer read `publisher.snapshot` without any lock, and never wait on or slow down ingestion.
+    The monitor calls `maybe_publish` after each data point or batch, which costs a clock read between publishes.
+    Publishing copies the flat per-pair arrays, and reads the latest data point of each window. Pairs evicted
+    by the memory governor are not published until they tick again.
+    If the monitor has a MoversIndex, the top PUBLISHED_MOVERS movers are also ranked by it on each publish.
+
+    Copying every window on each publish would be too costly, so windows are only copied for the pairs watched
+    by readers. `watch` adds a pair to the next snapshots, until it has not been watched for `watch_ttl` seconds.
+
+    Example:
+        publisher = StatePublisher(monitor, interval=1.0)
+        publisher.snapshot.movers(20)  # from any thread
+    """
+
+    def __init__(self, monitor, interval: float = 1.0, watch_ttl: float = 60.0):
+        self.monitor = monitor
+        self.interval = interval
+        self.watch_ttl = watch_ttl
+        self.snapshot = MonitorSnapshot.empty()
+        self.generation = 0
+        self.next_publish = 0.0
+        # currency pair -> wall time until which its window is copied; copied whole, as readers add to it
+        self.watched: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls, monitor) -> Optional["StatePublisher"]:
+        """Returns the publisher configured by QUERY_PORT and QUERY_INTERVAL, or None if QUERY_PORT is not set."""
+        if config.QUERY_PORT is None:
+            return None
+        return cls(monitor, config.QUERY_INTERVAL)
+
+    def maybe_publish(self):
+        if time.monotonic() >= self.next_publish:
+            self.publish()
+
+    def publish(self):
+        monitor = self.monitor
+        self.next_publish = time.monotonic() + self.interval
+        pair_ids = np.flatnonzero(np.frombuffer(monitor.active, dtype=np.uint8))
+
+        timestamps = np.full(len(pair_ids), math.nan)
+        rates = np.full(len(pair_ids), math.nan)
+        windows = monitor.windows
+        for row, pair_id in enumerate(pair_ids.tolist()):
+            window = windows[pair_id]
+            if window is not None and window.tail > window.head:
+                timestamps[row] = window.timestamps[window.tail - 1]
+                rates[row] = window.rates[window.tail - 1]
+
+        totals = np.frombuffer(monitor.totals, dtype=np.float64)[pair_ids]
+        totals += np.frombuffer(monitor.compensations, dtype=np.float64)[pair_ids]
+        counts = np.frombuffer(monitor.counts, dtype=np.int64)[pair_ids]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average_rates = np.where(counts > 0, totals / counts, math.nan)
+
+        pct_changes, ranked_rows = None, None
+        if monitor.movers is not None:
+            pct_changes = monitor.movers.get_many(pair_ids)
+            ranked_ids = np.array([pair_id for pair_id, _ in monitor.movers.top(PUBLISHED_MOVERS)], dtype=np.int64)
+            ranked_rows = np.searchsorted(pair_ids, ranked_ids)
+
+        now = time.time()
+        watched_windows = {}
+        for currency_pair, until in self.watched.copy().items():
+            if until < now:
+                self.watched.pop(currency_pair, None)
+                continue
+            pair_id = monitor.symbols.get(currency_pair)
+            if pair_id is not None and pair_id < len(windows) and windows[pair_id] is not None:
+                window_timestamps, window_rates = windows[pair_id].columns()
+                watched_windows[currency_pair] = (np.array(window_timestamps), np.array(window_rates))
+
+        self.snapshot = MonitorSnapshot(
+            now,
+            monitor.watermark,
+            monitor.symbols.symbol_array()[pair_ids],
+            average_rates,
+            timestamps,
+            rates,
+            counts,
+            watched_windows,
+            pct_changes,
+            ranked_rows,
+        )
+        self.generation += 1
+
+    def watch(self, currency_pair: str):
+        self.watched[currency_pair] = time.time() + self.watch_ttl
+
+    def wait_for_window(self, currency_pair: str, timeout: float) -> MonitorSnapshot:
+        """Watches the pair, and returns the first snapshot holding its window, or the latest one after `timeout`
+        seconds. Polls the published snapshot rather than waiting on a lock held by the ingestion loop."""
+        self.watch(currency_pair)
+        deadline = time.monotonic() + timeout
+        snapshot = self.snapshot
+        while currency_pair not in snapshot.windows and time.monotonic() < deadline:
+            time.sleep(min(0.02, self.interval))
+            snapshot = self.snapshot
+        return snapshot
+
+
+class QueryServer:
+    """Serves the snapshots of a StatePublisher as JSON at http://host:port from a daemon thread.
+
+    Endpoints:
+        /status: age of the snapshot, watermark, number of currency pairs and data points
+        /pairs: average rate, latest rate and timestamp, pct change and window size of every pair
+        /pairs/<currency pair>: the same for one pair, with the (timestamp, rate) data points of its window
+        /movers?k=20: the k pairs whose latest rate deviates the most from their average
+
+    The window of a pair is copied into the snapshots once requested, so the first request for it waits for
+    the next publish.
+    """
+
+    def __init__(self, publisher: StatePublisher, port: int, host: str = "127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        window_timeout = 2 * publisher.interval + 1
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                parts = [part for part in url.path.split("/") if part]
+                snapshot = publisher.snapshot
+
+                if parts == ["status"]:
+                    self._reply(200, snapshot.status())
+                elif parts == ["pairs"]:
+                    self._reply(200, {"published_at": snapshot.published_at, "pairs": snapshot.pairs()})
+                elif len(parts) == 2 and parts[0] == "pairs":
+                    currency_pair = parts[1].upper()
+                    if snapshot.row(currency_pair) is not None and currency_pair not in snapshot.windows:
+                        snapshot = publisher.wait_for_window(currency_pair, window_timeout)
+                    state = snapshot.pair(currency_pair)
+                    if state is None:
+                        self._reply(404, {"error": f"Unknown currency pair: {currency_pair}"})
+                    else:
+                        self._reply(200, {"published_at": snapshot.published_at, **state})
+                elif parts == ["movers"]:
+                    try:
+                        k = int(parse_qs(url.query).get("k", ["20"])[0])
+                    except ValueError:
+                        self._reply(400, {"error": "k must be an integer"})
+                        return
+                    self._reply(200, {"published_at": snapshot.published_at, "movers": snapshot.movers(max(k, 0))})
+                else:
+                    self._reply(404, {"error": f"Unknown path: {url.path}"})
+
+            def _reply(self, status: int, body: dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Query request from {self.client_address[0]}: {format % args}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="query-server", daemon=True)
+        self.thread.start()
+        logger.info(f"Serving monitor state at http://{self.server.server_address[0]}:{self.port}/pairs")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _json_number(value: float) -> Optional[float]:
+    """NaN and infinities are not valid JSON, and are returned as None."""
+    value = float(value)
+    return value if math.isfinite(value) else None
@@ -0,0 +1,141 @@
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator, Tuple
+
+
+class RateWindow:
+    """Fixed capacity window of (timestamp, rate) data points ordered by timestamp.
+
+    Timestamps and rates are kept in two separate preallocated `array('d')` columns instead of
+    a heap of boxed tuples. Each column is twice the window capacity, so the live window is always
+    the contiguous slice [head, tail). When the tail reaches the end of the columns, the live items
+    are moved back to the front with a single slice copy, which is amortized O(1) per data point.
+
+    In-order data points take the fast path and are written at the tail.
+    Late data points are inserted at their sorted position, which costs a bisect and a slice move.
+    Ties on the timestamp are ordered by rate, so items are dequeued in exactly the same order
+    as a PriorityQueue of (timestamp, rate) tuples.
+
+    The `full`, `empty`, `get`, and `put` methods mirror the queue interface used by MovingAverageMonitor.
+    Time-based windows are not bounded by a count, and call `grow` to double the capacity when full.
+
+    Throws:
+        ValueError: The capacity is not a positive integer.
+        IndexError: Attempt made to put into a full window, or get from an empty window.
+    """
+
+    __slots__ = ("capacity", "timestamps", "rates", "head", "tail")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f"Window capacity must be a positive integer: {capacity}")
+
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(16 * capacity))
+        self.rates = array("d", bytes(16 * capacity))
+        self.head = 0
+        self.tail = 0
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    def __iter__(self) -> Iterator[Tuple[float, float]]:
+        for i in range(self.head, self.tail):
+            yield self.timestamps[i], self.rates[i]
+
+    def full(self) -> bool:
+        return self.tail - self.head >= self.capacity
+
+    def empty(self) -> bool:
+        return self.tail == self.head
+
+    def put(self, item: Tuple[float, float]):
+        """Insert a (timestamp, rate) data point, keeping the window ordered by timestamp."""
+        timestamp, rate = item
+        head, tail = self.head, self.tail
+
+        if tail - head >= self.capacity:
+            raise IndexError("Cannot put into a full rate window")
+
+        if tail == len(self.timestamps):
+            self._compact()
+            head, tail = self.head, self.tail
+
+        timestamps = self.timestamps
+        if tail == head or timestamp > timestamps[tail - 1] or (
+                timestamp == timestamps[tail - 1] and rate >= self.rates[tail - 1]
+        ):
+            timestamps[tail] = timestamp
+            self.rates[tail] = rate
+        else:
+            pos = self._insert_position(timestamp, rate)
+            timestamps[pos + 1:tail + 1] = timestamps[pos:tail]
+            self.rates[pos + 1:tail + 1] = self.rates[pos:tail]
+            timestamps[pos] = timestamp
+            self.rates[pos] = rate
+
+        self.tail = tail + 1
+
+    def get(self) -> Tuple[float, float]:
+        """Remove and return the oldest (timestamp, rate) data point."""
+        if self.tail == self.head:
+            raise IndexError("Cannot get from an empty rate window")
+
+        head = self.head
+        self.head = head + 1
+        return self.timestamps[head], self.rates[head]
+
+    def peek(self) -> Tuple[float, float]:
+        """Return the oldest (timestamp, rate) data point without removing it."""
+        if self.tail == self.head:
+            raise IndexError("Cannot peek into an empty rate window")
+
+        return self.timestamps[self.head], self.rates[self.head]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns of the window."""
+        return (len(self.timestamps) + len(self.rates)) * self.timestamps.itemsize
+
+    def exact_sum(self) -> Tuple[float, float]:
+        """Return the sum of the rates in the window as (correctly rounded sum, rounding error of the sum)."""
+        rates = self.rates[self.head:self.tail]
+        total = math.fsum(rates)
+        rates.append(-total)
+        return total, math.fsum(rates)
+
+    def columns(self) -> Tuple[array, array]:
+        """Return copies of the timestamps and rates in the window, in window order."""
+        return self.timestamps[self.head:self.tail], self.rates[self.head:self.tail]
+
+    @classmethod
+    def from_columns(cls, capacity: int, timestamps: array, rates: array) -> "RateWindow":
+        """Create a window from columns returned by `columns`, growing the capacity if they do not fit."""
+        window = cls(max(capacity, len(timestamps)))
+        window.timestamps[0:len(timestamps)] = timestamps
+        window.rates[0:len(rates)] = rates
+        window.tail = len(timestamps)
+        return window
+
+    def grow(self):
+        """Double the capacity of the window, keeping its contents."""
+        self._compact()
+        padding = array("d", bytes(16 * self.capacity))
+        self.timestamps.extend(padding)
+        self.rates.extend(padding)
+        self.capacity *= 2
+
+    def _insert_position(self, timestamp: float, rate: float) -> int:
+        lo = bisect_left(self.timestamps, timestamp, self.head, self.tail)
+        hi = bisect_right(self.timestamps, timestamp, lo, self.tail)
+        if lo == hi:
+            return lo
+        return bisect_right(self.rates, rate, lo, hi)
+
+    def _compact(self):
+        size = self.tail - self.head
+        self.timestamps[0:size] = self.timestamps[self.head:self.tail]
+        self.rates[0:size] = self.rates[self.head:self.tail]
+        self.head = 0
+        self.tail = size
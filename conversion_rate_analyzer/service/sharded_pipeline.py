@@ -0,0 +1,221 @@
+import multiprocessing as mp
+import queue
+import threading
+import traceback
+import zlib
+from typing import Dict, List
+
+import numpy as np
+from loguru import logger
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.alert_block import AlertBlock
+from conversion_rate_analyzer.runtime_config import setting_names
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.utils.writer import AlertWriter
+
+
+class ShardedPipeline:
+    """Runs the moving average monitor over N worker processes, partitioned by currency pair.
+
+    Since the moving average of each currency pair is independent, the pairs are hashed to a fixed shard:
+    - the dispatcher (calling process) reads columnar batches and sends each worker the rows of its shard
+      over a bounded pipe-based queue, so a slow worker applies backpressure to the reader,
+    - each worker owns an independent MovingAverageMonitor and returns the alerts of every batch,
+      configured by the settings of the dispatcher, which are passed explicitly so that the workers do not
+      depend on the start method (fork or spawn),
+    - a single merger thread collects the alerts of each batch from all the workers,
+      restores the input order, and writes them through the AlertWriter of the monitor.
+
+    The alerts are therefore identical to the single process mode for the same input. Cross rate checks
+    (TRIANGULATION_TOLERANCE) need the rates of all the pairs in one process, so they are not supported.
+    The workers do not publish their state (QUERY_PORT) nor rank the top movers, and each of them appends
+    its late data points to LATE_OUTPUT_FILE suffixed with the shard number.
+
+    Throws:
+        ValueError: The number of workers is not a positive integer, or TRIANGULATION_TOLERANCE is set.
+        RuntimeError: A worker process failed.
+    """
+
+    def __init__(self, workers: int, queue_size: int = 8, start_method: str = None):
+        if workers < 1:
+            raise ValueError(f"Number of workers must be a positive integer: {workers}")
+        if config.TRIANGULATION_TOLERANCE is not None:
+            raise ValueError("Cross rate checks (TRIANGULATION_TOLERANCE) are not supported by the sharded pipeline")
+
+        self.workers = workers
+        self.queue_size = queue_size
+        self.start_method = start_method
+        self.shard_of_pair: Dict[str, int] = {}
+
+    def shard(self, currency_pair: str) -> int:
+        """Returns the shard of the currency pair, stable across processes and runs."""
+        shard = self.shard_of_pair.get(currency_pair)
+        if shard is None:
+            shard = self.shard_of_pair[currency_pair] = zlib.crc32(currency_pair.encode()) % self.workers
+        return shard
+
+    def run(self, input_file: str, writer: AlertWriter) -> int:
+        """Processes the input file and writes the alerts. Returns the number of data points processed."""
+        ctx = mp.get_context(self.start_method)
+        task_queues = [ctx.Queue(maxsize=self.queue_size) for _ in range(self.workers)]
+        result_queue = ctx.Queue()
+        processes = [
+            ctx.Process(
+                target=_worker,
+                args=(task_queues[i], result_queue, i, self.worker_settings(i)),
+                daemon=True,
+            )
+            for i in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        merger = _Merger(result_queue, writer, processes)
+        merger_thread = threading.Thread(target=merger.run, name="sharded-pipeline-merger", daemon=True)
+        merger_thread.start()
+
+        data_points_processed = 0
+        try:
+            for seq, batch in enumerate(SpotRateReader().columnar_reader(input_file, config.BATCH_SIZE)):
+                if merger.error:
+                    break
+
+                shards = np.fromiter(
+                    (self.shard(pair) for pair in batch.currency_pairs), dtype=np.int64, count=batch.size
+                )
+                timestamps = np.frombuffer(batch.timestamps, dtype=np.float64)
+                rates = np.frombuffer(batch.rates, dtype=np.float64)
+                pairs = np.asarray(batch.currency_pairs)
+
+                for i, task_queue in enumerate(task_queues):
+                    rows = np.flatnonzero(shards == i)
+                    self._put(task_queue, (seq, rows, timestamps[rows], pairs[rows], rates[rows]), merger)
+
+                data_points_processed += batch.size
+        finally:
+            for task_queue in task_queues:
+                self._put(task_queue, None, merger)
+            merger_thread.join()
+            if merger.error:
+                # the healthy workers may be waiting for tasks or sentinels that were never sent
+                for process in processes:
+                    process.terminate()
+                for task_queue in task_queues:
+                    task_queue.cancel_join_thread()
+            for process in processes:
+                process.join()
+
+        if merger.error:
+            raise RuntimeError(f"Sharded pipeline worker failed:\n{merger.error}")
+
+        return data_points_processed
+
+    @staticmethod
+    def worker_settings(shard: int) -> Dict[str, object]:
+        """Returns the settings of the worker of the shard: the current settings, without the components
+        that only make sense once per run."""
+        settings = {name: getattr(config, name) for name in setting_names() if name != "OUTPUT_FILE"}
+        settings.update(QUERY_PORT=None, MOVERS_INDEX=False, METRICS_ENABLED=False, CHECKPOINT_FILE=None)
+        if config.LATE_OUTPUT_FILE:
+            settings["LATE_OUTPUT_FILE"] = f"{config.LATE_OUTPUT_FILE}.{shard}"
+        return settings
+
+    @staticmethod
+    def _put(task_queue, task, merger: "_Merger"):
+        """Blocks while the worker is busy, unless the pipeline has failed and the worker may be gone."""
+        while not merger.error:
+            try:
+                task_queue.put(task, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+class _Merger:
+    """Collects the alerts of each batch from all the workers and writes them in input order.
+
+    A worker killed without reporting its error (by a signal, the OOM killer or a crash of native code)
+    is detected by its exit code, which is checked whenever no result has arrived for `poll_interval` seconds.
+    """
+
+    def __init__(self, result_queue, writer: AlertWriter, processes: list, poll_interval: float = 0.1):
+        self.result_queue = result_queue
+        self.writer = writer
+        self.processes = processes
+        self.workers = len(processes)
+        self.poll_interval = poll_interval
+        self.error = None
+
+    def run(self):
+        try:
+            self._merge()
+        except Exception:  # pragma: no cover
+            logger.exception("Sharded pipeline merger failed")
+            self.error = traceback.format_exc()
+
+    def _merge(self):
+        """Returns once every worker is done, or as soon as one of them failed."""
+        pending: Dict[int, List[AlertBlock]] = {}
+        next_seq = 0
+        running = set(range(self.workers))
+
+        while running:
+            try:
+                kind, seq, payload = self.result_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                for shard in running:
+                    exitcode = self.processes[shard].exitcode
+                    if exitcode:
+                        self.error = f"Worker of shard {shard} exited with code {exitcode} without reporting an error."
+                        return
+                continue
+
+            if kind == "done":
+                # the shard of the worker is passed as the sequence number
+                running.discard(seq)
+                continue
+            if kind == "error":
+                self.error = payload
+                return
+
+            pending.setdefault(seq, []).append(payload)
+            while len(pending.get(next_seq, ())) == self.workers:
+                self._write(pending.pop(next_seq))
+                next_seq += 1
+
+    def _write(self, blocks: List[AlertBlock]):
+        alerts = AlertBlock.merge(*blocks)
+        if not alerts.size:
+            return
+
+        self.writer.write_block(alerts)
+        MovingAverageMonitor.log_alert_block(alerts)
+
+
+def _worker(task_queue, result_queue, shard: int, settings: Dict[str, object]):
+    """Entry point of a worker process, owning the MovingAverageMonitor of one shard."""
+    for name, value in settings.items():
+        setattr(config, name, value)
+    monitor = MovingAverageMonitor(singleton=False)
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            seq, rows, timestamps, pairs, rates = task
+            alerts = monitor.update_batch(timestamps, pairs, rates)
+            # map the row indices of the shard back to the row indices of the input batch
+            result_queue.put(("alerts", seq, alerts._replace(indices=rows[alerts.indices])))
+    except Exception:
+        logger.exception(f"Worker of shard {shard} failed")
+        result_queue.put(("error", None, traceback.format_exc()))
+        return
+    finally:
+        if monitor.tick_filter is not None:
+            monitor.tick_filter.close()
+
+    result_queue.put(("done", shard, None))
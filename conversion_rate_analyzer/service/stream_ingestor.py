@@ -0,0 +1,273 @@
+import asyncio
+import os
+from array import array
+from typing import List, Optional, Set
+
+from jsonlines import InvalidLineError
+from loguru import logger
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.tick import TickBatch
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.exceptions import TickValidationError
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+
+READ_CHUNK_SIZE = 64 * 1024
+# longest line kept while waiting for its end: longer lines are dropped, so a producer without newlines
+# cannot grow the buffer of its connection without bound
+MAX_LINE_SIZE = 1 << 20
+
+
+class StreamIngestor:
+    """Asyncio front end feeding a continuous stream of conversion rates to the MovingAverageMonitor.
+
+    Data points can be received from TCP or Unix socket clients sending jsonlines, or by tailing a growing
+    jsonlines file. Each source decodes the lines it reads into columnar chunks and puts them into a bounded
+    queue. When the queue is full the sources stop reading, which applies backpressure to the producers
+    (TCP flow control for sockets), so memory use stays bounded.
+
+    A single consumer merges the chunks into micro-batches of up to `batch_size` data points,
+    or whatever has arrived within `max_delay` seconds, and passes them to MovingAverageMonitor.process_batch.
+
+    Invalid lines, and lines longer than MAX_LINE_SIZE bytes, are logged and skipped, so that a bad producer
+    does not stop the stream.
+
+    Example:
+        ingestor = StreamIngestor(monitor)
+        await ingestor.serve_tcp("127.0.0.1", 9000)
+        await ingestor.run()
+    """
+
+    def __init__(
+            self,
+            monitor: MovingAverageMonitor,
+            batch_size: int = None,
+            max_delay: float = 0.05,
+            max_pending_chunks: int = 64
+    ):
+        self.monitor = monitor
+        self.batch_size = batch_size or config.BATCH_SIZE
+        self.max_delay = max_delay
+        self.max_pending_chunks = max_pending_chunks
+        self.data_points_processed = 0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._servers: List[asyncio.AbstractServer] = []
+        self._connections: Set[asyncio.Task] = set()
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        self._create_loop_state()
+        return self._queue
+
+    @property
+    def stopped(self) -> asyncio.Event:
+        self._create_loop_state()
+        return self._stopped
+
+    def _create_loop_state(self):
+        # created lazily so that the queue and event are bound to the running event loop
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending_chunks)
+            self._stopped = asyncio.Event()
+
+    async def serve_tcp(self, host: str, port: int) -> asyncio.AbstractServer:
+        server = await asyncio.start_server(self._handle_connection, host, port, limit=READ_CHUNK_SIZE)
+        self._servers.append(server)
+        logger.info(f"Listening for conversion rates on tcp://{host}:{port}.")
+        return server
+
+    async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+        server = await asyncio.start_unix_server(self._handle_connection, path, limit=READ_CHUNK_SIZE)
+        self._servers.append(server)
+        logger.info(f"Listening for conversion rates on unix://{path}.")
+        return server
+
+    async def tail_file(self, path: str, poll_interval: float = 0.1):
+        """Reads the file from the start and keeps following new lines appended to it until stopped."""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"The input file does not exist: {path}")
+
+        logger.info(f"Tailing conversion rates from {path}.")
+        decoder = _LineDecoder(source=path)
+        with open(path, "rb") as f:
+            while not self.stopped.is_set():
+                data = f.read(READ_CHUNK_SIZE)
+                if not data:
+                    await asyncio.sleep(poll_interval)
+                    continue
+                await self._put(decoder.feed(data))
+
+    async def run(self):
+        """Consumes micro-batches until stop() is called and all the pending chunks have been processed."""
+        queue, stopped = self.queue, self.stopped
+        while not (stopped.is_set() and queue.empty()):
+            try:
+                chunk = await asyncio.wait_for(queue.get(), timeout=self.max_delay)
+            except asyncio.TimeoutError:
+                continue
+
+            batch = chunk
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            while batch.size < self.batch_size:
+                try:
+                    chunk = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - asyncio.get_running_loop().time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        chunk = await asyncio.wait_for(queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                batch.timestamps.extend(chunk.timestamps)
+                batch.currency_pairs.extend(chunk.currency_pairs)
+                batch.rates.extend(chunk.rates)
+
+            self.monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+            self.data_points_processed += batch.size
+
+        # the handlers of open connections may be blocked reading, and wait_closed waits for them on Python 3.12+
+        for server in self._servers:
+            server.close()
+        for connection in self._connections:
+            connection.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+
+    def stop(self):
+        self.stopped.set()
+
+    async def _put(self, chunk: TickBatch):
+        if chunk.size:
+            await self.queue.put(chunk)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername") or writer.get_extra_info("sockname")
+        decoder = _LineDecoder(source=str(peer))
+        connection = asyncio.current_task()
+        self._connections.add(connection)
+        try:
+            while not self.stopped.is_set():
+                data = await reader.read(READ_CHUNK_SIZE)
+                if not data:
+                    break
+                await self._put(decoder.feed(data))
+            await self._put(decoder.flush())
+        finally:
+            self._connections.discard(connection)
+            writer.close()
+
+
+class _LineDecoder:
+    """Splits a byte stream into jsonlines and decodes complete lines into a columnar chunk.
+
+    The fragments of an incomplete line are kept in a list, and joined once its end arrives, so a long line
+    is not copied on every read. Once the fragments exceed `max_line_size` bytes, they are dropped,
+    and so is the rest of the line.
+    """
+
+    def __init__(self, source: str, max_line_size: int = MAX_LINE_SIZE):
+        self.source = source
+        self.max_line_size = max_line_size
+        self.pending: List[bytes] = []
+        self.pending_size = 0
+        self.discarding = False
+        self.lineno = 0
+        self.oversized_lines = 0
+
+    def feed(self, data: bytes) -> TickBatch:
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._keep(data)
+            return self._decode([])
+
+        lines = data[:end].split(b"\n")
+        if self.discarding:
+            # the end of an oversized line
+            self.discarding = False
+            self.lineno += 1
+            self._skip_oversized()
+            lines = lines[1:]
+        elif self.pending:
+            lines[0] = b"".join(self.pending) + lines[0]
+        self.pending, self.pending_size = [], 0
+        self._keep(data[end + 1:])
+        return self._decode(lines)
+
+    def flush(self) -> TickBatch:
+        if self.discarding:
+            self.discarding = False
+            self.lineno += 1
+            self._skip_oversized()
+            return self._decode([])
+        lines = [b"".join(self.pending)]
+        self.pending, self.pending_size = [], 0
+        return self._decode(lines)
+
+    def _keep(self, fragment: bytes):
+        if self.discarding or not fragment:
+            return
+        self.pending.append(fragment)
+        self.pending_size += len(fragment)
+        if self.pending_size > self.max_line_size:
+            self.pending, self.pending_size = [], 0
+            self.discarding = True
+
+    def _skip_oversized(self):
+        self.oversized_lines += 1
+        logger.warning(f"Line {self.lineno} is longer than {self.max_line_size} bytes and was skipped. Source: {self.source}")
+
+    def _decode(self, lines: List[bytes]) -> TickBatch:
+        chunk = TickBatch(array("d"), [], array("d"))
+        for line in lines:
+            self.lineno += 1
+            if len(line) > self.max_line_size:
+                self._skip_oversized()
+                continue
+            if not line.strip():
+                continue
+            try:
+                timestamp, currency_pair, rate = SpotRateReader.decode_line(line, self.lineno)
+            except TickValidationError as e:
+                logger.warning(e)
+                continue
+            except InvalidLineError as e:
+                logger.error(f"{e} Source: {self.source}")
+                continue
+            chunk.timestamps.append(timestamp)
+            chunk.currency_pairs.append(currency_pair)
+            chunk.rates.append(rate)
+        return chunk
+
+
+async def stream(uri: str, monitor: MovingAverageMonitor, ingestor: StreamIngestor = None) -> StreamIngestor:
+    """Runs a StreamIngestor for `tcp://host:port`, `unix:///path/to.sock`, or a file path to tail, until cancelled.
+
+    The ingestor can be passed by the caller, to read `data_points_processed` even if the stream is interrupted.
+    """
+    ingestor = ingestor or StreamIngestor(monitor)
+
+    if uri.startswith("tcp://"):
+        host, _, port = uri[len("tcp://"):].rpartition(":")
+        await ingestor.serve_tcp(host, int(port))
+        source = None
+    elif uri.startswith("unix://"):
+        await ingestor.serve_unix(uri[len("unix://"):])
+        source = None
+    else:
+        if not os.path.exists(uri):
+            raise FileNotFoundError(f"The input file does not exist: {uri}")
+        source = asyncio.ensure_future(ingestor.tail_file(uri))
+        source.add_done_callback(lambda _: ingestor.stop())
+
+    try:
+        await ingestor.run()
+    finally:
+        ingestor.stop()
+        if source:
+            source.cancel()
+
+    return ingestor
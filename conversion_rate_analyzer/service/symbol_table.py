@@ -0,0 +1,80 @@
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SymbolTable:
+    """Interns currency pair symbols and maps each one to a dense integer ID, in order of first appearance.
+
+    The IDs index the flat per-pair state arrays of MovingAverageMonitor, so a data point costs
+    a single dict lookup on its symbol, and the readers can emit IDs instead of keeping a string per data point.
+
+    Six letter symbols such as "AUDUSD" are also decomposed into base and quote currencies, which are interned
+    in a second table of currency IDs (-1 for symbols that are not two ISO currency codes).
+
+    Example:
+        symbols = SymbolTable()
+        symbols.intern("AUDUSD")  # 0
+        symbols.intern("USDJPY")  # 1
+        symbols.currency_ids(1)   # (1, 2), the IDs of "USD" and "JPY"
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.currency_table: Dict[str, int] = {}
+        self.currencies: List[str] = []
+        self.base_ids = array("q")
+        self.quote_ids = array("q")
+        self._symbol_array: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.ids
+
+    def get(self, symbol: str) -> Optional[int]:
+        return self.ids.get(symbol)
+
+    def intern(self, symbol: str) -> int:
+        """Returns the ID of the symbol, assigning the next ID if it is new."""
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+            base, quote = (symbol[:3], symbol[3:]) if len(symbol) == 6 and symbol.isalpha() else (None, None)
+            self.base_ids.append(self._intern_currency(base))
+            self.quote_ids.append(self._intern_currency(quote))
+            self._symbol_array = None
+        return symbol_id
+
+    def intern_many(self, symbols: Sequence[str]) -> np.ndarray:
+        """Returns the IDs of a column of symbols as an int64 array."""
+        ids, intern = self.ids, self.intern
+        return np.fromiter((ids[symbol] if symbol in ids else intern(symbol) for symbol in symbols), dtype=np.int64, count=len(symbols))
+
+    def symbol(self, symbol_id: int) -> str:
+        return self.symbols[symbol_id]
+
+    def symbol_array(self) -> np.ndarray:
+        """Returns the symbols as an object array indexed by ID, for mapping an array of IDs back to symbols."""
+        if self._symbol_array is None:
+            self._symbol_array = np.array(self.symbols, dtype=object)
+        return self._symbol_array
+
+    def currency_ids(self, symbol_id: int) -> Tuple[int, int]:
+        """Returns the (base, quote) currency IDs of the symbol."""
+        return self.base_ids[symbol_id], self.quote_ids[symbol_id]
+
+    def _intern_currency(self, currency: Optional[str]) -> int:
+        if currency is None:
+            return -1
+        currency_id = self.currency_table.get(currency)
+        if currency_id is None:
+            currency_id = len(self.currencies)
+            self.currency_table[currency] = currency_id
+            self.currencies.append(currency)
+        return currency_id
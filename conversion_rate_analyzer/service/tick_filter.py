@@ -0,0 +1,149 @@
+import json
+import math
+import os
+from array import array
+from typing import List, Optional
+
+import numpy as np
+from loguru import logger
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.metrics import metrics
+
+
+class TickFilter:
+    """Drops duplicate and late data points before they reach the windows of MovingAverageMonitor.
+
+    Upstream retries deliver the same data point more than once. A data point is a duplicate if its pair already
+    received a data point with the same timestamp among its last `capacity` data points. The recent timestamps
+    of each pair are kept in an insertion-ordered dict used as a bounded set, so each check is O(1).
+
+    With `max_delay`, a data point more than `max_delay` seconds behind the latest data point of its pair is late.
+    Late data points are not applied to the window, and are appended to the `late_output` jsonlines file, if any,
+    in the input format, so that they can be inspected or replayed.
+
+    Duplicates and late data points are counted in `duplicates` and `late`, and in the metrics.
+
+    Example:
+        tick_filter = TickFilter(symbols, deduplicate=True, max_delay=60)
+        tick_filter.admit(pair_id, timestamp, rate)  # False for duplicate or late data points
+
+    Throws:
+        ValueError: The capacity or the maximum delay is not positive.
+    """
+
+    def __init__(
+            self,
+            symbols: SymbolTable,
+            deduplicate: bool = True,
+            capacity: int = 1024,
+            max_delay: float = None,
+            late_output: str = None,
+    ):
+        if capacity < 1 or (max_delay is not None and max_delay <= 0):
+            raise ValueError(f"Capacity and maximum delay must be positive: {capacity}, {max_delay}")
+
+        self.symbols = symbols
+        self.deduplicate = deduplicate
+        self.capacity = capacity
+        self.max_delay = max_delay
+        self.late_output = late_output
+        self.late_file = None
+
+        # latest timestamp and recent timestamps of each pair ID
+        self.latest = array("d")
+        self.recent: List[dict] = []
+
+        self.duplicates = 0
+        self.late = 0
+
+    @classmethod
+    def from_config(cls, symbols: SymbolTable) -> Optional["TickFilter"]:
+        """Returns the filter configured by DEDUPLICATE and MAX_TICK_DELAY, or None if neither is set."""
+        if not config.DEDUPLICATE and config.MAX_TICK_DELAY is None:
+            return None
+        return cls(symbols, config.DEDUPLICATE, config.DEDUP_CAPACITY, config.MAX_TICK_DELAY, config.LATE_OUTPUT_FILE)
+
+    def admit(self, pair_id: int, timestamp: float, rate: float) -> bool:
+        """Returns whether the data point should be applied, recording it as seen if so."""
+        if pair_id >= len(self.latest):
+            self._allocate(pair_id)
+
+        latest = self.latest[pair_id]
+        if self.max_delay is not None and timestamp < latest - self.max_delay:
+            self._route_late(pair_id, timestamp, rate)
+            return False
+
+        if self.deduplicate:
+            recent = self.recent[pair_id]
+            if timestamp in recent:
+                self.duplicates += 1
+                if metrics.enabled:
+                    metrics.duplicate_data_points.inc()
+                return False
+            recent[timestamp] = None
+            if len(recent) > self.capacity:
+                del recent[next(iter(recent))]
+
+        if timestamp > latest:
+            self.latest[pair_id] = timestamp
+        return True
+
+    def admit_batch(self, timestamps: np.ndarray, pair_ids: np.ndarray, rates: np.ndarray) -> Optional[np.ndarray]:
+        """Applies `admit` to every data point in order. Returns the boolean mask of the admitted data points,
+        or None if all of them are admitted."""
+        if len(pair_ids) and int(pair_ids.max()) >= len(self.latest):
+            self._allocate(int(pair_ids.max()))
+
+        admit = self.admit
+        mask = [admit(pair_id, timestamp, rate) for timestamp, pair_id, rate in zip(
+            timestamps.tolist(), pair_ids.tolist(), rates.tolist()
+        )]
+        return None if all(mask) else np.array(mask, dtype=bool)
+
+    def snapshot_state(self) -> dict:
+        """Captures the latest and recent timestamps of every pair seen, for MovingAverageMonitor.snapshot_state."""
+        pair_ids = [pair_id for pair_id, latest in enumerate(self.latest) if latest != -math.inf]
+        return {
+            "currency_pairs": [self.symbols.symbol(pair_id) for pair_id in pair_ids],
+            "latest": [self.latest[pair_id] for pair_id in pair_ids],
+            "recent": [list(self.recent[pair_id]) for pair_id in pair_ids],
+        }
+
+    def restore_state(self, state: dict):
+        """Restores a state captured by `snapshot_state`."""
+        for currency_pair, latest, recent in zip(state["currency_pairs"], state["latest"], state["recent"]):
+            pair_id = self.symbols.intern(currency_pair)
+            if pair_id >= len(self.latest):
+                self._allocate(pair_id)
+            self.latest[pair_id] = latest
+            self.recent[pair_id] = dict.fromkeys(recent[-self.capacity:])
+
+    def close(self):
+        if self.duplicates or self.late:
+            logger.info(f"Dropped {self.duplicates} duplicate and {self.late} late data points.")
+        if self.late_file is not None:
+            self.late_file.close()
+            self.late_file = None
+
+    def _allocate(self, pair_id: int):
+        new_pairs = pair_id + 1 - len(self.latest)
+        self.latest.extend(array("d", [-math.inf]) * new_pairs)
+        self.recent.extend({} for _ in range(new_pairs))
+
+    def _route_late(self, pair_id: int, timestamp: float, rate: float):
+        self.late += 1
+        if metrics.enabled:
+            metrics.late_data_points_routed.inc()
+
+        currency_pair = self.symbols.symbol(pair_id)
+        logger.debug(f"Routed late data point of {currency_pair} at {timestamp} (latest: {self.latest[pair_id]})")
+        if self.late_output is None:
+            return
+
+        if self.late_file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.late_output)), exist_ok=True)
+            # line buffered, so that the late data points can be inspected while the input is processed
+            self.late_file = open(self.late_output, "a", buffering=1)
+        self.late_file.write(json.dumps({"timestamp": timestamp, "currencyPair": currency_pair, "rate": rate}) + "\n")
@@ -0,0 +1,123 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.alert_block import AlertBlock
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.metrics import metrics
+
+
+class TriangulationEngine:
+    """Checks every data point against the cross rates of the other currency pairs.
+
+    The feed carries every ordered pair of currencies, so the rate of A→C can be implied through any other
+    currency B as A→B·B→C. The latest rate of each pair is kept in a dense matrix indexed by the base and quote
+    currency IDs of the SymbolTable, and a new rate of A→C is only compared with the paths through row A and
+    column C of the matrix: an O(n) vectorized check per data point, rather than recomputing all O(n³) triangles.
+
+    A rate is inconsistent if it deviates from the implied rate by more than `tolerance` for the majority of the
+    paths with both legs known, and there are at least `min_paths` of them. Requiring a majority keeps a single
+    bad leg from condemning the rates around it. The reference rate of an inconsistency is the median implied rate.
+
+    Every rate is recorded in the matrix, consistent or not, so that a genuine move of a currency is only flagged
+    on its first data points, until most of its crosses have caught up. Pairs whose symbol is not two currency codes
+    are not checked.
+
+    Example:
+        engine = TriangulationEngine(symbols, tolerance=0.01)
+        engine.check(symbols.intern("AUDJPY"), 80.0)  # (implied rate, deviation) if inconsistent, else None
+
+    Throws:
+        ValueError: The tolerance or the minimum number of paths is not positive.
+    """
+
+    alert = "crossRateMismatch"
+
+    def __init__(self, symbols: SymbolTable, tolerance: float, min_paths: int = 1):
+        if tolerance <= 0 or min_paths < 1:
+            raise ValueError(f"Tolerance and minimum paths must be positive: {tolerance}, {min_paths}")
+
+        self.symbols = symbols
+        self.tolerance = tolerance
+        self.min_paths = min_paths
+
+        # latest rate from the base currency (row) to the quote currency (column), NaN if not seen yet
+        self.rates = np.full((0, 0), math.nan)
+
+        self.checks = 0
+        self.inconsistencies = 0
+
+    @classmethod
+    def from_config(cls, symbols: SymbolTable) -> Optional["TriangulationEngine"]:
+        """Returns the engine configured by TRIANGULATION_TOLERANCE and TRIANGULATION_MIN_PATHS, or None if not set."""
+        if config.TRIANGULATION_TOLERANCE is None:
+            return None
+        return cls(symbols, config.TRIANGULATION_TOLERANCE, config.TRIANGULATION_MIN_PATHS)
+
+    def check(self, pair_id: int, rate: float) -> Optional[Tuple[float, float]]:
+        """Records the rate of the pair. Returns (implied rate, deviation) if it is inconsistent, else None."""
+        base, quote = self.symbols.base_ids[pair_id], self.symbols.quote_ids[pair_id]
+        if base < 0 or base == quote:
+            return None
+        if max(base, quote) >= len(self.rates):
+            self._grow(len(self.symbols.currencies))
+
+        matrix = self.rates
+        matrix[base, quote] = rate
+        self.checks += 1
+
+        # NaN for unknown legs, including the diagonal, so that B == A and B == C are not paths
+        implied = matrix[base] * matrix[:, quote]
+        paths = len(implied) - np.count_nonzero(np.isnan(implied))
+        if paths < self.min_paths:
+            return None
+
+        # NaN deviations compare as False, so only the known paths are counted
+        deviating = np.count_nonzero(np.abs(rate / implied - 1.0) > self.tolerance)
+        if 2 * deviating <= paths:
+            return None
+
+        self.inconsistencies += 1
+        if metrics.enabled:
+            metrics.cross_rate_mismatches.inc()
+        reference_rate = float(np.median(implied[~np.isnan(implied)]))
+        return reference_rate, rate / reference_rate - 1.0
+
+    def check_batch(self, timestamps: np.ndarray, pair_ids: np.ndarray, rates: np.ndarray) -> Tuple[Optional[np.ndarray], AlertBlock]:
+        """Applies `check` to every data point in order.
+
+        Returns the boolean mask of the consistent data points, or None if all of them are consistent,
+        and the inconsistencies as an AlertBlock whose indices are positions in the given arrays.
+        """
+        check = self.check
+        rows, reference_rates, deviations = [], [], []
+        for i, (pair_id, rate) in enumerate(zip(pair_ids.tolist(), rates.tolist())):
+            inconsistency = check(pair_id, rate)
+            if inconsistency is not None:
+                rows.append(i)
+                reference_rates.append(inconsistency[0])
+                deviations.append(inconsistency[1])
+
+        if not rows:
+            return None, AlertBlock.empty()
+
+        rows = np.array(rows, dtype=np.int64)
+        consistent = np.ones(len(pair_ids), dtype=bool)
+        consistent[rows] = False
+        return consistent, AlertBlock(
+            timestamps=timestamps[rows],
+            currency_pairs=self.symbols.symbol_array()[pair_ids[rows]],
+            rates=rates[rows],
+            average_rates=np.array(reference_rates),
+            pct_changes=np.array(deviations),
+            indices=rows,
+            alert_types=np.full(len(rows), self.alert, dtype=object),
+        )
+
+    def _grow(self, currencies: int):
+        size = max(currencies, 2 * len(self.rates))
+        matrix = np.full((size, size), math.nan)
+        matrix[:len(self.rates), :len(self.rates)] = self.rates
+        self.rates = matrix
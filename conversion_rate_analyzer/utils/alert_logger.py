@@ -0,0 +1,135 @@
+import itertools
+import time
+from typing import Dict, List, Tuple
+
+from loguru import logger
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.alert_block import SPOT_CHANGE, AlertBlock
+from conversion_rate_analyzer.utils.metrics import metrics
+
+COMPACT_TEMPLATE = "alert={alert} pair={currency_pair} rate={rate:.6f} reference={reference_rate:.6f} score={score:.6g}"
+
+# message templates by (ALERT_LOG_FORMAT, spot change alert), formatted by loguru only if the level is enabled
+TEMPLATES = {
+    ("verbose", True): (
+        "Significant rate change (>= {threshold}) recorded."
+        "\n\tCurrency pair : {currency_pair}"
+        "\n\tAverage rate  : {reference_rate:.6f}"
+        "\n\tNew spot rate : {rate:.6f}"
+        "\n\tPercent change: {percent:.2f}%"
+    ),
+    ("verbose", False): (
+        "Alert {alert} recorded."
+        "\n\tCurrency pair : {currency_pair}"
+        "\n\tReference rate: {reference_rate:.6f}"
+        "\n\tNew spot rate : {rate:.6f}"
+        "\n\tScore         : {score:.4f}"
+    ),
+    ("compact", True): COMPACT_TEMPLATE,
+    ("compact", False): COMPACT_TEMPLATE,
+}
+SUPPRESSED_SUFFIX = {
+    "verbose": "\n\tSuppressed    : {suppressed} earlier alerts of this pair",
+    "compact": " suppressed={suppressed}",
+}
+
+
+class AlertLogger:
+    """Logs alerts for humans without making the log I/O part of the alert path.
+
+    The alerts themselves are always written to the output file by the writer; this only controls the log lines:
+    - ALERT_LOG_FORMAT selects the multi-line "verbose" message, a single line "compact" message, or no log (None).
+    - The message is passed to loguru as a template with the alert fields as arguments, so it is only formatted
+      if a sink accepts the INFO level, and the fields are also available in `record["extra"]` for structured
+      (LOG_SERIALIZE) sinks.
+    - With ALERT_LOG_RATE, each currency pair is rate-limited by a token bucket of ALERT_LOG_BURST alerts,
+      refilled at ALERT_LOG_RATE alerts per second. Dropped log lines are counted, and reported with the
+      next log line of the pair.
+    - With LOG_ENQUEUE, the file sink writes from loguru's background thread (see config.py).
+    """
+
+    def __init__(self):
+        # currency pair -> [tokens, last refill time, suppressed alerts]
+        self.buckets: Dict[str, List[float]] = {}
+        self.suppressed = 0
+
+    def log(
+            self,
+            currency_pair: str,
+            reference_rate: float,
+            rate: float,
+            score: float,
+            alert: str = SPOT_CHANGE,
+            debounced: int = 0,
+    ):
+        """Logs an alert. `debounced` is the number of threshold breaches suppressed by AlertDebouncer before it,
+        which are reported together with the log lines suppressed by the rate limit."""
+        log_format = config.ALERT_LOG_FORMAT
+        if not log_format:
+            return
+
+        suppressed = debounced
+        if config.ALERT_LOG_RATE:
+            allowed, rate_limited = self._acquire(currency_pair)
+            if not allowed:
+                return
+            suppressed += rate_limited
+
+        template = TEMPLATES[(log_format, alert == SPOT_CHANGE)]
+        if suppressed:
+            template += SUPPRESSED_SUFFIX[log_format]
+
+        logger.info(
+            template,
+            alert=alert,
+            currency_pair=currency_pair,
+            reference_rate=reference_rate,
+            rate=rate,
+            score=score,
+            percent=score * 100,
+            threshold=config.PCT_CHANGE_THRESHOLD,
+            suppressed=suppressed,
+        )
+
+    def log_block(self, alerts: AlertBlock):
+        if not config.ALERT_LOG_FORMAT:
+            return
+
+        for currency_pair, reference_rate, rate, score, alert, debounced in zip(
+                alerts.currency_pairs.tolist(),
+                alerts.average_rates.tolist(),
+                alerts.rates.tolist(),
+                alerts.pct_changes.tolist(),
+                alerts.alert_types.tolist(),
+                alerts.suppressed.tolist() if alerts.suppressed is not None else itertools.repeat(0),
+        ):
+            self.log(currency_pair, reference_rate, rate, score, alert, debounced)
+
+    def reset(self):
+        self.buckets.clear()
+        self.suppressed = 0
+
+    def _acquire(self, currency_pair: str) -> Tuple[bool, int]:
+        """Takes a token from the bucket of the pair. Returns whether it was available, and the alerts suppressed before."""
+        now = time.monotonic()
+        bucket = self.buckets.get(currency_pair)
+        if bucket is None:
+            bucket = self.buckets[currency_pair] = [config.ALERT_LOG_BURST, now, 0]
+
+        tokens = min(config.ALERT_LOG_BURST, bucket[0] + (now - bucket[1]) * config.ALERT_LOG_RATE)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            bucket[2] += 1
+            self.suppressed += 1
+            if metrics.enabled:
+                metrics.alert_logs_suppressed.inc()
+            return False, 0
+
+        bucket[0] = tokens - 1
+        suppressed, bucket[2] = bucket[2], 0
+        return True, int(suppressed)
+
+
+alert_logger = AlertLogger()
@@ -0,0 +1,194 @@
+import itertools
+import os
+import platform
+import sys
+import tempfile
+import time
+from array import array
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.tick import TickBatch
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.exceptions import TickValidationError
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed, write_feed
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.utils.writer import create_writer
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+BENCHMARK_VERSION = 1
+
+
+def run_benchmark(input_path: str, batch_size: int = None) -> dict:
+    """Benchmarks each stage of the fast path on a jsonlines input file, then the whole path end to end.
+
+    The stages run one after another on the output of the previous stage, held in memory:
+    - read: reading the raw lines of the file,
+    - parse: decoding and validating the lines into columnar batches of interned pair IDs,
+    - update: updating the moving averages and detectors (MovingAverageMonitor.update_batch),
+    - write: writing the alerts to a jsonlines file, where `data_points` and throughput count the alerts,
+    - end_to_end: all of the above interleaved, as main.py does with a fresh monitor.
+
+    Every stage processes the input in batches of `batch_size` data points (BATCH_SIZE by default).
+    Since a data point is only done when its batch is, the per-tick latency of a stage is the latency of
+    its batch; the p50/p99 latencies are computed over the batches. `peak_rss_mb` is the peak resident
+    memory of the process at the end of the stage, so it includes the memory of the previous stages.
+
+    Returns a JSON serializable dict of the results.
+    """
+    batch_size = batch_size or config.BATCH_SIZE
+    stages = {}
+
+    # read
+    line_batches, latencies = [], []
+    start_time = time.perf_counter()
+    with open(input_path, "rb") as f:
+        while True:
+            batch_start = time.perf_counter()
+            lines = list(itertools.islice(f, batch_size))
+            if not lines:
+                break
+            line_batches.append(lines)
+            latencies.append(time.perf_counter() - batch_start)
+    data_points = sum(map(len, line_batches))
+    stages["read"] = _stage_result(data_points, time.perf_counter() - start_time, latencies)
+
+    # parse
+    symbols = SymbolTable()
+    tick_batches, latencies = [], []
+    start_time = time.perf_counter()
+    for lines in line_batches:
+        batch_start = time.perf_counter()
+        tick_batches.append(_parse_lines(lines, symbols))
+        latencies.append(time.perf_counter() - batch_start)
+    stages["parse"] = _stage_result(data_points, time.perf_counter() - start_time, latencies)
+    del line_batches
+
+    # update
+    monitor = MovingAverageMonitor(singleton=False, symbols=symbols)
+    alert_blocks, latencies = [], []
+    start_time = time.perf_counter()
+    for batch in tick_batches:
+        batch_start = time.perf_counter()
+        alert_blocks.append(monitor.update_batch(batch.timestamps, batch.pair_ids, batch.rates))
+        latencies.append(time.perf_counter() - batch_start)
+    stages["update"] = _stage_result(data_points, time.perf_counter() - start_time, latencies)
+    alerts = sum(block.size for block in alert_blocks)
+    del tick_batches, monitor
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # write
+        writer = create_writer(os.path.join(tmp_dir, "write.jsonl"))
+        latencies = []
+        start_time = time.perf_counter()
+        for block in alert_blocks:
+            batch_start = time.perf_counter()
+            if block.size:
+                writer.write_block(block)
+            latencies.append(time.perf_counter() - batch_start)
+        writer.close()
+        stages["write"] = _stage_result(alerts, time.perf_counter() - start_time, latencies)
+        del alert_blocks
+
+        # end to end
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(os.path.join(tmp_dir, "end_to_end.jsonl"))
+        latencies = []
+        start_time = time.perf_counter()
+        batch_start = start_time
+        for batch in SpotRateReader.columnar_reader(input_path, batch_size, symbols=monitor.symbols):
+            monitor.process_batch(batch.timestamps, batch.pair_ids, batch.rates)
+            batch_end = time.perf_counter()
+            latencies.append(batch_end - batch_start)
+            batch_start = batch_end
+        monitor.terminate_writer()
+        stages["end_to_end"] = _stage_result(data_points, time.perf_counter() - start_time, latencies)
+
+    return {
+        "version": BENCHMARK_VERSION,
+        "timestamp": time.time(),
+        "environment": environment(),
+        "input": {"path": input_path, "bytes": os.path.getsize(input_path)},
+        "batch_size": batch_size,
+        "data_points": data_points,
+        "alerts": alerts,
+        "stages": stages,
+    }
+
+
+def run_synthetic_benchmark(
+        currency_count: int = 10,
+        seconds: int = 60,
+        out_of_order: float = 0.0,
+        volatility: float = 0.001,
+        seed: int = 0,
+        batch_size: int = None,
+) -> dict:
+    """Generates a synthetic feed (see feed_generator.synthetic_feed) in a temporary file and benchmarks it."""
+    feed = {
+        "currencies": currency_count,
+        "seconds": seconds,
+        "out_of_order": out_of_order,
+        "volatility": volatility,
+        "seed": seed,
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "feed.jsonl")
+        write_feed(path, synthetic_feed(currency_count, seconds, out_of_order, volatility, seed))
+        results = run_benchmark(path, batch_size)
+
+    results["input"] = dict(feed, bytes=results["input"]["bytes"])
+    return results
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "moving_average_window": config.MOVING_AVERAGE_WINDOW,
+        "window_seconds": config.WINDOW_SECONDS,
+        "detectors": [detector["type"] for detector in config.DETECTORS],
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Returns the peak resident memory of the process so far in MiB, if the platform reports it."""
+    if resource is None:  # pragma: no cover
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _parse_lines(lines: List[bytes], symbols: SymbolTable) -> TickBatch:
+    batch = TickBatch(array("d"), None, array("d"), pair_ids=array("q"))
+    for lineno, line in enumerate(lines, start=1):
+        try:
+            timestamp, currency_pair, rate = SpotRateReader.decode_line(line, lineno)
+        except TickValidationError:
+            continue
+        batch.timestamps.append(timestamp)
+        batch.pair_ids.append(symbols.intern(currency_pair))
+        batch.rates.append(rate)
+    return batch
+
+
+def _stage_result(data_points: int, seconds: float, latencies: List[float]) -> Dict[str, float]:
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "data_points": data_points,
+        "seconds": seconds,
+        "throughput": data_points / seconds if seconds > 0 else 0.0,
+        "latency_p50_us": float(np.percentile(latencies, 50)) * 1e6,
+        "latency_p99_us": float(np.percentile(latencies, 99)) * 1e6,
+        "peak_rss_mb": peak_rss_mb(),
+    }
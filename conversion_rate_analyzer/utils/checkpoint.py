@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from array import array
+from typing import Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.exceptions import SnapshotError
+
+SNAPSHOT_VERSION = 2
+
+
+class Checkpointer:
+    """Periodically saves snapshots of the monitor state, so that a restarted process resumes with warm windows.
+
+    `maybe_checkpoint` is called by the processing loop after each batch, with the input offset just past that batch.
+    When `interval` seconds have passed since the last snapshot, it captures the state of the monitor,
+    which copies the live slice of every window, and hands it over to a background thread that serializes
+    and writes the snapshot. If the previous snapshot is still being written, the new one is skipped
+    instead of stalling the loop.
+
+    Snapshots are written to a temporary file which then replaces the previous snapshot, so a crash never leaves
+    a partial snapshot behind. Alerts raised after the last snapshot are raised again after a restart,
+    as the input is replayed from the offset of the snapshot.
+
+    Example:
+        checkpointer = Checkpointer(monitor, "state.npz")
+        offset = checkpointer.restore()
+        for batch in SpotRateReader.columnar_reader(path, batch_size, offset):
+            monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+            checkpointer.maybe_checkpoint(batch.offset)
+        checkpointer.close(batch.offset)
+    """
+
+    def __init__(self, monitor: MovingAverageMonitor, path: str, interval: float = 60.0):
+        self.monitor = monitor
+        self.path = path
+        self.interval = interval
+        self.last_checkpoint = time.monotonic()
+        self.snapshots_written = 0
+        self.snapshots_skipped = 0
+        self._writer: Optional[threading.Thread] = None
+
+    def restore(self) -> int:
+        """Restores the monitor from the snapshot, if there is one. Returns the input offset to resume from."""
+        if not os.path.exists(self.path):
+            logger.info(f"No snapshot found at {self.path}. Starting with empty windows.")
+            return 0
+
+        start_time = time.perf_counter()
+        state, input_offset = load_snapshot(self.path)
+        self.monitor.restore_state(state)
+        logger.info(
+            f"Restored {len(state['currency_pairs'])} currency pairs from {self.path} "
+            f"in {(time.perf_counter() - start_time) * 1000:.1f} ms. Resuming input at byte offset {input_offset}."
+        )
+        return input_offset
+
+    def maybe_checkpoint(self, input_offset: int) -> bool:
+        """Starts writing a snapshot in the background if one is due. Returns whether it was started."""
+        if time.monotonic() - self.last_checkpoint < self.interval:
+            return False
+
+        return self.checkpoint(input_offset)
+
+    def checkpoint(self, input_offset: int) -> bool:
+        """Captures the state now and writes it in the background, unless the previous snapshot is still being written."""
+        self.last_checkpoint = time.monotonic()
+        if self._writer and self._writer.is_alive():
+            self.snapshots_skipped += 1
+            logger.debug("Previous snapshot is still being written. Skipped snapshot.")
+            return False
+
+        state = self.monitor.snapshot_state()
+        self._writer = threading.Thread(
+            target=self._write, args=(state, input_offset), name="snapshot-writer", daemon=True
+        )
+        self._writer.start()
+        return True
+
+    def close(self, input_offset: int = None):
+        """Waits for the pending snapshot, then writes a final snapshot at `input_offset` if given."""
+        if self._writer:
+            self._writer.join()
+
+        if input_offset is not None:
+            self._write(self.monitor.snapshot_state(), input_offset)
+
+    def _write(self, state: dict, input_offset: int):
+        try:
+            save_snapshot(self.path, state, input_offset)
+            self.snapshots_written += 1
+        except OSError as e:
+            logger.exception(e)
+
+
+def save_snapshot(path: str, state: dict, input_offset: int):
+    """Writes a state captured by MovingAverageMonitor.snapshot_state as an uncompressed .npz file.
+
+    The windows of all the pairs are concatenated into two flat float64 columns,
+    next to the per-pair window lengths, sums, counts, compensations and re-anchoring countdowns.
+    The scalar states of each detector are saved as a (pairs, state size) float64 array, and so are the
+    debouncer states, as (pairs, 4). The recent timestamps of the tick filter are concatenated like the windows.
+    """
+    windows = state["windows"]
+    arrays = {
+        "version": np.int64(SNAPSHOT_VERSION),
+        "input_offset": np.int64(input_offset),
+        "moving_average_window": np.int64(state["moving_average_window"]),
+        "window_seconds": np.float64(state["window_seconds"]),
+        "watermark": np.float64(state["watermark"]),
+        "late_data_points": np.int64(state["late_data_points"]),
+        "currency_pairs": np.array(state["currency_pairs"], dtype=str),
+        "window_lengths": np.array([len(timestamps) for timestamps, _ in windows], dtype=np.int64),
+        "timestamps": np.frombuffer(b"".join(timestamps.tobytes() for timestamps, _ in windows), dtype=np.float64),
+        "rates": np.frombuffer(b"".join(rates.tobytes() for _, rates in windows), dtype=np.float64),
+        "totals": np.array([total for total, _ in state["sum_counts"]], dtype=np.float64),
+        "counts": np.array([count for _, count in state["sum_counts"]], dtype=np.int64),
+        "compensations": np.array(state["compensations"], dtype=np.float64),
+        "reanchor_countdowns": np.array(state["reanchor_countdowns"], dtype=np.int64),
+        "detectors": np.array(state["detectors"], dtype=str),
+    }
+    for i, detector_states in enumerate(state["detector_states"]):
+        if detector_states is not None:
+            arrays[f"detector_states_{i}"] = np.array(detector_states, dtype=np.float64)
+    if state["debouncer_states"] is not None:
+        arrays["debouncer_states"] = np.array(state["debouncer_states"], dtype=np.float64).reshape(-1, 4)
+    if state["pct_changes"] is not None:
+        arrays["pct_changes"] = np.array(state["pct_changes"], dtype=np.float64)
+    tick_filter = state["tick_filter"]
+    if tick_filter is not None:
+        arrays["tick_filter_pairs"] = np.array(tick_filter["currency_pairs"], dtype=str)
+        arrays["tick_filter_latest"] = np.array(tick_filter["latest"], dtype=np.float64)
+        arrays["tick_filter_recent_lengths"] = np.array([len(recent) for recent in tick_filter["recent"]], dtype=np.int64)
+        arrays["tick_filter_recent"] = np.array(
+            [timestamp for recent in tick_filter["recent"] for timestamp in recent], dtype=np.float64
+        )
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Tuple[dict, int]:
+    """Reads a snapshot written by save_snapshot. Returns the state and the input offset.
+
+    Throws:
+        SnapshotError: The file is not a readable snapshot, or was written by another snapshot version.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            arrays = dict(arrays)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Snapshot could not be read: {e}.", path) from e
+
+    if arrays.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version: {arrays.get('version')}.", path)
+
+    boundaries = np.cumsum(arrays["window_lengths"])[:-1]
+    windows = [
+        (array("d", timestamps.tobytes()), array("d", rates.tobytes()))
+        for timestamps, rates in zip(np.split(arrays["timestamps"], boundaries), np.split(arrays["rates"], boundaries))
+    ]
+
+    tick_filter = None
+    if "tick_filter_pairs" in arrays:
+        recent = np.split(arrays["tick_filter_recent"], np.cumsum(arrays["tick_filter_recent_lengths"])[:-1])
+        tick_filter = {
+            "currency_pairs": arrays["tick_filter_pairs"].tolist(),
+            "latest": arrays["tick_filter_latest"].tolist(),
+            "recent": [timestamps.tolist() for timestamps in recent],
+        }
+
+    state = {
+        "moving_average_window": int(arrays["moving_average_window"]),
+        "window_seconds": float(arrays["window_seconds"]),
+        "currency_pairs": arrays["currency_pairs"].tolist(),
+        "windows": windows,
+        "sum_counts": list(zip(arrays["totals"].tolist(), arrays["counts"].tolist())),
+        "compensations": arrays["compensations"].tolist(),
+        "reanchor_countdowns": arrays["reanchor_countdowns"].tolist(),
+        "detectors": arrays["detectors"].tolist(),
+        "detector_states": [
+            arrays[f"detector_states_{i}"].tolist() if f"detector_states_{i}" in arrays else None
+            for i in range(len(arrays["detectors"]))
+        ],
+        "debouncer_states": arrays["debouncer_states"].tolist() if "debouncer_states" in arrays else None,
+        "pct_changes": arrays["pct_changes"].tolist() if "pct_changes" in arrays else None,
+        "tick_filter": tick_filter,
+        "watermark": float(arrays["watermark"]),
+        "late_data_points": int(arrays["late_data_points"]),
+    }
+    return state, int(arrays["input_offset"])
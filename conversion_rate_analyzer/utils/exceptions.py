@@ -10,3 +10,65 @@ class SpotRateWriterError(Exception):
         self.message = f"{message} Output path: {path}"
         self.path = path
         super().__init__(self.message)
+
+
+class TickValidationError(ValueError):
+    """Exception raised when a data point fails validation on the fast decoding path.
+
+    The message follows the layout of pydantic's ValidationError,
+    so that invalid data points are logged the same way in both strict and fast mode.
+
+    Attributes:
+        message: explanation of the error
+        errors: list of (field, error message, error type) tuples
+    """
+
+    def __init__(self, errors: list, model: str = "Tick"):
+        self.errors = errors
+        lines = [f"{len(errors)} validation error{'' if len(errors) == 1 else 's'} for {model}"]
+        for field, msg, error_type in errors:
+            lines.append(f"{field}\n  {msg} (type={error_type})")
+        self.message = "\n".join(lines)
+        super().__init__(self.message)
+
+
+class SnapshotError(Exception):
+    """Exception raised when a snapshot of the monitor state cannot be read or restored.
+
+    Attributes:
+        message: explanation of the error
+        path: path of the snapshot file
+    """
+
+    def __init__(self, message="Exception encountered while restoring a snapshot.", path: str = None):
+        self.message = f"{message} Snapshot path: {path}"
+        self.path = path
+        super().__init__(self.message)
+
+
+class ConfigError(ValueError):
+    """Exception raised when a setting of the runtime configuration is unknown or has an invalid value.
+
+    Attributes:
+        message: explanation of the error
+        source: where the setting comes from (config file path, environment variable or command line)
+    """
+
+    def __init__(self, message="Invalid configuration.", source: str = None):
+        self.message = f"{message} Source: {source}"
+        self.source = source
+        super().__init__(self.message)
+
+
+class TickFileError(Exception):
+    """Exception raised when a binary tick file is invalid or cannot be read.
+
+    Attributes:
+        message: explanation of the error
+        path: path of the tick file
+    """
+
+    def __init__(self, message="Exception encountered while reading a tick file.", path: str = None):
+        self.message = f"{message} Tick file path: {path}"
+        self.path = path
+        super().__init__(self.message)
@@ -0,0 +1,84 @@
+import itertools
+import string
+from typing import Iterator, List
+
+import numpy as np
+
+from conversion_rate_analyzer.models.tick import Tick
+
+# ISO codes used first, then synthetic three letter codes for larger feeds
+ISO_CURRENCIES = [
+    "USD", "EUR", "JPY", "GBP", "AUD", "CAD", "CHF", "CNY", "HKD", "NZD", "SEK", "KRW", "SGD", "NOK", "MXN",
+    "INR", "RUB", "ZAR", "TRY", "BRL", "TWD", "DKK", "PLN", "THB", "IDR", "HUF", "CZK", "ILS", "CLP", "PHP",
+]
+FEED_START = 1554933784.0
+
+
+def currencies(count: int) -> List[str]:
+    """Returns `count` distinct currency codes."""
+    synthetic = ("".join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3))
+    codes = ISO_CURRENCIES[:count]
+    known = set(codes)
+    for code in synthetic:
+        if len(codes) >= count:
+            break
+        if code not in known:
+            codes.append(code)
+    return codes
+
+
+def synthetic_feed(
+        currency_count: int = 10,
+        seconds: int = 60,
+        out_of_order: float = 0.0,
+        volatility: float = 0.001,
+        seed: int = 0,
+        start: float = FEED_START,
+) -> Iterator[Tick]:
+    """Yields a deterministic feed of one data point per second for every pair of `currency_count` currencies.
+
+    Each currency follows a geometric random walk against a common numeraire, with a per second volatility
+    of `volatility`, and the rate of each pair is the ratio of its base and quote currencies.
+    A fraction `out_of_order` of the data points is delayed by up to 5 seconds, so that it arrives after
+    data points with later timestamps. The same arguments always produce the same feed.
+
+    Example:
+        feed = synthetic_feed(currency_count=30, seconds=300, out_of_order=0.01)
+        write_feed("feed.jsonl", feed)
+    """
+    rng = np.random.default_rng(seed)
+    codes = currencies(currency_count)
+    base, quote = np.array(list(itertools.permutations(range(currency_count), 2)), dtype=np.int64).reshape(-1, 2).T
+    pairs = [codes[b] + codes[q] for b, q in zip(base.tolist(), quote.tolist())]
+    values = np.exp(rng.normal(0, 1, currency_count))
+
+    delayed = []
+    for second in range(seconds):
+        values = values * np.exp(rng.normal(0, volatility, currency_count))
+        rates = np.round(values[base] / values[quote], 6)
+        timestamps = np.round(start + second + np.arange(len(pairs)) / max(len(pairs), 1), 3)
+        delays = np.where(rng.random(len(pairs)) < out_of_order, rng.integers(1, 6, len(pairs)), 0)
+
+        # release the data points whose delay ends in this second
+        due = [tick for release, tick in delayed if release <= second]
+        delayed = [(release, tick) for release, tick in delayed if release > second]
+        yield from due
+
+        for timestamp, currency_pair, rate, delay in zip(timestamps.tolist(), pairs, rates.tolist(), delays.tolist()):
+            tick = Tick(timestamp, currency_pair, rate)
+            if delay:
+                delayed.append((second + delay, tick))
+            else:
+                yield tick
+
+    yield from (tick for _, tick in delayed)
+
+
+def write_feed(path: str, feed: Iterator[Tick]) -> int:
+    """Writes the feed as a jsonlines file in the input format. Returns the number of data points written."""
+    count = 0
+    with open(path, "w") as f:
+        for timestamp, currency_pair, rate in feed:
+            f.write(f'{{"timestamp": {timestamp!r}, "currencyPair": "{currency_pair}", "rate": {rate!r}}}\n')
+            count += 1
+    return count
@@ -0,0 +1,347 @@
+import os
+import threading
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# histogram buckets: 2^SUB_BUCKET_BITS linear sub-buckets per power of two of nanoseconds,
+# from 2^MIN_EXPONENT ns (128 ns) to 2^MAX_EXPONENT ns (about 69 s), for a relative error of at most 25%
+SUB_BUCKET_BITS = 2
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MIN_EXPONENT = 7
+MAX_EXPONENT = 36
+BUCKETS = 1 + (MAX_EXPONENT - MIN_EXPONENT) * SUB_BUCKETS
+
+
+def _bucket_upper_bounds() -> List[int]:
+    bounds = [1 << MIN_EXPONENT]
+    for exponent in range(MIN_EXPONENT, MAX_EXPONENT):
+        width = 1 << (exponent - SUB_BUCKET_BITS)
+        bounds.extend((1 << exponent) + (sub + 1) * width for sub in range(SUB_BUCKETS))
+    return bounds
+
+
+BUCKET_UPPER_BOUNDS = _bucket_upper_bounds()
+
+
+class Counter:
+    """Monotonic counter, such as the number of data points processed."""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Dict[str, str] = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self) -> List[tuple]:
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge:
+    """Value read from a function when the metrics are exported, such as the number of currency pairs."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, function: Callable[[], float] = None):
+        self.name = name
+        self.help = help
+        self.labels = {}
+        self.function = function
+
+    def samples(self) -> List[tuple]:
+        return [(self.name, self.labels, self.function())] if self.function else []
+
+
+class Histogram:
+    """HDR-style latency histogram over preallocated log-linear buckets of nanoseconds.
+
+    Recording a value costs a bit length, a shift and an array increment. Values are exported in seconds
+    as a Prometheus histogram, with the upper bound of each bucket as its `le`.
+
+    Example:
+        start = time.perf_counter_ns()
+        ...
+        histogram.record(time.perf_counter_ns() - start)
+        histogram.quantile(0.99)  # in nanoseconds
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Dict[str, str] = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.counts = array("q", bytes(8 * (BUCKETS + 1)))
+        self.count = 0
+        self.total = 0
+
+    def record(self, nanoseconds: int):
+        if nanoseconds < 1 << MIN_EXPONENT:
+            index = 0
+        else:
+            exponent = nanoseconds.bit_length() - 1
+            index = 1 + (exponent - MIN_EXPONENT) * SUB_BUCKETS + ((nanoseconds >> (exponent - SUB_BUCKET_BITS)) & (SUB_BUCKETS - 1))
+            if index > BUCKETS:
+                index = BUCKETS
+        self.counts[index] += 1
+        self.count += 1
+        self.total += nanoseconds
+
+    def quantile(self, q: float) -> float:
+        """Returns the upper bound in nanoseconds of the bucket holding the q-quantile, or nan if empty."""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(BUCKET_UPPER_BOUNDS[index]) if index < BUCKETS else float("inf")
+        return float("inf")  # pragma: no cover
+
+    def samples(self) -> List[tuple]:
+        samples = []
+        cumulative = 0
+        for upper_bound, count in zip(BUCKET_UPPER_BOUNDS, self.counts):
+            cumulative += count
+            samples.append((f"{self.name}_bucket", dict(self.labels, le=repr(upper_bound / 1e9)), cumulative))
+        samples.append((f"{self.name}_bucket", dict(self.labels, le="+Inf"), self.count))
+        samples.append((f"{self.name}_sum", self.labels, self.total / 1e9))
+        samples.append((f"{self.name}_count", self.labels, self.count))
+        return samples
+
+
+class Metrics:
+    """Counters and latency histograms of every stage of the pipeline, exported in the Prometheus text format.
+
+    All the metrics are created up front. The instrumented code checks `metrics.enabled` before reading
+    the clock or touching a metric, so the metrics cost a single attribute check when disabled.
+    The stages are timed per data point where data points are processed one at a time (strict parsing,
+    process_new_rate, write), and per batch on the columnar path (reader, process_batch, write_block).
+
+    Example:
+        metrics.enabled = True
+        metrics.track_monitor(monitor)
+        MetricsServer(9100).start()  # curl localhost:9100/metrics
+    """
+
+    def __init__(self, prefix: str = "rate_analyzer"):
+        self.enabled = False
+        self.prefix = prefix
+        self.registry = []
+
+        self.reader_lines = self._add(Counter(f"{prefix}_reader_lines_total", "Lines read from the input."))
+        self.reader_bytes = self._add(Counter(f"{prefix}_reader_bytes_total", "Bytes read from the input."))
+        self.reader_batch_seconds = self._add(
+            Histogram(f"{prefix}_reader_batch_seconds", "Time to read and decode a columnar batch.")
+        )
+        self.validation_errors = self._add(Counter(
+            f"{prefix}_validation_errors_total", "Data points that failed validation.", {"path": "fast"}
+        ))
+        self.strict_validation_errors = self._add(Counter(
+            f"{prefix}_validation_errors_total", "Data points that failed validation.", {"path": "strict"}
+        ))
+        self.parse_seconds = self._add(
+            Histogram(f"{prefix}_parse_seconds", "Time to validate a data point with the pydantic model.")
+        )
+        self.data_points = self._add(Counter(f"{prefix}_monitor_data_points_total", "Data points processed by the monitor."))
+        self.update_seconds = self._add(
+            Histogram(f"{prefix}_monitor_update_seconds", "Time to process a data point with process_new_rate.")
+        )
+        self.batch_seconds = self._add(
+            Histogram(f"{prefix}_monitor_batch_seconds", "Time to process a batch with process_batch.")
+        )
+        self.alerts_written = self._add(Counter(f"{prefix}_alerts_written_total", "Alerts written to the output."))
+        self.write_seconds = self._add(
+            Histogram(f"{prefix}_writer_write_seconds", "Time to write an alert, or a block of alerts.")
+        )
+        self.alert_logs_suppressed = self._add(
+            Counter(f"{prefix}_alert_logs_suppressed_total", "Alert log lines dropped by ALERT_LOG_RATE.")
+        )
+        self.currency_pairs = self._add(Gauge(f"{prefix}_monitor_currency_pairs", "Currency pairs seen by the monitor."))
+        self.window_data_points = self._add(
+            Gauge(f"{prefix}_monitor_window_data_points", "Data points held in the windows of all currency pairs.")
+        )
+        self.window_depth_max = self._add(
+            Gauge(f"{prefix}_monitor_window_depth_max", "Data points held in the deepest window.")
+        )
+        self.late_data_points = self._add(
+            Gauge(f"{prefix}_monitor_late_data_points", "Data points dropped for arriving too late.")
+        )
+        self.pairs_evicted_ttl = self._add(Counter(
+            f"{prefix}_monitor_pairs_evicted_total", "Currency pairs evicted by the memory governor.", {"reason": "ttl"}
+        ))
+        self.pairs_evicted_budget = self._add(Counter(
+            f"{prefix}_monitor_pairs_evicted_total", "Currency pairs evicted by the memory governor.", {"reason": "budget"}
+        ))
+        self.pairs_reloaded = self._add(
+            Counter(f"{prefix}_monitor_pairs_reloaded_total", "Evicted currency pairs reloaded from the spill store.")
+        )
+        self.duplicate_data_points = self._add(Counter(
+            f"{prefix}_filter_data_points_dropped_total", "Data points dropped before the monitor.", {"reason": "duplicate"}
+        ))
+        self.late_data_points_routed = self._add(Counter(
+            f"{prefix}_filter_data_points_dropped_total", "Data points dropped before the monitor.", {"reason": "late"}
+        ))
+        self.cross_rate_mismatches = self._add(Counter(
+            f"{prefix}_triangulation_mismatches_total", "Data points inconsistent with the cross rates of other pairs."
+        ))
+        self.breaches_suppressed = self._add(Counter(
+            f"{prefix}_alert_breaches_suppressed_total", "Threshold breaches suppressed by the alert debouncer."
+        ))
+        self.memory_bytes = self._add(
+            Gauge(f"{prefix}_monitor_memory_bytes", "Estimated bytes held by the state of the currency pairs.")
+        )
+        self.spilled_pairs = self._add(Gauge(f"{prefix}_monitor_spilled_pairs", "Currency pairs held in the spill store."))
+        self.spilled_bytes = self._add(
+            Gauge(f"{prefix}_monitor_spilled_bytes", "Bytes of the states held in the spill store.")
+        )
+
+    def track_monitor(self, monitor):
+        """Exports the window depths of the MovingAverageMonitor, read when the metrics are exported."""
+        self.currency_pairs.function = lambda: len(monitor.get_known_currency_pairs())
+        self.window_data_points.function = lambda: sum(monitor.counts)
+        self.window_depth_max.function = lambda: max(monitor.counts, default=0)
+        self.late_data_points.function = lambda: monitor.late_data_points
+        self.memory_bytes.function = monitor.memory_bytes
+        governor = monitor.governor
+        if governor is not None and governor.store is not None:
+            self.spilled_pairs.function = lambda: len(governor.store)
+            self.spilled_bytes.function = governor.spilled_bytes
+
+    def sink_counters(self, sink: str) -> Tuple[Counter, Counter, Counter]:
+        """Creates the counters of the lines written, bytes written and lines dropped by an output sink,
+        replacing those of a previous sink of the same name."""
+        labels = {"sink": sink}
+        self.registry = [
+            metric for metric in self.registry
+            if not (metric.name.startswith(f"{self.prefix}_sink_") and metric.labels == labels)
+        ]
+        return (
+            self._add(Counter(f"{self.prefix}_sink_lines_total", "Alert lines written by each output sink.", labels)),
+            self._add(Counter(f"{self.prefix}_sink_bytes_total", "Alert bytes written by each output sink.", labels)),
+            self._add(Counter(
+                f"{self.prefix}_sink_lines_dropped_total", "Alert lines dropped by each output sink.", labels
+            )),
+        )
+
+    def render(self) -> str:
+        """Returns a snapshot of all the metrics in the Prometheus text exposition format."""
+        # the samples of each metric name are grouped under a single HELP and TYPE
+        families: Dict[str, list] = {}
+        for metric in self.registry:
+            families.setdefault(metric.name, []).append(metric)
+
+        lines = []
+        for name, family in families.items():
+            lines.append(f"# HELP {name} {family[0].help}")
+            lines.append(f"# TYPE {name} {family[0].type}")
+            for metric in family:
+                lines.extend(self._render_samples(metric))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_samples(metric) -> List[str]:
+        lines = []
+        for name, labels, value in metric.samples():
+            if labels:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+        return lines
+
+    def reset(self):
+        for metric in self.registry:
+            if isinstance(metric, Counter):
+                metric.value = 0
+            elif isinstance(metric, Histogram):
+                metric.counts = array("q", bytes(8 * (BUCKETS + 1)))
+                metric.count = metric.total = 0
+            else:
+                metric.function = None
+
+    def _add(self, metric):
+        self.registry.append(metric)
+        return metric
+
+
+metrics = Metrics()
+
+
+class MetricsServer:
+    """Serves `metrics.render()` at http://host:port/metrics from a daemon thread."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: Metrics = metrics):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        render = registry.render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Metrics request from {self.client_address[0]}: {format % args}")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        logger.info(f"Serving metrics at http://{self.server.server_address[0]}:{self.port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class MetricsDumper:
+    """Writes `metrics.render()` to a file every `interval` seconds from a daemon thread, and once more on stop().
+
+    Each dump replaces the file atomically, so it can be read at any time, for example by the
+    textfile collector of the Prometheus node exporter.
+    """
+
+    def __init__(self, path: str, interval: float = 10.0, registry: Metrics = metrics):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._dump_periodically, name="metrics-dumper", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.dump()
+
+    def dump(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                f.write(self.registry.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.exception(e)
+
+    def _dump_periodically(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
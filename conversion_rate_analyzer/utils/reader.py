@@ -1,16 +1,97 @@
+import gzip
+import io
+import json
+import multiprocessing as mp
 import os
+import time
+from array import array
+from collections import deque
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
 
 import jsonlines
+from jsonlines import InvalidLineError
 from jsonlines.jsonlines import Reader
 from loguru import logger
 
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.tick import Tick, TickBatch
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.exceptions import TickValidationError
+from conversion_rate_analyzer.utils.metrics import metrics
+
+# use the fastest available JSON decoder, falling back to the standard library
+try:
+    import orjson
+
+    json_loads = orjson.loads
+    JSON_DECODE_ERRORS = (ValueError,)
+except ImportError:
+    try:
+        import msgspec
+
+        json_loads = msgspec.json.decode
+        JSON_DECODE_ERRORS = (ValueError, msgspec.DecodeError)
+    except ImportError:
+        json_loads = json.loads
+        JSON_DECODE_ERRORS = (ValueError,)
+
+# zstandard is optional, and only needed for zstd compressed inputs
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """Returns "gzip" or "zstd" for compressed files, by their magic bytes or else their extension, or None."""
+    with open(path, "rb") as f:
+        magic = f.read(len(ZSTD_MAGIC))
+    if magic.startswith(GZIP_MAGIC) or (not magic and path.endswith(".gz")):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC) or (not magic and path.endswith(".zst")):
+        return "zstd"
+    return None
+
+
+def open_input(path: str) -> BinaryIO:
+    """Opens the input file for reading bytes, decompressing gzip and zstd files as they are read.
+
+    Throws:
+        FileNotFoundError
+        ImportError: the file is zstd compressed, and the zstandard package is not installed.
+    """
+    compression = detect_compression(path)
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError(f"Reading zstd compressed input requires the zstandard package: {path}")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
 
 @logger.catch
 class SpotRateReader:
     """Class for reading jsonlines file.
 
+    `jsonlines_reader` returns the raw objects, which are validated with the pydantic model (strict mode).
+    `tick_reader` and `columnar_reader` are the fast path for trusted feeds: lines are decoded with
+    orjson or msgspec when installed, and validated with the cheap checks of `Tick.parse_obj`.
+    `tick_file_reader` reads binary tick files converted from jsonlines, without decoding or validation.
+
+    gzip and zstd compressed files (by magic bytes or extension) are decompressed as they are read,
+    and byte offsets then refer to the decompressed stream. Uncompressed files can also be read by
+    `columnar_reader` with several worker processes, each decoding chunks of the file.
+    Data points that fail validation are logged as warnings and skipped.
+
     Throws:
         FileNotFoundError
+        InvalidLineError: a line of the input file is not valid json.
     """
 
     @staticmethod
@@ -20,4 +101,268 @@ class SpotRateReader:
         if not os.path.exists(path):
             raise FileNotFoundError(f"The input file does not exist: {path}")
 
+        if detect_compression(path):
+            return Reader(open_input(path))
         return jsonlines.open(path)
+
+    @staticmethod
+    def tick_reader(path: str) -> Iterator[Tick]:
+        """Yields a validated Tick for each line of the jsonlines file."""
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"The input file does not exist: {path}")
+
+        return SpotRateReader._decode_ticks(path)
+
+    @staticmethod
+    def columnar_reader(
+            path: str, batch_size: int, offset: int = 0, symbols: Optional[SymbolTable] = None, workers: int = 1
+    ) -> Iterator[TickBatch]:
+        """Yields validated data points in columnar batches of up to `batch_size` rows.
+
+        Reading starts at the byte `offset` of the file, such as the offset of a batch recorded in a snapshot.
+        With a symbol table, such as the `symbols` of the monitor, the currency pairs are interned as they are
+        decoded and the batches hold their `pair_ids` instead of `currency_pairs`.
+
+        With more than one worker, an uncompressed file is split at line boundaries into chunks of
+        READER_CHUNK_SIZE bytes, which are decoded by a pool of `workers` processes. The chunks are merged
+        back in file order, and the pairs are interned in the calling process in order of first appearance,
+        so the data points, pair IDs and offsets are the same as when reading sequentially; only the batches
+        are cut at chunk boundaries, and their columns are NumPy arrays.
+        """
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"The input file does not exist: {path}")
+
+        if workers > 1 and detect_compression(path) is None:
+            return SpotRateReader._decode_chunks(path, batch_size, offset, symbols, workers)
+        return SpotRateReader._decode_batches(path, batch_size, offset, symbols)
+
+    @staticmethod
+    def tick_file_reader(
+            path: str, batch_size: int, offset: int = 0, symbols: Optional[SymbolTable] = None
+    ) -> Iterator[TickBatch]:
+        """Yields the data points of a binary tick file in batches of up to `batch_size` rows.
+
+        The file is memory-mapped and the batches are views of it, see TickFile.batches.
+        `offset` and the `offset` of the batches are byte offsets in the file, as with `columnar_reader`.
+        """
+        from conversion_rate_analyzer.utils.tick_file import TickFile
+
+        return TickFile(path).batches(batch_size, offset, symbols)
+
+    @staticmethod
+    def decode_line(line: bytes, lineno: int) -> Tick:
+        """Decodes and validates a single jsonline.
+
+        Throws:
+            InvalidLineError: the line is not valid json.
+            TickValidationError: the data point is invalid.
+        """
+        try:
+            obj = json_loads(line)
+        except JSON_DECODE_ERRORS as e:
+            raise InvalidLineError(f"line contains invalid json: {e}", line, lineno) from e
+
+        return Tick.parse_obj(obj)
+
+    @staticmethod
+    def _decode_ticks(path: str) -> Iterator[Tick]:
+        with open_input(path) as f:
+            for lineno, line in enumerate(f, start=1):
+                try:
+                    yield SpotRateReader.decode_line(line, lineno)
+                except TickValidationError as e:
+                    logger.warning(e)
+                    if metrics.enabled:
+                        metrics.validation_errors.inc()
+
+    @staticmethod
+    def _decode_batches(
+            path: str, batch_size: int, offset: int = 0, symbols: Optional[SymbolTable] = None
+    ) -> Iterator[TickBatch]:
+        batch = SpotRateReader._new_batch(symbols)
+        # start time, line number and offset of the current batch, for the metrics
+        batch_start, batch_lineno, batch_offset = time.perf_counter_ns(), 0, offset
+
+        with open_input(path) as f:
+            if offset:
+                f.seek(offset)
+            for lineno, line in enumerate(f, start=1):
+                try:
+                    timestamp, currency_pair, rate = SpotRateReader.decode_line(line, lineno)
+                except TickValidationError as e:
+                    logger.warning(e)
+                    if metrics.enabled:
+                        metrics.validation_errors.inc()
+                    offset += len(line)
+                    continue
+                except InvalidLineError:
+                    # hand over the data points read so far before raising, as the per-line reader would
+                    if batch.size:
+                        yield batch._replace(offset=offset)
+                    raise
+
+                offset += len(line)
+                batch.timestamps.append(timestamp)
+                if symbols is None:
+                    batch.currency_pairs.append(currency_pair)
+                else:
+                    batch.pair_ids.append(symbols.intern(currency_pair))
+                batch.rates.append(rate)
+                if batch.size >= batch_size:
+                    if metrics.enabled:
+                        SpotRateReader._record_batch(batch_start, lineno - batch_lineno, offset - batch_offset)
+                    yield batch._replace(offset=offset)
+                    batch = SpotRateReader._new_batch(symbols)
+                    batch_start, batch_lineno, batch_offset = time.perf_counter_ns(), lineno, offset
+
+        if batch.size:
+            if metrics.enabled:
+                SpotRateReader._record_batch(batch_start, lineno - batch_lineno, offset - batch_offset)
+            yield batch._replace(offset=offset)
+
+    @staticmethod
+    def _decode_chunks(
+            path: str, batch_size: int, offset: int, symbols: Optional[SymbolTable], workers: int
+    ) -> Iterator[TickBatch]:
+        chunks = SpotRateReader._chunk_boundaries(path, offset, config.READER_CHUNK_SIZE)
+        chunk = next(chunks, None)
+        lineno = 0
+
+        with mp.get_context().Pool(workers) as pool:
+            # a few chunks per worker in flight, so that reading ahead is bounded
+            pending = deque()
+            while chunk is not None or pending:
+                while chunk is not None and len(pending) < 2 * workers:
+                    pending.append(pool.apply_async(_decode_chunk, (path, *chunk)))
+                    chunk = next(chunks, None)
+
+                result = pending.popleft().get()
+                yield from SpotRateReader._chunk_batches(result, batch_size, symbols, lineno)
+                lineno += result.lines
+
+    @staticmethod
+    def _chunk_boundaries(path: str, offset: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+        """Yields the (start, end) byte offsets of chunks of about `chunk_size` bytes, ending at line boundaries."""
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            start = offset
+            while start < size:
+                end = start + chunk_size
+                if end < size:
+                    f.seek(end)
+                    f.readline()
+                    end = f.tell()
+                yield start, min(end, size)
+                start = end
+
+    @staticmethod
+    def _chunk_batches(chunk: "_Chunk", batch_size: int, symbols: Optional[SymbolTable], lineno: int) -> Iterator[TickBatch]:
+        """Yields the data points decoded from a chunk in batches, as the sequential reader would have."""
+        for message in chunk.warnings:
+            logger.warning(message)
+        if metrics.enabled:
+            metrics.validation_errors.inc(len(chunk.warnings))
+            metrics.reader_batch_seconds.record(chunk.decode_ns)
+            metrics.reader_lines.inc(chunk.lines)
+            metrics.reader_bytes.inc(chunk.end - chunk.start)
+
+        timestamps = np.frombuffer(chunk.timestamps, dtype=np.float64)
+        rates = np.frombuffer(chunk.rates, dtype=np.float64)
+        codes = np.frombuffer(chunk.codes, dtype=np.int64)
+        if symbols is None:
+            pair_symbols = chunk.pair_symbols
+            currency_pairs, pair_ids = [pair_symbols[code] for code in codes.tolist()], None
+        else:
+            # the pairs of the chunk are listed in order of first appearance, so they are interned in file order
+            translation = symbols.intern_many(chunk.pair_symbols) if chunk.pair_symbols else codes
+            currency_pairs, pair_ids = None, translation[codes]
+
+        # the last batch of the chunk extends to the end of the chunk, or to the start of the invalid line
+        chunk_end = chunk.end if chunk.invalid is None else chunk.invalid[2]
+        size = len(timestamps)
+        for begin in range(0, size, batch_size):
+            end = min(begin + batch_size, size)
+            yield TickBatch(
+                timestamps[begin:end],
+                currency_pairs[begin:end] if pair_ids is None else None,
+                rates[begin:end],
+                chunk_end if end == size else chunk.ends[end - 1],
+                pair_ids[begin:end] if pair_ids is not None else None,
+            )
+
+        if chunk.invalid is not None:
+            line, chunk_lineno, _ = chunk.invalid
+            # decoding the line again raises the same InvalidLineError as the sequential reader
+            SpotRateReader.decode_line(line, lineno + chunk_lineno)
+
+    @staticmethod
+    def _record_batch(start_time: int, lines: int, size: int):
+        metrics.reader_batch_seconds.record(time.perf_counter_ns() - start_time)
+        metrics.reader_lines.inc(lines)
+        metrics.reader_bytes.inc(size)
+
+    @staticmethod
+    def _new_batch(symbols: Optional[SymbolTable]) -> TickBatch:
+        if symbols is None:
+            return TickBatch(array("d"), [], array("d"))
+        return TickBatch(array("d"), None, array("d"), pair_ids=array("q"))
+
+
+class _Chunk(NamedTuple):
+    """Data points decoded from the lines of the file between the byte offsets `start` and `end`.
+
+    The currency pairs are held as codes into `pair_symbols`, which lists the pairs of the chunk in order
+    of first appearance. `ends` holds the byte offset just past the line of each data point. `invalid` holds
+    the (line, line number in the chunk, byte offset) of the first line that is not valid json, if any,
+    in which case the chunk stops there.
+    """
+    start: int
+    end: int
+    timestamps: array
+    codes: array
+    pair_symbols: List[str]
+    rates: array
+    ends: array
+    warnings: List[str]
+    lines: int
+    invalid: Optional[Tuple[bytes, int, int]]
+    decode_ns: int
+
+
+def _decode_chunk(path: str, start: int, end: int) -> _Chunk:
+    """Decodes the lines of a chunk of the file. Entry point of the reader worker processes."""
+    start_time = time.perf_counter_ns()
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    timestamps, codes, rates, ends = array("d"), array("q"), array("d"), array("q")
+    pair_codes, pair_symbols, warnings = {}, [], []
+    invalid, offset, lineno = None, start, 0
+    for lineno, line in enumerate(io.BytesIO(data), start=1):
+        try:
+            timestamp, currency_pair, rate = SpotRateReader.decode_line(line, lineno)
+        except TickValidationError as e:
+            warnings.append(str(e))
+            offset += len(line)
+            continue
+        except InvalidLineError:
+            invalid = (line, lineno, offset)
+            break
+
+        offset += len(line)
+        code = pair_codes.get(currency_pair)
+        if code is None:
+            code = pair_codes[currency_pair] = len(pair_symbols)
+            pair_symbols.append(currency_pair)
+        timestamps.append(timestamp)
+        codes.append(code)
+        rates.append(rate)
+        ends.append(offset)
+
+    return _Chunk(
+        start, end, timestamps, codes, pair_symbols, rates, ends, warnings, lineno, invalid,
+        time.perf_counter_ns() - start_time,
+    )
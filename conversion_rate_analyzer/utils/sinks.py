@@ -0,0 +1,345 @@
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Type
+
+from loguru import logger
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.utils.metrics import metrics
+
+POLICIES = ("drop_newest", "drop_oldest", "block")
+
+
+class Sink(ABC):
+    """Output target of the alerts, fed with jsonlines by FanOutWriter.
+
+    Each sink has a bounded buffer of `buffer_size` lines, drained by a thread of its own, so a slow sink does not
+    hold up the monitor or the other sinks. When the buffer is full, the `policy` decides what happens to new lines:
+    - "drop_newest": they are dropped,
+    - "drop_oldest": the oldest buffered lines are dropped to make room for them,
+    - "block": the writer waits until the sink drains them (backpressure on the monitor).
+    Lines that the sink fails to write are dropped too. The lines and bytes written and the lines dropped are
+    counted in the metrics, labeled with the name of the sink.
+
+    Subclasses implement `_emit`, called from the sink thread with the lines taken from the buffer,
+    and may override `_close`.
+
+    Throws:
+        ValueError: The buffer size is not positive, or the policy is not one of POLICIES.
+    """
+    kind = "sink"
+
+    def __init__(self, name: str = None, buffer_size: int = 10000, policy: str = "drop_newest"):
+        if buffer_size < 1 or policy not in POLICIES:
+            raise ValueError(f"Invalid sink settings: buffer size {buffer_size}, policy {policy}. Policies: {POLICIES}")
+
+        self.name = name or self.kind
+        self.buffer_size = buffer_size
+        self.policy = policy
+
+        self.buffer = deque()
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.closing = False
+        self.failing = False
+        self.lines_written, self.bytes_written, self.lines_dropped = metrics.sink_counters(self.name)
+
+        self.thread = threading.Thread(target=self._drain, name=f"sink-{self.name}", daemon=True)
+        self.thread.start()
+
+    def offer(self, lines: List[str]):
+        """Adds the lines to the buffer, applying the policy to those that do not fit."""
+        with self.condition:
+            if self.closing:
+                self.lines_dropped.inc(len(lines))
+                return
+
+            overflow = len(self.buffer) + len(lines) - self.buffer_size
+            if overflow > 0:
+                if self.policy == "block":
+                    for line in lines:
+                        while len(self.buffer) >= self.buffer_size and not self.closing:
+                            self.condition.wait()
+                        self.buffer.append(line)
+                        self.condition.notify_all()
+                    return
+                if self.policy == "drop_newest":
+                    lines = lines[:len(lines) - overflow]
+                elif overflow >= len(self.buffer):
+                    lines = lines[overflow - len(self.buffer):]
+                    self.buffer.clear()
+                else:
+                    for _ in range(overflow):
+                        self.buffer.popleft()
+                self.lines_dropped.inc(overflow)
+
+            self.buffer.extend(lines)
+            self.condition.notify_all()
+
+    def flush(self):
+        """Waits until the sink has written or dropped every buffered line."""
+        with self.condition:
+            while self.buffer or self.in_flight:
+                self.condition.wait()
+
+    def close(self):
+        """Drains the buffer and closes the sink."""
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+        self._close()
+        logger.info(
+            f"Sink {self.name} closed: {self.lines_written.value} lines ({self.bytes_written.value} bytes) written, "
+            f"{self.lines_dropped.value} dropped."
+        )
+
+    @abstractmethod
+    def _emit(self, lines: List[str]) -> Optional[int]:
+        """Writes the lines. Returns the number of lines written if not all of them were."""
+
+    def _close(self):
+        pass
+
+    def _drain(self):
+        while True:
+            with self.condition:
+                while not self.buffer and not self.closing:
+                    self.condition.wait()
+                if not self.buffer:
+                    return
+                lines = list(self.buffer)
+                self.buffer.clear()
+                self.in_flight = len(lines)
+                self.condition.notify_all()
+
+            try:
+                written, error = self._emit(lines), None
+            except Exception as e:
+                written, error = 0, e
+            if written is None:
+                written = len(lines)
+
+            self.lines_written.inc(written)
+            self.bytes_written.inc(sum(map(len, lines[:written])))
+            if written < len(lines):
+                with self.condition:
+                    self.lines_dropped.inc(len(lines) - written)
+                if not self.failing:
+                    self.failing = True
+                    reason = repr(error) if error else f"{len(lines) - written} lines not written"
+                    logger.warning(f"Sink {self.name} failed, dropping lines until it recovers: {reason}")
+            elif self.failing:
+                self.failing = False
+                logger.info(f"Sink {self.name} recovered.")
+
+            with self.condition:
+                self.in_flight = 0
+                self.condition.notify_all()
+
+
+SINKS: Dict[str, Type[Sink]] = {}
+
+
+def register_sink(name: str):
+    """Class decorator registering a Sink under the type used by OUTPUT_SINKS in the config file."""
+    def register(cls: Type[Sink]) -> Type[Sink]:
+        cls.kind = name
+        SINKS[name] = cls
+        return cls
+
+    return register
+
+
+@register_sink("stdout")
+class StdoutSink(Sink):
+    """Writes the alerts to standard output, as expected by Challenge.md."""
+
+    def _emit(self, lines: List[str]):
+        sys.stdout.write("".join(lines))
+        sys.stdout.flush()
+
+
+@register_sink("file")
+class RotatingFileSink(Sink):
+    """Appends the alerts to a file that is rotated on time and on size.
+
+    The path is formatted with strftime when lines are written, so "output/%Y-%m-%d.jsonl" rolls over to a new
+    file at midnight, and "%H" every hour. With `max_bytes`, a file about to grow beyond `max_bytes` characters
+    is renamed to <path>.1 (shifting <path>.1 to <path>.2 and so on, keeping `backups` of them), and a new file
+    is started.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_bytes: int = None,
+            backups: int = 5,
+            clock: Callable[[], datetime] = datetime.now,
+            **kwargs
+    ):
+        self.path_pattern = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.clock = clock
+        self.path = None
+        self.file = None
+        self.file_bytes = 0
+        super().__init__(**kwargs)
+
+    def _emit(self, lines: List[str]):
+        path = self.clock().strftime(self.path_pattern)
+        if path != self.path:
+            self._open(path)
+
+        chunk = []
+        for line in lines:
+            if self.max_bytes and self.file_bytes and self.file_bytes + len(line) > self.max_bytes:
+                self.file.write("".join(chunk))
+                chunk.clear()
+                self._rotate()
+            chunk.append(line)
+            self.file_bytes += len(line)
+        self.file.write("".join(chunk))
+        self.file.flush()
+
+    def _open(self, path: str):
+        if self.file:
+            self.file.close()
+            logger.info(f"Sink {self.name} rolled over from {self.path} to {path}.")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.file = open(path, mode="a", encoding="utf-8")
+        self.file_bytes = self.file.tell()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, mode="a", encoding="utf-8")
+        self.file_bytes = 0
+
+    def _close(self):
+        if self.file:
+            self.file.close()
+
+
+@register_sink("unix")
+class UnixSocketSink(Sink):
+    """Streams the alerts to a local consumer listening on a Unix stream socket.
+
+    The sink connects on the first write, and after a failure, reconnects on the next write at most once every
+    `retry_interval` seconds. Lines written while disconnected are dropped.
+    """
+
+    def __init__(self, path: str, retry_interval: float = 1.0, **kwargs):
+        self.path = path
+        self.retry_interval = retry_interval
+        self.socket = None
+        self.retry_at = 0.0
+        super().__init__(**kwargs)
+
+    def _emit(self, lines: List[str]):
+        if self.socket is None:
+            self._connect()
+        try:
+            self.socket.sendall("".join(lines).encode())
+        except OSError:
+            self._close()
+            raise
+
+    def _connect(self):
+        now = time.monotonic()
+        if now < self.retry_at:
+            raise ConnectionError(f"Not connected to {self.path}")
+        self.retry_at = now + self.retry_interval
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.socket = sock
+        logger.info(f"Sink {self.name} connected to {self.path}.")
+
+    def _close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+
+CONSUMER_QUEUES: Dict[str, queue.Queue] = {}
+
+
+def consumer_queue(name: str = "queue", maxsize: int = 10000) -> queue.Queue:
+    """Returns the queue of jsonlines fed by the queue sink of that name, for consumers in this process.
+    The queue can be requested before or after the sink is created."""
+    if name not in CONSUMER_QUEUES:
+        CONSUMER_QUEUES[name] = queue.Queue(maxsize)
+    return CONSUMER_QUEUES[name]
+
+
+@register_sink("queue")
+class QueueSink(Sink):
+    """Hands the alerts to consumers in this process through `consumer_queue(name)`.
+
+    The sink thread waits up to `put_timeout` seconds for a full queue, so a consumer that stops reading
+    only fills the buffer of the sink, and its lines are then dropped by the policy.
+    """
+
+    def __init__(self, name: str = "queue", put_timeout: float = 1.0, **kwargs):
+        self.queue = consumer_queue(name, kwargs.get("buffer_size", 10000))
+        self.put_timeout = put_timeout
+        super().__init__(name=name, **kwargs)
+
+    def _emit(self, lines: List[str]):
+        for i, line in enumerate(lines):
+            try:
+                self.queue.put(line, timeout=self.put_timeout)
+            except queue.Full:
+                return i
+
+
+def create_sinks(specs: Sequence[dict], default_path: str = None) -> List[Sink]:
+    """Creates sinks from specs such as {"type": "file", "path": "output/%Y-%m-%d.jsonl", "max_bytes": 1 << 26}.
+
+    A file sink without a path writes to `default_path`. Sinks without a "buffer_size" or a "policy" get
+    SINK_BUFFER_SIZE and SINK_POLICY, and sinks without a "name" are named after their type, or their path.
+
+    Throws:
+        ValueError: Unknown sink type, invalid settings, or two sinks with the same name.
+    """
+    sinks = []
+    try:
+        for spec in specs:
+            spec = dict(spec)
+            kind = spec.pop("type")
+            if kind not in SINKS:
+                raise ValueError(f"Unknown sink type: {kind}. Available types: {sorted(SINKS)}")
+            if kind == "file":
+                spec.setdefault("path", default_path)
+            if kind != "queue" and "path" in spec:
+                spec.setdefault("name", f"{kind}:{spec['path']}")
+            spec.setdefault("buffer_size", config.SINK_BUFFER_SIZE)
+            spec.setdefault("policy", config.SINK_POLICY)
+            if spec.get("name", SINKS[kind].kind) in {sink.name for sink in sinks}:
+                raise ValueError(f"Duplicate sink name: {spec.get('name', kind)}. Set a distinct \"name\" for each sink.")
+            sinks.append(SINKS[kind](**spec))
+    except Exception:
+        for sink in sinks:
+            sink.close()
+        raise
+    return sinks
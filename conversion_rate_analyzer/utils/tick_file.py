@@ -0,0 +1,227 @@
+"""
+Compact binary tick format, for replaying and backtesting historical feeds without decoding JSON.
+
+Layout (little endian):
+- header: magic b"RATETICK", uint32 version, uint32 pair count, uint64 record count, uint64 data offset,
+- pair dictionary: for each pair ID in order, a uint16 length followed by the UTF-8 symbol,
+- zero padding up to the data offset, a multiple of DATA_ALIGNMENT,
+- records: fixed-width (float64 timestamp, uint32 pair ID, float64 rate), 20 bytes each.
+
+The data points are validated once when converting from jsonlines, so reading a tick file only memory-maps
+the records and slices them into NumPy views, which MovingAverageMonitor.process_batch consumes directly.
+
+Usage:
+    python -m conversion_rate_analyzer.utils.tick_file input.jsonl output.ticks [--batch-size 100000]
+"""
+import os
+import struct
+import time
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.tick import TickBatch
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.exceptions import TickFileError
+from conversion_rate_analyzer.utils.metrics import metrics
+
+MAGIC = b"RATETICK"
+VERSION = 1
+# magic, version, pair count, record count, data offset
+HEADER = struct.Struct("<8sIIQQ")
+SYMBOL_LENGTH = struct.Struct("<H")
+RECORD_DTYPE = np.dtype([("timestamp", "<f8"), ("pair_id", "<u4"), ("rate", "<f8")])
+DATA_ALIGNMENT = 64
+
+
+def is_tick_file(path: str) -> bool:
+    """Returns whether the file starts with the magic of the tick format."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def convert_jsonl(input_path: str, output_path: str, batch_size: int = None) -> int:
+    """Converts a jsonlines input file to a tick file. Returns the number of data points written.
+
+    The lines are decoded and validated on the fast path of SpotRateReader.columnar_reader,
+    so invalid data points are logged and skipped as they would be when processing the jsonlines file.
+    The pair IDs are assigned in order of first appearance.
+
+    Throws:
+        FileNotFoundError
+        InvalidLineError: a line of the input file is not valid json.
+    """
+    from conversion_rate_analyzer.utils.reader import SpotRateReader
+
+    symbols = SymbolTable()
+    batches = SpotRateReader.columnar_reader(
+        input_path, batch_size or config.TICK_FILE_BATCH_SIZE, symbols=symbols, workers=config.READER_WORKERS
+    )
+
+    # the dictionary is only complete once every line has been read, so the records are staged in a temporary file
+    records_path = f"{output_path}.records"
+    record_count = 0
+    try:
+        with open(records_path, "wb") as f:
+            for batch in batches:
+                records = np.empty(batch.size, dtype=RECORD_DTYPE)
+                records["timestamp"] = np.frombuffer(batch.timestamps, dtype=np.float64)
+                records["pair_id"] = np.frombuffer(batch.pair_ids, dtype=np.int64)
+                records["rate"] = np.frombuffer(batch.rates, dtype=np.float64)
+                f.write(records.tobytes())
+                record_count += batch.size
+
+        write_header(output_path, symbols.symbols, record_count)
+        with open(output_path, "ab") as output, open(records_path, "rb") as records_file:
+            while True:
+                chunk = records_file.read(1 << 24)
+                if not chunk:
+                    break
+                output.write(chunk)
+    finally:
+        if os.path.exists(records_path):
+            os.remove(records_path)
+
+    return record_count
+
+
+def write_header(path: str, symbols: List[str], record_count: int) -> int:
+    """Writes the header and pair dictionary of a tick file, truncating the file. Returns the data offset."""
+    dictionary = bytearray()
+    for symbol in symbols:
+        encoded = symbol.encode("utf-8")
+        dictionary += SYMBOL_LENGTH.pack(len(encoded)) + encoded
+
+    data_offset = HEADER.size + len(dictionary)
+    data_offset += -data_offset % DATA_ALIGNMENT
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(symbols), record_count, data_offset))
+        f.write(dictionary)
+        f.write(b"\0" * (data_offset - HEADER.size - len(dictionary)))
+    return data_offset
+
+
+class TickFile:
+    """Read-only, memory-mapped tick file.
+
+    `records` is a structured array over the mapped records, and `timestamps`, `pair_ids` and `rates`
+    are views of its columns, so no data point is copied until it is used.
+
+    Example:
+        tick_file = TickFile("day.ticks")
+        for batch in tick_file.batches(100000, symbols=monitor.symbols):
+            monitor.process_batch(batch.timestamps, batch.pair_ids, batch.rates)
+
+    Throws:
+        FileNotFoundError
+        TickFileError: the file is not a tick file of this version, or is truncated.
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"The input file does not exist: {path}")
+        self.path = path
+
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+                raise TickFileError("Not a tick file.", path)
+            _, version, pair_count, self.record_count, self.data_offset = HEADER.unpack(header)
+            if version != VERSION:
+                raise TickFileError(f"Unsupported tick file version {version}.", path)
+            self.symbols = self._read_dictionary(f.read(self.data_offset - HEADER.size), pair_count)
+
+        if os.path.getsize(path) != self.data_offset + self.record_count * RECORD_DTYPE.itemsize:
+            raise TickFileError("Tick file is truncated.", path)
+
+        if self.record_count:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=self.data_offset, shape=(self.record_count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        self.timestamps = self.records["timestamp"]
+        self.pair_ids = self.records["pair_id"]
+        self.rates = self.records["rate"]
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def batches(self, batch_size: int, offset: int = 0, symbols: Optional[SymbolTable] = None) -> Iterator[TickBatch]:
+        """Yields the records in batches of up to `batch_size` rows, as views of the mapped file.
+
+        As with SpotRateReader.columnar_reader, `offset` is a byte offset in the file, such as the offset
+        of a batch recorded in a snapshot, and the `offset` of each batch is the byte offset just past it.
+        With a symbol table, the pairs of the file are interned into it and the batches hold their `pair_ids`;
+        the IDs are only translated (copying that column) if the table numbers the pairs differently from the file.
+        Otherwise the batches hold the `currency_pairs` as an object array of symbols.
+
+        Throws:
+            TickFileError: the offset is not at a record boundary, or a record holds an unknown pair ID.
+        """
+        start = self._record_index(offset)
+        translation = None
+        if symbols is not None:
+            translation = symbols.intern_many(self.symbols)
+            if np.array_equal(translation, np.arange(len(self.symbols))):
+                translation = None
+        else:
+            symbol_array = np.array(self.symbols, dtype=object)
+
+        for begin in range(start, self.record_count, batch_size):
+            batch_start = time.perf_counter_ns() if metrics.enabled else 0
+            end = min(begin + batch_size, self.record_count)
+            pair_ids = self.pair_ids[begin:end]
+            if len(self.symbols) <= int(pair_ids.max()):
+                raise TickFileError(f"Unknown pair ID {int(pair_ids.max())} in records {begin}-{end}.", self.path)
+
+            if symbols is None:
+                batch = TickBatch(self.timestamps[begin:end], symbol_array[pair_ids], self.rates[begin:end])
+            else:
+                pair_ids = pair_ids if translation is None else translation[pair_ids]
+                batch = TickBatch(self.timestamps[begin:end], None, self.rates[begin:end], pair_ids=pair_ids)
+
+            offset = self.data_offset + end * RECORD_DTYPE.itemsize
+            if metrics.enabled:
+                metrics.reader_batch_seconds.record(time.perf_counter_ns() - batch_start)
+                metrics.reader_lines.inc(end - begin)
+                metrics.reader_bytes.inc((end - begin) * RECORD_DTYPE.itemsize)
+            yield batch._replace(offset=offset)
+
+    def _record_index(self, offset: int) -> int:
+        if offset <= 0:
+            return 0
+        index, remainder = divmod(offset - self.data_offset, RECORD_DTYPE.itemsize)
+        if remainder or not 0 <= index <= self.record_count:
+            raise TickFileError(f"Offset {offset} is not at a record boundary.", self.path)
+        return index
+
+    def _read_dictionary(self, data: bytes, pair_count: int) -> List[str]:
+        symbols, position = [], 0
+        try:
+            for _ in range(pair_count):
+                (length,) = SYMBOL_LENGTH.unpack_from(data, position)
+                position += SYMBOL_LENGTH.size
+                symbols.append(data[position:position + length].decode("utf-8"))
+                position += length
+        except (struct.error, UnicodeDecodeError) as e:
+            raise TickFileError(f"Pair dictionary is corrupt: {e}.", self.path) from e
+        if position > len(data):
+            raise TickFileError("Pair dictionary is corrupt.", self.path)
+        return symbols
+
+
+if __name__ == "__main__":  # pragma: no cover
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Converts a jsonlines input file to the binary tick format.")
+    parser.add_argument("input_file", help="input jsonlines file")
+    parser.add_argument("output_file", help="output tick file")
+    parser.add_argument("--batch-size", type=int, default=None, help="data points decoded per batch")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    count = convert_jsonl(args.input_file, args.output_file, args.batch_size)
+    print(f"{count} data points converted in {time.perf_counter() - start_time:.2f} seconds to {args.output_file}")
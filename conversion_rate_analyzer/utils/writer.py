@@ -1,15 +1,85 @@
+import itertools
+import math
 import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from json.encoder import encode_basestring
+from typing import List, Union
 
 import jsonlines
 from jsonlines.jsonlines import Writer
 from loguru import logger
 
 from conversion_rate_analyzer import config
+from conversion_rate_analyzer.models.alert_block import SPOT_CHANGE, AlertBlock
 from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.models.tick import Tick
 from conversion_rate_analyzer.utils.exceptions import SpotRateWriterError
+from conversion_rate_analyzer.utils.metrics import metrics
+from conversion_rate_analyzer.utils.sinks import Sink, create_sinks
 
 
-class SpotRateWriter:
+class AlertWriter(ABC):
+    """Base class of the writers of the alerts raised by MovingAverageMonitor, one jsonline per alert.
+
+    `write` and `write_block` record the metrics of the writes, and hand each alert to `_write_row`,
+    or the whole block to `_write_block`, which subclasses implement along with `close`.
+    Alerts that stand for suppressed threshold breaches (see AlertDebouncer) also report their number as "suppressed".
+    """
+
+    def write(
+            self,
+            data: Union[CurrencyConversionRate, Tick],
+            current_avg_rate: float = None,
+            pct_change: float = None,
+            alert: str = SPOT_CHANGE,
+            suppressed: int = 0
+    ):
+        if metrics.enabled:
+            start_time = time.perf_counter_ns()
+            self._write_row(data.timestamp, data.currencyPair, data.rate, current_avg_rate, pct_change, alert, suppressed)
+            metrics.write_seconds.record(time.perf_counter_ns() - start_time)
+            metrics.alerts_written.inc()
+        else:
+            self._write_row(data.timestamp, data.currencyPair, data.rate, current_avg_rate, pct_change, alert, suppressed)
+
+    def write_block(self, alerts: AlertBlock):
+        """Write a block of alerts produced by MovingAverageMonitor.process_batch, one jsonline per row."""
+        if metrics.enabled:
+            start_time = time.perf_counter_ns()
+            self._write_block(alerts)
+            metrics.write_seconds.record(time.perf_counter_ns() - start_time)
+            metrics.alerts_written.inc(alerts.size)
+        else:
+            self._write_block(alerts)
+
+    def flush(self):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    def _write_block(self, alerts: AlertBlock):
+        for row in _rows(alerts):
+            self._write_row(*row)
+
+    @abstractmethod
+    def _write_row(
+            self,
+            timestamp: float,
+            currency_pair: str,
+            rate: float,
+            current_avg_rate: float,
+            pct_change: float,
+            alert: str,
+            suppressed: int = 0,
+    ):
+        pass
+
+
+class SpotRateWriter(AlertWriter):
     """Class for writing conversion rates that exceed acceptance threshold percentage.
     Data will be written into a jsonline file.
 
@@ -26,35 +96,275 @@ class SpotRateWriter:
         The file will be flushed after each write.
         """
         self.path = path
-
-        if not os.path.exists(self.path):
-            logger.info(f"Output file ({self.path}) does not exist. Creating file.")
+        _create_output_dir(self.path)
 
         self.writer: Writer = jsonlines.open(self.path, mode="a", flush=True)
         logger.info("Jsonline writer created.")
 
-    def write(
+    def close(self):
+        self.writer.close()
+
+        if not os.path.exists(self.path):
+            raise SpotRateWriterError("Output file has been removed before closing.", self.path)
+
+        logger.info(f"Jsonline writer terminated and output file closed. Saved output at {self.path}.")
+
+    def _write_row(
             self,
-            data: CurrencyConversionRate,
-            current_avg_rate: float = None,
-            pct_change: float = None
+            timestamp: float,
+            currency_pair: str,
+            rate: float,
+            current_avg_rate: float,
+            pct_change: float,
+            alert: str,
+            suppressed: int = 0,
     ):
-        out = data.dict()
+        out = {"timestamp": timestamp, "currencyPair": currency_pair}
 
         if config.VERBOSE:
-            out["average_rate"] = current_avg_rate
-            out["pct_change"] = pct_change
-        else:
-            del out["rate"]
+            out["rate"] = rate
+            if alert == SPOT_CHANGE:
+                out["average_rate"] = current_avg_rate
+                out["pct_change"] = pct_change
+            else:
+                out["reference_rate"] = current_avg_rate
+                out["score"] = pct_change
 
-        out["alert"] = "spotChange"
+        out["alert"] = alert
+        if suppressed:
+            out["suppressed"] = suppressed
 
         self.writer.write(out)
 
+
+class BufferedSpotRateWriter(AlertWriter):
+    """Writer that serializes alerts into an in-memory buffer and writes them to the output file in batches.
+
+    The buffer is flushed to the output file when it holds `max_records` alerts or `max_bytes` bytes,
+    when `max_delay_ms` milliseconds have passed since the last flush, and on close().
+    Alerts are formatted straight into jsonlines without building an intermediate dict,
+    and the output is byte-identical to SpotRateWriter.
+
+    Durability:
+        SpotRateWriter: every alert is handed to the OS as soon as it is written,
+            so alerts survive a crash of this process (but not a power loss, as the file is not fsync-ed).
+        BufferedSpotRateWriter: on a crash of this process, up to `max_records` alerts (or `max_bytes` bytes)
+            that are still buffered are lost. Without the background flusher, the time limit is only checked
+            when an alert is written, so during a quiet period the last alerts stay buffered until the next write
+            or close(). With `background_flush=True`, a flusher thread bounds that delay to about `max_delay_ms`.
+        With `fsync=True`, every flush also calls os.fsync, so flushed alerts survive a power loss.
+
+    Throws:
+        SpotRateWriterException: the output file has been removed before closing.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_records: int = 1000,
+            max_bytes: int = 1 << 20,
+            max_delay_ms: float = 100,
+            background_flush: bool = False,
+            fsync: bool = False
+    ):
+        self.path = path
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay_ms / 1000
+        self.fsync = fsync
+        _create_output_dir(self.path)
+
+        self.file = open(self.path, mode="a", encoding="utf-8")
+        self.buffer: List[str] = []
+        self.buffered_bytes = 0
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.flusher = None
+        self.closed = threading.Event()
+        if background_flush:
+            self.flusher = threading.Thread(target=self._flush_periodically, name="spot-rate-writer-flusher", daemon=True)
+            self.flusher.start()
+
+        logger.info("Buffered jsonline writer created.")
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
     def close(self):
-        self.writer.close()
+        self.closed.set()
+        if self.flusher:
+            self.flusher.join()
+
+        with self.lock:
+            self._flush()
+            self.file.close()
 
         if not os.path.exists(self.path):
             raise SpotRateWriterError("Output file has been removed before closing.", self.path)
 
-        logger.info(f"Jsonline writer terminated and output file closed. Saved output at {self.path}.")
+        logger.info(f"Buffered jsonline writer terminated and output file closed. Saved output at {self.path}.")
+
+    def _write_block(self, alerts: AlertBlock):
+        self._append([_format_line(*row) for row in _rows(alerts)])
+
+    def _write_row(
+            self,
+            timestamp: float,
+            currency_pair: str,
+            rate: float,
+            current_avg_rate: float,
+            pct_change: float,
+            alert: str,
+            suppressed: int = 0,
+    ):
+        self._append([_format_line(timestamp, currency_pair, rate, current_avg_rate, pct_change, alert, suppressed)])
+
+    def _append(self, lines: List[str]):
+        with self.lock:
+            self.buffer.extend(lines)
+            self.buffered_bytes += sum(map(len, lines))
+
+            if (
+                    len(self.buffer) >= self.max_records
+                    or self.buffered_bytes >= self.max_bytes
+                    or time.monotonic() - self.last_flush >= self.max_delay
+            ):
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.buffer.clear()
+            self.buffered_bytes = 0
+
+        self.last_flush = time.monotonic()
+
+    def _flush_periodically(self):
+        while not self.closed.wait(self.max_delay):
+            with self.lock:
+                if time.monotonic() - self.last_flush >= self.max_delay:
+                    self._flush()
+
+
+class FanOutWriter(AlertWriter):
+    """Writer that formats each alert once, and fans the jsonline out to several sinks (see utils/sinks.py).
+
+    Writing only appends the lines to the bounded buffer of each sink, which is written from a thread of its own,
+    so a slow or failing sink never holds up the monitor, unless its policy is "block". The output of each sink
+    is byte-identical to SpotRateWriter. Lines still buffered are written on close().
+    """
+
+    def __init__(self, sinks: List[Sink]):
+        self.sinks = sinks
+        logger.info(f"Fan-out writer created with sinks: {self._sink_names()}.")
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+        logger.info(f"Fan-out writer terminated and sinks closed: {self._sink_names()}.")
+
+    def _write_block(self, alerts: AlertBlock):
+        lines = [_format_line(*row) for row in _rows(alerts)]
+        for sink in self.sinks:
+            sink.offer(lines)
+
+    def _write_row(
+            self,
+            timestamp: float,
+            currency_pair: str,
+            rate: float,
+            current_avg_rate: float,
+            pct_change: float,
+            alert: str,
+            suppressed: int = 0,
+    ):
+        lines = [_format_line(timestamp, currency_pair, rate, current_avg_rate, pct_change, alert, suppressed)]
+        for sink in self.sinks:
+            sink.offer(lines)
+
+    def _sink_names(self) -> str:
+        return ", ".join(sink.name for sink in self.sinks)
+
+
+def _create_output_dir(path: str):
+    if not os.path.exists(path):
+        logger.info(f"Output file ({path}) does not exist. Creating file.")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+
+def _rows(alerts: AlertBlock):
+    """Yields the (timestamp, currency pair, rate, reference rate, score, alert, suppressed) of each alert."""
+    return zip(
+        alerts.timestamps.tolist(),
+        alerts.currency_pairs.tolist(),
+        alerts.rates.tolist(),
+        alerts.average_rates.tolist(),
+        alerts.pct_changes.tolist(),
+        alerts.alert_types.tolist(),
+        alerts.suppressed.tolist() if alerts.suppressed is not None else itertools.repeat(0),
+    )
+
+
+def _format_line(
+        timestamp: float,
+        currency_pair: str,
+        rate: float,
+        current_avg_rate: float,
+        pct_change: float,
+        alert: str,
+        suppressed: int = 0,
+) -> str:
+    """Formats an alert straight into the jsonline SpotRateWriter writes, without building an intermediate dict."""
+    suffix = f', "suppressed": {suppressed}}}\n' if suppressed else "}\n"
+    if config.VERBOSE:
+        reference_key, score_key = ("average_rate", "pct_change") if alert == SPOT_CHANGE else ("reference_rate", "score")
+        return (
+            f'{{"timestamp": {_json_float(timestamp)}, "currencyPair": {encode_basestring(currency_pair)}, '
+            f'"rate": {_json_float(rate)}, "{reference_key}": {_json_float(current_avg_rate)}, '
+            f'"{score_key}": {_json_float(pct_change)}, "alert": {encode_basestring(alert)}{suffix}'
+        )
+
+    return (
+        f'{{"timestamp": {_json_float(timestamp)}, "currencyPair": {encode_basestring(currency_pair)}, '
+        f'"alert": {encode_basestring(alert)}{suffix}'
+    )
+
+
+def _json_float(value: float) -> str:
+    """Formats a float the same way as the json module."""
+    if value is None:
+        return "null"
+    if value != value:
+        return "NaN"
+    if value == math.inf:
+        return "Infinity"
+    if value == -math.inf:
+        return "-Infinity"
+    return repr(float(value))
+
+
+def create_writer(path: str) -> AlertWriter:
+    """Returns the writer configured by the OUTPUT_SINKS and WRITER_* settings in the config file."""
+    if config.OUTPUT_SINKS:
+        return FanOutWriter(create_sinks(config.OUTPUT_SINKS, default_path=path))
+
+    if config.WRITER_FLUSH_RECORDS <= 1:
+        return SpotRateWriter(path)
+
+    return BufferedSpotRateWriter(
+        path,
+        max_records=config.WRITER_FLUSH_RECORDS,
+        max_bytes=config.WRITER_FLUSH_BYTES,
+        max_delay_ms=config.WRITER_FLUSH_INTERVAL_MS,
+        background_flush=config.WRITER_BACKGROUND_FLUSH,
+    )
@@ -0,0 +1,100 @@
+import os
+from unittest.mock import patch
+
+import jsonlines
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.service.alert_debouncer import AlertDebouncer
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+
+
+def test_hysteresis_fires_once_per_excursion():
+    debouncer = AlertDebouncer(clear_threshold=0.05)
+    scores = [0.0, 0.12, 0.15, 0.11, 0.07, 0.12, 0.04, 0.02, 0.11, 0.2]
+    results = [debouncer.update(0, float(t), score, score >= 0.1) for t, score in enumerate(scores)]
+
+    # 0.07 is between the clear and trigger thresholds, so the alert keeps firing until 0.04
+    assert results == [None, 0, None, None, None, None, None, None, 3, None]
+    assert debouncer.suppressed_total == 4
+
+
+def test_min_ticks_and_cooldown():
+    debouncer = AlertDebouncer(clear_threshold=0.1, cooldown=10, min_ticks=2)
+    breaches = [True, False, True, True, False, True, True, False, True, True, True, True, True, True]
+    results = [debouncer.update(0, float(t), 0.2 if breach else 0.0, breach) for t, breach in enumerate(breaches)]
+
+    # consecutive breaches at t=2,3 fire; the next ones are within the cooldown of the alert at t=3 until t=13
+    assert results == [None, None, None, 2] + [None] * 9 + [7]
+
+
+def test_update_round_matches_update():
+    rng = np.random.default_rng(0)
+    scalar = AlertDebouncer(clear_threshold=0.04, cooldown=3, min_ticks=2, direction="both")
+    vector = AlertDebouncer(clear_threshold=0.04, cooldown=3, min_ticks=2, direction="both")
+    for t in range(200):
+        pair_ids = rng.choice(20, size=8, replace=False)
+        scores = rng.normal(0, 0.1, 8)
+        breaches = np.abs(scores) >= 0.1
+        expected = [scalar.update(int(p), float(t), float(s), bool(b)) for p, s, b in zip(pair_ids, scores, breaches)]
+
+        alert, suppressed = vector.update_round(pair_ids, np.full(8, float(t)), scores, breaches)
+        assert alert.tolist() == [result is not None for result in expected]
+        assert suppressed.tolist() == [result for result in expected if result is not None]
+
+    assert vector.suppressed_total == scalar.suppressed_total > 0
+    assert vector.firing == scalar.firing
+
+
+def test_debouncer_rejects_invalid_settings():
+    for kwargs in ({"clear_threshold": -0.1}, {"cooldown": -1}, {"min_ticks": 0}, {"direction": "sideways"}):
+        with pytest.raises(ValueError):
+            AlertDebouncer(**{"clear_threshold": 0.05, **kwargs})
+
+
+@pytest.mark.parametrize("window_seconds", [None, 120])
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 60)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_THRESHOLD", 0.05)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_DIRECTION", "both")
+@patch("conversion_rate_analyzer.config.DETECTORS", [{"type": "ema", "threshold": 0.08, "direction": "both"}])
+def test_sustained_moves_raise_single_alerts(window_seconds, path_output_file_test: str):
+    rng = np.random.default_rng(0)
+    currency_pairs = ["AUDUSD", "AUDJPY", "AUDEUR"] * 600
+    timestamps = np.repeat(1554933784.0 + np.arange(600), 3)
+    # three 10% moves of 100 seconds per pair
+    levels = 1.0 + 0.1 * ((np.arange(600) // 100) % 2)
+    rates = np.repeat(levels, 3) * np.exp(rng.normal(0, 0.002, 1800))
+
+    with patch("conversion_rate_analyzer.config.WINDOW_SECONDS", window_seconds):
+        raw = MovingAverageMonitor(singleton=False).update_batch(timestamps, currency_pairs, rates)
+
+        with patch("conversion_rate_analyzer.config.ALERT_CLEAR_THRESHOLD", 0.02), \
+                patch("conversion_rate_analyzer.config.ALERT_COOLDOWN", 30):
+            monitor = MovingAverageMonitor(singleton=False)
+            monitor.initialize_writer(path_output_file_test)
+            for timestamp, currency_pair, rate in zip(timestamps, currency_pairs, rates):
+                monitor.process_new_rate(CurrencyConversionRate(timestamp=timestamp, currencyPair=currency_pair, rate=rate))
+            monitor.terminate_writer()
+            with jsonlines.open(path_output_file_test) as reader:
+                expected = list(reader)
+            os.remove(path_output_file_test)
+
+            monitor = MovingAverageMonitor(singleton=False)
+            monitor.initialize_writer(path_output_file_test)
+            for i in range(0, len(rates), 90):
+                monitor.process_batch(timestamps[i:i + 90], currency_pairs[i:i + 90], rates[i:i + 90])
+            monitor.terminate_writer()
+            with jsonlines.open(path_output_file_test) as reader:
+                assert list(reader) == expected
+            os.remove(path_output_file_test)
+
+    spot_changes = [line for line in expected if line["alert"] == "spotChange"]
+    raw_spot_changes = np.count_nonzero(raw.alert_types == "spotChange")
+    # one alert per move up or down of each pair
+    assert len(spot_changes) == 3 * 5
+    assert raw_spot_changes > 10 * len(spot_changes)
+    assert len(spot_changes) + sum(line.get("suppressed", 0) for line in spot_changes) <= raw_spot_changes
+    assert any(line.get("suppressed", 0) > 0 for line in spot_changes)
+    assert all("suppressed" not in line for line in expected if line["alert"] != "spotChange")
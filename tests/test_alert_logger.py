@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.models.alert_block import AlertBlock
+from conversion_rate_analyzer.utils.alert_logger import AlertLogger
+
+
+@pytest.fixture
+def alert_logger():
+    return AlertLogger()
+
+
+def test_verbose_alert_log(caplog, alert_logger):
+    alert_logger.log("CNYAUD", 0.4, 0.5, 0.25)
+    alert_logger.log("CNYAUD", 0.4, 0.5, 3.5, "zScore")
+
+    assert "Significant rate change (>= 0.1) recorded." in caplog.text
+    assert "Currency pair : CNYAUD" in caplog.text
+    assert "Percent change: 25.00%" in caplog.text
+    assert "Alert zScore recorded." in caplog.text
+    assert "Score         : 3.5000" in caplog.text
+
+
+@patch("conversion_rate_analyzer.config.ALERT_LOG_FORMAT", "compact")
+def test_compact_alert_log(caplog, alert_logger):
+    alert_logger.log("CNYAUD", 0.4, 0.5, 0.25)
+
+    assert "alert=spotChange pair=CNYAUD rate=0.500000 reference=0.400000 score=0.25" in caplog.text
+    # the fields are also passed as structured extra
+    assert "'currency_pair': 'CNYAUD'" in caplog.text
+    assert "\n" not in caplog.records[0].getMessage()
+
+
+@patch("conversion_rate_analyzer.config.ALERT_LOG_FORMAT", None)
+def test_alert_log_disabled(caplog, alert_logger):
+    alert_logger.log("CNYAUD", 0.4, 0.5, 0.25)
+    assert caplog.text == ""
+
+
+@patch("conversion_rate_analyzer.config.ALERT_LOG_FORMAT", "compact")
+@patch("conversion_rate_analyzer.config.ALERT_LOG_RATE", 1)
+@patch("conversion_rate_analyzer.config.ALERT_LOG_BURST", 2)
+def test_alert_log_rate_limit(caplog, alert_logger):
+    with patch("conversion_rate_analyzer.utils.alert_logger.time.monotonic", return_value=100.0):
+        for _ in range(5):
+            alert_logger.log("CNYAUD", 0.4, 0.5, 0.25)
+        alert_logger.log("AUDUSD", 0.4, 0.5, 0.25)
+
+    assert len(caplog.records) == 3
+    assert alert_logger.suppressed == 3
+
+    # a token is refilled after a second, and the next log line reports the suppressed alerts
+    with patch("conversion_rate_analyzer.utils.alert_logger.time.monotonic", return_value=101.0):
+        alert_logger.log("CNYAUD", 0.4, 0.5, 0.25)
+        alert_logger.log("CNYAUD", 0.4, 0.5, 0.25)
+
+    assert len(caplog.records) == 4
+    assert " suppressed=3 " in caplog.records[-1].getMessage()
+    assert alert_logger.suppressed == 4
+
+
+@patch("conversion_rate_analyzer.config.ALERT_LOG_FORMAT", "compact")
+def test_alert_log_block(caplog, alert_logger):
+    block = AlertBlock(
+        timestamps=np.array([1.0, 2.0]),
+        currency_pairs=np.array(["CNYAUD", "AUDUSD"], dtype=object),
+        rates=np.array([0.5, 0.8]),
+        average_rates=np.array([0.4, 0.7]),
+        pct_changes=np.array([0.25, 0.14]),
+        indices=np.array([0, 1]),
+        alert_types=np.array(["spotChange", "emaChange"], dtype=object),
+    )
+    alert_logger.log_block(block)
+
+    assert [record.getMessage().split()[:2] for record in caplog.records] == [
+        ["alert=spotChange", "pair=CNYAUD"], ["alert=emaChange", "pair=AUDUSD"]
+    ]
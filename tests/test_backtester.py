@@ -0,0 +1,92 @@
+import json
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.main import main
+from conversion_rate_analyzer.service.backtester import Backtester
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed, write_feed
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.utils.tick_file import convert_jsonl
+
+
+@pytest.fixture
+def path_feed(tmp_path) -> str:
+    path = str(tmp_path / "feed.jsonl")
+    write_feed(path, synthetic_feed(currency_count=4, seconds=200, volatility=0.02, seed=1))
+    return path
+
+
+def monitor_alerts(path: str, window: int, threshold: float) -> dict:
+    """Alert timestamps of each pair raised by MovingAverageMonitor with the given settings."""
+    alerts = {}
+    with patch.object(config, "MOVING_AVERAGE_WINDOW", window), patch.object(config, "PCT_CHANGE_THRESHOLD", threshold):
+        monitor = MovingAverageMonitor(singleton=False)
+        for batch in SpotRateReader.columnar_reader(path, 1000):
+            block = monitor.update_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+            for currency_pair, timestamp in zip(block.currency_pairs.tolist(), block.timestamps.tolist()):
+                alerts.setdefault(currency_pair, []).append(timestamp)
+    return alerts
+
+
+def test_backtest_matches_monitor(path_feed: str):
+    backtester = Backtester(windows=[5, 30, 300], thresholds=[0.02, 0.05])
+    results = backtester.run(path_feed)
+
+    assert [(result.window, result.threshold) for result in results] == [
+        (5, 0.02), (5, 0.05), (30, 0.02), (30, 0.05), (300, 0.02), (300, 0.05)
+    ]
+    for result in results:
+        expected = monitor_alerts(path_feed, result.window, result.threshold)
+        assert {pair: timestamps.tolist() for pair, timestamps in result.alerts.items()} == expected
+        assert result.alert_count == sum(map(len, expected.values()))
+    assert results[0].alert_count > results[1].alert_count > 0
+
+
+def test_backtest_workers(path_feed: str, tmp_path):
+    expected = [result.to_dict() for result in Backtester([10, 60], [0.03]).run(path_feed)]
+
+    assert [result.to_dict() for result in Backtester([10, 60], [0.03], workers=2).run(path_feed)] == expected
+
+    tick_path = str(tmp_path / "feed.ticks")
+    convert_jsonl(path_feed, tick_path)
+    assert [result.to_dict() for result in Backtester([10, 60], [0.03]).run(tick_path)] == expected
+
+
+def test_backtest_empty_input():
+    results = Backtester([10], [0.1]).run_arrays([], np.empty(0), np.empty(0, dtype=np.int64), np.empty(0))
+    assert results[0].alert_count == 0
+    assert results[0].alerts == {}
+
+
+def test_backtest_invalid_grid():
+    with pytest.raises(ValueError):
+        Backtester([0], [0.1])
+    with pytest.raises(ValueError):
+        Backtester([10.5], [0.1])
+    with pytest.raises(ValueError):
+        Backtester([10], [])
+    with pytest.raises(ValueError):
+        Backtester([10], [0.1], workers=0)
+
+
+def test_main_backtest(tmp_path, path_input_file_sample: str):
+    import conversion_rate_analyzer.main as main_module
+
+    main_module.data_points_processed = 0
+    output = str(tmp_path / "backtest.jsonl")
+    argv = ["main.py", path_input_file_sample, "--backtest-windows", "[2, 5]", "--output", output]
+    with patch.object(sys, "argv", argv), patch.object(config, "BACKTEST_WINDOWS", None), \
+            patch.object(config, "OUTPUT_FILE", config.OUTPUT_FILE):
+        main()
+    assert main_module.data_points_processed == 11
+    main_module.data_points_processed = 0
+
+    with open(output) as f:
+        results = [json.loads(line) for line in f]
+    assert [(result["window"], result["threshold"]) for result in results] == [(2, 0.1), (5, 0.1)]
+    assert results[1]["pairs"] == {"CNYAUD": {"alerts": 1, "timestamps": [1554933794.023]}}
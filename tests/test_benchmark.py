@@ -0,0 +1,64 @@
+import json
+import os
+
+from conversion_rate_analyzer.utils.benchmark import run_benchmark, run_synthetic_benchmark
+from conversion_rate_analyzer.utils.feed_generator import currencies, synthetic_feed, write_feed
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+
+
+def test_currencies():
+    codes = currencies(100)
+    assert codes[:3] == ["USD", "EUR", "JPY"]
+    assert len(set(codes)) == 100
+    assert all(len(code) == 3 and code.isalpha() for code in codes)
+
+
+def test_synthetic_feed_is_deterministic():
+    feed = list(synthetic_feed(currency_count=4, seconds=10, out_of_order=0.2, seed=1))
+    assert feed == list(synthetic_feed(currency_count=4, seconds=10, out_of_order=0.2, seed=1))
+    assert feed != list(synthetic_feed(currency_count=4, seconds=10, out_of_order=0.2, seed=2))
+
+    # every pair of 4 currencies, once per second, some of them delayed
+    assert len(feed) == 4 * 3 * 10
+    assert len({tick.currencyPair for tick in feed}) == 12
+    timestamps = [tick.timestamp for tick in feed]
+    assert timestamps != sorted(timestamps)
+
+    in_order = [tick.timestamp for tick in synthetic_feed(currency_count=4, seconds=10)]
+    assert in_order == sorted(in_order)
+
+
+def test_synthetic_feed_rates_are_consistent():
+    rates = {tick.currencyPair: tick.rate for tick in synthetic_feed(currency_count=3, seconds=1)}
+    assert abs(rates["USDEUR"] * rates["EURJPY"] - rates["USDJPY"]) / rates["USDJPY"] < 1e-5
+    assert abs(rates["USDEUR"] * rates["EURUSD"] - 1) < 1e-5
+
+
+def test_write_feed(tmp_path):
+    path = str(tmp_path / "feed.jsonl")
+    feed = list(synthetic_feed(currency_count=3, seconds=5))
+    assert write_feed(path, feed) == len(feed)
+    assert list(SpotRateReader().tick_reader(path)) == feed
+
+
+def test_run_benchmark(tmp_path):
+    path = str(tmp_path / "feed.jsonl")
+    data_points = write_feed(path, synthetic_feed(currency_count=5, seconds=30, volatility=0.05))
+    results = run_benchmark(path, batch_size=100)
+
+    assert results["data_points"] == data_points
+    assert list(results["stages"]) == ["read", "parse", "update", "write", "end_to_end"]
+    assert results["alerts"] > 0
+    for name, stage in results["stages"].items():
+        assert stage["data_points"] == (results["alerts"] if name == "write" else data_points)
+        assert stage["throughput"] > 0
+        assert stage["latency_p99_us"] >= stage["latency_p50_us"] > 0
+        assert stage["peak_rss_mb"] > 0
+    json.dumps(results)
+
+
+def test_run_synthetic_benchmark():
+    results = run_synthetic_benchmark(currency_count=3, seconds=5, batch_size=10)
+    assert results["data_points"] == 30
+    assert results["input"]["currencies"] == 3
+    assert not os.path.exists(results["input"].get("path", ""))
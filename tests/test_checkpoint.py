@@ -0,0 +1,142 @@
+import os
+from unittest.mock import patch
+
+import jsonlines
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.checkpoint import Checkpointer, load_snapshot, save_snapshot
+from conversion_rate_analyzer.utils.exceptions import SnapshotError
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+
+
+def read_output(path: str) -> list:
+    with jsonlines.open(path) as reader:
+        output = list(reader)
+    os.remove(path)
+    return output
+
+
+@pytest.mark.parametrize("window_seconds", [None, 120])
+@patch("conversion_rate_analyzer.config.DETECTORS", [{"type": "zscore", "threshold": 2.0}, {"type": "range", "threshold": 0.05}])
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 60)
+@patch("conversion_rate_analyzer.config.REANCHOR_INTERVAL", 25)
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+def test_restart_from_checkpoint_matches_uninterrupted_run(
+        window_seconds, tmp_path, path_input_file_10min_single_curr_stream_outoforder: str, path_output_file_test: str
+):
+    path = path_input_file_10min_single_curr_stream_outoforder
+    snapshot_path = str(tmp_path / "state.npz")
+
+    with patch("conversion_rate_analyzer.config.WINDOW_SECONDS", window_seconds):
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(path_output_file_test)
+        for batch in SpotRateReader.columnar_reader(path, 50):
+            monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+        monitor.terminate_writer()
+        expected = read_output(path_output_file_test)
+
+        # stop after 6 batches, and restart from the snapshot
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(path_output_file_test)
+        checkpointer = Checkpointer(monitor, snapshot_path, interval=0)
+        for i, batch in enumerate(SpotRateReader.columnar_reader(path, 50)):
+            monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+            checkpointer.maybe_checkpoint(batch.offset)
+            if i == 5:
+                break
+        checkpointer.close()
+        monitor.terminate_writer()
+        assert checkpointer.snapshots_written + checkpointer.snapshots_skipped == 6
+        # the last snapshot may have been skipped, so only the output replayed from the snapshot is compared
+        read_output(path_output_file_test)
+
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(path_output_file_test)
+        offset = Checkpointer(monitor, snapshot_path).restore()
+        assert offset > 0
+        for batch in SpotRateReader.columnar_reader(path, 50, offset):
+            monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+        monitor.terminate_writer()
+        output = read_output(path_output_file_test)
+
+    assert len(expected) >= len(output) > 0
+    assert expected[-len(output):] == output
+
+
+def test_snapshot_round_trip(tmp_path, path_input_file_10min_single_curr_stream: str):
+    monitor = MovingAverageMonitor(singleton=False)
+    for batch in SpotRateReader.columnar_reader(path_input_file_10min_single_curr_stream, 100):
+        monitor.update_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+
+    snapshot_path = str(tmp_path / "state.npz")
+    save_snapshot(snapshot_path, monitor.snapshot_state(), 1234)
+    state, offset = load_snapshot(snapshot_path)
+
+    restored = MovingAverageMonitor(singleton=False)
+    restored.restore_state(state)
+    assert offset == 1234
+    assert restored.snapshot_state() == monitor.snapshot_state()
+    assert restored.get_current_average_rate("AUDUSD") == monitor.get_current_average_rate("AUDUSD")
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 5)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_THRESHOLD", 0.002)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_DIRECTION", "both")
+@patch("conversion_rate_analyzer.config.ALERT_COOLDOWN", 1000)
+@patch("conversion_rate_analyzer.config.DEDUPLICATE", True)
+@patch("conversion_rate_analyzer.config.MOVERS_INDEX", True)
+def test_snapshot_keeps_filter_debouncer_and_movers_state(tmp_path):
+    timestamps, currency_pairs, rates = map(list, zip(*synthetic_feed(4, 60, volatility=0.003)))
+    timestamps, rates = np.array(timestamps), np.array(rates)
+    head = 12 * 30
+
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.update_batch(timestamps[:head], currency_pairs[:head], rates[:head])
+    snapshot_path = str(tmp_path / "state.npz")
+    save_snapshot(snapshot_path, monitor.snapshot_state(), 0)
+    restored = MovingAverageMonitor(singleton=False)
+    restored.restore_state(load_snapshot(snapshot_path)[0])
+    assert restored.top_movers(12) == monitor.top_movers(12)
+
+    # the rest of the feed, after a replay of the last data points before the snapshot
+    tail = slice(head - 24, None)
+    alerts = [
+        m.update_batch(timestamps[tail], currency_pairs[tail], rates[tail]) for m in (monitor, restored)
+    ]
+    assert restored.tick_filter.duplicates == monitor.tick_filter.duplicates == 24
+    # the pairs that fired before the snapshot are still within their cooldown
+    assert alerts[1].currency_pairs.tolist() == alerts[0].currency_pairs.tolist() == []
+    assert restored.debouncer.suppressed_total > 0
+    assert restored.top_movers(12) == monitor.top_movers(12)
+
+
+def test_restore_errors(tmp_path, path_input_file_10min_single_curr_stream: str):
+    snapshot_path = str(tmp_path / "state.npz")
+    with open(snapshot_path, "w") as f:
+        f.write("not a snapshot")
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot_path)
+
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.update_batch([1.0], ["CNYAUD"], [0.5])
+    save_snapshot(snapshot_path, monitor.snapshot_state(), 0)
+    state, _ = load_snapshot(snapshot_path)
+
+    with pytest.raises(SnapshotError):
+        monitor.restore_state(state)
+
+    with patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 10):
+        with pytest.raises(SnapshotError):
+            MovingAverageMonitor(singleton=False).restore_state(state)
+
+
+def test_checkpointer_without_snapshot(tmp_path):
+    checkpointer = Checkpointer(MovingAverageMonitor(singleton=False), str(tmp_path / "state.npz"), interval=3600)
+    assert checkpointer.restore() == 0
+    assert checkpointer.maybe_checkpoint(100) is False
+
+    checkpointer.close(100)
+    assert load_snapshot(checkpointer.path)[1] == 100
@@ -0,0 +1,48 @@
+import math
+import random
+from unittest.mock import patch
+
+import numpy as np
+
+from conversion_rate_analyzer.service.compensated_sum import compensated_add, compensated_add_array
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+
+
+def test_compensated_add_recovers_lost_bits():
+    plain, total, compensation = 1e16, 1e16, 0.0
+    for _ in range(10):
+        plain += 1.0
+        total, compensation = compensated_add(total, compensation, 1.0)
+
+    assert plain == 1e16
+    assert total + compensation == 1e16 + 10
+
+
+def test_compensated_add_array_matches_scalar():
+    rng = np.random.default_rng(1)
+    totals = rng.normal(0, 1e6, 1000)
+    compensations = rng.normal(0, 1e-10, 1000)
+    values = rng.normal(0, 1e3, 1000) * rng.choice([1e-8, 1, 1e8], 1000)
+
+    new_totals, new_compensations = compensated_add_array(totals, compensations, values)
+    expected = [compensated_add(*args) for args in zip(totals.tolist(), compensations.tolist(), values.tolist())]
+
+    assert new_totals.tolist() == [total for total, _ in expected]
+    assert new_compensations.tolist() == [compensation for _, compensation in expected]
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 100)
+def test_moving_sum_does_not_drift():
+    rng = random.Random(3)
+    monitor = MovingAverageMonitor(singleton=False)
+
+    for interval in [0, 1000]:
+        with patch("conversion_rate_analyzer.config.REANCHOR_INTERVAL", interval):
+            monitor.__init__(singleton=False)
+            for i in range(5000):
+                # rates spanning several orders of magnitude make a plain running sum drift quickly
+                monitor.update_batch([i], ["AUDUSD"], [rng.choice([1e-4, 1.0, 1e4]) * rng.random()])
+
+            window = monitor.get_window("AUDUSD")
+            exact = sum(window.exact_sum()) / len(window)
+            assert math.isclose(monitor.get_current_average_rate("AUDUSD"), exact, rel_tol=1e-15, abs_tol=1e-15)
@@ -0,0 +1,156 @@
+import math
+import os
+import random
+import statistics
+from unittest.mock import patch
+
+import jsonlines
+import pytest
+
+from conversion_rate_analyzer.models.tick import Tick
+from conversion_rate_analyzer.service.detectors import (
+    Detector,
+    EmaDetector,
+    RangeDetector,
+    ZScoreDetector,
+    create_detectors,
+    exceeds_threshold,
+)
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.rate_window import RateWindow
+
+DETECTORS = [
+    {"type": "ema", "threshold": 0.05, "alpha": 0.2, "direction": "both"},
+    {"type": "zscore", "threshold": 2.0, "direction": "both"},
+    {"type": "range", "threshold": 0.01, "direction": "both"},
+]
+
+
+def run_detector(detector, items, capacity: int):
+    """Feeds the items to the detector the same way as MovingAverageMonitor. Yields the data points checked against, and the alert."""
+    window = RateWindow(capacity)
+    state = detector.new_state()
+    for timestamp, rate in items:
+        if window.full():
+            detector.evict(state, *window.get())
+        previous = list(window)
+        window.put((timestamp, rate))
+        yield previous, detector.update(state, timestamp, rate, window)
+
+
+def late_feed(n: int, seed: int):
+    rng = random.Random(seed)
+    return [(float(i - rng.choice([0, 0, 0, 1, 4])), rng.choice([0.9, 1.0, 1.1]) * rng.uniform(0.95, 1.05)) for i in range(n)]
+
+
+def test_exceeds_threshold_directions():
+    assert exceeds_threshold(0.2, 0.1, "up") and not exceeds_threshold(-0.2, 0.1, "up")
+    assert exceeds_threshold(-0.2, 0.1, "down") and not exceeds_threshold(0.2, 0.1, "down")
+    assert exceeds_threshold(0.2, 0.1, "both") and exceeds_threshold(-0.2, 0.1, "both")
+    assert not exceeds_threshold(math.nan, 0.1, "both")
+
+
+def test_create_detectors():
+    detectors = create_detectors(DETECTORS)
+    assert [type(detector) for detector in detectors] == [EmaDetector, ZScoreDetector, RangeDetector]
+    assert detectors[0].alpha == 0.2
+
+    with pytest.raises(ValueError):
+        create_detectors([{"type": "unknown", "threshold": 1.0}])
+    with pytest.raises(ValueError):
+        create_detectors([{"type": "zscore", "threshold": 1.0, "direction": "sideways"}])
+
+
+def test_incomplete_detector_cannot_be_created():
+    class StatelessDetector(Detector):
+        def update(self, state, timestamp, rate, window):
+            return None
+
+    with pytest.raises(TypeError):
+        StatelessDetector(threshold=1.0)
+
+
+def test_ema_detector():
+    detector = EmaDetector(threshold=0.05, alpha=0.5, direction="both")
+    items = [(0, 1.0), (1, 1.0), (2, 1.2), (3, 1.0), (4, 0.9)]
+    alerts = [alert for _, alert in run_detector(detector, items, capacity=3)]
+
+    # ema: 1.0, 1.0, 1.1, 1.05
+    assert alerts[:2] == [None, None]
+    assert alerts[2] == pytest.approx((1.0, 0.2))
+    assert alerts[3] == pytest.approx((1.1, -1 / 11))
+    assert alerts[4] == pytest.approx((1.05, 0.9 / 1.05 - 1))
+
+
+def test_zscore_detector_matches_recomputation():
+    detector = ZScoreDetector(threshold=1.0, direction="both")
+    alerts = 0
+    for (previous, alert), (_, rate) in zip(run_detector(detector, late_feed(2000, 1), capacity=30), late_feed(2000, 1)):
+        rates = [r for _, r in previous]
+        expected = None
+        if len(rates) >= 2 and statistics.stdev(rates) > 0:
+            z_score = (rate - statistics.mean(rates)) / statistics.stdev(rates)
+            if abs(z_score) >= 1.0:
+                expected = (statistics.mean(rates), z_score)
+
+        if expected is None:
+            assert alert is None
+        else:
+            alerts += 1
+            assert alert == pytest.approx(expected, rel=1e-9)
+
+    assert alerts > 0
+
+
+def test_range_detector_matches_recomputation():
+    detector = RangeDetector(threshold=0.01, direction="both")
+    alerts = 0
+    for (previous, alert), (_, rate) in zip(run_detector(detector, late_feed(2000, 2), capacity=30), late_feed(2000, 2)):
+        expected = None
+        if previous:
+            maximum, minimum = max(r for _, r in previous), min(r for _, r in previous)
+            if rate > maximum and (rate - maximum) / maximum >= 0.01:
+                expected = (maximum, (rate - maximum) / maximum)
+            elif rate < minimum and (rate - minimum) / minimum <= -0.01:
+                expected = (minimum, (rate - minimum) / minimum)
+
+        assert alert == expected
+        alerts += alert is not None
+
+    assert alerts > 0
+
+
+@patch("conversion_rate_analyzer.config.DETECTORS", DETECTORS)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_DIRECTION", "both")
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_THRESHOLD", 0.05)
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.REANCHOR_INTERVAL", 40)
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+def test_monitor_detectors_process_batch_matches_process_new_rate(path_output_file_test: str):
+    # interleave two streams with late data points
+    records = []
+    for (ts_1, rate_1), (ts_2, rate_2) in zip(late_feed(1000, 3), late_feed(1000, 4)):
+        records += [(ts_1, "AUDUSD", rate_1), (ts_2, "USDAUD", rate_2)]
+
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(path_output_file_test)
+    for record in records:
+        monitor.process_new_rate(Tick(*record))
+    monitor.terminate_writer()
+    with jsonlines.open(path_output_file_test) as reader:
+        expected = list(reader)
+    os.remove(path_output_file_test)
+
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(path_output_file_test)
+    for start in range(0, len(records), 64):
+        timestamps, pairs, rates = zip(*records[start:start + 64])
+        monitor.process_batch(timestamps, pairs, rates)
+    monitor.terminate_writer()
+    with jsonlines.open(path_output_file_test) as reader:
+        output = list(reader)
+
+    assert {alert["alert"] for alert in expected} == {"spotChange", "emaChange", "zScore", "rangeBreakout"}
+    assert any(alert["alert"] == "spotChange" and alert["pct_change"] < 0 for alert in expected)
+    assert all("score" in alert for alert in expected if alert["alert"] != "spotChange")
+    assert output == expected
@@ -0,0 +1,38 @@
+import pytest
+
+from conversion_rate_analyzer.service.expiration_index import ExpirationIndex
+
+
+def test_expiration_index_invalid_resolution():
+    with pytest.raises(ValueError):
+        ExpirationIndex(resolution=0)
+
+
+def test_expiration_index_pop_expired():
+    index = ExpirationIndex(resolution=1.0)
+    index.schedule("AUDUSD", 10.5)
+    index.schedule("USDAUD", 12.0)
+    index.schedule("CNYAUD", 10.2)
+
+    # bucket [10, 11) has not fully elapsed yet
+    assert index.pop_expired(10.9) == []
+    assert sorted(index.pop_expired(11.0)) == ["AUDUSD", "CNYAUD"]
+    assert index.pop_expired(12.5) == []
+    assert index.pop_expired(13.0) == ["USDAUD"]
+    assert len(index) == 0
+
+
+def test_expiration_index_reschedule():
+    index = ExpirationIndex(resolution=1.0)
+    index.schedule("AUDUSD", 20.0)
+    # a later expiration does not replace the pending one
+    index.schedule("AUDUSD", 30.0)
+    # an earlier expiration does, and the stale entry is skipped
+    index.schedule("AUDUSD", 10.0)
+
+    assert index.pop_expired(11.0) == ["AUDUSD"]
+    assert index.pop_expired(100.0) == []
+
+    index.schedule("USDAUD", 10.0)
+    index.discard("USDAUD")
+    assert index.pop_expired(100.0) == []
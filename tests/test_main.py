@@ -9,6 +9,8 @@ from jsonlines import InvalidLineError
 
 from conversion_rate_analyzer import config
 from conversion_rate_analyzer.main import main
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.metrics import metrics
 
 
 @patch("sys.argv", ["conversion_rate_analyzer/main.py"])
@@ -50,6 +52,22 @@ def test_main(path_output_file_test: str):
     assert data_points_processed == 11
 
 
+@patch("conversion_rate_analyzer.config.WORKERS", 2)
+@patch("sys.argv", ["conversion_rate_analyzer/main.py", "input/input1.jsonl"])
+def test_main_sharded(path_output_file_test: str):
+    offset = 0
+    if os.path.exists(config.OUTPUT_FILE):
+        with open(config.OUTPUT_FILE) as f:
+            offset = len(f.readlines())
+
+    main()
+
+    with jsonlines.open(config.OUTPUT_FILE) as reader:
+        output = list(reader)[offset:]
+
+    assert output == [{"timestamp": 1554933794.023, "currencyPair": "CNYAUD", "alert": "spotChange"}]
+
+
 @patch("sys.argv", ["conversion_rate_analyzer/main.py", "input/testinput1.jsonl"])
 def test_main_invalid_jsonline(path_input_file_sample: str, path_output_file_test: str):
     reader = jsonlines.open(path_input_file_sample)
@@ -70,3 +88,54 @@ def test_main_invalid_jsonline(path_input_file_sample: str, path_output_file_tes
         main()
 
     os.remove(new_file)
+
+
+@patch("conversion_rate_analyzer.config.STRICT_VALIDATION", True)
+def test_main_strict_validation(caplog, path_input_file_nonexistent: str, conversion_data_missing: Dict):
+    test_input_file = path_input_file_nonexistent
+
+    if os.path.exists(test_input_file):
+        os.remove(test_input_file)
+
+    writer = jsonlines.open(test_input_file, "a")
+    writer.write(conversion_data_missing)
+    writer.close()
+
+    with patch.object(sys, "argv", ["conversion_rate_analyzer/main.py", test_input_file]):
+        main()
+
+    assert "1 validation error for CurrencyConversionRate" in caplog.text
+    os.remove(test_input_file)
+
+
+@patch("sys.argv", ["conversion_rate_analyzer/main.py", "input/input1.jsonl"])
+def test_main_checkpoint(tmp_path, path_output_file_test: str):
+    import conversion_rate_analyzer.main as main_module
+
+    with patch("conversion_rate_analyzer.config.CHECKPOINT_FILE", str(tmp_path / "state.npz")):
+        main_module.data_points_processed = 0
+        main()
+        assert main_module.data_points_processed == 11
+
+        # the second run restores the windows, and resumes at the end of the input
+        main_module.data_points_processed = 0
+        main()
+        assert main_module.data_points_processed == 0
+        assert MovingAverageMonitor.instance.get_current_queue_size("CNYAUD") == 11
+
+
+@patch("conversion_rate_analyzer.config.METRICS_ENABLED", True)
+@patch("sys.argv", ["conversion_rate_analyzer/main.py", "input/input1.jsonl"])
+def test_main_metrics(tmp_path, path_output_file_test: str):
+    metrics_file = str(tmp_path / "metrics.prom")
+    try:
+        with patch("conversion_rate_analyzer.config.METRICS_FILE", metrics_file):
+            main()
+    finally:
+        metrics.enabled = False
+        metrics.reset()
+
+    with open(metrics_file) as f:
+        text = f.read()
+    assert "rate_analyzer_monitor_data_points_total 11\n" in text
+    assert "rate_analyzer_reader_lines_total 11\n" in text
@@ -0,0 +1,230 @@
+import os
+from array import array
+from unittest.mock import patch
+
+import jsonlines
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.service.memory_governor import MemoryGovernor, SpillStore
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.metrics import metrics
+
+
+def churning_feed(seconds: int = 400, seed: int = 0):
+    """Yields (timestamps, currency pairs, rates) for each second, where most pairs go idle for a while."""
+    rng = np.random.default_rng(seed)
+    pairs = [f"AUD{quote}" for quote in ("USD", "EUR", "JPY", "CNY", "GBP", "NZD")]
+    rates = np.ones(len(pairs))
+    for second in range(seconds):
+        rates *= np.exp(rng.normal(0, 0.02, len(pairs)))
+        ticking = [i for i in range(len(pairs)) if i == 0 or (second // (40 * i)) % 2 == 0]
+        yield (
+            np.full(len(ticking), 1554933784.0 + second),
+            [pairs[i] for i in ticking],
+            rates[ticking].copy(),
+        )
+
+
+def batch_alerts(monitor: MovingAverageMonitor) -> list:
+    alerts = []
+    for timestamps, currency_pairs, rates in churning_feed():
+        block = monitor.update_batch(timestamps, currency_pairs, rates)
+        alerts.extend(zip(block.timestamps.tolist(), block.currency_pairs.tolist(), block.pct_changes.tolist()))
+    return alerts
+
+
+def tick_alerts(monitor: MovingAverageMonitor, path: str) -> list:
+    monitor.initialize_writer(path)
+    for timestamps, currency_pairs, rates in churning_feed():
+        for timestamp, currency_pair, rate in zip(timestamps, currency_pairs, rates):
+            monitor.process_new_rate(CurrencyConversionRate(timestamp=timestamp, currencyPair=currency_pair, rate=rate))
+    monitor.terminate_writer()
+    with jsonlines.open(path) as reader:
+        alerts = list(reader)
+    os.remove(path)
+    return alerts
+
+
+@pytest.mark.parametrize("window_seconds", [None, 60])
+@patch("conversion_rate_analyzer.config.DETECTORS", [{"type": "zscore", "threshold": 2.0}, {"type": "ema", "threshold": 0.05}])
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_THRESHOLD", 0.05)
+@patch("conversion_rate_analyzer.config.REANCHOR_INTERVAL", 25)
+@patch("conversion_rate_analyzer.config.GOVERNOR_INTERVAL", 5)
+def test_spilled_pairs_alert_as_if_never_evicted(window_seconds, tmp_path, path_output_file_test: str):
+    with patch("conversion_rate_analyzer.config.WINDOW_SECONDS", window_seconds):
+        expected = batch_alerts(MovingAverageMonitor(singleton=False))
+        expected_ticks = tick_alerts(MovingAverageMonitor(singleton=False), path_output_file_test)
+
+        with patch("conversion_rate_analyzer.config.PAIR_TTL", 20), \
+                patch("conversion_rate_analyzer.config.SPILL_DIR", str(tmp_path)):
+            monitor = MovingAverageMonitor(singleton=False)
+            assert batch_alerts(monitor) == expected
+            assert monitor.governor.evicted["ttl"] > 0
+            assert monitor.governor.reloaded > 0
+
+            monitor = MovingAverageMonitor(singleton=False)
+            assert tick_alerts(monitor, path_output_file_test) == expected_ticks
+            assert monitor.governor.reloaded > 0
+
+    assert len(expected) > 0
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_THRESHOLD", 0.05)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_DIRECTION", "both")
+@patch("conversion_rate_analyzer.config.ALERT_COOLDOWN", 1000)
+@patch("conversion_rate_analyzer.config.GOVERNOR_INTERVAL", 5)
+def test_spilled_pairs_keep_their_debouncing_state(tmp_path, path_output_file_test: str):
+    expected = batch_alerts(MovingAverageMonitor(singleton=False))
+    expected_ticks = tick_alerts(MovingAverageMonitor(singleton=False), path_output_file_test)
+
+    with patch("conversion_rate_analyzer.config.PAIR_TTL", 20), \
+            patch("conversion_rate_analyzer.config.SPILL_DIR", str(tmp_path)):
+        monitor = MovingAverageMonitor(singleton=False)
+        assert batch_alerts(monitor) == expected
+        assert monitor.governor.reloaded > 0
+
+        monitor = MovingAverageMonitor(singleton=False)
+        assert tick_alerts(monitor, path_output_file_test) == expected_ticks
+        assert monitor.governor.reloaded > 0
+
+    assert 0 < len(expected) == len(expected_ticks)
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.PAIR_TTL", 20)
+@patch("conversion_rate_analyzer.config.GOVERNOR_INTERVAL", 5)
+def test_idle_pairs_are_dropped_after_ttl():
+    monitor = MovingAverageMonitor(singleton=False)
+    assert monitor.governor.store is None
+
+    monitor.update_batch([100.0, 100.0], ["AUDUSD", "AUDEUR"], [1.0, 2.0])
+    monitor.update_batch([110.0], ["AUDUSD"], [1.0])
+    assert monitor.get_known_currency_pairs() == {"AUDUSD", "AUDEUR"}
+
+    monitor.update_batch([125.0], ["AUDUSD"], [1.0])
+    assert monitor.get_known_currency_pairs() == {"AUDUSD"}
+    assert monitor.windows[monitor.symbols.get("AUDEUR")] is None
+    assert monitor.governor.evicted == {"ttl": 1, "budget": 0}
+
+    # the pair starts over with an empty window
+    monitor.update_batch([130.0], ["AUDEUR"], [4.0])
+    assert monitor.get_current_queue_size("AUDEUR") == 1
+    assert monitor.get_current_average_rate("AUDEUR") == 4.0
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 1000)
+@patch("conversion_rate_analyzer.config.GOVERNOR_INTERVAL", 1)
+def test_least_recently_updated_pairs_are_evicted_over_budget():
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.update_batch([1.0], ["AUDUSD"], [1.0])
+    pair_bytes = monitor.pair_memory_bytes(0)
+    assert pair_bytes == 2 * 16 * 1000
+    assert monitor.memory_bytes() > pair_bytes
+
+    # over budget with 3 windows: the least recently updated pair is evicted at each batch
+    monitor.governor = MemoryGovernor(monitor, budget_bytes=int(2.5 * pair_bytes), interval=1)
+    monitor.update_batch([2.0, 2.0], ["AUDEUR", "AUDJPY"], [1.0, 1.0])
+    assert monitor.get_known_currency_pairs() == {"AUDEUR", "AUDJPY"}
+    monitor.update_batch([3.0, 3.0], ["AUDUSD", "AUDJPY"], [1.0, 1.0])
+    assert monitor.get_known_currency_pairs() == {"AUDUSD", "AUDJPY"}
+    monitor.update_batch([4.0], ["AUDCNY"], [1.0])
+    assert monitor.get_known_currency_pairs() == {"AUDJPY", "AUDCNY"}
+
+    assert monitor.memory_bytes() <= 2.5 * pair_bytes
+    assert monitor.governor.evicted == {"ttl": 0, "budget": 3}
+
+
+def test_governor_rejects_non_positive_settings():
+    monitor = MovingAverageMonitor(singleton=False)
+    for kwargs in ({"ttl": 0}, {"budget_bytes": -1}, {"interval": 0}):
+        with pytest.raises(ValueError):
+            MemoryGovernor(monitor, **kwargs)
+
+
+def test_spill_store_round_trip_and_compaction(tmp_path):
+    store = SpillStore(str(tmp_path))
+    record = {
+        "timestamps": array("d", range(100000)),
+        "rates": array("d", [1.5] * 100000),
+        "total": 150000.0,
+        "compensation": 1e-12,
+        "count": 100000,
+        "countdown": 7,
+        "detector_states": [[1.0, 2.0], None],
+        "debouncer": [1, 0, 1554933784.0, 3],
+    }
+    for pair_id in range(5):
+        store.put(pair_id, record)
+    assert len(store) == 5 and 4 in store
+    assert dict(store.items())[2] == record
+
+    assert store.pop(0) == record
+    assert store.pop(0) is None
+    assert store.pop(1) == record
+    assert store.pop(2) == record
+    assert store.size == 5 * store.live_bytes // 2
+
+    # compacted once less than a quarter of the file is live
+    assert store.pop(3) == record
+    assert store.size == store.live_bytes
+    assert store.pop(4) == record
+    store.close()
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.PAIR_TTL", 20)
+@patch("conversion_rate_analyzer.config.GOVERNOR_INTERVAL", 5)
+def test_snapshot_includes_spilled_pairs(tmp_path):
+    with patch("conversion_rate_analyzer.config.SPILL_DIR", str(tmp_path)):
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.update_batch([100.0, 100.0], ["AUDUSD", "AUDEUR"], [1.0, 2.0])
+        monitor.update_batch([125.0], ["AUDUSD"], [3.0])
+        assert monitor.get_known_currency_pairs() == {"AUDUSD"}
+        assert len(monitor.governor.store) == 1
+        # spilled pairs are unknown until they tick again
+        assert not monitor.currency_pair_exists("AUDEUR")
+        with pytest.raises(KeyError):
+            monitor.get_current_average_rate("AUDEUR")
+        state = monitor.snapshot_state()
+
+    assert state["currency_pairs"] == ["AUDUSD", "AUDEUR"]
+    assert state["sum_counts"] == [(4.0, 2), (2.0, 1)]
+
+    restored = MovingAverageMonitor(singleton=False)
+    restored.restore_state(state)
+    assert restored.get_known_currency_pairs() == {"AUDUSD", "AUDEUR"}
+    assert restored.get_current_average_rate("AUDEUR") == 2.0
+
+    # restored pairs count as seen at the first maintenance, rather than idle since forever
+    restored.update_batch([126.0], ["AUDUSD"], [3.0])
+    assert restored.get_known_currency_pairs() == {"AUDUSD", "AUDEUR"}
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.PAIR_TTL", 20)
+@patch("conversion_rate_analyzer.config.GOVERNOR_INTERVAL", 5)
+def test_governor_metrics(tmp_path):
+    metrics.enabled = True
+    try:
+        with patch("conversion_rate_analyzer.config.SPILL_DIR", str(tmp_path)):
+            monitor = MovingAverageMonitor(singleton=False)
+        metrics.track_monitor(monitor)
+        monitor.update_batch([100.0, 100.0], ["AUDUSD", "AUDEUR"], [1.0, 2.0])
+        monitor.update_batch([125.0], ["AUDUSD"], [3.0])
+
+        text = metrics.render()
+        assert 'rate_analyzer_monitor_pairs_evicted_total{reason="ttl"} 1' in text
+        assert 'rate_analyzer_monitor_pairs_evicted_total{reason="budget"} 0' in text
+        assert "rate_analyzer_monitor_spilled_pairs 1" in text
+        assert f"rate_analyzer_monitor_memory_bytes {monitor.memory_bytes()}" in text
+
+        monitor.update_batch([126.0], ["AUDEUR"], [2.0])
+        assert "rate_analyzer_monitor_pairs_reloaded_total 1" in metrics.render()
+        assert "rate_analyzer_monitor_spilled_bytes 0" in metrics.render()
+    finally:
+        metrics.enabled = False
+        metrics.reset()
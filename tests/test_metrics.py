@@ -0,0 +1,111 @@
+import math
+import urllib.request
+
+import pytest
+
+from conversion_rate_analyzer.models.tick import Tick
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.utils.metrics import BUCKET_UPPER_BOUNDS, Histogram, Metrics, MetricsDumper, MetricsServer, metrics
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
+def test_histogram_buckets():
+    histogram = Histogram("latency_seconds", "Latency.")
+    assert math.isnan(histogram.quantile(0.5))
+
+    for value in [50, 128, 1000, 1001, 1300, 10 ** 6, 10 ** 12]:
+        histogram.record(value)
+    assert histogram.count == 7
+    assert histogram.quantile(0) == 128
+    assert histogram.quantile(0.5) == 1024
+    assert histogram.quantile(1) == math.inf
+
+    # every recorded value is within 25% below the upper bound of its bucket
+    for value in [129, 1000, 12345, 10 ** 9]:
+        histogram = Histogram("latency_seconds", "Latency.")
+        histogram.record(value)
+        upper_bound = histogram.quantile(1)
+        assert value < upper_bound <= value * 1.25
+    assert BUCKET_UPPER_BOUNDS == sorted(set(BUCKET_UPPER_BOUNDS))
+
+
+def test_render():
+    registry = Metrics(prefix="test")
+    registry.data_points.inc(3)
+    registry.validation_errors.inc()
+    registry.update_seconds.record(2000)
+    text = registry.render()
+
+    assert "# TYPE test_monitor_data_points_total counter\ntest_monitor_data_points_total 3\n" in text
+    assert text.count("# TYPE test_validation_errors_total counter") == 1
+    assert 'test_validation_errors_total{path="fast"} 1\n' in text
+    assert 'test_validation_errors_total{path="strict"} 0\n' in text
+    assert 'test_monitor_update_seconds_bucket{le="+Inf"} 1\n' in text
+    assert 'test_monitor_update_seconds_bucket{le="2.048e-06"} 1\n' in text
+    assert 'test_monitor_update_seconds_bucket{le="1.792e-06"} 0\n' in text
+    assert "test_monitor_update_seconds_sum 2e-06\n" in text
+    # gauges without a function have no sample
+    assert "\ntest_monitor_currency_pairs " not in text
+
+
+def test_disabled_metrics_are_not_collected(path_input_file_sample: str):
+    metrics.reset()
+    monitor = MovingAverageMonitor(singleton=False)
+    for batch in SpotRateReader.columnar_reader(path_input_file_sample, 10):
+        monitor.update_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+    assert metrics.reader_lines.value == 0
+    assert metrics.reader_batch_seconds.count == 0
+
+
+def test_pipeline_metrics(enabled_metrics, path_input_file_10min_single_curr_stream: str, path_output_file_test: str):
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(path_output_file_test)
+    enabled_metrics.track_monitor(monitor)
+
+    batches = list(SpotRateReader.columnar_reader(path_input_file_10min_single_curr_stream, 256))
+    for batch in batches:
+        monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+    monitor.process_new_rate(Tick(batches[-1].timestamps[-1] + 1, "AUDUSD", 10.0))
+    monitor.terminate_writer()
+
+    assert enabled_metrics.reader_lines.value == 600
+    assert enabled_metrics.reader_bytes.value == batches[-1].offset
+    assert enabled_metrics.reader_batch_seconds.count == 3
+    assert enabled_metrics.batch_seconds.count == 3
+    assert enabled_metrics.update_seconds.count == 1
+    assert enabled_metrics.data_points.value == 601
+    assert enabled_metrics.alerts_written.value >= 1
+    assert "rate_analyzer_monitor_currency_pairs 1\n" in enabled_metrics.render()
+    assert "rate_analyzer_monitor_window_depth_max 300\n" in enabled_metrics.render()
+
+
+def test_metrics_server(enabled_metrics):
+    enabled_metrics.data_points.inc(5)
+    server = MetricsServer(0)
+    server.start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert "rate_analyzer_monitor_data_points_total 5\n" in response.read().decode()
+    finally:
+        server.stop()
+
+
+def test_metrics_dumper(enabled_metrics, tmp_path):
+    path = str(tmp_path / "metrics.prom")
+    dumper = MetricsDumper(path, interval=3600)
+    dumper.start()
+    enabled_metrics.alerts_written.inc(2)
+    dumper.stop()
+    with open(path) as f:
+        assert "rate_analyzer_alerts_written_total 2\n" in f.read()
+
@@ -0,0 +1,99 @@
+import math
+from collections import defaultdict
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.movers_index import MoversIndex
+from conversion_rate_analyzer.service.query_api import StatePublisher
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed
+
+
+def brute_force_top(deviations: dict, k: int):
+    ranked = sorted(
+        ((pair_id, deviation) for pair_id, deviation in deviations.items() if not math.isnan(deviation)),
+        key=lambda item: (-abs(item[1]), item[0]),
+    )
+    return ranked[:k]
+
+
+def test_top_matches_brute_force():
+    rng = np.random.default_rng(0)
+    index = MoversIndex(capacity=16)
+    deviations = {}
+    for _ in range(2000):
+        pair_id = int(rng.integers(0, 100))
+        deviation = float(rng.normal(0, 0.05)) if rng.random() > 0.05 else math.nan
+        if rng.random() < 0.05:
+            index.remove(pair_id)
+            deviations[pair_id] = math.nan
+        else:
+            index.update(pair_id, deviation)
+            deviations[pair_id] = deviation
+        assert index.top(5) == brute_force_top(deviations, 5)
+
+    assert index.capacity == 128
+    assert index.top(1000) == brute_force_top(deviations, 1000)
+    assert MoversIndex().top(20) == []
+
+
+def test_update_many_matches_update():
+    rng = np.random.default_rng(1)
+    scalar, vector = MoversIndex(capacity=4), MoversIndex(capacity=4)
+    for _ in range(50):
+        pair_ids = rng.choice(300, size=40, replace=False)
+        deviations = rng.normal(0, 0.05, 40)
+        deviations[rng.random(40) < 0.1] = math.nan
+        for pair_id, deviation in zip(pair_ids.tolist(), deviations.tolist()):
+            scalar.update(pair_id, deviation)
+        vector.update_many(pair_ids, deviations)
+
+        assert vector.tree == scalar.tree
+        assert vector.top(10) == scalar.top(10)
+    assert vector.get_many(np.array([0, 5, 10_000])).shape == (3,)
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 5)
+@patch("conversion_rate_analyzer.config.MOVERS_INDEX", True)
+def test_monitor_ranks_latest_pct_changes(path_output_file_test: str):
+    timestamps, currency_pairs, rates = map(list, zip(*synthetic_feed(6, 12)))
+
+    # pct change of the latest data point of each pair against the average of the 5 data points before it
+    history = defaultdict(list)
+    for currency_pair, rate in zip(currency_pairs, rates):
+        history[currency_pair].append(rate)
+    expected = sorted(
+        ((pair, series[-1] / np.mean(series[-6:-1]) - 1) for pair, series in history.items()),
+        key=lambda item: -abs(item[1]),
+    )
+
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(path_output_file_test)
+    for timestamp, currency_pair, rate in zip(timestamps, currency_pairs, rates):
+        monitor.process_new_rate(CurrencyConversionRate(timestamp=timestamp, currencyPair=currency_pair, rate=rate))
+    monitor.terminate_writer()
+    movers = monitor.top_movers(10)
+    assert [pair for pair, _ in movers] == [pair for pair, _ in expected[:10]]
+    assert [pct_change for _, pct_change in movers] == pytest.approx([pct_change for _, pct_change in expected[:10]])
+
+    batched = MovingAverageMonitor(singleton=False)
+    batched.update_batch(np.array(timestamps), currency_pairs, np.array(rates))
+    assert batched.top_movers(30) == monitor.top_movers(30)
+
+    # evicted pairs leave the ranking
+    top_pair = movers[0][0]
+    batched.drop_pair(batched.symbols.get(top_pair))
+    assert top_pair not in dict(batched.top_movers(30))
+
+    publisher = StatePublisher(monitor)
+    publisher.publish()
+    assert [state["currencyPair"] for state in publisher.snapshot.movers(10)] == [pair for pair, _ in movers]
+    assert [state["pct_change"] for state in publisher.snapshot.movers(10)] == [pct for _, pct in movers]
+
+
+def test_top_movers_requires_the_index():
+    with pytest.raises(ValueError):
+        MovingAverageMonitor(singleton=False).top_movers()
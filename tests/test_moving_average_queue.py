@@ -1,3 +1,4 @@
+import math
 import os
 from unittest.mock import patch
 
@@ -5,6 +6,7 @@ import jsonlines
 import pytest
 
 from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.models.tick import Tick
 from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
 from conversion_rate_analyzer.utils.exceptions import SpotRateWriterError
 from conversion_rate_analyzer.utils.reader import SpotRateReader
@@ -16,6 +18,13 @@ def test_singleton():
     assert monitor1 == monitor2
 
 
+def test_independent_instances():
+    shard1 = MovingAverageMonitor(singleton=False)
+    shard2 = MovingAverageMonitor(singleton=False)
+    assert shard1 is not shard2
+    assert shard1 is not MovingAverageMonitor()
+
+
 def test_moving_average_10min_single_curr(
         path_input_file_10min_single_curr_stream: str,
         path_output_file_test: str
@@ -53,8 +62,8 @@ def test_moving_average_10min_single_curr_out_of_order(
 
     currency_pair = "AUDUSD"
     items = []
-    while not monitor.conversion_rates_queue[currency_pair].empty():
-        ts, rate = monitor.conversion_rates_queue[currency_pair].get()
+    while not monitor.get_window(currency_pair).empty():
+        ts, rate = monitor.get_window(currency_pair).get()
         items += ts,
 
     start = 1626609915
@@ -165,3 +174,140 @@ def test_moving_average_initialize_twice(
     assert monitor.jsonline_writer.path == new_path
     assert os.path.exists(new_path)
     os.remove(new_path)
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+@patch("conversion_rate_analyzer.config.REANCHOR_INTERVAL", 50)
+def test_moving_average_process_batch_matches_process_new_rate(
+        path_input_file_10min_single_curr_stream: str,
+        path_input_file_10min_single_curr_stream_outoforder: str,
+        path_output_file_test: str
+):
+    # interleave an in-order and an out-of-order stream under different currency pairs
+    records = []
+    for path, currency_pair in [
+        (path_input_file_10min_single_curr_stream, "AUDUSD"),
+        (path_input_file_10min_single_curr_stream_outoforder, "USDAUD"),
+    ]:
+        for i, obj in enumerate(SpotRateReader().jsonlines_reader(path)):
+            records.append((i, dict(obj, currencyPair=currency_pair)))
+    records = [obj for _, obj in sorted(records, key=lambda x: x[0])]
+
+    monitor = MovingAverageMonitor()
+    monitor.initialize_writer(path_output_file_test)
+    for obj in records:
+        monitor.process_new_rate(CurrencyConversionRate.parse_obj(obj))
+    monitor.terminate_writer()
+    expected_state = monitor.snapshot_state()
+    with jsonlines.open(path_output_file_test) as reader:
+        expected_output = list(reader)
+    os.remove(path_output_file_test)
+
+    monitor = MovingAverageMonitor()
+    monitor.initialize_writer(path_output_file_test)
+    alerts = 0
+    for start in range(0, len(records), 97):
+        chunk = records[start:start + 97]
+        block = monitor.process_batch(
+            [obj["timestamp"] for obj in chunk],
+            [obj["currencyPair"] for obj in chunk],
+            [obj["rate"] for obj in chunk],
+        )
+        alerts += block.size
+    monitor.terminate_writer()
+    with jsonlines.open(path_output_file_test) as reader:
+        output = list(reader)
+
+    assert alerts == len(expected_output) > 0
+    assert output == expected_output
+    assert monitor.snapshot_state() == expected_state
+
+
+def test_moving_average_process_batch_empty(path_output_file_test: str):
+    monitor = MovingAverageMonitor()
+    monitor.initialize_writer(path_output_file_test)
+    assert monitor.process_batch([], [], []).size == 0
+    monitor.terminate_writer()
+
+
+def test_moving_average_process_batch_uninitialized_writer():
+    monitor = MovingAverageMonitor()
+
+    with pytest.raises(SpotRateWriterError):
+        monitor.process_batch([1626609615.0], ["AUDUSD"], [1.0])
+
+
+@patch("conversion_rate_analyzer.config.WINDOW_SECONDS", 300)
+def test_moving_average_time_window_out_of_order(
+        path_input_file_10min_single_curr_stream_outoforder: str,
+        path_output_file_test: str
+):
+    monitor = MovingAverageMonitor()
+    monitor.initialize_writer(path_output_file_test)
+    for tick in SpotRateReader().tick_reader(path_input_file_10min_single_curr_stream_outoforder):
+        monitor.process_new_rate(tick)
+    monitor.terminate_writer()
+
+    start = 1626609915
+    assert [ts for ts, _ in monitor.get_window("AUDUSD")] == list(range(start, start + 300))
+    assert monitor.get_current_queue_size("AUDUSD") == 300
+    assert monitor.late_data_points == 0
+
+
+@patch("conversion_rate_analyzer.config.WINDOW_SECONDS", 300)
+@patch("conversion_rate_analyzer.config.ALLOWED_LATENESS", 10)
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 4)
+def test_moving_average_time_window_irregular_ticks(path_output_file_test: str):
+    monitor = MovingAverageMonitor()
+    monitor.initialize_writer(path_output_file_test)
+
+    # more data points within the window than the initial window capacity
+    for ts in range(10):
+        monitor.process_new_rate(Tick(1000.0 + ts, "AUDUSD", 1.0))
+    monitor.process_new_rate(Tick(1000.0, "USDAUD", 2.0))
+    assert monitor.get_current_queue_size("AUDUSD") == 10
+
+    # late data point within the allowed lateness, and one beyond it
+    monitor.process_new_rate(Tick(1005.5, "AUDUSD", 1.0))
+    monitor.process_new_rate(Tick(990.0, "AUDUSD", 1.0))
+    assert monitor.get_current_queue_size("AUDUSD") == 11
+    assert monitor.late_data_points == 1
+
+    # after a gap, only the data points of the last 300 seconds remain, including idle pairs
+    monitor.process_new_rate(Tick(1305.0, "AUDUSD", 3.0))
+    assert [ts for ts, _ in monitor.get_window("AUDUSD")] == [1005.5, 1006.0, 1007.0, 1008.0, 1009.0, 1305.0]
+    assert monitor.get_current_queue_size("USDAUD") == 0
+    assert math.isnan(monitor.get_current_average_rate("USDAUD"))
+
+    # an emptied window does not raise alerts on its next data point
+    monitor.process_new_rate(Tick(1306.0, "USDAUD", 5.0))
+    monitor.terminate_writer()
+
+    with jsonlines.open(path_output_file_test) as reader:
+        assert [alert["currencyPair"] for alert in reader] == ["AUDUSD"]
+
+
+@patch("conversion_rate_analyzer.config.WINDOW_SECONDS", 60)
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+def test_moving_average_time_window_process_batch(
+        path_input_file_10min_single_curr_stream: str,
+        path_output_file_test: str,
+        tmp_path
+):
+    expected_path = str(tmp_path / "expected.jsonl")
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(expected_path)
+    for tick in SpotRateReader().tick_reader(path_input_file_10min_single_curr_stream):
+        monitor.process_new_rate(tick)
+    monitor.terminate_writer()
+
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(path_output_file_test)
+    for batch in SpotRateReader().columnar_reader(path_input_file_10min_single_curr_stream, 64):
+        monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+    monitor.terminate_writer()
+
+    with jsonlines.open(expected_path) as expected, jsonlines.open(path_output_file_test) as output:
+        expected_alerts = list(expected)
+        assert len(expected_alerts) > 0
+        assert list(output) == expected_alerts
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.query_api import QueryServer, StatePublisher
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed
+
+
+def feed_monitor(monitor: MovingAverageMonitor, currencies: int = 5, seconds: int = 20):
+    timestamps, currency_pairs, rates = map(list, zip(*synthetic_feed(currencies, seconds)))
+    per_second = currencies * (currencies - 1)
+    for i in range(0, len(rates), per_second):
+        monitor.update_batch(timestamps[i:i + per_second], currency_pairs[i:i + per_second], rates[i:i + per_second])
+
+
+def get(port: int, path: str):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 10)
+def test_snapshot_matches_monitor_state():
+    monitor = MovingAverageMonitor(singleton=False)
+    publisher = StatePublisher(monitor, interval=60)
+    feed_monitor(monitor)
+    publisher.publish()
+    snapshot = publisher.snapshot
+
+    assert sorted(snapshot.currency_pairs.tolist()) == sorted(monitor.get_known_currency_pairs())
+    for currency_pair in monitor.get_known_currency_pairs():
+        state = snapshot.pair(currency_pair)
+        timestamp, rate = list(monitor.get_window(currency_pair))[-1]
+        average_rate = monitor.get_current_average_rate(currency_pair)
+        assert state["average_rate"] == average_rate
+        assert (state["timestamp"], state["rate"]) == (timestamp, rate)
+        assert state["pct_change"] == pytest.approx(rate / average_rate - 1)
+        assert state["count"] == monitor.get_current_queue_size(currency_pair) == 10
+        assert "window" not in state
+    assert snapshot.pair("XXXYYY") is None
+
+    movers = snapshot.movers(5)
+    deviations = sorted((abs(state["pct_change"]) for state in snapshot.pairs()), reverse=True)
+    assert [abs(state["pct_change"]) for state in movers] == deviations[:5]
+    assert len(snapshot.movers(1000)) == len(snapshot) == 20
+    assert snapshot.movers(0) == []
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 10)
+def test_published_snapshots_are_not_modified_by_ingestion():
+    monitor = MovingAverageMonitor(singleton=False)
+    publisher = StatePublisher(monitor, interval=60)
+    publisher.watch("AUDUSD")
+    feed_monitor(monitor, seconds=5)
+    publisher.maybe_publish()
+    snapshot = publisher.snapshot
+    pairs, window = snapshot.pairs(), [list(point) for point in monitor.get_window("AUDUSD")]
+    assert snapshot.pair("AUDUSD")["window"] == window
+
+    feed_monitor(monitor, seconds=5)
+    publisher.maybe_publish()
+    assert publisher.snapshot is snapshot
+    assert snapshot.pairs() == pairs
+    assert snapshot.pair("AUDUSD")["window"] == window
+
+    publisher.publish()
+    assert publisher.generation == 2
+    assert publisher.snapshot.pair("AUDUSD")["window"] == [list(point) for point in monitor.get_window("AUDUSD")]
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 10)
+def test_monitor_publishes_on_interval(path_output_file_test: str):
+    assert MovingAverageMonitor(singleton=False).publisher is None
+    with patch("conversion_rate_analyzer.config.QUERY_PORT", 0), patch("conversion_rate_analyzer.config.QUERY_INTERVAL", 0):
+        monitor = MovingAverageMonitor(singleton=False)
+
+    monitor.initialize_writer(path_output_file_test)
+    monitor.process_batch([1554933784.0, 1554933785.0], ["AUDUSD", "EURUSD"], [0.7, 1.1])
+    monitor.terminate_writer()
+    os.remove(path_output_file_test)
+
+    assert monitor.publisher.generation == 1
+    assert sorted(monitor.publisher.snapshot.currency_pairs.tolist()) == ["AUDUSD", "EURUSD"]
+    # count-based windows do not track the event time
+    assert monitor.publisher.snapshot.status()["watermark"] is None
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 10)
+def test_query_server():
+    monitor = MovingAverageMonitor(singleton=False)
+    publisher = StatePublisher(monitor, interval=0.05)
+    server = QueryServer(publisher, 0)
+    server.start()
+    try:
+        assert get(server.port, "/status")[1]["currency_pairs"] == 0
+
+        feed_monitor(monitor)
+        publisher.publish()
+        status, body = get(server.port, "/status")
+        assert status == 200 and body["currency_pairs"] == 20 and body["data_points"] == 200
+
+        status, body = get(server.port, "/pairs")
+        assert status == 200 and body["pairs"] == publisher.snapshot.pairs()
+
+        status, body = get(server.port, "/movers?k=3")
+        assert status == 200 and body["movers"] == publisher.snapshot.movers(3)
+
+        # the window is copied by the next publish of the ingestion loop
+        publishing = threading.Event()
+
+        def ingest():
+            while not publishing.wait(0.01):
+                publisher.maybe_publish()
+
+        ingestion = threading.Thread(target=ingest)
+        ingestion.start()
+        try:
+            status, body = get(server.port, "/pairs/audusd")
+        finally:
+            publishing.set()
+            ingestion.join()
+        assert status == 200 and body["window"] == [list(point) for point in monitor.get_window("AUDUSD")]
+
+        assert get(server.port, "/pairs/XXXYYY")[0] == 404
+        assert get(server.port, "/movers?k=many")[0] == 400
+        assert get(server.port, "/metrics")[0] == 404
+    finally:
+        server.stop()
+
+
+def test_empty_snapshot():
+    publisher = StatePublisher(MovingAverageMonitor(singleton=False))
+    assert publisher.snapshot.status()["age"] is None
+    publisher.publish()
+    assert len(publisher.snapshot) == 0
+    assert publisher.snapshot.movers(20) == []
+    assert publisher.snapshot.status()["data_points"] == 0
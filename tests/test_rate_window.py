@@ -0,0 +1,77 @@
+import random
+from queue import PriorityQueue
+
+import pytest
+
+from conversion_rate_analyzer.service.rate_window import RateWindow
+
+
+def test_rate_window_invalid_capacity():
+    with pytest.raises(ValueError):
+        RateWindow(0)
+
+
+def test_rate_window_in_order():
+    window = RateWindow(3)
+    assert window.empty() is True
+
+    for ts in range(10):
+        if window.full():
+            window.get()
+        window.put((ts, ts * 0.1))
+
+    assert window.full() is True
+    assert len(window) == 3
+    assert [ts for ts, _ in window] == [7, 8, 9]
+
+
+def test_rate_window_out_of_order():
+    window = RateWindow(5)
+    for ts in [3, 1, 4, 2, 5]:
+        window.put((ts, 1.0))
+
+    assert [window.get()[0] for _ in range(5)] == [1, 2, 3, 4, 5]
+
+
+def test_rate_window_full_and_empty():
+    window = RateWindow(1)
+    window.put((1, 1.0))
+
+    with pytest.raises(IndexError):
+        window.put((2, 1.0))
+
+    window.get()
+    with pytest.raises(IndexError):
+        window.get()
+
+
+def test_rate_window_matches_priority_queue():
+    rng = random.Random(7)
+    capacity = 50
+    window = RateWindow(capacity)
+    queue = PriorityQueue(maxsize=capacity)
+
+    for i in range(2000):
+        # mostly in-order timestamps with late arrivals and duplicate timestamps
+        item = (float(i - rng.choice([0, 0, 0, 1, 5, 30])), rng.choice([0.5, 0.75, 1.0]))
+        if window.full():
+            assert window.get() == queue.get()
+        window.put(item)
+        queue.put(item)
+
+    assert list(window) == [queue.get() for _ in range(queue.qsize())]
+
+
+def test_rate_window_grow_and_peek():
+    window = RateWindow(2)
+    with pytest.raises(IndexError):
+        window.peek()
+
+    window.put((2, 1.0))
+    window.put((3, 1.0))
+    window.grow()
+    window.put((1, 1.0))
+
+    assert window.capacity == 4
+    assert window.peek() == (1, 1.0)
+    assert [ts for ts, _ in window] == [1, 2, 3]
@@ -1,8 +1,13 @@
 from typing import Dict
+from unittest.mock import patch
 
+import jsonlines
+from jsonlines import InvalidLineError
 from jsonlines.jsonlines import Reader
 import pytest
 
+from conversion_rate_analyzer.models.tick import Tick
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
 from conversion_rate_analyzer.utils.reader import SpotRateReader
 
 
@@ -15,3 +20,140 @@ def test_jsonlines_reader(path_input_file_sample: str, conversion_data_valid: Di
     reader = SpotRateReader().jsonlines_reader(path_input_file_sample)
     assert type(reader) == Reader
     assert reader.read() == conversion_data_valid
+
+
+def test_tick_reader_invalid_input_file():
+    with pytest.raises(FileNotFoundError):
+        SpotRateReader().tick_reader("foo.jsonl")
+
+
+def test_tick_reader(path_input_file_sample: str, conversion_data_valid: Dict):
+    ticks = list(SpotRateReader().tick_reader(path_input_file_sample))
+    assert len(ticks) == 11
+    assert ticks[0] == Tick(**conversion_data_valid)
+
+
+def test_tick_reader_invalid_data(caplog, tmp_path, conversion_data_valid: Dict, conversion_data_invalid: Dict):
+    path = str(tmp_path / "input.jsonl")
+    with jsonlines.open(path, "w") as writer:
+        writer.write_all([conversion_data_invalid, conversion_data_valid])
+
+    assert list(SpotRateReader().tick_reader(path)) == [Tick(**conversion_data_valid)]
+    assert "timestamp must be Unix Timestamp" in caplog.text
+
+
+def test_columnar_reader(path_input_file_10min_single_curr_stream: str):
+    batches = list(SpotRateReader().columnar_reader(path_input_file_10min_single_curr_stream, batch_size=256))
+    assert [batch.size for batch in batches] == [256, 256, 88]
+    assert batches[0].timestamps[0] == 1626614332.0
+    assert batches[0].currency_pairs[0] == "AUDUSD"
+
+
+def test_columnar_reader_symbols(path_input_file_10min_single_curr_stream: str):
+    symbols = SymbolTable()
+    symbols.intern("CNYAUD")
+    batches = list(SpotRateReader().columnar_reader(path_input_file_10min_single_curr_stream, 256, symbols=symbols))
+    assert [batch.size for batch in batches] == [256, 256, 88]
+    assert batches[0].currency_pairs is None
+    assert set(batches[0].pair_ids) == {1}
+    assert symbols.symbol(1) == "AUDUSD"
+
+
+def test_columnar_reader_invalid_jsonline(tmp_path, conversion_data_valid: Dict):
+    path = str(tmp_path / "input.jsonl")
+    with jsonlines.open(path, "w") as writer:
+        writer.write(conversion_data_valid)
+    with open(path, "a") as f:
+        f.write("invalid line")
+
+    batches = SpotRateReader().columnar_reader(path, batch_size=10)
+    assert next(batches).size == 1
+    with pytest.raises(InvalidLineError):
+        next(batches)
+
+
+@pytest.fixture
+def path_feed(tmp_path) -> str:
+    from conversion_rate_analyzer.utils.feed_generator import synthetic_feed, write_feed
+
+    path = str(tmp_path / "feed.jsonl")
+    write_feed(path, synthetic_feed(currency_count=5, seconds=20, out_of_order=0.1))
+    return path
+
+
+def columns(batches) -> tuple:
+    timestamps, pairs, rates = [], [], []
+    for batch in batches:
+        timestamps.extend(batch.timestamps)
+        pairs.extend(batch.currency_pairs if batch.pair_ids is None else batch.pair_ids)
+        rates.extend(batch.rates)
+    return timestamps, pairs, rates
+
+
+def test_gzip_input(tmp_path, path_feed: str):
+    import gzip
+
+    path = str(tmp_path / "feed.jsonl.gz")
+    with open(path_feed, "rb") as f, gzip.open(path, "wb") as compressed:
+        compressed.write(f.read())
+
+    assert columns(SpotRateReader.columnar_reader(path, 64)) == columns(SpotRateReader.columnar_reader(path_feed, 64))
+    assert list(SpotRateReader.tick_reader(path)) == list(SpotRateReader.tick_reader(path_feed))
+    assert list(SpotRateReader.jsonlines_reader(path)) == list(SpotRateReader.jsonlines_reader(path_feed))
+
+    # offsets are offsets in the decompressed stream, so a compressed input can be resumed
+    batches = list(SpotRateReader.columnar_reader(path, 64))
+    resumed = SpotRateReader.columnar_reader(path, 64, offset=batches[1].offset)
+    assert columns(resumed) == columns(batches[2:])
+
+
+def test_zstd_input(tmp_path, path_feed: str):
+    zstandard = pytest.importorskip("zstandard")
+
+    path = str(tmp_path / "feed.jsonl.zst")
+    with open(path_feed, "rb") as f, open(path, "wb") as compressed:
+        compressed.write(zstandard.ZstdCompressor().compress(f.read()))
+
+    assert columns(SpotRateReader.columnar_reader(path, 64)) == columns(SpotRateReader.columnar_reader(path_feed, 64))
+
+
+@patch("conversion_rate_analyzer.config.READER_CHUNK_SIZE", 1000)
+def test_parallel_columnar_reader(path_feed: str):
+    sequential_symbols, parallel_symbols = SymbolTable(), SymbolTable()
+    sequential = list(SpotRateReader.columnar_reader(path_feed, 64, symbols=sequential_symbols))
+    parallel = list(SpotRateReader.columnar_reader(path_feed, 64, symbols=parallel_symbols, workers=2))
+
+    assert columns(parallel) == columns(sequential)
+    assert parallel_symbols.symbols == sequential_symbols.symbols
+    assert parallel[-1].offset == sequential[-1].offset
+    # the offset of every batch is the offset just past its last line
+    sequential_offsets = {}
+    for batch in SpotRateReader.columnar_reader(path_feed, 1):
+        sequential_offsets[batch.offset] = True
+    assert all(batch.offset in sequential_offsets for batch in parallel)
+
+    resumed = SpotRateReader.columnar_reader(path_feed, 64, offset=parallel[3].offset, workers=2)
+    assert columns(resumed) == columns(SpotRateReader.columnar_reader(path_feed, 64, offset=parallel[3].offset))
+    assert columns(SpotRateReader.columnar_reader(path_feed, 64, workers=2)) == columns(
+        SpotRateReader.columnar_reader(path_feed, 64)
+    )
+
+
+@patch("conversion_rate_analyzer.config.READER_CHUNK_SIZE", 100)
+def test_parallel_columnar_reader_invalid_lines(caplog, tmp_path, conversion_data_valid: Dict, conversion_data_invalid: Dict):
+    path = str(tmp_path / "input.jsonl")
+    with jsonlines.open(path, "w") as writer:
+        writer.write_all([conversion_data_valid] * 5 + [conversion_data_invalid] + [conversion_data_valid] * 5)
+    with open(path, "a") as f:
+        f.write("invalid line\n")
+    with jsonlines.open(path, "a") as writer:
+        writer.write(conversion_data_valid)
+
+    # the data points before the invalid line are handed over before raising, as with the sequential reader
+    sizes = []
+    with pytest.raises(InvalidLineError) as e:
+        for batch in SpotRateReader.columnar_reader(path, 100, workers=2):
+            sizes.append(batch.size)
+    assert sum(sizes) == 10
+    assert e.value.lineno == 12
+    assert "timestamp must be Unix Timestamp" in caplog.text
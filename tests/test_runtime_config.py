@@ -0,0 +1,141 @@
+import json
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.runtime_config import RuntimeConfig, check_value, parse_value
+from conversion_rate_analyzer.utils.exceptions import ConfigError
+
+from tests.conftest import PROJECT_ROOT_DIR
+
+
+def test_import_has_no_side_effects():
+    code = (
+        "import sys; import conversion_rate_analyzer.main; "
+        "print(sorted(m for m in ('loguru', 'numpy', 'pydantic', 'jsonlines') if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT_DIR, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+def test_output_file_default():
+    with patch.object(config, "OUTPUT_DIR", "/tmp/outputs"):
+        vars(config).pop("OUTPUT_FILE", None)
+        assert config.OUTPUT_FILE.startswith("/tmp/outputs/")
+        assert config.OUTPUT_FILE.endswith(".jsonl")
+        del config.OUTPUT_FILE
+
+
+def test_parse_value():
+    assert parse_value("moving_average_window", "600") == 600
+    assert parse_value("PCT_CHANGE_THRESHOLD", "0.05") == 0.05
+    assert parse_value("VERBOSE", "yes") is True
+    assert parse_value("VERBOSE", "0") is False
+    assert parse_value("WINDOW_SECONDS", "120") == 120
+    # durations accept fractions of a second
+    assert parse_value("ALERT_COOLDOWN", "0.5") == 0.5
+    assert parse_value("ALLOWED_LATENESS", "2") == 2.0
+    assert parse_value("DETECTORS", '[{"type": "ema", "threshold": 0.05}]') == [{"type": "ema", "threshold": 0.05}]
+    assert parse_value("CHECKPOINT_FILE", "state.npz") == "state.npz"
+    assert parse_value("ALERT_LOG_FORMAT", "none") is None
+    assert parse_value("OUTPUT_FILE", "out.jsonl") == "out.jsonl"
+
+    with pytest.raises(ConfigError):
+        parse_value("NOT_A_SETTING", "1")
+    with pytest.raises(ConfigError):
+        parse_value("MOVING_AVERAGE_WINDOW", "five")
+    with pytest.raises(ConfigError):
+        parse_value("VERBOSE", "maybe")
+
+
+def test_runtime_config_priority(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"moving_average_window": 600, "PCT_CHANGE_THRESHOLD": 0.2, "VERBOSE": True}))
+    environ = {"RATE_ANALYZER_PCT_CHANGE_THRESHOLD": "0.3", "RATE_ANALYZER_BATCH_SIZE": "100", "HOME": "/root"}
+
+    input_file, runtime_config = RuntimeConfig.from_args(
+        ["input.jsonl", "--config", str(config_file), "--set", "batch_size=50", "--output", "out.jsonl"], environ
+    )
+    assert input_file == "input.jsonl"
+    assert runtime_config.resolve() == {
+        "MOVING_AVERAGE_WINDOW": 600,
+        "PCT_CHANGE_THRESHOLD": 0.3,
+        "VERBOSE": True,
+        "BATCH_SIZE": 50,
+        "OUTPUT_FILE": "out.jsonl",
+    }
+
+    window, batch_size = config.MOVING_AVERAGE_WINDOW, config.BATCH_SIZE
+    runtime_config.apply()
+    try:
+        assert config.MOVING_AVERAGE_WINDOW == 600
+        assert config.OUTPUT_FILE == "out.jsonl"
+    finally:
+        runtime_config.restore()
+    assert (config.MOVING_AVERAGE_WINDOW, config.BATCH_SIZE) == (window, batch_size)
+    assert "OUTPUT_FILE" not in vars(config) or config.OUTPUT_FILE != "out.jsonl"
+
+
+def test_check_value():
+    assert check_value("workers", "5") == 5
+    assert check_value("WORKERS", 5) == 5
+    assert check_value("PCT_CHANGE_THRESHOLD", 1) == 1.0 and isinstance(check_value("PCT_CHANGE_THRESHOLD", 1), float)
+    assert check_value("VERBOSE", "on") is True
+    assert check_value("WINDOW_SECONDS", 120) == 120
+    assert check_value("ALERT_COOLDOWN", 0.5) == 0.5
+    assert check_value("DETECTORS", [{"type": "ema", "threshold": 0.05}]) == [{"type": "ema", "threshold": 0.05}]
+    assert check_value("ALERT_LOG_FORMAT", None) is None
+
+    for name, value in (("WORKERS", 2.5), ("WORKERS", True), ("VERBOSE", 1), ("ALERT_LOG_FORMAT", 3), ("WORKERS", "five")):
+        with pytest.raises(ConfigError):
+            check_value(name, value, "config.json")
+
+
+def test_runtime_config_errors(tmp_path):
+    with pytest.raises(ConfigError):
+        RuntimeConfig.from_args(["input.jsonl", "--set", "VERBOSE"])
+
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"WINDOW": 600}))
+    with pytest.raises(ConfigError):
+        RuntimeConfig(str(config_file), environ={}).resolve()
+
+    config_file.write_text(json.dumps({"WORKERS": "many"}))
+    with pytest.raises(ConfigError):
+        RuntimeConfig(str(config_file), environ={}).resolve()
+
+    config_file.write_text("[1, 2]")
+    with pytest.raises(ConfigError):
+        RuntimeConfig(str(config_file), environ={}).resolve()
+
+    with pytest.raises(ConfigError):
+        RuntimeConfig(str(tmp_path / "missing.json"), environ={}).resolve()
+
+
+def test_runtime_config_reload(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"PCT_CHANGE_THRESHOLD": 0.2, "MOVING_AVERAGE_WINDOW": 600}))
+    runtime_config = RuntimeConfig(str(config_file), environ={})
+    threshold, window = config.PCT_CHANGE_THRESHOLD, config.MOVING_AVERAGE_WINDOW
+
+    runtime_config.apply()
+    try:
+        # reloadable settings change in place, the others wait for a restart
+        config_file.write_text(json.dumps({"PCT_CHANGE_THRESHOLD": 0.05, "MOVING_AVERAGE_WINDOW": 60, "VERBOSE": True}))
+        assert runtime_config.reload() == {"PCT_CHANGE_THRESHOLD": 0.05, "VERBOSE": True}
+        assert config.MOVING_AVERAGE_WINDOW == 600
+
+        # removed overrides revert to their default
+        config_file.write_text(json.dumps({}))
+        assert runtime_config.reload() == {"PCT_CHANGE_THRESHOLD": threshold, "VERBOSE": False}
+
+        # an invalid config keeps the current settings
+        config_file.write_text("{")
+        assert runtime_config.reload() == {}
+        assert config.PCT_CHANGE_THRESHOLD == threshold
+    finally:
+        runtime_config.restore()
+    assert (config.PCT_CHANGE_THRESHOLD, config.MOVING_AVERAGE_WINDOW, config.VERBOSE) == (threshold, window, False)
@@ -0,0 +1,145 @@
+import os
+import signal
+from unittest.mock import patch
+
+import jsonlines
+import pytest
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.sharded_pipeline import ShardedPipeline
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.utils.writer import SpotRateWriter
+
+
+@pytest.fixture
+def path_input_file_multi_curr(
+        tmp_path,
+        path_input_file_10min_single_curr_stream: str,
+        path_input_file_10min_single_curr_stream_outoforder: str
+) -> str:
+    """Interleaves the single currency streams under several currency pairs."""
+    streams = []
+    for path in [path_input_file_10min_single_curr_stream, path_input_file_10min_single_curr_stream_outoforder]:
+        with jsonlines.open(path) as reader:
+            streams.append(list(reader))
+
+    path = str(tmp_path / "multi_curr.jsonl")
+    with jsonlines.open(path, "w") as writer:
+        for i in range(600):
+            for j, currency_pair in enumerate(["AUDUSD", "USDAUD", "CNYAUD", "AUDCNY", "JPYUSD"]):
+                writer.write(dict(streams[j % 2][i], currencyPair=currency_pair))
+
+    return path
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+@patch("conversion_rate_analyzer.config.BATCH_SIZE", 256)
+def test_sharded_pipeline_matches_single_process(tmp_path, path_input_file_multi_curr: str):
+    expected_path = str(tmp_path / "expected.jsonl")
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(expected_path)
+    for batch in SpotRateReader().columnar_reader(path_input_file_multi_curr, 256):
+        monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+    monitor.terminate_writer()
+
+    output_path = str(tmp_path / "output.jsonl")
+    writer = SpotRateWriter(output_path)
+    data_points_processed = ShardedPipeline(workers=3).run(path_input_file_multi_curr, writer)
+    writer.close()
+
+    with jsonlines.open(expected_path) as expected, jsonlines.open(output_path) as output:
+        expected_alerts = list(expected)
+        assert len(expected_alerts) > 0
+        assert list(output) == expected_alerts
+
+    assert data_points_processed == 3000
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+@patch("conversion_rate_analyzer.config.BATCH_SIZE", 256)
+@patch("conversion_rate_analyzer.config.WINDOW_SECONDS", 120)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_DIRECTION", "both")
+@patch("conversion_rate_analyzer.config.ALERT_COOLDOWN", 60)
+@patch("conversion_rate_analyzer.config.QUERY_PORT", 0)
+def test_spawned_workers_use_the_settings_of_the_dispatcher(tmp_path, path_input_file_multi_curr: str):
+    expected_path = str(tmp_path / "expected.jsonl")
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(expected_path)
+    for batch in SpotRateReader().columnar_reader(path_input_file_multi_curr, 256):
+        monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+    monitor.terminate_writer()
+
+    settings = ShardedPipeline.worker_settings(1)
+    assert settings["WINDOW_SECONDS"] == 120 and settings["QUERY_PORT"] is None
+
+    output_path = str(tmp_path / "output.jsonl")
+    writer = SpotRateWriter(output_path)
+    ShardedPipeline(workers=2, start_method="spawn").run(path_input_file_multi_curr, writer)
+    writer.close()
+
+    with jsonlines.open(expected_path) as expected, jsonlines.open(output_path) as output:
+        expected_alerts = list(expected)
+        assert any(alert.get("suppressed") for alert in expected_alerts)
+        assert list(output) == expected_alerts
+
+
+def test_sharded_pipeline_shard_is_stable():
+    pipeline = ShardedPipeline(workers=4)
+    assert pipeline.shard("AUDUSD") == ShardedPipeline(workers=4).shard("AUDUSD")
+    assert 0 <= pipeline.shard("AUDUSD") < 4
+
+
+def test_sharded_pipeline_invalid_workers():
+    with pytest.raises(ValueError):
+        ShardedPipeline(workers=0)
+
+
+def test_sharded_pipeline_nonexistent_input_file(tmp_path):
+    writer = SpotRateWriter(str(tmp_path / "output.jsonl"))
+
+    with pytest.raises(FileNotFoundError):
+        ShardedPipeline(workers=2).run("foo.jsonl", writer)
+
+    writer.close()
+
+
+@patch("conversion_rate_analyzer.config.BATCH_SIZE", 50)
+def test_sharded_pipeline_worker_failure(tmp_path, path_input_file_multi_curr: str):
+    update_batch = MovingAverageMonitor.update_batch
+
+    def failing_update_batch(monitor, timestamps, currency_pairs, rates):
+        if "JPYUSD" in list(currency_pairs):
+            raise ValueError("shard failure")
+        return update_batch(monitor, timestamps, currency_pairs, rates)
+
+    writer = SpotRateWriter(str(tmp_path / "output.jsonl"))
+    # the workers inherit the patch when forked
+    with patch.object(MovingAverageMonitor, "update_batch", failing_update_batch):
+        with pytest.raises(RuntimeError, match="shard failure"):
+            ShardedPipeline(workers=3, queue_size=1).run(path_input_file_multi_curr, writer)
+
+    writer.close()
+
+
+@patch("conversion_rate_analyzer.config.BATCH_SIZE", 50)
+def test_sharded_pipeline_killed_worker(tmp_path, path_input_file_multi_curr: str):
+    update_batch = MovingAverageMonitor.update_batch
+
+    def killed_update_batch(monitor, timestamps, currency_pairs, rates):
+        if "JPYUSD" in list(currency_pairs):
+            # as the OOM killer would, without a chance to report the error
+            os.kill(os.getpid(), signal.SIGKILL)
+        return update_batch(monitor, timestamps, currency_pairs, rates)
+
+    writer = SpotRateWriter(str(tmp_path / "output.jsonl"))
+    with patch.object(MovingAverageMonitor, "update_batch", killed_update_batch):
+        with pytest.raises(RuntimeError, match="exited with code"):
+            ShardedPipeline(workers=3, queue_size=1).run(path_input_file_multi_curr, writer)
+
+    writer.close()
+
+
+@patch("conversion_rate_analyzer.config.TRIANGULATION_TOLERANCE", 0.01)
+def test_sharded_pipeline_rejects_triangulation():
+    with pytest.raises(ValueError):
+        ShardedPipeline(workers=2)
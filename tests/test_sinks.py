@@ -0,0 +1,175 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.models.alert_block import AlertBlock
+from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.utils.metrics import metrics
+from conversion_rate_analyzer.utils.sinks import RotatingFileSink, Sink, UnixSocketSink, consumer_queue, create_sinks
+from conversion_rate_analyzer.utils.writer import FanOutWriter, SpotRateWriter, create_writer
+
+
+class SlowSink(Sink):
+    """Sink whose first write blocks until `release` is set."""
+
+    def __init__(self, **kwargs):
+        self.lines = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        super().__init__(**kwargs)
+
+    def _emit(self, lines):
+        self.started.set()
+        self.release.wait()
+        self.lines.extend(lines)
+
+
+def write_alerts(writer: SpotRateWriter, conversion_rate: CurrencyConversionRate):
+    for i in range(5):
+        writer.write(conversion_rate, current_avg_rate=0.353529, pct_change=i / 10, suppressed=i % 2)
+    writer.write_block(AlertBlock(
+        timestamps=np.array([1.0, 2.0]),
+        currency_pairs=np.array(["AUDUSD", "EURUSD"]),
+        rates=np.array([0.7, 1.1]),
+        average_rates=np.array([0.6, 1.0]),
+        pct_changes=np.array([0.16, 0.1]),
+        indices=np.array([0, 1]),
+        alert_types=np.array(["spotChange", "crossRateMismatch"]),
+    ))
+    writer.close()
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+def test_fan_out_writer_matches_writer(conversion_rate_valid: CurrencyConversionRate, tmp_path, capsys):
+    expected_path, path = str(tmp_path / "expected.jsonl"), str(tmp_path / "output.jsonl")
+    write_alerts(SpotRateWriter(expected_path), conversion_rate_valid)
+    with open(expected_path) as f:
+        expected = f.read()
+
+    sinks = [{"type": "stdout"}, {"type": "file"}, {"type": "queue", "name": "test-alerts"}]
+    with patch("conversion_rate_analyzer.config.OUTPUT_SINKS", sinks):
+        writer = create_writer(path)
+    assert isinstance(writer, FanOutWriter)
+    write_alerts(writer, conversion_rate_valid)
+
+    with open(path) as f:
+        assert f.read() == expected
+    assert capsys.readouterr().out == expected
+    alerts = consumer_queue("test-alerts")
+    assert "".join(alerts.get_nowait() for _ in range(alerts.qsize())) == expected
+    for sink in writer.sinks:
+        assert sink.lines_written.value == 7
+        assert sink.bytes_written.value == len(expected)
+        assert sink.lines_dropped.value == 0
+
+
+def test_rotating_file_sink_rolls_over_on_date_and_size(tmp_path):
+    now = [datetime(2026, 10, 18, 23, 59, 59)]
+    sink = RotatingFileSink(str(tmp_path / "%Y-%m-%d.jsonl"), max_bytes=25, backups=1, clock=lambda: now[0])
+
+    sink.offer([f"line {i:04d}\n" for i in range(5)])
+    sink.flush()
+    now[0] = datetime(2026, 10, 19, 0, 0, 1)
+    sink.offer(["next day\n"])
+    sink.close()
+
+    # 10 character lines: two per file of up to 25 characters, and a single backup of the previous file
+    assert sorted(os.listdir(tmp_path)) == ["2026-10-18.jsonl", "2026-10-18.jsonl.1", "2026-10-19.jsonl"]
+    assert (tmp_path / "2026-10-18.jsonl").read_text() == "line 0004\n"
+    assert (tmp_path / "2026-10-18.jsonl.1").read_text() == "line 0002\nline 0003\n"
+    assert (tmp_path / "2026-10-19.jsonl").read_text() == "next day\n"
+    assert sink.lines_written.value == 6
+
+
+@pytest.mark.parametrize("policy, kept", [("drop_newest", range(1, 4)), ("drop_oldest", range(7, 10))])
+def test_slow_sink_drops_lines_without_blocking(policy, kept):
+    sink = SlowSink(name=f"slow-{policy}", buffer_size=3, policy=policy)
+    sink.offer(["0"])
+    assert sink.started.wait(5)
+
+    start_time = time.perf_counter()
+    for i in range(1, 10):
+        sink.offer([str(i)])
+    assert time.perf_counter() - start_time < 1
+
+    sink.release.set()
+    sink.close()
+    assert sink.lines == ["0"] + [str(i) for i in kept]
+    assert sink.lines_dropped.value == 6
+
+
+def test_blocking_sink_applies_backpressure():
+    sink = SlowSink(name="slow-block", buffer_size=2, policy="block")
+    sink.offer(["0"])
+    assert sink.started.wait(5)
+
+    writer = threading.Thread(target=sink.offer, args=([str(i) for i in range(1, 5)],))
+    writer.start()
+    writer.join(0.2)
+    assert writer.is_alive()
+
+    sink.release.set()
+    writer.join(5)
+    sink.close()
+    assert sink.lines == [str(i) for i in range(5)]
+    assert sink.lines_dropped.value == 0
+
+
+def test_unix_socket_sink_reconnects(tmp_path):
+    path = str(tmp_path / "alerts.sock")
+    sink = UnixSocketSink(path, retry_interval=0, name="unix-test")
+    sink.offer(['{"alert": "lost"}\n'])
+    sink.flush()
+    assert sink.lines_dropped.value == 1
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    try:
+        sink.offer(['{"alert": "first"}\n', '{"alert": "second"}\n'])
+        connection, _ = server.accept()
+        sink.close()
+        # the sink closed the connection once done
+        received = b"".join(iter(lambda: connection.recv(4096), b""))
+        connection.close()
+    finally:
+        server.close()
+
+    assert received.decode() == '{"alert": "first"}\n{"alert": "second"}\n'
+    assert sink.lines_written.value == 2
+
+
+def test_sink_metrics_and_invalid_specs(tmp_path):
+    sinks = create_sinks([{"type": "file", "path": str(tmp_path / "a.jsonl")}, {"type": "stdout", "name": "console"}])
+    sinks[0].offer(["{}\n"])
+    for sink in sinks:
+        sink.close()
+
+    rendered = metrics.render()
+    assert f'rate_analyzer_sink_lines_total{{sink="file:{tmp_path / "a.jsonl"}"}} 1' in rendered
+    assert 'rate_analyzer_sink_lines_dropped_total{sink="console"} 0' in rendered
+    assert rendered.count("# TYPE rate_analyzer_sink_lines_total counter") == 1
+
+    for specs in (
+            [{"type": "kafka"}],
+            [{"type": "stdout", "policy": "retry"}],
+            [{"type": "stdout", "buffer_size": 0}],
+            [{"type": "stdout"}, {"type": "stdout"}],
+    ):
+        with pytest.raises(ValueError):
+            create_sinks(specs)
+
+
+def test_incomplete_sink_cannot_be_created():
+    class ClosingSink(Sink):
+        def _close(self):
+            pass
+
+    with pytest.raises(TypeError):
+        ClosingSink()
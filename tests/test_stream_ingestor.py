@@ -0,0 +1,187 @@
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.stream_ingestor import StreamIngestor, _LineDecoder, stream
+
+
+@pytest.fixture
+def monitor(tmp_path) -> MovingAverageMonitor:
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(str(tmp_path / "output.jsonl"))
+    yield monitor
+    monitor.terminate_writer()
+
+
+async def wait_for_processed(ingestor: StreamIngestor, count: int, timeout: float = 10):
+    deadline = time.perf_counter() + timeout
+    while ingestor.data_points_processed < count:
+        assert time.perf_counter() < deadline, f"{ingestor.data_points_processed} of {count} data points processed"
+        await asyncio.sleep(0.001)
+
+
+def test_stream_ingestor_tcp(monitor: MovingAverageMonitor):
+    input_file = os.path.join(os.path.dirname(__file__), "..", "input", "1second_all.jsonl")
+    with open(input_file, "rb") as f:
+        lines = f.read()
+
+    async def scenario():
+        ingestor = StreamIngestor(monitor, max_delay=0.01)
+        server = await ingestor.serve_tcp("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        consumer = asyncio.ensure_future(ingestor.run())
+
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(lines)
+        await writer.drain()
+        await wait_for_processed(ingestor, 11772)
+
+        # a single data point is processed without waiting for a full batch
+        writer.write(b'{"timestamp": 1626614332.69, "currencyPair": "GIPPEN", "rate": 2.0}\n')
+        await writer.drain()
+        await wait_for_processed(ingestor, 11773)
+
+        writer.close()
+        ingestor.stop()
+        await consumer
+
+    asyncio.run(scenario())
+    assert monitor.get_current_queue_size("GIPPEN") == 2
+
+
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 3)
+def test_stream_ingestor_alert_latency(monitor: MovingAverageMonitor):
+    alerts = []
+    process_batch = monitor.process_batch
+
+    def record_alerts(timestamps, currency_pairs, rates):
+        block = process_batch(timestamps, currency_pairs, rates)
+        if block.size:
+            alerts.append((time.perf_counter(), block))
+        return block
+
+    monitor.process_batch = record_alerts
+
+    async def scenario():
+        ingestor = StreamIngestor(monitor, max_delay=0.01)
+        server = await ingestor.serve_tcp("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        consumer = asyncio.ensure_future(ingestor.run())
+
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        for timestamp in range(3):
+            writer.write(b'{"timestamp": %d, "currencyPair": "GIPPEN", "rate": 1.0}\n' % (1626614330 + timestamp))
+        await writer.drain()
+        await wait_for_processed(ingestor, 3)
+        assert not alerts
+
+        # the alert is raised without waiting for a full batch: the bound is generous, the benchmark measures it
+        start_time = time.perf_counter()
+        writer.write(b'{"timestamp": 1626614333, "currencyPair": "GIPPEN", "rate": 2.0}\n')
+        await writer.drain()
+        await wait_for_processed(ingestor, 4, timeout=1.0)
+
+        writer.close()
+        ingestor.stop()
+        await consumer
+        return start_time
+
+    start_time = asyncio.run(scenario())
+    assert len(alerts) == 1
+    alert_time, block = alerts[0]
+    assert list(block.currency_pairs) == ["GIPPEN"]
+    assert alert_time - start_time < 1.0
+
+
+def test_stream_ingestor_stop_closes_open_connections(monitor: MovingAverageMonitor):
+    async def scenario():
+        ingestor = StreamIngestor(monitor, max_delay=0.01)
+        server = await ingestor.serve_tcp("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        consumer = asyncio.ensure_future(ingestor.run())
+
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b'{"timestamp": 1626609615, "currencyPair": "AUDUSD", "rate": 1.0}\n')
+        await writer.drain()
+        await wait_for_processed(ingestor, 1)
+
+        # the client keeps its connection open, so its handler is blocked reading when the ingestor stops
+        ingestor.stop()
+        await asyncio.wait_for(consumer, timeout=5)
+        assert await asyncio.wait_for(reader.read(), timeout=5) == b""
+        writer.close()
+
+    asyncio.run(scenario())
+    assert monitor.get_current_queue_size("AUDUSD") == 1
+
+
+def test_line_decoder_skips_oversized_lines():
+    decoder = _LineDecoder("test", max_line_size=100)
+    line = b'{"timestamp": 1626609615, "currencyPair": "AUDUSD", "rate": 1.0}\n'
+
+    assert decoder.feed(line[:20]).size == 0
+    assert decoder.feed(line[20:] + b"x" * 150).size == 1
+    # the rest of the oversized line is dropped without being buffered
+    assert decoder.feed(b"x" * 1000).size == 0
+    assert decoder.pending_size == 0
+    assert decoder.feed(b"x\n" + line + b"y" * 101 + b"\n" + line[:10]).size == 1
+    assert decoder.flush().size == 0
+    assert decoder.oversized_lines == 2
+    assert decoder.lineno == 5
+
+
+def test_stream_ingestor_tail_file(tmp_path, monitor: MovingAverageMonitor):
+    path = str(tmp_path / "input.jsonl")
+    with open(path, "w") as f:
+        f.write('{"timestamp": 1626609615, "currencyPair": "AUDUSD", "rate": 1.0}\n')
+
+    async def scenario():
+        ingestor = StreamIngestor(monitor, max_delay=0.01)
+        source = asyncio.ensure_future(ingestor.tail_file(path, poll_interval=0.01))
+        consumer = asyncio.ensure_future(ingestor.run())
+        await wait_for_processed(ingestor, 1)
+
+        with open(path, "a") as f:
+            f.write('{"timestamp": 1626609616, "currencyPair": "AUDUSD", ')
+            f.flush()
+            await asyncio.sleep(0.05)
+            f.write('"rate": 1.5}\ninvalid line\n{"timestamp": 1626609617, "currencyPair": "AUDUSD"}\n')
+
+        await wait_for_processed(ingestor, 2)
+        ingestor.stop()
+        await asyncio.gather(source, consumer)
+        return ingestor
+
+    ingestor = asyncio.run(scenario())
+    assert ingestor.data_points_processed == 2
+    assert monitor.get_current_average_rate("AUDUSD") == 1.25
+
+
+def test_stream_nonexistent_input_file(monitor: MovingAverageMonitor):
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(stream("foo.jsonl", monitor))
+
+
+def test_stream_unix_socket(tmp_path, monitor: MovingAverageMonitor):
+    path = str(tmp_path / "rates.sock")
+
+    async def scenario():
+        task = asyncio.ensure_future(stream(f"unix://{path}", monitor))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.001)
+
+        _, writer = await asyncio.open_unix_connection(path)
+        writer.write(b'{"timestamp": 1626609615, "currencyPair": "AUDUSD", "rate": 1.0}\n')
+        await writer.drain()
+        writer.close()
+
+        while not monitor.currency_pair_exists("AUDUSD"):
+            await asyncio.sleep(0.001)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert monitor.get_current_queue_size("AUDUSD") == 1
@@ -0,0 +1,51 @@
+import numpy as np
+
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+
+
+def test_symbol_table_intern():
+    symbols = SymbolTable()
+    assert symbols.intern("AUDUSD") == 0
+    assert symbols.intern("USDJPY") == 1
+    assert symbols.intern("AUDUSD") == 0
+    assert len(symbols) == 2
+    assert "USDJPY" in symbols
+    assert symbols.get("EURUSD") is None
+    assert symbols.symbol(1) == "USDJPY"
+
+
+def test_symbol_table_intern_many():
+    symbols = SymbolTable()
+    symbols.intern("AUDUSD")
+    pair_ids = symbols.intern_many(["USDJPY", "AUDUSD", "USDJPY", "EURUSD"])
+    assert pair_ids.dtype == np.int64
+    assert pair_ids.tolist() == [1, 0, 1, 2]
+    assert symbols.symbol_array()[pair_ids].tolist() == ["USDJPY", "AUDUSD", "USDJPY", "EURUSD"]
+
+    symbols.intern("CNYAUD")
+    assert symbols.symbol_array().tolist() == ["AUDUSD", "USDJPY", "EURUSD", "CNYAUD"]
+
+
+def test_symbol_table_currency_ids():
+    symbols = SymbolTable()
+    symbols.intern("AUDUSD")
+    symbols.intern("USDJPY")
+    symbols.intern("BTC-USD")
+    assert symbols.currency_ids(0) == (0, 1)
+    assert symbols.currency_ids(1) == (1, 2)
+    assert symbols.currency_ids(2) == (-1, -1)
+    assert symbols.currencies == ["AUD", "USD", "JPY"]
+
+
+def test_monitor_batch_with_pair_ids():
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.symbols.intern("USDJPY")
+    pair_ids = monitor.symbols.intern_many(["AUDUSD", "AUDUSD", "CNYAUD"])
+    block = monitor.update_batch([1.0, 2.0, 3.0], pair_ids, [0.7, 0.8, 0.2])
+
+    # interning a symbol does not register the currency pair until it has data points
+    assert monitor.get_known_currency_pairs() == {"AUDUSD", "CNYAUD"}
+    assert monitor.currency_pair_exists("USDJPY") is False
+    assert monitor.get_current_queue_size("AUDUSD") == 2
+    assert block.currency_pairs.tolist() == ["AUDUSD"]
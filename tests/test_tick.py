@@ -0,0 +1,47 @@
+from typing import Dict
+
+import pytest
+
+from conversion_rate_analyzer.models.tick import Tick
+from conversion_rate_analyzer.utils.exceptions import TickValidationError
+
+
+def test_tick(conversion_data_valid: Dict):
+    tick = Tick.parse_obj(conversion_data_valid)
+    assert tick == (1554933784.023, "CNYAUD", 0.39281)
+
+
+def test_tick_integer_timestamp(conversion_data_valid: Dict):
+    tick = Tick.parse_obj(dict(conversion_data_valid, timestamp=1554933784))
+    assert type(tick.timestamp) == float
+
+
+def test_tick_missing_attributes(conversion_data_missing: Dict):
+    with pytest.raises(TickValidationError) as excinfo:
+        Tick.parse_obj(conversion_data_missing)
+
+    assert "field required (type=value_error.missing)" in str(excinfo.value)
+
+
+def test_tick_invalid_data(conversion_data_invalid: Dict):
+    with pytest.raises(TickValidationError) as excinfo:
+        Tick.parse_obj(conversion_data_invalid)
+
+    assert "timestamp must be Unix Timestamp" in str(excinfo.value)
+
+
+def test_tick_invalid_types():
+    with pytest.raises(TickValidationError) as excinfo:
+        Tick.parse_obj({"timestamp": "now", "currencyPair": 1, "rate": [0.39281]})
+
+    assert excinfo.value.errors == [
+        ("timestamp", "value is not a valid float", "type_error.float"),
+        ("currencyPair", "str type expected", "type_error.str"),
+        ("rate", "value is not a valid float", "type_error.float"),
+    ]
+    assert str(excinfo.value).startswith("3 validation errors for Tick")
+
+
+def test_tick_not_an_object():
+    with pytest.raises(TickValidationError):
+        Tick.parse_obj([1554933784.023, "CNYAUD", 0.39281])
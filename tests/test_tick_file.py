@@ -0,0 +1,123 @@
+import filecmp
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer import config
+from conversion_rate_analyzer.main import main
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.utils.exceptions import TickFileError
+from conversion_rate_analyzer.utils.reader import SpotRateReader
+from conversion_rate_analyzer.utils.tick_file import RECORD_DTYPE, TickFile, convert_jsonl, is_tick_file
+
+
+@pytest.fixture
+def path_tick_file(tmp_path, path_input_file_sample: str) -> str:
+    path = str(tmp_path / "input1.ticks")
+    assert convert_jsonl(path_input_file_sample, path, batch_size=4) == 11
+    return path
+
+
+def test_convert_jsonl(path_tick_file: str, path_input_file_sample: str):
+    assert is_tick_file(path_tick_file)
+    assert not is_tick_file(path_input_file_sample)
+
+    tick_file = TickFile(path_tick_file)
+    ticks = list(SpotRateReader.tick_reader(path_input_file_sample))
+    assert len(tick_file) == 11
+    assert tick_file.data_offset % 64 == 0
+    assert tick_file.symbols == ["CNYAUD"]
+    assert tick_file.timestamps.tolist() == [tick.timestamp for tick in ticks]
+    assert tick_file.rates.tolist() == [tick.rate for tick in ticks]
+    assert isinstance(tick_file.records, np.memmap)
+
+
+def test_tick_file_batches(path_tick_file: str):
+    tick_file = TickFile(path_tick_file)
+    batches = list(tick_file.batches(4))
+    assert [batch.size for batch in batches] == [4, 4, 3]
+    assert batches[0].currency_pairs.tolist() == ["CNYAUD"] * 4
+    assert batches[-1].offset == tick_file.data_offset + 11 * RECORD_DTYPE.itemsize
+    # the columns are views of the mapped records
+    assert np.shares_memory(batches[0].timestamps, tick_file.records)
+
+    # resuming at the offset of a batch yields the remaining data points
+    assert [batch.size for batch in tick_file.batches(4, batches[0].offset)] == [4, 3]
+    assert list(tick_file.batches(4, batches[-1].offset)) == []
+    with pytest.raises(TickFileError):
+        list(tick_file.batches(4, batches[0].offset + 1))
+
+
+def test_tick_file_pair_ids(tmp_path, path_input_file_10min_single_curr_stream: str):
+    path = str(tmp_path / "10min.ticks")
+    convert_jsonl(path_input_file_10min_single_curr_stream, path)
+    tick_file = TickFile(path)
+
+    # a fresh symbol table numbers the pairs as the file does, so the pair IDs are not copied
+    symbols = SymbolTable()
+    batch = next(tick_file.batches(100, symbols=symbols))
+    assert batch.currency_pairs is None
+    assert np.shares_memory(batch.pair_ids, tick_file.records)
+
+    # otherwise the pair IDs are translated to the IDs of the table
+    symbols = SymbolTable()
+    symbols.intern("AUDUSD")
+    batch = next(tick_file.batches(100, symbols=symbols))
+    assert set(batch.pair_ids.tolist()) == {symbols.get(tick_file.symbols[0])}
+
+
+def test_tick_file_matches_jsonlines(tmp_path, path_input_file_10min_single_curr_stream: str):
+    path = str(tmp_path / "10min.ticks")
+    convert_jsonl(path_input_file_10min_single_curr_stream, path)
+
+    outputs = []
+    for name, reader in (
+            ("jsonl", SpotRateReader.columnar_reader(path_input_file_10min_single_curr_stream, 128)),
+            ("ticks", SpotRateReader.tick_file_reader(path, 128)),
+    ):
+        output = str(tmp_path / f"{name}.jsonl")
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(output)
+        for batch in reader:
+            monitor.process_batch(batch.timestamps, batch.currency_pairs, batch.rates)
+        monitor.terminate_writer()
+        outputs.append(output)
+
+    assert filecmp.cmp(*outputs, shallow=False)
+
+
+def test_tick_file_errors(tmp_path, path_tick_file: str, path_input_file_sample: str):
+    with pytest.raises(FileNotFoundError):
+        TickFile(str(tmp_path / "missing.ticks"))
+    with pytest.raises(TickFileError):
+        TickFile(path_input_file_sample)
+
+    with open(path_tick_file, "rb") as f:
+        data = f.read()
+    truncated = str(tmp_path / "truncated.ticks")
+    with open(truncated, "wb") as f:
+        f.write(data[:-1])
+    with pytest.raises(TickFileError):
+        TickFile(truncated)
+
+    empty = str(tmp_path / "empty.jsonl")
+    open(empty, "w").close()
+    convert_jsonl(empty, str(tmp_path / "empty.ticks"))
+    assert list(TickFile(str(tmp_path / "empty.ticks")).batches(10)) == []
+
+
+def test_main_tick_file(path_tick_file: str, path_output_file_test: str):
+    import conversion_rate_analyzer.main as main_module
+
+    main_module.data_points_processed = 0
+    with patch("conversion_rate_analyzer.config.STRICT_VALIDATION", True), \
+            patch.object(sys, "argv", ["conversion_rate_analyzer/main.py", path_tick_file]):
+        main()
+
+    assert main_module.data_points_processed == 11
+    assert MovingAverageMonitor.instance.get_current_queue_size("CNYAUD") == 11
+    with open(config.OUTPUT_FILE) as f:
+        assert f.readlines()[-1] == '{"timestamp": 1554933794.023, "currencyPair": "CNYAUD", "alert": "spotChange"}\n'
@@ -0,0 +1,152 @@
+import os
+from unittest.mock import patch
+
+import jsonlines
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.service.tick_filter import TickFilter
+from conversion_rate_analyzer.utils.metrics import metrics
+
+
+def retried_feed(seconds: int = 300, seed: int = 0):
+    """(timestamps, currency pairs, rates) of a feed where some data points are delivered twice, and some late."""
+    rng = np.random.default_rng(seed)
+    timestamps, currency_pairs, rates = [], [], []
+    for second in range(seconds):
+        for pair, rate in (("AUDUSD", 0.7), ("AUDJPY", 80.0)):
+            timestamp = 1554933784.0 + second + 0.5 * rng.random()
+            if rng.random() < 0.05:
+                timestamp -= 120
+            rate *= np.exp(rng.normal(0, 0.05))
+            for _ in range(2 if rng.random() < 0.2 else 1):
+                timestamps.append(timestamp)
+                currency_pairs.append(pair)
+                rates.append(rate)
+    return np.array(timestamps), currency_pairs, np.array(rates)
+
+
+def test_admit_drops_duplicates_and_late_data_points():
+    symbols = SymbolTable()
+    symbols.intern_many(["AUDUSD", "AUDJPY"])
+    tick_filter = TickFilter(symbols, capacity=2, max_delay=10)
+    assert tick_filter.admit(0, 100.0, 1.0)
+    assert not tick_filter.admit(0, 100.0, 1.1)
+    assert tick_filter.admit(1, 100.0, 1.0)
+    assert tick_filter.admit(0, 95.0, 1.0)
+    assert not tick_filter.admit(0, 89.0, 1.0)
+    assert tick_filter.admit(0, 90.0, 1.0)
+    assert (tick_filter.duplicates, tick_filter.late) == (1, 1)
+
+    # only the last `capacity` timestamps of each pair are remembered
+    assert tick_filter.admit(0, 100.0, 1.0)
+    assert list(tick_filter.recent[0]) == [90.0, 100.0]
+
+
+def test_admit_batch_matches_admit():
+    timestamps, currency_pairs, rates = retried_feed()
+    symbols = SymbolTable()
+    pair_ids = symbols.intern_many(currency_pairs)
+
+    tick_filter = TickFilter(symbols, max_delay=60)
+    expected = [tick_filter.admit(pair_id, timestamp, rate) for timestamp, pair_id, rate in zip(timestamps, pair_ids, rates)]
+
+    batch_filter = TickFilter(symbols, max_delay=60)
+    mask = np.concatenate([
+        batch_filter.admit_batch(timestamps[i:i + 50], pair_ids[i:i + 50], rates[i:i + 50])
+        for i in range(0, len(timestamps), 50)
+    ])
+    assert mask.tolist() == expected
+    assert (batch_filter.duplicates, batch_filter.late) == (tick_filter.duplicates, tick_filter.late)
+    assert tick_filter.duplicates > 0 and tick_filter.late > 0
+
+    assert batch_filter.admit_batch(np.array([1e10]), np.array([0]), np.array([1.0])) is None
+
+
+def test_tick_filter_rejects_non_positive_settings():
+    with pytest.raises(ValueError):
+        TickFilter(SymbolTable(), capacity=0)
+    with pytest.raises(ValueError):
+        TickFilter(SymbolTable(), max_delay=0)
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_THRESHOLD", 0.05)
+@patch("conversion_rate_analyzer.config.DEDUPLICATE", True)
+@patch("conversion_rate_analyzer.config.MAX_TICK_DELAY", 60)
+def test_monitor_skips_filtered_data_points(tmp_path, path_output_file_test: str):
+    timestamps, currency_pairs, rates = retried_feed()
+    late_output = str(tmp_path / "late" / "late.jsonl")
+
+    with patch("conversion_rate_analyzer.config.LATE_OUTPUT_FILE", late_output):
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(path_output_file_test)
+        for timestamp, currency_pair, rate in zip(timestamps, currency_pairs, rates):
+            monitor.process_new_rate(CurrencyConversionRate(timestamp=timestamp, currencyPair=currency_pair, rate=rate))
+        monitor.terminate_writer()
+    with jsonlines.open(path_output_file_test) as reader:
+        expected = list(reader)
+    os.remove(path_output_file_test)
+    with jsonlines.open(late_output) as reader:
+        late = list(reader)
+    assert len(late) == monitor.tick_filter.late > 0
+    assert set(late[0]) == {"timestamp", "currencyPair", "rate"}
+
+    # the same alerts as a monitor only fed the admitted data points, from the batch path
+    reference = MovingAverageMonitor(singleton=False)
+    reference.tick_filter = None
+    pair_ids = reference.symbols.intern_many(currency_pairs)
+    admitted = TickFilter(reference.symbols, max_delay=60).admit_batch(timestamps, pair_ids, rates)
+    expected_block = reference.update_batch(timestamps[admitted], np.array(currency_pairs)[admitted], rates[admitted])
+
+    monitor = MovingAverageMonitor(singleton=False)
+    monitor.initialize_writer(path_output_file_test)
+    blocks = [
+        monitor.process_batch(timestamps[i:i + 64], currency_pairs[i:i + 64], rates[i:i + 64])
+        for i in range(0, len(timestamps), 64)
+    ]
+    monitor.terminate_writer()
+    with jsonlines.open(path_output_file_test) as reader:
+        assert list(reader) == expected
+    os.remove(path_output_file_test)
+    os.remove(late_output)
+
+    assert len(expected) == sum(block.size for block in blocks) == expected_block.size > 0
+    # indices refer to positions in the input batches
+    positions = np.concatenate([block.indices + i * 64 for i, block in enumerate(blocks)])
+    assert np.array_equal(timestamps[positions], expected_block.timestamps)
+
+
+@patch("conversion_rate_analyzer.config.DEDUPLICATE", True)
+def test_filter_metrics():
+    metrics.enabled = True
+    try:
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.update_batch([1.0, 1.0, 2.0], ["AUDUSD", "AUDUSD", "AUDUSD"], [1.0, 1.0, 1.0])
+        monitor.tick_filter.max_delay = 5
+        monitor.update_batch([10.0, 3.0], ["AUDUSD", "AUDUSD"], [1.0, 1.0])
+
+        text = metrics.render()
+        assert 'rate_analyzer_filter_data_points_dropped_total{reason="duplicate"} 1' in text
+        assert 'rate_analyzer_filter_data_points_dropped_total{reason="late"} 1' in text
+        assert monitor.get_current_queue_size("AUDUSD") == 3
+    finally:
+        metrics.enabled = False
+        metrics.reset()
+
+
+@patch("conversion_rate_analyzer.config.DEDUPLICATE", True)
+def test_monitor_shares_prebuilt_symbol_table():
+    symbols = SymbolTable()
+    pair_ids = symbols.intern_many(["AUDUSD", "AUDJPY", "AUDUSD"])
+    monitor = MovingAverageMonitor(singleton=False, symbols=symbols)
+    assert monitor.symbols is symbols
+    assert monitor.tick_filter.symbols is symbols
+
+    monitor.update_batch(np.array([1.0, 1.0, 1.0]), pair_ids, np.array([1.0, 2.0, 1.0]))
+    assert monitor.get_current_queue_size("AUDUSD") == 1
+    assert monitor.get_current_average_rate("AUDJPY") == 2.0
@@ -0,0 +1,119 @@
+import os
+from unittest.mock import patch
+
+import jsonlines
+import numpy as np
+import pytest
+
+from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
+from conversion_rate_analyzer.service.moving_average_monitor import MovingAverageMonitor
+from conversion_rate_analyzer.service.symbol_table import SymbolTable
+from conversion_rate_analyzer.service.triangulation import TriangulationEngine
+from conversion_rate_analyzer.utils.feed_generator import synthetic_feed
+
+
+def feed_with_bad_quotes(currencies: int = 8, seconds: int = 60, bad_every: int = 97):
+    """Columns of a synthetic feed where every `bad_every`-th rate is off by 20%. Returns the bad rows too."""
+    timestamps, currency_pairs, rates = map(list, zip(*synthetic_feed(currencies, seconds)))
+    bad_rows = list(range(currencies * (currencies - 1) * 2, len(rates), bad_every))
+    for row in bad_rows:
+        rates[row] *= 1.2
+    return np.array(timestamps), currency_pairs, np.array(rates), bad_rows
+
+
+def test_consistent_feed_has_no_inconsistencies():
+    symbols = SymbolTable()
+    engine = TriangulationEngine(symbols, tolerance=0.01)
+    for _, currency_pair, rate in synthetic_feed(10, 10):
+        assert engine.check(symbols.intern(currency_pair), rate) is None
+    assert engine.checks == 10 * 9 * 10
+    assert engine.inconsistencies == 0
+
+
+def test_bad_quote_is_flagged_against_the_implied_rate():
+    symbols = SymbolTable()
+    engine = TriangulationEngine(symbols, tolerance=0.01, min_paths=2)
+    for currency_pair, rate in (("AUDUSD", 0.7), ("USDJPY", 110.0), ("AUDEUR", 0.6), ("EURJPY", 128.0)):
+        assert engine.check(symbols.intern(currency_pair), rate) is None
+
+    # no path through a known pair yet
+    assert engine.check(symbols.intern("AUDCHF"), 2.0) is None
+    assert engine.check(symbols.intern("CHFJPY"), 40.0) is None
+
+    reference_rate, deviation = engine.check(symbols.intern("AUDJPY"), 90.0)
+    assert reference_rate == pytest.approx(np.median([77.0, 76.8, 80.0]))
+    assert deviation == pytest.approx(90.0 / reference_rate - 1)
+    assert engine.check(symbols.intern("AUDJPY"), 77.0) is None
+    assert engine.inconsistencies == 1
+
+    # a single bad leg does not condemn the rates around it
+    assert engine.check(symbols.intern("AUDCHF"), 3.0) is None
+    assert engine.check(symbols.intern("AUDJPY"), 77.0) is None
+
+    # symbols that are not two currency codes are not checked
+    assert engine.check(symbols.intern("BTC-USD"), 1.0) is None
+    assert engine.checks == 10
+
+
+def test_check_batch_matches_check():
+    timestamps, currency_pairs, rates, bad_rows = feed_with_bad_quotes()
+    symbols = SymbolTable()
+    pair_ids = symbols.intern_many(currency_pairs)
+
+    engine = TriangulationEngine(symbols, tolerance=0.01)
+    expected = [engine.check(pair_id, rate) for pair_id, rate in zip(pair_ids.tolist(), rates.tolist())]
+    flagged = [row for row, inconsistency in enumerate(expected) if inconsistency is not None]
+    assert flagged == bad_rows
+
+    engine = TriangulationEngine(symbols, tolerance=0.01)
+    masks, blocks = zip(*(
+        engine.check_batch(timestamps[i:i + 100], pair_ids[i:i + 100], rates[i:i + 100])
+        for i in range(0, len(rates), 100)
+    ))
+    rows = np.concatenate([block.indices + i * 100 for i, block in enumerate(blocks)])
+    assert rows.tolist() == flagged
+    assert np.concatenate([block.pct_changes for block in blocks]).tolist() == [expected[row][1] for row in flagged]
+    assert set(np.concatenate([block.alert_types for block in blocks])) == {TriangulationEngine.alert}
+    assert sum(np.count_nonzero(~mask) for mask in masks if mask is not None) == len(flagged)
+
+
+def test_engine_rejects_non_positive_settings():
+    with pytest.raises(ValueError):
+        TriangulationEngine(SymbolTable(), tolerance=0)
+    with pytest.raises(ValueError):
+        TriangulationEngine(SymbolTable(), tolerance=0.01, min_paths=0)
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+@patch("conversion_rate_analyzer.config.MOVING_AVERAGE_WINDOW", 30)
+@patch("conversion_rate_analyzer.config.PCT_CHANGE_THRESHOLD", 0.1)
+def test_bad_quotes_do_not_raise_spot_change_alerts(path_output_file_test: str):
+    timestamps, currency_pairs, rates, bad_rows = feed_with_bad_quotes()
+
+    monitor = MovingAverageMonitor(singleton=False)
+    spot_changes = monitor.update_batch(timestamps, currency_pairs, rates)
+    assert spot_changes.size > 0
+
+    with patch("conversion_rate_analyzer.config.TRIANGULATION_TOLERANCE", 0.01):
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(path_output_file_test)
+        for timestamp, currency_pair, rate in zip(timestamps, currency_pairs, rates):
+            monitor.process_new_rate(CurrencyConversionRate(timestamp=timestamp, currencyPair=currency_pair, rate=rate))
+        monitor.terminate_writer()
+        with jsonlines.open(path_output_file_test) as reader:
+            expected = list(reader)
+        os.remove(path_output_file_test)
+        assert [line["alert"] for line in expected] == [TriangulationEngine.alert] * len(bad_rows)
+
+        monitor = MovingAverageMonitor(singleton=False)
+        monitor.initialize_writer(path_output_file_test)
+        alerts = [
+            monitor.process_batch(timestamps[i:i + 50], currency_pairs[i:i + 50], rates[i:i + 50])
+            for i in range(0, len(rates), 50)
+        ]
+        monitor.terminate_writer()
+        with jsonlines.open(path_output_file_test) as reader:
+            assert list(reader) == expected
+        os.remove(path_output_file_test)
+
+    assert np.concatenate([block.indices + i * 50 for i, block in enumerate(alerts)]).tolist() == bad_rows
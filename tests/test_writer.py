@@ -1,10 +1,16 @@
 import os
+import time
 from unittest.mock import patch
 
 import jsonlines
+import numpy as np
+import pytest
 
+from conversion_rate_analyzer.models.alert_block import AlertBlock
 from conversion_rate_analyzer.models.currency_conversion_rate import CurrencyConversionRate
-from conversion_rate_analyzer.utils.writer import SpotRateWriter
+from conversion_rate_analyzer.models.tick import Tick
+from conversion_rate_analyzer.utils.exceptions import SpotRateWriterError
+from conversion_rate_analyzer.utils.writer import AlertWriter, BufferedSpotRateWriter, SpotRateWriter, create_writer
 
 
 def test_writer(conversion_rate_valid: CurrencyConversionRate, path_output_file_test: str):
@@ -23,3 +29,134 @@ def test_writer_verbose(conversion_rate_valid: CurrencyConversionRate, path_outp
     reader = jsonlines.open(path_output_file_test)
     data = reader.read()
     assert data.keys() == {"timestamp", "currencyPair", "alert", "rate", "average_rate", "pct_change"}
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+def test_buffered_writer_matches_writer(conversion_rate_valid: CurrencyConversionRate, tmp_path):
+    expected_path, path = str(tmp_path / "expected.jsonl"), str(tmp_path / "output.jsonl")
+
+    for writer in [SpotRateWriter(expected_path), BufferedSpotRateWriter(path, max_records=3)]:
+        for i in range(10):
+            writer.write(conversion_rate_valid, current_avg_rate=0.353529, pct_change=i / 10)
+        writer.close()
+
+    with open(expected_path) as expected, open(path) as output:
+        assert output.read() == expected.read()
+
+
+def test_buffered_writer_flush_policy(conversion_rate_valid: CurrencyConversionRate, tmp_path):
+    path = str(tmp_path / "output.jsonl")
+    writer = BufferedSpotRateWriter(path, max_records=3, max_delay_ms=60_000)
+
+    def lines_written():
+        with open(path) as f:
+            return len(f.readlines())
+
+    writer.write(conversion_rate_valid)
+    writer.write(conversion_rate_valid)
+    assert lines_written() == 0
+
+    writer.write(conversion_rate_valid)
+    assert lines_written() == 3
+
+    writer.write(conversion_rate_valid)
+    writer.flush()
+    assert lines_written() == 4
+
+    writer.write(conversion_rate_valid)
+    writer.close()
+    assert lines_written() == 5
+
+
+def test_buffered_writer_background_flush(conversion_rate_valid: CurrencyConversionRate, tmp_path):
+    path = str(tmp_path / "output.jsonl")
+    writer = BufferedSpotRateWriter(path, max_records=1000, max_delay_ms=10, background_flush=True, fsync=True)
+    writer.write(conversion_rate_valid)
+
+    deadline = time.monotonic() + 5
+    while os.path.getsize(path) == 0:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+    writer.close()
+
+
+def test_buffered_writer_delete_output_file(conversion_rate_valid: CurrencyConversionRate, tmp_path):
+    path = str(tmp_path / "output.jsonl")
+    writer = BufferedSpotRateWriter(path)
+    writer.write(conversion_rate_valid)
+    os.remove(path)
+
+    with pytest.raises(SpotRateWriterError):
+        writer.close()
+
+
+def test_create_writer(tmp_path):
+    path = str(tmp_path / "output.jsonl")
+    writer = create_writer(path)
+    assert type(writer) == SpotRateWriter
+    writer.close()
+
+    with patch("conversion_rate_analyzer.config.WRITER_FLUSH_RECORDS", 100):
+        writer = create_writer(path)
+        assert type(writer) == BufferedSpotRateWriter
+        assert isinstance(writer, AlertWriter) and not isinstance(writer, SpotRateWriter)
+        assert writer.max_records == 100
+        writer.close()
+
+
+def test_incomplete_writer_cannot_be_created():
+    class RowWriter(AlertWriter):
+        def _write_row(self, *row):
+            pass
+
+    with pytest.raises(TypeError):
+        RowWriter()
+
+
+@patch("conversion_rate_analyzer.config.VERBOSE", True)
+def test_buffered_writer_write_block_matches_writer(tmp_path):
+    alerts = AlertBlock(
+        timestamps=np.array([1554933784.023, 1554933785.0]),
+        currency_pairs=np.array(["CNYAUD", "AUD\"USD"], dtype=object),
+        rates=np.array([0.39281, np.inf]),
+        average_rates=np.array([0.0, -np.inf]),
+        pct_changes=np.array([np.nan, 1e-20]),
+        indices=np.arange(2),
+        alert_types=np.array(["spotChange", "zScore"], dtype=object),
+    )
+    expected_path, path = str(tmp_path / "expected.jsonl"), str(tmp_path / "output.jsonl")
+
+    for writer in [SpotRateWriter(expected_path), BufferedSpotRateWriter(path)]:
+        writer.write_block(alerts)
+        writer.write(Tick(1554933786.5, "CNYAUD", 0.4))
+        writer.close()
+
+    with open(expected_path) as expected, open(path) as output:
+        assert output.read() == expected.read()
+
+
+@pytest.mark.parametrize("verbose", [True, False])
+def test_writers_report_suppressed_breaches(verbose, tmp_path):
+    alerts = AlertBlock(
+        timestamps=np.array([1554933784.023, 1554933785.0]),
+        currency_pairs=np.array(["CNYAUD", "AUDUSD"], dtype=object),
+        rates=np.array([0.39281, 0.7]),
+        average_rates=np.array([0.3, 0.6]),
+        pct_changes=np.array([0.3, 0.16]),
+        indices=np.arange(2),
+        alert_types=np.array(["spotChange", "spotChange"], dtype=object),
+        suppressed=np.array([0, 12]),
+    )
+    expected_path, path = str(tmp_path / "expected.jsonl"), str(tmp_path / "output.jsonl")
+
+    with patch("conversion_rate_analyzer.config.VERBOSE", verbose):
+        for writer in [SpotRateWriter(expected_path), BufferedSpotRateWriter(path)]:
+            writer.write_block(alerts)
+            writer.write(Tick(1554933786.5, "CNYAUD", 0.4), 0.3, 0.33, suppressed=3)
+            writer.close()
+
+    with open(expected_path) as expected, open(path) as output:
+        assert output.read() == expected.read()
+    with jsonlines.open(path) as reader:
+        assert [line.get("suppressed") for line in reader] == [None, 12, 3]